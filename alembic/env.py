@@ -24,6 +24,17 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+def include_name(name, type_, parent_names):
+    # Búsqueda (services_search): tablas FTS5 de SQLite (<tabla>_fts y sus
+    # shadow tables) e índices pg_trgm se manejan fuera de los modelos.
+    if type_ == "table" and name and "_fts" in name:
+        return False
+    if type_ == "index" and name and name.startswith("ix_trgm_"):
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -48,6 +59,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         compare_type=True,
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -71,7 +83,8 @@ def run_migrations_online() -> None:
             connection=connection,
             target_metadata=target_metadata,
             compare_type=True,
-            compare_server_default=True
+            compare_server_default=True,
+            include_name=include_name,
         )
 
         with context.begin_transaction():
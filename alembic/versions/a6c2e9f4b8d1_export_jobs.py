@@ -0,0 +1,55 @@
+"""export_jobs: exportaciones en background con progreso y artefacto
+
+Revision ID: a6c2e9f4b8d1
+Revises: f3a9d1c7e5b2
+Create Date: 2026-10-16 20:41:07.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e9f4b8d1'
+down_revision: Union[str, Sequence[str], None] = 'f3a9d1c7e5b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('export_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('usuario', sa.String(), nullable=False),
+    sa.Column('tipo', sa.String(length=60), nullable=False),
+    sa.Column('parametros_json', sa.Text(), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('filas_total', sa.Integer(), nullable=True),
+    sa.Column('filas_procesadas', sa.Integer(), nullable=False),
+    sa.Column('tamano_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('nombre_archivo', sa.String(length=200), nullable=True),
+    sa.Column('media_type', sa.String(length=120), nullable=True),
+    sa.Column('archivo_relpath', sa.String(length=500), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('iniciado_en', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('finalizado_en', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('expira_en', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_export_jobs_negocio_id'), 'export_jobs', ['negocio_id'], unique=False)
+    op.create_index('ix_export_jobs_negocio_creado', 'export_jobs', ['negocio_id', 'creado_en'], unique=False)
+    op.create_index('ix_export_jobs_estado_creado', 'export_jobs', ['estado', 'creado_en'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_export_jobs_estado_creado', table_name='export_jobs')
+    op.drop_index('ix_export_jobs_negocio_creado', table_name='export_jobs')
+    op.drop_index(op.f('ix_export_jobs_negocio_id'), table_name='export_jobs')
+    op.drop_table('export_jobs')
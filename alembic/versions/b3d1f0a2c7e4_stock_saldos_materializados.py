@@ -0,0 +1,66 @@
+"""stock_saldos materializados
+
+Revision ID: b3d1f0a2c7e4
+Revises: a47505a27a27
+Create Date: 2026-10-16 10:12:41.512203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d1f0a2c7e4'
+down_revision: Union[str, Sequence[str], None] = 'a47505a27a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stock_saldos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('producto_key', sa.String(), nullable=False),
+    sa.Column('producto', sa.String(), nullable=False),
+    sa.Column('zona', sa.String(), nullable=False),
+    sa.Column('cantidad', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('negocio_id', 'producto_key', 'zona', name='uq_stock_saldo_scope')
+    )
+    op.create_index(op.f('ix_stock_saldos_negocio_id'), 'stock_saldos', ['negocio_id'], unique=False)
+    op.create_index('ix_stock_saldos_negocio_producto', 'stock_saldos', ['negocio_id', 'producto_key'], unique=False)
+
+    # Backfill desde el ledger: SUM con signo agrupado por (negocio, producto normalizado, slot).
+    # lower() de SQL solo normaliza ASCII; para nombres con acentos/ñ usar
+    # `python -m modules.basic_wms.services.services_stock_saldos rebuild`.
+    op.execute(
+        """
+        INSERT INTO stock_saldos (negocio_id, producto_key, producto, zona, cantidad, updated_at)
+        SELECT
+            negocio_id,
+            lower(trim(producto)),
+            min(trim(producto)),
+            trim(zona),
+            sum(CASE
+                    WHEN tipo = 'salida' THEN -abs(cantidad)
+                    WHEN tipo = 'ajuste' AND cantidad < 0 THEN -abs(cantidad)
+                    ELSE abs(cantidad)
+                END),
+            CURRENT_TIMESTAMP
+        FROM movimientos
+        WHERE trim(producto) <> ''
+        GROUP BY negocio_id, lower(trim(producto)), trim(zona)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_saldos_negocio_producto', table_name='stock_saldos')
+    op.drop_index(op.f('ix_stock_saldos_negocio_id'), table_name='stock_saldos')
+    op.drop_table('stock_saldos')
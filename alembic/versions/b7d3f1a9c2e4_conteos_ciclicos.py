@@ -0,0 +1,78 @@
+"""conteos_ciclicos: sesiones de conteo cíclico con escaneos incrementales
+
+Revision ID: b7d3f1a9c2e4
+Revises: a6c2e9f4b8d1
+Create Date: 2026-10-16 21:12:44.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3f1a9c2e4'
+down_revision: Union[str, Sequence[str], None] = 'a6c2e9f4b8d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('conteos_ciclicos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(length=120), nullable=True),
+    sa.Column('zona_id', sa.Integer(), nullable=True),
+    sa.Column('ubicacion_id', sa.Integer(), nullable=True),
+    sa.Column('alcance', sa.String(length=200), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('total_lineas', sa.Integer(), nullable=False),
+    sa.Column('total_ajustes', sa.Integer(), nullable=False),
+    sa.Column('resumen_json', sa.Text(), nullable=True),
+    sa.Column('creado_por', sa.String(), nullable=False),
+    sa.Column('creado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('contabilizado_por', sa.String(), nullable=True),
+    sa.Column('contabilizado_en', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.ForeignKeyConstraint(['ubicacion_id'], ['ubicaciones.id'], ),
+    sa.ForeignKeyConstraint(['zona_id'], ['zonas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_conteos_ciclicos_negocio_id'), 'conteos_ciclicos', ['negocio_id'], unique=False)
+    op.create_index('ix_conteos_ciclicos_negocio_estado', 'conteos_ciclicos', ['negocio_id', 'estado'], unique=False)
+    op.create_table('conteo_ciclico_lineas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('conteo_id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('producto', sa.String(), nullable=False),
+    sa.Column('producto_key', sa.String(), nullable=False),
+    sa.Column('slot_id', sa.Integer(), nullable=False),
+    sa.Column('zona', sa.String(), nullable=False),
+    sa.Column('cantidad_contada', sa.Float(), nullable=False),
+    sa.Column('escaneos', sa.Integer(), nullable=False),
+    sa.Column('stock_teorico', sa.Float(), nullable=True),
+    sa.Column('diferencia', sa.Float(), nullable=True),
+    sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['conteo_id'], ['conteos_ciclicos.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.ForeignKeyConstraint(['slot_id'], ['slots.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('conteo_id', 'producto_id', 'slot_id', name='uq_conteo_linea_scope')
+    )
+    op.create_index(op.f('ix_conteo_ciclico_lineas_conteo_id'), 'conteo_ciclico_lineas', ['conteo_id'], unique=False)
+    op.create_index(op.f('ix_conteo_ciclico_lineas_negocio_id'), 'conteo_ciclico_lineas', ['negocio_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_conteo_ciclico_lineas_negocio_id'), table_name='conteo_ciclico_lineas')
+    op.drop_index(op.f('ix_conteo_ciclico_lineas_conteo_id'), table_name='conteo_ciclico_lineas')
+    op.drop_table('conteo_ciclico_lineas')
+    op.drop_index('ix_conteos_ciclicos_negocio_estado', table_name='conteos_ciclicos')
+    op.drop_index(op.f('ix_conteos_ciclicos_negocio_id'), table_name='conteos_ciclicos')
+    op.drop_table('conteos_ciclicos')
@@ -0,0 +1,53 @@
+"""stock_lotes fefo persistidos
+
+Revision ID: c4e2a1b9d8f3
+Revises: b3d1f0a2c7e4
+Create Date: 2026-10-16 11:04:18.220931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e2a1b9d8f3'
+down_revision: Union[str, Sequence[str], None] = 'b3d1f0a2c7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stock_lotes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('movimiento_id', sa.Integer(), nullable=True),
+    sa.Column('producto_key', sa.String(), nullable=False),
+    sa.Column('producto', sa.String(), nullable=False),
+    sa.Column('zona', sa.String(), nullable=False),
+    sa.Column('fecha_vencimiento', sa.Date(), nullable=True),
+    sa.Column('cantidad_inicial', sa.Float(), nullable=False),
+    sa.Column('cantidad_restante', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_lotes_negocio_id'), 'stock_lotes', ['negocio_id'], unique=False)
+    op.create_index(op.f('ix_stock_lotes_movimiento_id'), 'stock_lotes', ['movimiento_id'], unique=False)
+    op.create_index('ix_stock_lotes_fefo', 'stock_lotes', ['negocio_id', 'producto_key', 'zona', 'fecha_vencimiento'], unique=False)
+    op.create_index('ix_stock_lotes_vencimiento', 'stock_lotes', ['negocio_id', 'fecha_vencimiento'], unique=False)
+
+    # Sin backfill SQL: el consumo FEFO requiere replay ordenado del ledger.
+    # ensure_stock_saldos() (startup) reconstruye los negocios con stock sin lotes,
+    # o bien: `python -m modules.basic_wms.services.services_stock_saldos rebuild`.
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_lotes_vencimiento', table_name='stock_lotes')
+    op.drop_index('ix_stock_lotes_fefo', table_name='stock_lotes')
+    op.drop_index(op.f('ix_stock_lotes_movimiento_id'), table_name='stock_lotes')
+    op.drop_index(op.f('ix_stock_lotes_negocio_id'), table_name='stock_lotes')
+    op.drop_table('stock_lotes')
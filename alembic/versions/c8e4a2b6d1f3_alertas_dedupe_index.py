@@ -0,0 +1,28 @@
+"""alertas: índice (negocio_id, tipo, fecha_creacion) para dedupe por lotes
+
+Revision ID: c8e4a2b6d1f3
+Revises: b7d3f1a9c2e4
+Create Date: 2026-10-16 22:05:17.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e4a2b6d1f3'
+down_revision: Union[str, Sequence[str], None] = 'b7d3f1a9c2e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_alertas_negocio_tipo_fecha', 'alertas', ['negocio_id', 'tipo', 'fecha_creacion'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_alertas_negocio_tipo_fecha', table_name='alertas')
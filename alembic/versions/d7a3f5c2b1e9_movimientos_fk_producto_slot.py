@@ -0,0 +1,112 @@
+"""movimientos y stock_saldos con FK producto_id / slot_id
+
+Revision ID: d7a3f5c2b1e9
+Revises: c4e2a1b9d8f3
+Create Date: 2026-10-16 15:42:07.511284
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3f5c2b1e9'
+down_revision: Union[str, Sequence[str], None] = 'c4e2a1b9d8f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Filas por UPDATE en el backfill (transacciones cortas en tablas grandes)
+BACKFILL_CHUNK = 5000
+
+_SET_PRODUCTO_ID = """
+    producto_id = (
+        SELECT p.id FROM productos p
+        WHERE p.negocio_id = {t}.negocio_id
+          AND lower(trim(p.nombre)) = lower(trim({t}.producto))
+        ORDER BY p.id
+        LIMIT 1
+    )
+"""
+
+_SET_SLOT_ID = """
+    slot_id = (
+        SELECT s.id FROM slots s
+        JOIN ubicaciones u ON u.id = s.ubicacion_id
+        JOIN zonas z ON z.id = u.zona_id
+        WHERE z.negocio_id = {t}.negocio_id
+          AND s.codigo_full = trim({t}.zona)
+        ORDER BY s.id
+        LIMIT 1
+    )
+"""
+
+
+def _backfill(table: str) -> None:
+    """
+    Completa producto_id / slot_id desde los strings, por rangos de id.
+    lower() de SQL solo normaliza ASCII (en SQLite 'Ñandú' != 'ñandú'): esas
+    filas quedan sin FK en movimientos. reconstruir_stock_saldos resuelve el
+    producto_id de los saldos por nombre normalizado en Python, y los totales
+    por producto (get_total_producto_id, alertas) suman además los saldos sin
+    FK por producto_key.
+    """
+    bind = op.get_bind()
+    min_id, max_id = bind.execute(sa.text(f"SELECT min(id), max(id) FROM {table}")).one()
+    if min_id is None:
+        return
+
+    sets = ", ".join([_SET_PRODUCTO_ID.format(t=table), _SET_SLOT_ID.format(t=table)])
+    stmt = sa.text(
+        f"UPDATE {table} SET {sets} "
+        "WHERE id >= :desde AND id < :hasta AND (producto_id IS NULL OR slot_id IS NULL)"
+    )
+
+    desde = int(min_id)
+    while desde <= int(max_id):
+        bind.execute(stmt, {"desde": desde, "hasta": desde + BACKFILL_CHUNK})
+        desde += BACKFILL_CHUNK
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    is_sqlite = op.get_bind().dialect.name == 'sqlite'
+
+    op.add_column('movimientos', sa.Column('producto_id', sa.Integer(), nullable=True))
+    op.add_column('movimientos', sa.Column('slot_id', sa.Integer(), nullable=True))
+    op.add_column('stock_saldos', sa.Column('producto_id', sa.Integer(), nullable=True))
+    op.add_column('stock_saldos', sa.Column('slot_id', sa.Integer(), nullable=True))
+
+    # SQLite no soporta ALTER TABLE ADD CONSTRAINT (las FKs quedan en el modelo)
+    if not is_sqlite:
+        op.create_foreign_key('fk_movimientos_producto_id', 'movimientos', 'productos', ['producto_id'], ['id'])
+        op.create_foreign_key('fk_movimientos_slot_id', 'movimientos', 'slots', ['slot_id'], ['id'])
+        op.create_foreign_key('fk_stock_saldos_producto_id', 'stock_saldos', 'productos', ['producto_id'], ['id'])
+        op.create_foreign_key('fk_stock_saldos_slot_id', 'stock_saldos', 'slots', ['slot_id'], ['id'])
+
+    _backfill('movimientos')
+    _backfill('stock_saldos')
+
+    op.create_index('ix_movimientos_negocio_producto_slot', 'movimientos', ['negocio_id', 'producto_id', 'slot_id'], unique=False)
+    op.create_index('ix_stock_saldos_negocio_producto_slot', 'stock_saldos', ['negocio_id', 'producto_id', 'slot_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    is_sqlite = op.get_bind().dialect.name == 'sqlite'
+
+    op.drop_index('ix_stock_saldos_negocio_producto_slot', table_name='stock_saldos')
+    op.drop_index('ix_movimientos_negocio_producto_slot', table_name='movimientos')
+
+    if not is_sqlite:
+        op.drop_constraint('fk_stock_saldos_slot_id', 'stock_saldos', type_='foreignkey')
+        op.drop_constraint('fk_stock_saldos_producto_id', 'stock_saldos', type_='foreignkey')
+        op.drop_constraint('fk_movimientos_slot_id', 'movimientos', type_='foreignkey')
+        op.drop_constraint('fk_movimientos_producto_id', 'movimientos', type_='foreignkey')
+
+    op.drop_column('stock_saldos', 'slot_id')
+    op.drop_column('stock_saldos', 'producto_id')
+    op.drop_column('movimientos', 'slot_id')
+    op.drop_column('movimientos', 'producto_id')
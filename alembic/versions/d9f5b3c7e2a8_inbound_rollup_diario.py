@@ -0,0 +1,52 @@
+"""inbound_rollup_diario: agregado diario por negocio / proveedor / día CL
+
+Revision ID: d9f5b3c7e2a8
+Revises: c8e4a2b6d1f3
+Create Date: 2026-10-16 23:18:40.652117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f5b3c7e2a8'
+down_revision: Union[str, Sequence[str], None] = 'c8e4a2b6d1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('inbound_rollup_diario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('proveedor_id', sa.Integer(), nullable=False),
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('recepciones', sa.Integer(), nullable=False),
+    sa.Column('recepciones_cerradas', sa.Integer(), nullable=False),
+    sa.Column('kg', sa.Float(), nullable=False),
+    sa.Column('incidencias', sa.Integer(), nullable=False),
+    sa.Column('chk_total', sa.Integer(), nullable=False),
+    sa.Column('chk_ok', sa.Integer(), nullable=False),
+    sa.Column('eta_arribo_min_sum', sa.Float(), nullable=False),
+    sa.Column('eta_arribo_n', sa.Integer(), nullable=False),
+    sa.Column('arribo_descarga_min_sum', sa.Float(), nullable=False),
+    sa.Column('arribo_descarga_n', sa.Integer(), nullable=False),
+    sa.Column('arribo_cierre_min_sum', sa.Float(), nullable=False),
+    sa.Column('arribo_cierre_n', sa.Integer(), nullable=False),
+    sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('negocio_id', 'proveedor_id', 'dia', name='uq_inbound_rollup_diario_bucket')
+    )
+    op.create_index('ix_inbound_rollup_diario_neg_dia', 'inbound_rollup_diario', ['negocio_id', 'dia'], unique=False)
+    # El backfill lo hace ensure_inbound_rollup() al arrancar (o el comando rebuild)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inbound_rollup_diario_neg_dia', table_name='inbound_rollup_diario')
+    op.drop_table('inbound_rollup_diario')
@@ -0,0 +1,50 @@
+"""inbound analytics cache: clave en inbound_analytics_snapshots + inbound_data_versiones
+
+Revision ID: e1a7c4d9b3f6
+Revises: d9f5b3c7e2a8
+Create Date: 2026-10-16 23:52:07.318442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7c4d9b3f6'
+down_revision: Union[str, Sequence[str], None] = 'd9f5b3c7e2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('inbound_analytics_snapshots', sa.Column('origen', sa.String(length=10), server_default='manual', nullable=False))
+    op.add_column('inbound_analytics_snapshots', sa.Column('desde', sa.Date(), nullable=True))
+    op.add_column('inbound_analytics_snapshots', sa.Column('hasta', sa.Date(), nullable=True))
+    op.add_column('inbound_analytics_snapshots', sa.Column('filtros_hash', sa.String(length=64), nullable=True))
+    op.add_column('inbound_analytics_snapshots', sa.Column('data_version', sa.Integer(), nullable=True))
+    op.create_index('ix_inb_analytics_snap_cache', 'inbound_analytics_snapshots', ['negocio_id', 'origen', 'filtros_hash', 'desde', 'hasta'], unique=False)
+
+    op.create_table('inbound_data_versiones',
+    sa.Column('negocio_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('actualizado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['negocio_id'], ['negocios.id'], ),
+    sa.PrimaryKeyConstraint('negocio_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('inbound_data_versiones')
+
+    op.drop_index('ix_inb_analytics_snap_cache', table_name='inbound_analytics_snapshots')
+    # los snapshots de cache no tienen sentido sin su clave
+    op.execute("DELETE FROM inbound_analytics_snapshots WHERE origen = 'cache'")
+    op.drop_column('inbound_analytics_snapshots', 'data_version')
+    op.drop_column('inbound_analytics_snapshots', 'filtros_hash')
+    op.drop_column('inbound_analytics_snapshots', 'hasta')
+    op.drop_column('inbound_analytics_snapshots', 'desde')
+    op.drop_column('inbound_analytics_snapshots', 'origen')
@@ -0,0 +1,28 @@
+"""movimientos: índice (negocio_id, fecha, id) para paginación keyset
+
+Revision ID: e8b4c6d2a7f1
+Revises: d7a3f5c2b1e9
+Create Date: 2026-10-16 17:08:23.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b4c6d2a7f1'
+down_revision: Union[str, Sequence[str], None] = 'd7a3f5c2b1e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_movimientos_negocio_fecha_id', 'movimientos', ['negocio_id', 'fecha', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movimientos_negocio_fecha_id', table_name='movimientos')
@@ -0,0 +1,93 @@
+"""búsqueda por substring: pg_trgm (Postgres) / FTS5 trigram (SQLite)
+
+Revision ID: f3a9d1c7e5b2
+Revises: e8b4c6d2a7f1
+Create Date: 2026-10-16 18:21:40.117093
+
+"""
+import sqlite3
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d1c7e5b2'
+down_revision: Union[str, Sequence[str], None] = 'e8b4c6d2a7f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# tabla -> columnas buscables (ver core/services/services_search.py)
+INDICES = {
+    'movimientos': ('producto', 'usuario'),
+    'productos': ('nombre', 'sku', 'ean13'),
+    'inbound_recepciones': ('codigo_recepcion', 'documento_ref', 'contenedor', 'patente_camion'),
+}
+
+
+def _upgrade_sqlite() -> None:
+    # tokenizer trigram: SQLite >= 3.34 (si no, la búsqueda cae a LIKE)
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return
+
+    for t, columnas in INDICES.items():
+        fts = f'{t}_fts'
+        cols = ', '.join(columnas)
+        new_vals = ', '.join(f'new.{c}' for c in columnas)
+        old_vals = ', '.join(f'old.{c}' for c in columnas)
+
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{t}', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {t} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {t} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {t} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+        )
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _upgrade_postgres() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY: no bloquea escrituras en tablas grandes (fuera de transacción)
+    with op.get_context().autocommit_block():
+        for t, columnas in INDICES.items():
+            for c in columnas:
+                op.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trgm_{t}_{c} '
+                    f'ON {t} USING gin (lower({c}) gin_trgm_ops)'
+                )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _upgrade_sqlite()
+    elif dialect == 'postgresql':
+        _upgrade_postgres()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    for t, columnas in INDICES.items():
+        if dialect == 'sqlite':
+            fts = f'{t}_fts'
+            for suf in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suf}')
+            op.execute(f'DROP TABLE IF EXISTS {fts}')
+        elif dialect == 'postgresql':
+            for c in columnas:
+                op.execute(f'DROP INDEX IF EXISTS ix_trgm_{t}_{c}')
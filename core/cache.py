@@ -0,0 +1,94 @@
+﻿# core/cache.py
+"""
+Cache en memoria (por proceso) – ORBION
+
+✔ LRU acotado (max_entries) + TTL por entrada
+✔ Thread-safe (rutas sync corren en threadpool)
+✔ Métricas simples: hits / misses / evictions
+✔ ttl_seconds <= 0 o max_entries <= 0 => cache deshabilitado (no guarda nada)
+
+Uso:
+    cache = LRUTTLCache(max_entries=1024, ttl_seconds=5)
+    cache.set(key, value)
+    value = cache.get(key)        # None si no existe / expiró
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUTTLCache:
+    def __init__(self, *, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, *, ttl_seconds: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+
+        ttl = self.ttl_seconds if ttl_seconds is None else float(ttl_seconds)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Elimina las entradas que cumplan predicate(key, value). Retorna cuántas."""
+        with self._lock:
+            keys = [k for k, (_exp, v) in self._data.items() if predicate(k, v)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -34,6 +34,24 @@ class Settings(BaseSettings):
     # ============================
     DATABASE_URL: str = "sqlite:///./miniWMS.db"
 
+    # Pool de conexiones (QueuePool). pool_size + max_overflow >= THREADPOOL_MAX_WORKERS
+    # evita que los hilos esperen conexión bajo carga.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 30
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # Postgres: statement_timeout por conexión (0 = sin límite)
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+
+    # SQLite: PRAGMAs por conexión (WAL + lectores concurrentes con escrituras)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 64 MB por conexión
+
+    # Rutas sync (def) corren en el threadpool de AnyIO: tope de hilos concurrentes
+    THREADPOOL_MAX_WORKERS: int = 40
+
     # ============================
     #   SEGURIDAD / SESIONES
     # ============================
@@ -53,6 +71,83 @@ class Settings(BaseSettings):
     SESSION_COOKIE_SAMESITE: Literal["lax", "strict", "none"] = "lax"
     SESSION_COOKIE_SECURE: bool = False  # Forzado en production
 
+    # last_seen_at: persistir solo si el valor en BD es más antiguo que esto (0 = cada request)
+    SESSION_TOUCH_GRANULARITY_SECONDS: int = 60
+    SESSION_TOUCH_FLUSH_SECONDS: float = 5.0
+
+    # Cache de sesión resuelta (por proceso). TTL corto: la revocación invalida explícitamente.
+    AUTH_CACHE_TTL_SECONDS: float = 5.0
+    AUTH_CACHE_MAX_ENTRIES: int = 2048
+
+    # ============================
+    #   CACHES (por proceso)
+    # ============================
+    # Snapshot de entitlements por negocio (invalidación explícita en escrituras)
+    ENTITLEMENTS_CACHE_TTL_SECONDS: float = 30.0
+    ENTITLEMENTS_CACHE_MAX_ENTRIES: int = 1024
+
+    # Usage counters write-behind (acumular_usage*). BILLABLE crash-safe: se
+    # persiste en el commit de la transacción; OPERATIONAL por timer.
+    USAGE_WRITE_BEHIND_ENABLED: bool = False
+    USAGE_FLUSH_SECONDS: float = 2.0
+    USAGE_BILLABLE_CRASH_SAFE: bool = True
+
+    # Facetas de filtro de /movimientos (productos / usuarios por negocio)
+    MOVIMIENTOS_FACETAS_CACHE_TTL_SECONDS: float = 600.0
+    MOVIMIENTOS_FACETAS_CACHE_MAX_ENTRIES: int = 1024
+
+    # Catálogo de productos por negocio (SKU / EAN / nombre -> producto).
+    # Invalidación por versión en escrituras; el TTL acota staleness entre procesos.
+    PRODUCT_CATALOG_CACHE_TTL_SECONDS: float = 60.0
+    PRODUCT_CATALOG_CACHE_MAX_ENTRIES: int = 256
+
+    # Evaluación de alertas de stock / vencimiento en background: eventos del
+    # mismo (negocio, producto) dentro de la ventana se evalúan una vez
+    ALERTS_ASYNC_ENABLED: bool = True
+    ALERTS_COALESCE_SECONDS: float = 2.0
+    ALERTS_WORKER_POLL_SECONDS: float = 0.5
+    ALERTS_BATCH_MAX: int = 500
+
+    # Cache de /inbound/analytics en inbound_analytics_snapshots (origen="cache"):
+    # válido mientras no cambie la versión de datos inbound del negocio;
+    # max_age acota escrituras que no pasan por el ORM (inserts Core / scripts)
+    INBOUND_ANALYTICS_CACHE_ENABLED: bool = True
+    INBOUND_ANALYTICS_CACHE_MAX_AGE_SECONDS: int = 900
+    INBOUND_ANALYTICS_CACHE_MAX_ENTRIES: int = 200  # por negocio
+
+    # Templates Jinja2 (un solo Environment compartido, ver core/web.py)
+    # auto_reload: None -> activo salvo en production (sin stat() por render)
+    TEMPLATES_AUTO_RELOAD: bool | None = None
+    # Bytecode compilado en disco: workers nuevos no re-parsean los .html
+    TEMPLATES_BYTECODE_CACHE_ENABLED: bool = True
+    TEMPLATES_BYTECODE_CACHE_DIR: str | None = None  # None -> tmp del sistema
+    # Compilar todos los templates al arrancar (primer request sin compilación)
+    TEMPLATES_PRECOMPILE: bool = False
+
+    # Importación masiva de movimientos (CSV / XLSX)
+    MOVIMIENTOS_IMPORT_BATCH_SIZE: int = 1000
+    MOVIMIENTOS_IMPORT_MAX_FILAS: int = 100_000
+    # filas con error que se reportan (el total se cuenta igual)
+    MOVIMIENTOS_IMPORT_MAX_ERRORES: int = 200
+
+    # ============================
+    #   EXPORTS EN BACKGROUND
+    # ============================
+    # Pool propio (no usa el threadpool de requests). Artefactos en
+    # $ORBION_STORAGE_DIR/exports/negocio_<id>/
+    EXPORT_JOBS_ENABLED: bool = True
+    EXPORT_JOBS_WORKERS: int = 2
+    EXPORT_JOBS_MAX_POR_NEGOCIO: int = 1
+    EXPORT_JOBS_POLL_SECONDS: float = 5.0
+    EXPORT_JOBS_PROGRESS_EVERY_ROWS: int = 5000
+    # en_proceso sin heartbeat por más de esto => error (proceso caído)
+    EXPORT_JOBS_STALE_SECONDS: int = 900
+    EXPORT_JOBS_RETENTION_HOURS: int = 72
+    # Postgres: statement_timeout de la sesión del job (0 = sin límite)
+    EXPORT_JOBS_STATEMENT_TIMEOUT_MS: int = 0
+    # Vigencia del link firmado de descarga
+    EXPORT_LINK_TTL_SECONDS: int = 3600
+
     # ============================
     #   WHATSAPP / NOTIFICACIONES
     # ============================
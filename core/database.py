@@ -1,7 +1,7 @@
 ﻿# core/database.py
 from __future__ import annotations
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from core.config import settings
@@ -13,18 +13,64 @@ from core.config import settings
 
 DATABASE_URL = settings.DATABASE_URL
 
-# SQLite (local) requiere check_same_thread=False
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_POSTGRES = DATABASE_URL.startswith(("postgresql", "postgres"))
+_SQLITE_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") == "sqlite:")
+
+connect_args: dict = {}
+engine_kwargs: dict = {}
+
+if IS_SQLITE:
+    # SQLite (local) requiere check_same_thread=False (rutas sync corren en threadpool)
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": max(int(settings.SQLITE_BUSY_TIMEOUT_MS), 0) / 1000,
+    }
+elif IS_POSTGRES and int(settings.DB_STATEMENT_TIMEOUT_MS) > 0:
+    connect_args = {"options": f"-c statement_timeout={int(settings.DB_STATEMENT_TIMEOUT_MS)}"}
+
+if not _SQLITE_MEMORY:
+    engine_kwargs = {
+        "pool_size": int(settings.DB_POOL_SIZE),
+        "max_overflow": int(settings.DB_MAX_OVERFLOW),
+        "pool_timeout": int(settings.DB_POOL_TIMEOUT_SECONDS),
+        "pool_recycle": int(settings.DB_POOL_RECYCLE_SECONDS),
+    }
 
 engine = create_engine(
     DATABASE_URL,
     connect_args=connect_args,
     future=True,
     pool_pre_ping=True,
+    **engine_kwargs,
 )
 
+
+# =========================================================
+# SQLITE PRAGMAS (por conexión)
+# =========================================================
+
+if IS_SQLITE:
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        """
+        - WAL: lectores no bloquean al escritor (last_seen_at, usage, auditoría).
+        - synchronous=NORMAL: seguro con WAL, mucho menos fsync.
+        - busy_timeout: espera el lock en vez de "database is locked".
+        - cache_size negativo = KB.
+        """
+        cursor = dbapi_connection.cursor()
+        try:
+            if not _SQLITE_MEMORY and settings.SQLITE_JOURNAL_MODE:
+                cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
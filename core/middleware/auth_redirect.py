@@ -10,14 +10,16 @@ Middleware de redirección / autorización por rutas – ORBION (SaaS enterprise
   - Roles inbound-only (solo /inbound)
 ✔ Redirecciones consistentes (sin loops)
 ✔ Login centralizado en /app/login
+✔ Usuario resuelto 1 vez por request (reutilizado por las dependencias)
 """
 
 from __future__ import annotations
 
 from fastapi import Request
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import RedirectResponse, Response
 
-from core.security import get_current_user
+from core.security import get_request_user
 
 
 # ============================
@@ -38,6 +40,11 @@ PUBLIC_PREFIXES: tuple[str, ...] = (
     "/openapi.json",
 )
 
+# Descargas por link firmado (/app/exports/{id}/descargar): la ruta valida
+# la firma HMAC + expiración, no requieren sesión
+SIGNED_DOWNLOAD_PREFIX = "/app/exports/"
+SIGNED_DOWNLOAD_SUFFIX = "/descargar"
+
 
 # ============================
 # ROUTE GROUPS
@@ -86,6 +93,8 @@ INBOUND_ONLY_ROLES: tuple[str, ...] = (
 def _is_public(path: str) -> bool:
     if path in PUBLIC_EXACT_PATHS:
         return True
+    if path.startswith(SIGNED_DOWNLOAD_PREFIX) and path.endswith(SIGNED_DOWNLOAD_SUFFIX):
+        return True
     return any(path.startswith(prefix) for prefix in PUBLIC_PREFIXES)
 
 
@@ -108,8 +117,9 @@ async def redirect_middleware(request: Request, call_next) -> Response:
     if _is_public(path):
         return await call_next(request)
 
-    # 2) Auth
-    user = get_current_user(request)
+    # 2) Auth (queda en request.state para las dependencias require_*_dep)
+    # Resolución sync (BD en cache miss) -> threadpool, no bloquea el event loop
+    user = await run_in_threadpool(get_request_user, request)
     if not user:
         return _redirect("/app/login")
 
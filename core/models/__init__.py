@@ -23,6 +23,7 @@ import json
 from datetime import datetime, timezone, date
 
 from sqlalchemy import (
+    BigInteger,
     Column,
     Integer,
     String,
@@ -33,6 +34,7 @@ from sqlalchemy import (
     Text,
     CheckConstraint,
     UniqueConstraint,
+    Index,
     JSON,
 )
 from sqlalchemy.orm import relationship
@@ -61,6 +63,48 @@ class Auditoria(Base):
     negocio = relationship("Negocio", back_populates="auditorias")
 
 
+class ExportJob(Base):
+    """
+    Exportación en background (ver core.services.services_export_jobs).
+
+    - estado: pendiente -> en_proceso -> completado | error; completado -> expirado
+      (artefacto borrado por retención).
+    - Artefacto en storage/exports/negocio_<id>/ (archivo_relpath relativo al storage root).
+    - Progreso: filas_procesadas / filas_total (total estimado al iniciar; None si no aplica).
+    - actualizado_en es el heartbeat del worker.
+    """
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        Index("ix_export_jobs_negocio_creado", "negocio_id", "creado_en"),
+        Index("ix_export_jobs_estado_creado", "estado", "creado_en"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    negocio_id = Column(Integer, ForeignKey("negocios.id"), nullable=False, index=True)
+    usuario = Column(String, nullable=False)
+
+    tipo = Column(String(60), nullable=False)
+    parametros_json = Column(Text, nullable=True)
+    estado = Column(String(20), default="pendiente", nullable=False)
+
+    filas_total = Column(Integer, nullable=True)
+    filas_procesadas = Column(Integer, default=0, nullable=False)
+    tamano_bytes = Column(BigInteger, nullable=True)
+
+    nombre_archivo = Column(String(200), nullable=True)
+    media_type = Column(String(120), nullable=True)
+    archivo_relpath = Column(String(500), nullable=True)
+    error = Column(Text, nullable=True)
+
+    creado_en = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    iniciado_en = Column(DateTime(timezone=True), nullable=True)
+    actualizado_en = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    finalizado_en = Column(DateTime(timezone=True), nullable=True)
+    expira_en = Column(DateTime(timezone=True), nullable=True)
+
+    negocio = relationship("Negocio", back_populates="export_jobs")
+
+
 # =========================================================
 # SAAS / TENANCY
 # =========================================================
@@ -147,8 +191,12 @@ class Negocio(Base):
     productos = relationship("Producto", back_populates="negocio", cascade="all, delete-orphan")
     zonas = relationship("Zona", back_populates="negocio", cascade="all, delete-orphan")
     movimientos = relationship("Movimiento", back_populates="negocio", cascade="all, delete-orphan")
+    stock_saldos = relationship("StockSaldo", back_populates="negocio", cascade="all, delete-orphan")
+    stock_lotes = relationship("StockLote", back_populates="negocio", cascade="all, delete-orphan")
     alertas = relationship("Alerta", back_populates="negocio", cascade="all, delete-orphan")
     auditorias = relationship("Auditoria", back_populates="negocio", cascade="all, delete-orphan")
+    export_jobs = relationship("ExportJob", back_populates="negocio", cascade="all, delete-orphan")
+    conteos_ciclicos = relationship("ConteoCiclico", back_populates="negocio", cascade="all, delete-orphan")
 
     created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
     updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
@@ -370,6 +418,10 @@ class Producto(Base):
 
 class Movimiento(Base):
     __tablename__ = "movimientos"
+    __table_args__ = (
+        Index("ix_movimientos_negocio_producto_slot", "negocio_id", "producto_id", "slot_id"),
+        Index("ix_movimientos_negocio_fecha_id", "negocio_id", "fecha", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     negocio_id = Column(Integer, ForeignKey("negocios.id"), nullable=False, index=True)
@@ -380,6 +432,10 @@ class Movimiento(Base):
 
     cantidad = Column(Float, nullable=False)
     zona = Column(String, nullable=False)
+
+    # FKs (los strings producto/zona se mantienen como snapshot histórico)
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=True)
+    slot_id = Column(Integer, ForeignKey("slots.id"), nullable=True)
     fecha = Column(DateTime(timezone=True), default=utcnow, nullable=False)
 
     fecha_vencimiento = Column(Date, nullable=True)
@@ -389,8 +445,156 @@ class Movimiento(Base):
     negocio = relationship("Negocio", back_populates="movimientos")
 
 
+class StockSaldo(Base):
+    """
+    Saldo materializado de stock por (negocio, producto normalizado, slot).
+
+    - Se actualiza incrementalmente en la MISMA transacción que el Movimiento
+      (ver modules.basic_wms.services.services_stock_saldos).
+    - producto_key = nombre normalizado (strip + lower).
+    - zona = Slot.codigo_full (mismo string que Movimiento.zona).
+    - producto_id / slot_id: FKs tomadas de los movimientos (joins por entero).
+    - Es una proyección: siempre se puede reconstruir desde movimientos.
+    """
+    __tablename__ = "stock_saldos"
+    __table_args__ = (
+        UniqueConstraint("negocio_id", "producto_key", "zona", name="uq_stock_saldo_scope"),
+        Index("ix_stock_saldos_negocio_producto", "negocio_id", "producto_key"),
+        Index("ix_stock_saldos_negocio_producto_slot", "negocio_id", "producto_id", "slot_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    negocio_id = Column(Integer, ForeignKey("negocios.id"), nullable=False, index=True)
+
+    producto_key = Column(String, nullable=False)
+    producto = Column(String, nullable=False)  # nombre display (último canónico)
+    zona = Column(String, nullable=False)
+
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=True)
+    slot_id = Column(Integer, ForeignKey("slots.id"), nullable=True)
+
+    cantidad = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+    negocio = relationship("Negocio", back_populates="stock_saldos")
+
+
+class StockLote(Base):
+    """
+    Lote FEFO persistido por (negocio, producto normalizado, slot).
+
+    - Cada entrada (delta positivo) crea un lote con su fecha_vencimiento.
+    - Cada salida consume lotes en orden FEFO (vence antes primero, sin fecha al final).
+    - Lotes agotados se eliminan: la tabla solo contiene stock vivo.
+    - Proyección del ledger: reconstruible desde movimientos.
+    """
+    __tablename__ = "stock_lotes"
+    __table_args__ = (
+        Index("ix_stock_lotes_fefo", "negocio_id", "producto_key", "zona", "fecha_vencimiento"),
+        Index("ix_stock_lotes_vencimiento", "negocio_id", "fecha_vencimiento"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    negocio_id = Column(Integer, ForeignKey("negocios.id"), nullable=False, index=True)
+
+    # Movimiento que originó el lote (referencia blanda, sin FK)
+    movimiento_id = Column(Integer, nullable=True, index=True)
+
+    producto_key = Column(String, nullable=False)
+    producto = Column(String, nullable=False)
+    zona = Column(String, nullable=False)
+
+    fecha_vencimiento = Column(Date, nullable=True)
+    cantidad_inicial = Column(Float, nullable=False, default=0.0)
+    cantidad_restante = Column(Float, nullable=False, default=0.0)
+
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+    negocio = relationship("Negocio", back_populates="stock_lotes")
+
+
+class ConteoCiclico(Base):
+    """
+    Sesión de conteo cíclico (inventario físico por alcance).
+
+    - Alcance: zona_id / ubicacion_id (ambos NULL = todo el negocio).
+    - estado: abierto -> contabilizado | cancelado.
+    - Los escaneos se acumulan en ConteoCiclicoLinea (lotes incrementales);
+      al contabilizar se comparan contra stock_saldos y se generan los ajustes
+      en una sola transacción (ver services_conteo_ciclico).
+    """
+    __tablename__ = "conteos_ciclicos"
+    __table_args__ = (
+        Index("ix_conteos_ciclicos_negocio_estado", "negocio_id", "estado"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    negocio_id = Column(Integer, ForeignKey("negocios.id"), nullable=False, index=True)
+
+    nombre = Column(String(120), nullable=True)
+    zona_id = Column(Integer, ForeignKey("zonas.id"), nullable=True)
+    ubicacion_id = Column(Integer, ForeignKey("ubicaciones.id"), nullable=True)
+    alcance = Column(String(200), nullable=False, default="Todo el negocio")
+
+    estado = Column(String(20), nullable=False, default="abierto")
+
+    total_lineas = Column(Integer, nullable=False, default=0)
+    total_ajustes = Column(Integer, nullable=False, default=0)
+    resumen_json = Column(Text, nullable=True)
+
+    creado_por = Column(String, nullable=False)
+    creado_en = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    actualizado_en = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    contabilizado_por = Column(String, nullable=True)
+    contabilizado_en = Column(DateTime(timezone=True), nullable=True)
+
+    negocio = relationship("Negocio", back_populates="conteos_ciclicos")
+    lineas = relationship(
+        "ConteoCiclicoLinea",
+        back_populates="conteo",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class ConteoCiclicoLinea(Base):
+    """
+    Cantidad contada de un (producto, slot) dentro de un conteo cíclico.
+    stock_teorico / diferencia se fijan al contabilizar (trazabilidad).
+    """
+    __tablename__ = "conteo_ciclico_lineas"
+    __table_args__ = (
+        UniqueConstraint("conteo_id", "producto_id", "slot_id", name="uq_conteo_linea_scope"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    conteo_id = Column(Integer, ForeignKey("conteos_ciclicos.id", ondelete="CASCADE"), nullable=False, index=True)
+    negocio_id = Column(Integer, ForeignKey("negocios.id"), nullable=False, index=True)
+
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
+    producto = Column(String, nullable=False)
+    producto_key = Column(String, nullable=False)
+    slot_id = Column(Integer, ForeignKey("slots.id"), nullable=False)
+    zona = Column(String, nullable=False)
+
+    cantidad_contada = Column(Float, nullable=False, default=0.0)
+    escaneos = Column(Integer, nullable=False, default=0)
+
+    stock_teorico = Column(Float, nullable=True)
+    diferencia = Column(Float, nullable=True)
+
+    actualizado_en = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+    conteo = relationship("ConteoCiclico", back_populates="lineas")
+
+
 class Alerta(Base):
     __tablename__ = "alertas"
+    __table_args__ = (
+        # dedupe 24h por (negocio, tipo, mensaje) en services_alerts
+        Index("ix_alertas_negocio_tipo_fecha", "negocio_id", "tipo", "fecha_creacion"),
+    )
 
     id = Column(Integer, primary_key=True)
     negocio_id = Column(Integer, ForeignKey("negocios.id"), nullable=False, index=True)
@@ -431,6 +635,9 @@ from core.models.inbound import (  # noqa: E402
     InboundIncidencia,
     InboundFoto,
     InboundDocumento,
+    InboundAnalyticsSnapshot,
+    InboundDataVersion,
+    InboundRollupDiario,
 )
 
 from core.models.enums import (  # noqa: E402
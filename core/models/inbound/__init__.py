@@ -22,6 +22,8 @@ from .checklist import (
 from .incidencias import InboundIncidencia
 from .fotos import InboundFoto
 from .documentos import InboundDocumento
+from .analytics_snapshots import InboundAnalyticsSnapshot, InboundDataVersion
+from .rollup import InboundRollupDiario
 
 
 __all__ = [
@@ -48,4 +50,7 @@ __all__ = [
     "InboundIncidencia",
     "InboundFoto",
     "InboundDocumento",
+    "InboundAnalyticsSnapshot",
+    "InboundDataVersion",
+    "InboundRollupDiario",
 ]
@@ -1,6 +1,6 @@
 ﻿from __future__ import annotations
 
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, Index, String, Text
 from sqlalchemy.orm import relationship
 
 from core.database import Base
@@ -11,8 +11,17 @@ class InboundAnalyticsSnapshot(Base):
     """
     Snapshot de analytics inbound (JSON serializado) para histórico.
     Baseline v2: guardamos el payload renderizable en UI, no métricas crudas sueltas.
+
+    origen:
+      - "manual": snapshot creado por el usuario (histórico, se lista en UI)
+      - "cache":  resultado cacheado de /inbound/analytics, clave
+                  (negocio_id, desde, hasta, filtros_hash) y válido mientras
+                  data_version == versión inbound actual del negocio
     """
     __tablename__ = "inbound_analytics_snapshots"
+    __table_args__ = (
+        Index("ix_inb_analytics_snap_cache", "negocio_id", "origen", "filtros_hash", "desde", "hasta"),
+    )
 
     id = Column(Integer, primary_key=True)
 
@@ -24,4 +33,23 @@ class InboundAnalyticsSnapshot(Base):
     # JSON serializado (dict) con métricas/tablas/gráficos
     payload_json = Column(Text, nullable=False)
 
+    origen = Column(String(10), nullable=False, default="manual", server_default="manual")
+    desde = Column(Date, nullable=True)
+    hasta = Column(Date, nullable=True)
+    filtros_hash = Column(String(64), nullable=True)
+    data_version = Column(Integer, nullable=True)
+
     negocio = relationship("Negocio", back_populates="inbound_analytics_snapshots")
+
+
+class InboundDataVersion(Base):
+    """
+    Versión de datos inbound por negocio: se incrementa al commitear escrituras
+    de recepciones / líneas / incidencias / checklist / proveedores.
+    Invalida los snapshots "cache" de analytics.
+    """
+    __tablename__ = "inbound_data_versiones"
+
+    negocio_id = Column(Integer, ForeignKey("negocios.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    actualizado_en = Column(DateTime(timezone=True), default=utcnow, nullable=False)
@@ -0,0 +1,46 @@
+﻿# core/models/inbound/rollup.py
+from __future__ import annotations
+
+from sqlalchemy import Column, Integer, Date, DateTime, Float, ForeignKey, Index, UniqueConstraint
+
+from core.database import Base
+from core.models.time import utcnow
+
+
+class InboundRollupDiario(Base):
+    """
+    Agregado diario de inbound por (negocio, proveedor, día America/Santiago).
+
+    - Derivado: se recalcula por bucket al commitear cambios en recepciones,
+      líneas, incidencias o checklist (services_inbound_rollup)
+    - proveedor_id = 0 -> recepciones sin proveedor (sin FK: tabla derivada)
+    - SLA como suma + conteo (promedios ponderados exactos al agregar días)
+    """
+    __tablename__ = "inbound_rollup_diario"
+    __table_args__ = (
+        UniqueConstraint("negocio_id", "proveedor_id", "dia", name="uq_inbound_rollup_diario_bucket"),
+        Index("ix_inbound_rollup_diario_neg_dia", "negocio_id", "dia"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    negocio_id = Column(Integer, ForeignKey("negocios.id"), nullable=False)
+    proveedor_id = Column(Integer, nullable=False, default=0)
+    dia = Column(Date, nullable=False)
+
+    recepciones = Column(Integer, nullable=False, default=0)
+    recepciones_cerradas = Column(Integer, nullable=False, default=0)
+    kg = Column(Float, nullable=False, default=0.0)
+    incidencias = Column(Integer, nullable=False, default=0)
+    chk_total = Column(Integer, nullable=False, default=0)
+    chk_ok = Column(Integer, nullable=False, default=0)
+
+    # minutos (suma, n) por tramo
+    eta_arribo_min_sum = Column(Float, nullable=False, default=0.0)
+    eta_arribo_n = Column(Integer, nullable=False, default=0)
+    arribo_descarga_min_sum = Column(Float, nullable=False, default=0.0)
+    arribo_descarga_n = Column(Integer, nullable=False, default=0)
+    arribo_cierre_min_sum = Column(Float, nullable=False, default=0.0)
+    arribo_cierre_n = Column(Integer, nullable=False, default=0)
+
+    actualizado_en = Column(DateTime(timezone=True), default=utcnow, nullable=False)
@@ -190,7 +190,7 @@ def _is_coming_soon_for(db: Session, negocio_id: int, mk: ModuleKey) -> bool:
 
 
 @router.get("", response_class=HTMLResponse)
-async def orbion_hub_view(
+def orbion_hub_view(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_user_dep),
@@ -432,7 +432,7 @@ async def orbion_hub_view(
 # =========================================================
 
 @router.post("/modules/{module_key}/activate")
-async def activate_module_from_hub(
+def activate_module_from_hub(
     module_key: str,
     request: Request,
     db: Session = Depends(get_db),
@@ -480,7 +480,7 @@ async def activate_module_from_hub(
 
 
 @router.post("/modules/{module_key}/pay_now")
-async def pay_now_module_from_hub(
+def pay_now_module_from_hub(
     module_key: str,
     request: Request,
     months: int = Form(1),
@@ -527,7 +527,7 @@ async def pay_now_module_from_hub(
 
 
 @router.post("/modules/{module_key}/cancel")
-async def cancel_module_from_hub(
+def cancel_module_from_hub(
     module_key: str,
     request: Request,
     db: Session = Depends(get_db),
@@ -562,7 +562,7 @@ async def cancel_module_from_hub(
 
 
 @router.post("/modules/{module_key}/reactivate")
-async def reactivate_module_from_hub(
+def reactivate_module_from_hub(
     module_key: str,
     request: Request,
     db: Session = Depends(get_db),
@@ -150,7 +150,7 @@ def _counters_for_module(*, db: Session, negocio_id: int, slug: str, mod: dict)
 
 
 @router.get("/planes", response_class=HTMLResponse)
-async def app_planes_view(
+def app_planes_view(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_user_dep),
@@ -260,5 +260,5 @@ async def app_planes_view(
 
 
 @router.get("/planes/volver")
-async def app_planes_volver():
+def app_planes_volver():
     return RedirectResponse(url="/app", status_code=303)
@@ -27,12 +27,13 @@ from itsdangerous import BadSignature
 from core.web import templates
 from core.config import settings
 from core.database import get_db
-from core.models import Usuario, SesionUsuario
+from core.models import Usuario
 from core.models.enums import NegocioEstado
 from core.security import (
     get_current_user,
     verify_password,
     crear_sesion_db,
+    invalidar_sesion_db,
     crear_cookie_sesion,
     signer,
     SESSION_INACTIVITY_SECONDS,
@@ -98,7 +99,7 @@ def _delete_session_cookie(resp: RedirectResponse) -> None:
 # =========================================================
 
 @router.get("/login", response_class=HTMLResponse)
-async def login_page(request: Request):
+def login_page(request: Request):
     user = get_current_user(request)
     if user:
         return RedirectResponse(url="/app", status_code=302)
@@ -110,7 +111,7 @@ async def login_page(request: Request):
 
 
 @router.post("/login", response_class=HTMLResponse)
-async def login_submit(
+def login_submit(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
@@ -222,7 +223,7 @@ async def login_submit(
 # =========================================================
 
 @router.api_route("/logout", methods=["GET", "POST"])
-async def logout(request: Request, db: Session = Depends(get_db)):
+def logout(request: Request, db: Session = Depends(get_db)):
     """
     Logout:
     - Revoca sesión activa en BD (si cookie válida)
@@ -271,16 +272,7 @@ async def logout(request: Request, db: Session = Depends(get_db)):
                 user_id_int = None
 
             if user_id_int and token_sesion:
-                (
-                    db.query(SesionUsuario)
-                    .filter(
-                        SesionUsuario.usuario_id == user_id_int,
-                        SesionUsuario.token_sesion == token_sesion,
-                        SesionUsuario.activo == 1,
-                    )
-                    .update({SesionUsuario.activo: 0})
-                )
-                db.commit()
+                invalidar_sesion_db(db, user_id_int, str(token_sesion))
 
                 _audit_logout("logout_ok", extra={"user_id": user_id_int})
                 logger.info("[AUTH] Logout user_id=%s", user_id_int)
@@ -40,7 +40,7 @@ router = APIRouter(prefix="/app", tags=["registro_negocio"])
 # GET
 # =========================================================
 @router.get("/registrar-negocio", response_class=HTMLResponse)
-async def registrar_negocio_get(request: Request):
+def registrar_negocio_get(request: Request):
     user = get_current_user(request)
     if user:
         return RedirectResponse(url="/app", status_code=302)
@@ -62,7 +62,7 @@ async def registrar_negocio_get(request: Request):
 # POST
 # =========================================================
 @router.post("/registrar-negocio", response_class=HTMLResponse)
-async def registrar_negocio_post(
+def registrar_negocio_post(
     request: Request,
     nombre_negocio: str = Form(...),
     nombre_admin: str = Form(...),
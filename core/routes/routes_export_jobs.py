@@ -0,0 +1,144 @@
+﻿# core/routes/routes_export_jobs.py
+"""
+ORBION Export Center – /app/exports
+
+✅ Lista los exports en background del negocio (progreso, filas, tamaño)
+✅ Estado JSON para polling: /app/exports/{id}/estado
+✅ Descarga con link firmado (HMAC + expiración): no requiere sesión, así
+   el link sirve también para loaders BI / descargas diferidas
+
+Los exports se encolan desde cada módulo (POST /exportar/jobs,
+POST /inbound/analytics/export-job); ver core.services.services_export_jobs.
+"""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from sqlalchemy.orm import Session
+
+from core.web import templates
+from core.database import get_db
+from core.security import require_user_dep, is_admin, is_superadmin
+from core.logging_config import logger
+from core.models import ExportJob
+from core.services.services_export_jobs import (
+    COMPLETADO,
+    ESTADOS_ACTIVOS,
+    listar_export_jobs,
+    obtener_export_job,
+    progreso_pct,
+    ruta_artefacto,
+    url_descarga_firmada,
+    verificar_firma_descarga,
+)
+
+router = APIRouter(prefix="/app", tags=["app-exports"])
+
+
+def _effective_negocio_id(user: dict) -> int | None:
+    try:
+        if user.get("acting_negocio_id"):
+            return int(user["acting_negocio_id"])
+    except Exception:
+        pass
+
+    try:
+        if user.get("negocio_id"):
+            return int(user["negocio_id"])
+    except Exception:
+        pass
+
+    return None
+
+
+def _job_para_ui(job: ExportJob) -> dict:
+    return {
+        "id": job.id,
+        "tipo": job.tipo,
+        "usuario": job.usuario,
+        "estado": job.estado,
+        "filas_procesadas": int(job.filas_procesadas or 0),
+        "filas_total": job.filas_total,
+        "progreso_pct": progreso_pct(job),
+        "tamano_bytes": job.tamano_bytes,
+        "nombre_archivo": job.nombre_archivo,
+        "error": job.error,
+        "creado_en": job.creado_en,
+        "finalizado_en": job.finalizado_en,
+        "expira_en": job.expira_en,
+        "descarga_url": url_descarga_firmada(job) if job.estado == COMPLETADO else None,
+    }
+
+
+@router.get("/exports", response_class=HTMLResponse)
+def app_exports_view(
+    request: Request,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_user_dep),
+):
+    negocio_id = _effective_negocio_id(user)
+    if not negocio_id:
+        raise HTTPException(status_code=400, detail="No se encontró contexto de negocio en la sesión.")
+
+    # admin / superadmin ven todos los exports del negocio; el resto, los propios
+    ver_todos = is_admin(user) or is_superadmin(user)
+    jobs = listar_export_jobs(
+        db,
+        negocio_id=negocio_id,
+        usuario=None if ver_todos else user.get("email"),
+    )
+    items = [_job_para_ui(j) for j in jobs]
+
+    return templates.TemplateResponse(
+        "app/app_exports.html",
+        {
+            "request": request,
+            "user": user,
+            "jobs": items,
+            "hay_activos": any(j["estado"] in ESTADOS_ACTIVOS for j in items),
+            "ok": request.query_params.get("ok"),
+            "error": request.query_params.get("error"),
+        },
+    )
+
+
+@router.get("/exports/{job_id}/estado")
+def app_exports_estado(
+    job_id: int,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_user_dep),
+):
+    negocio_id = _effective_negocio_id(user)
+    job = obtener_export_job(db, negocio_id=negocio_id, job_id=job_id) if negocio_id else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export no encontrado.")
+    return JSONResponse(jsonable_encoder(_job_para_ui(job)))
+
+
+@router.get("/exports/{job_id}/descargar")
+def app_exports_descargar(
+    job_id: int,
+    exp: int,
+    sig: str,
+    db: Session = Depends(get_db),
+):
+    """Descarga por link firmado (sin sesión). Link vencido o alterado => 403."""
+    job = db.get(ExportJob, int(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export no encontrado.")
+
+    if not verificar_firma_descarga(job, exp, sig):
+        logger.warning("[EXPORT_JOBS] firma inválida o vencida job_id=%s", job_id)
+        raise HTTPException(status_code=403, detail="Link de descarga inválido o vencido.")
+
+    path = ruta_artefacto(job)
+    if job.estado != COMPLETADO or path is None or not path.is_file():
+        raise HTTPException(status_code=410, detail="El archivo ya no está disponible.")
+
+    return FileResponse(
+        path,
+        media_type=job.media_type or "application/octet-stream",
+        filename=job.nombre_archivo or path.name,
+    )
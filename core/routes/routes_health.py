@@ -144,7 +144,7 @@ def _build_health_view(payload: dict[str, Any]) -> dict[str, Any]:
 # ============================
 
 @router.get("/health", response_class=HTMLResponse)
-async def health_root(
+def health_root(
     request: Request,
     db: Session = Depends(get_db),
     user=Depends(require_roles_dep("superadmin")),
@@ -224,7 +224,7 @@ async def health_root(
 # ============================
 
 @router.get("/health/smoke", response_class=HTMLResponse)
-async def health_smoke(
+def health_smoke(
     request: Request,
     db: Session = Depends(get_db),
     user=Depends(require_roles_dep("superadmin")),
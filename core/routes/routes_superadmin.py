@@ -12,6 +12,10 @@ Superadmin Console – ORBION (SaaS enterprise, baseline aligned)
   - total / total_pages / páginas NO se calculan sobre base_query “sin filtro real”
   - se filtra primero (por módulo) y luego se pagina
 
+✅ Listado /superadmin/negocios en queries constantes:
+  - filtro por módulo con join a suscripciones_modulo (sin snapshot por negocio)
+  - usuarios / productos / movimientos 30d con COUNT ... GROUP BY negocio_id
+
 Esto evita que el negocio ORBION aparezca en:
 - contadores del dashboard
 - lista /superadmin/negocios
@@ -44,7 +48,7 @@ from core.models import (
     Usuario,
     TenantType,
 )
-from core.models.enums import ModuleKey, NegocioEstado
+from core.models.enums import ModuleKey, NegocioEstado, SubscriptionStatus
 from core.models.saas import SuscripcionModulo
 from core.models.time import utcnow
 from core.security import (
@@ -409,31 +413,75 @@ def _require_customer_negocio(negocio: Negocio | None) -> Negocio:
     return negocio
 
 
-def _enabled_for_module_from_snapshot(snapshot: dict, module_slug: str) -> bool:
+def _module_filter_ids(db: Session, base_query, module_slug: str) -> list[int]:
     """
-    Decide si un negocio califica para el filtro por módulo.
-    - Si el módulo no existe -> False
-    - Si status == coming_soon -> False
-    - Si enabled True -> True
+    IDs (orden id desc) de negocios con el módulo habilitado, misma regla que
+    get_entitlements_snapshot (_effective_enabled_status):
+    - entitlements: enabled y no coming_soon
+    - suscripción (si existe): status trial/active  -> filtrado en SQL
+      (uq_suscripcion_modulo_negocio / ix_subs_negocio_status)
+
+    Una sola query (id + entitlements); sin snapshot por negocio.
     """
-    ms = (module_slug or "").strip().lower()
+    ms = _module_alias(module_slug)
     if not ms:
-        return False
-    mods = (snapshot or {}).get("modules") or {}
-    m = mods.get(ms)
-    if not isinstance(m, dict):
-        return False
-    status = (m.get("status") or "").strip().lower()
-    if status == "coming_soon":
-        return False
-    return bool(m.get("enabled"))
+        return []
+
+    q = base_query.with_entities(Negocio.id, Negocio.entitlements)
+
+    mk = next((k for k in ModuleKey if k.value == ms), None)
+    if mk is not None:
+        q = q.outerjoin(
+            SuscripcionModulo,
+            (SuscripcionModulo.negocio_id == Negocio.id) & (SuscripcionModulo.module_key == mk),
+        ).filter(
+            or_(
+                SuscripcionModulo.id.is_(None),
+                SuscripcionModulo.status.in_([SubscriptionStatus.TRIAL, SubscriptionStatus.ACTIVE]),
+            )
+        )
+
+    ids: list[int] = []
+    for nid, ent in q.order_by(Negocio.id.desc()).all():
+        mod = (normalize_entitlements(ent if isinstance(ent, dict) else None).get("modules") or {}).get(ms)
+        if not isinstance(mod, dict) or mod.get("coming_soon"):
+            continue
+        if bool(mod.get("enabled")):
+            ids.append(int(nid))
+    return ids
+
+
+def _conteos_por_negocio(db: Session, negocio_ids: list[int], *, desde_movs: datetime) -> dict[int, dict[str, int]]:
+    """
+    Usuarios, productos y movimientos (desde `desde_movs`) por negocio:
+    3 queries GROUP BY negocio_id, sin importar cuántos negocios haya en la página.
+    """
+    out = {nid: {"usuarios": 0, "productos": 0, "movimientos_30d": 0} for nid in negocio_ids}
+    if not negocio_ids:
+        return out
+
+    consultas = (
+        ("usuarios", Usuario.negocio_id, []),
+        ("productos", Producto.negocio_id, []),
+        ("movimientos_30d", Movimiento.negocio_id, [Movimiento.fecha >= desde_movs]),
+    )
+    for campo, col, extra in consultas:
+        rows = (
+            db.query(col, func.count())
+            .filter(col.in_(negocio_ids), *extra)
+            .group_by(col)
+            .all()
+        )
+        for nid, total in rows:
+            out[int(nid)][campo] = int(total or 0)
+    return out
 
 
 # =========================================================
 # DASHBOARD
 # =========================================================
 @router.get("/dashboard", response_class=HTMLResponse)
-async def superadmin_dashboard(
+def superadmin_dashboard(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_superadmin_dep),
@@ -475,7 +523,7 @@ async def superadmin_dashboard(
 # JOB CENTER
 # =========================================================
 @router.get("/jobs", response_class=HTMLResponse)
-async def superadmin_jobs(
+def superadmin_jobs(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_superadmin_dep),
@@ -503,7 +551,7 @@ async def superadmin_jobs(
 
 
 @router.post("/jobs/subscriptions", response_class=HTMLResponse)
-async def superadmin_job_subscriptions(
+def superadmin_job_subscriptions(
     request: Request,
     batch_size: int = Form(500),
     lookahead_minutes: int = Form(5),
@@ -549,7 +597,7 @@ async def superadmin_job_subscriptions(
 # NEGOCIOS LISTA (enterprise paginación consistente con module_filter)
 # =========================================================
 @router.get("/negocios", response_class=HTMLResponse)
-async def superadmin_negocios(
+def superadmin_negocios(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_superadmin_dep),
@@ -584,22 +632,10 @@ async def superadmin_negocios(
 
     # -----------------------------
     # ✅ Enterprise FIX:
-    # Si hay module_filter -> filtrar IDs primero (con snapshot), luego paginar.
+    # Si hay module_filter -> filtrar IDs primero (SQL + entitlements), luego paginar.
     # -----------------------------
     if module_filter:
-        # Traemos IDs ordenados (sin cargar objetos completos)
-        id_rows = base_query.order_by(Negocio.id.desc()).with_entities(Negocio.id).all()
-        ordered_ids = [r[0] for r in id_rows]
-
-        matched_ids: list[int] = []
-        for nid in ordered_ids:
-            try:
-                snap = get_entitlements_snapshot(db, nid)
-            except Exception:
-                # snapshot no debería romper listado
-                snap = {}
-            if _enabled_for_module_from_snapshot(snap, module_filter):
-                matched_ids.append(nid)
+        matched_ids = _module_filter_ids(db, base_query, module_filter)
 
         total = len(matched_ids)
         total_pages = max(1, math.ceil(total / page_size)) if total > 0 else 1
@@ -628,20 +664,11 @@ async def superadmin_negocios(
         )
 
     hace_30 = utcnow() - timedelta(days=30)
+    conteos = _conteos_por_negocio(db, [n.id for n in negocios], desde_movs=hace_30)
 
     data: list[dict] = []
     for n in negocios:
-        usuarios = db.query(Usuario).filter(Usuario.negocio_id == n.id).count()
-        productos = db.query(Producto).filter(Producto.negocio_id == n.id).count()
-        movimientos = db.query(Movimiento).filter(Movimiento.negocio_id == n.id, Movimiento.fecha >= hace_30).count()
-
-        # Snapshot solo si fue necesario arriba (module_filter), si no, evitamos costo.
-        snap = None
-        if module_filter:
-            try:
-                snap = get_entitlements_snapshot(db, n.id)
-            except Exception:
-                snap = {}
+        cnt = conteos.get(n.id) or {}
 
         # Segmento y resumen desde resolve (fuente viva)
         ent_live = resolve_entitlements(n) or {}
@@ -651,7 +678,7 @@ async def superadmin_negocios(
         next_period_end_cl = cl_date(dt_next) if dt_next else "—"
 
         dt_last = n.ultimo_acceso or getattr(n, "updated_at", None) or getattr(n, "created_at", None)
-        ultimo_acceso_cl = cl_datetime(dt_last, with_tz=False) if dt_last else "—"
+        ultimo_acceso_cl = cl_datetime(dt_last, no_tz=True) if dt_last else "—"
 
         data.append(
             {
@@ -665,9 +692,9 @@ async def superadmin_negocios(
                 "next_period_end_cl": next_period_end_cl,
                 "ultimo_acceso": n.ultimo_acceso,
                 "ultimo_acceso_cl": ultimo_acceso_cl,
-                "usuarios": usuarios,
-                "productos": productos,
-                "movimientos_30d": movimientos,
+                "usuarios": cnt.get("usuarios", 0),
+                "productos": cnt.get("productos", 0),
+                "movimientos_30d": cnt.get("movimientos_30d", 0),
             }
         )
 
@@ -698,7 +725,7 @@ async def superadmin_negocios(
 # NEGOCIO DETALLE
 # =========================================================
 @router.get("/negocios/{negocio_id}", response_class=HTMLResponse)
-async def superadmin_negocio_detalle(
+def superadmin_negocio_detalle(
     request: Request,
     negocio_id: int,
     db: Session = Depends(get_db),
@@ -761,7 +788,7 @@ async def superadmin_negocio_detalle(
 
 
 @router.post("/negocios/{negocio_id}/estado")
-async def superadmin_negocio_estado_update(
+def superadmin_negocio_estado_update(
     negocio_id: int,
     estado: str = Form(...),
     db: Session = Depends(get_db),
@@ -797,7 +824,7 @@ async def superadmin_negocio_estado_update(
 
 
 @router.post("/negocios/{negocio_id}/segmento")
-async def superadmin_negocio_segmento_update(
+def superadmin_negocio_segmento_update(
     negocio_id: int,
     segmento: str = Form(...),
     db: Session = Depends(get_db),
@@ -839,7 +866,7 @@ async def superadmin_negocio_segmento_update(
 # ACCIONES SaaS POR MÓDULO
 # =========================================================
 @router.post("/negocios/{negocio_id}/modules/{module_key}/activate")
-async def superadmin_activate_module(
+def superadmin_activate_module(
     negocio_id: int,
     module_key: str,
     db: Session = Depends(get_db),
@@ -858,7 +885,7 @@ async def superadmin_activate_module(
 
 
 @router.post("/negocios/{negocio_id}/modules/{module_key}/cancel")
-async def superadmin_cancel_module(
+def superadmin_cancel_module(
     negocio_id: int,
     module_key: str,
     db: Session = Depends(get_db),
@@ -878,7 +905,7 @@ async def superadmin_cancel_module(
 
 
 @router.post("/negocios/{negocio_id}/modules/{module_key}/reactivate")
-async def superadmin_reactivate_module(
+def superadmin_reactivate_module(
     negocio_id: int,
     module_key: str,
     db: Session = Depends(get_db),
@@ -898,7 +925,7 @@ async def superadmin_reactivate_module(
 
 
 @router.post("/negocios/{negocio_id}/modules/{module_key}/suspend")
-async def superadmin_suspend_module(
+def superadmin_suspend_module(
     negocio_id: int,
     module_key: str,
     db: Session = Depends(get_db),
@@ -918,7 +945,7 @@ async def superadmin_suspend_module(
 
 
 @router.post("/negocios/{negocio_id}/modules/{module_key}/renew-now")
-async def superadmin_force_renew_module(
+def superadmin_force_renew_module(
     negocio_id: int,
     module_key: str,
     db: Session = Depends(get_db),
@@ -941,7 +968,7 @@ async def superadmin_force_renew_module(
 # ALERTAS GLOBALES
 # =========================================================
 @router.get("/alertas", response_class=HTMLResponse)
-async def superadmin_alertas(
+def superadmin_alertas(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_superadmin_dep),
@@ -968,7 +995,7 @@ async def superadmin_alertas(
 # IMPERSONACIÓN
 # =========================================================
 @router.get("/negocios/{negocio_id}/ver-como")
-async def superadmin_ver_como_negocio(
+def superadmin_ver_como_negocio(
     negocio_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -1002,7 +1029,7 @@ async def superadmin_ver_como_negocio(
 
 
 @router.get("/salir-modo-negocio")
-async def superadmin_salir_modo_negocio(
+def superadmin_salir_modo_negocio(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_superadmin_dep),
@@ -1033,7 +1060,7 @@ async def superadmin_salir_modo_negocio(
 # AUDITORÍA POR NEGOCIO
 # =========================================================
 @router.get("/negocios/{negocio_id}/auditoria", response_class=HTMLResponse)
-async def superadmin_auditoria_negocio(
+def superadmin_auditoria_negocio(
     request: Request,
     negocio_id: int,
     db: Session = Depends(get_db),
@@ -6,8 +6,11 @@ Seguridad / Sesiones – ORBION (SaaS enterprise, baseline aligned)
 ✔ Sesiones persistidas en BD (revocables)
 ✔ Cookie firmada (itsdangerous TimestampSigner)
 ✔ Control de inactividad (idle timeout) + max_age cookie
+✔ last_seen_at con granularidad + flush por lotes (services_session_touch)
 ✔ Impersonación (superadmin -> modo negocio) vía payload firmado
 ✔ Dependencias FastAPI: require_user_dep / require_roles_dep / require_superadmin_dep
+✔ Usuario resuelto 1 vez por request (request.state.current_user)
+✔ Cache LRU+TTL de sesión resuelta (hash de cookie -> user dict), invalidación explícita
 
 Baseline:
 - La cookie guarda un payload mínimo (user_id + token_sesion + acting_negocio_id opcional).
@@ -22,21 +25,30 @@ Baseline:
 
 from __future__ import annotations
 
+import hashlib
 import json
 import secrets
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
 import bcrypt
 from fastapi import Request, HTTPException, status
 from fastapi.responses import RedirectResponse
 from itsdangerous import TimestampSigner, BadSignature
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
+from core.cache import LRUTTLCache
 from core.config import settings
 from core.database import SessionLocal
 from core.models import Usuario, SesionUsuario
 from core.models.time import utcnow
+from core.services.services_session_touch import (
+    descartar_touch,
+    registrar_touch,
+    touch_habilitado,
+    ultimo_touch_pendiente,
+)
 
 # bcrypt solo usa los primeros 72 bytes
 BCRYPT_MAX_LENGTH = 72
@@ -47,6 +59,12 @@ signer = TimestampSigner(settings.APP_SECRET_KEY)
 # tiempo máximo de inactividad (idle timeout)
 SESSION_INACTIVITY_SECONDS = int(settings.SESSION_EXPIRATION_MINUTES) * 60
 
+# cache de sesiones resueltas (por proceso): sha256(cookie) -> entry
+_auth_cache = LRUTTLCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+)
+
 
 # =========================================================
 # DATETIME NORMALIZATION (UTC tz-aware)
@@ -110,6 +128,7 @@ def crear_sesion_db(db: Session, usuario: Usuario) -> str:
         SesionUsuario.usuario_id == usuario.id,
         SesionUsuario.activo == 1,
     ).update({SesionUsuario.activo: 0})
+    invalidar_cache_usuario(usuario.id)
 
     token_sesion = secrets.token_urlsafe(int(settings.SESSION_TOKEN_BYTES))
     ahora = _utcnow_aware()
@@ -131,6 +150,17 @@ def invalidar_sesion_db(db: Session, user_id: int, token_sesion: str) -> None:
     """
     Revoca una sesión específica.
     """
+    sesion = (
+        db.query(SesionUsuario.id)
+        .filter(
+            SesionUsuario.usuario_id == user_id,
+            SesionUsuario.token_sesion == token_sesion,
+        )
+        .first()
+    )
+    if sesion:
+        descartar_touch(sesion.id)
+
     db.query(SesionUsuario).filter(
         SesionUsuario.usuario_id == user_id,
         SesionUsuario.token_sesion == token_sesion,
@@ -138,6 +168,40 @@ def invalidar_sesion_db(db: Session, user_id: int, token_sesion: str) -> None:
     ).update({SesionUsuario.activo: 0})
     db.commit()
 
+    invalidar_cache_sesion(token_sesion)
+
+
+# =========================================================
+# AUTH CACHE (LRU + TTL)
+# =========================================================
+
+def _hash_token(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def invalidar_cache_sesion(token_sesion: str) -> None:
+    """Saca del cache toda entrada de esa sesión (logout / revocación)."""
+    token_hash = _hash_token(token_sesion)
+    _auth_cache.delete_where(lambda _k, e: e["token_hash"] == token_hash)
+
+
+def invalidar_cache_usuario(user_id: int) -> None:
+    """Saca del cache todas las sesiones de un usuario (login nuevo / desactivación / cambio de rol)."""
+    uid = int(user_id)
+    _auth_cache.delete_where(lambda _k, e: e["user_id"] == uid)
+
+
+@event.listens_for(Usuario.activo, "set")
+@event.listens_for(Usuario.rol, "set")
+def _usuario_auth_changed(target, value, oldvalue, initiator) -> None:
+    # Cualquier desactivación / cambio de rol vía ORM invalida de inmediato
+    if target.id is not None and value != oldvalue:
+        invalidar_cache_usuario(target.id)
+
+
+def auth_cache_stats() -> dict[str, int]:
+    return _auth_cache.stats()
+
 
 # =========================================================
 # COOKIE PAYLOAD
@@ -163,19 +227,33 @@ def crear_cookie_sesion(response: RedirectResponse, usuario: Usuario, token_sesi
     _set_session_cookie_from_payload(response, payload)
 
 
-def _decode_cookie_payload(cookie_value: str) -> dict | None:
+def _decode_cookie_payload_ts(cookie_value: str) -> tuple[dict | None, datetime | None]:
     """
-    Verifica firma + max_age y retorna payload dict.
+    Verifica firma + max_age y retorna (payload dict, timestamp de firma UTC).
     """
     try:
-        raw = signer.unsign(cookie_value, max_age=SESSION_INACTIVITY_SECONDS)
+        raw, firmado_en = signer.unsign(
+            cookie_value,
+            max_age=SESSION_INACTIVITY_SECONDS,
+            return_timestamp=True,
+        )
         data = raw.decode("utf-8", errors="strict")
         parsed = json.loads(data)
-        return parsed if isinstance(parsed, dict) else None
+        if not isinstance(parsed, dict):
+            return None, None
+        return parsed, _ensure_utc_aware(firmado_en)
     except (BadSignature, json.JSONDecodeError, UnicodeDecodeError):
-        return None
+        return None, None
     except Exception:
-        return None
+        return None, None
+
+
+def _decode_cookie_payload(cookie_value: str) -> dict | None:
+    """
+    Verifica firma + max_age y retorna payload dict.
+    """
+    payload, _ts = _decode_cookie_payload_ts(cookie_value)
+    return payload
 
 
 def _encode_cookie_payload(payload: dict) -> str:
@@ -223,8 +301,23 @@ def get_current_user(request: Request) -> dict | None:
     - Token debe existir en BD como sesión activa
     - last_seen_at controla idle timeout (además del TimestampSigner max_age)
     - Superadmin puede impersonar un negocio (rol efectivo = admin)
+    - Cache LRU+TTL por hash de cookie: en hit no hay firma/JSON/BD, pero sí
+      se valida expiración de cookie + idle timeout y se registra el touch.
     """
-    payload = _get_session_payload_from_request(request)
+    cookie = request.cookies.get(settings.SESSION_COOKIE_NAME)
+    if not cookie:
+        return None
+
+    ahora = _utcnow_aware()
+
+    # Cache solo con touch throttled (legacy = commit por request, requiere BD)
+    cache_key = _hash_token(cookie) if touch_habilitado() and _auth_cache.enabled else None
+    if cache_key:
+        cached = _usuario_desde_cache(cache_key, ahora)
+        if cached is not None:
+            return cached
+
+    payload, firmado_en = _decode_cookie_payload_ts(cookie)
     if not payload:
         return None
 
@@ -257,14 +350,21 @@ def get_current_user(request: Request) -> dict | None:
         if not sesion:
             return None
 
-        ahora = _utcnow_aware()
+        last_seen_bd = _ensure_utc_aware(getattr(sesion, "last_seen_at", None))
+
+        # Actividad real = max(BD, touch pendiente aún no persistido)
+        last_seen = last_seen_bd
+        pendiente = _ensure_utc_aware(ultimo_touch_pendiente(sesion.id))
+        if pendiente and (last_seen is None or pendiente > last_seen):
+            last_seen = pendiente
 
-        last_seen = _ensure_utc_aware(getattr(sesion, "last_seen_at", None))
         if last_seen:
             delta = ahora - last_seen
             if delta.total_seconds() > SESSION_INACTIVITY_SECONDS:
+                descartar_touch(sesion.id)
                 sesion.activo = 0
                 db.commit()
+                invalidar_cache_sesion(token_sesion)
                 return None
 
         usuario: Usuario | None = (
@@ -275,9 +375,12 @@ def get_current_user(request: Request) -> dict | None:
         if not usuario:
             return None
 
-        # touch last_seen_at
-        sesion.last_seen_at = ahora
-        db.commit()
+        # touch last_seen_at (throttled + batch; legacy: commit por request)
+        if touch_habilitado():
+            registrar_touch(sesion.id, last_seen_bd, ahora)
+        else:
+            sesion.last_seen_at = ahora
+            db.commit()
 
         rol_real = (usuario.rol or "").strip()
         rol_efectivo = rol_real
@@ -303,7 +406,7 @@ def get_current_user(request: Request) -> dict | None:
                 negocio_nombre = str(acting_negocio_nombre)
             rol_efectivo = "admin"
 
-        return {
+        user = {
             "id": int(usuario.id),
             "email": usuario.email,
             "negocio": negocio_nombre,
@@ -319,10 +422,77 @@ def get_current_user(request: Request) -> dict | None:
             "impersonando_negocio_id": acting_id_int,
         }
 
+        if cache_key and firmado_en:
+            _auth_cache.set(
+                cache_key,
+                {
+                    "user": user,
+                    "user_id": int(usuario.id),
+                    "token_hash": _hash_token(token_sesion),
+                    "sesion_id": int(sesion.id),
+                    "last_seen_bd": last_seen_bd,
+                    "cookie_expira": firmado_en + timedelta(seconds=SESSION_INACTIVITY_SECONDS),
+                },
+            )
+
+        return dict(user)
+
     finally:
         db.close()
 
 
+def _usuario_desde_cache(cache_key: str, ahora: datetime) -> dict | None:
+    """
+    Hit de cache => user dict (copia). Si la cookie expiró o la sesión superó
+    el idle timeout, descarta la entrada y retorna None (el caller resuelve
+    por BD, que revoca/rechaza como siempre).
+    """
+    entry = _auth_cache.get(cache_key)
+    if entry is None:
+        return None
+
+    if ahora > entry["cookie_expira"]:
+        _auth_cache.delete(cache_key)
+        return None
+
+    last_seen = entry["last_seen_bd"]
+    pendiente = _ensure_utc_aware(ultimo_touch_pendiente(entry["sesion_id"]))
+    if pendiente and (last_seen is None or pendiente > last_seen):
+        last_seen = pendiente
+
+    if last_seen and (ahora - last_seen).total_seconds() > SESSION_INACTIVITY_SECONDS:
+        _auth_cache.delete(cache_key)
+        return None
+
+    registrar_touch(entry["sesion_id"], entry["last_seen_bd"], ahora)
+    return dict(entry["user"])
+
+
+# =========================================================
+# REQUEST-SCOPED USER
+# =========================================================
+
+_STATE_USER_ATTR = "current_user"
+
+
+def get_request_user(request: Request) -> dict | None:
+    """
+    Usuario efectivo del request, resuelto UNA sola vez.
+
+    - El middleware de auth lo resuelve y deja en request.state.current_user.
+    - Las dependencias (require_*_dep) reutilizan ese valor: sin SessionLocal,
+      SELECTs ni commit de last_seen_at duplicados por request.
+    - Fuera del middleware (rutas públicas) resuelve y memoiza igual.
+    """
+    state = request.state
+    if hasattr(state, _STATE_USER_ATTR):
+        return getattr(state, _STATE_USER_ATTR)
+
+    user = get_current_user(request)
+    setattr(state, _STATE_USER_ATTR, user)
+    return user
+
+
 # =========================================================
 # ROLE HELPERS
 # =========================================================
@@ -356,7 +526,7 @@ def is_operator(user: dict) -> bool:
 # =========================================================
 
 def require_user_dep(request: Request) -> dict:
-    user = get_current_user(request)
+    user = get_request_user(request)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -369,7 +539,7 @@ def require_roles_dep(*allowed_roles: str):
     allowed = {str(r).strip().lower() for r in allowed_roles}
 
     def dependency(request: Request) -> dict:
-        user = get_current_user(request)
+        user = get_request_user(request)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -388,7 +558,7 @@ def require_roles_dep(*allowed_roles: str):
 
 
 def require_superadmin_dep(request: Request) -> dict:
-    user = get_current_user(request)
+    user = get_request_user(request)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -51,6 +51,11 @@ class AuditAction:
     AUTH_LOGIN_FAIL = "auth.login.fail"
     AUTH_LOGOUT = "auth.logout"
 
+    # --- WMS
+    MOVIMIENTOS_IMPORT = "movimientos.import"
+    INVENTARIO_AJUSTE = "inventario.ajuste"
+    INVENTARIO_CONTEO_CONTABILIZAR = "inventario.conteo.contabilizar"
+
     # --- Impersonación
     IMPERSONATION_START = "impersonation.start"
     IMPERSONATION_STOP = "impersonation.stop"
@@ -239,6 +244,63 @@ def audit(
         logger.error("[AUDIT][ERROR] action=%s error=%s", action, exc)
 
 
+def audit_bulk(
+    db: Session,
+    *,
+    action: str,
+    registros: list[dict],
+    user: Optional[dict] = None,
+    actor: Optional[str] = None,
+    negocio_id: Optional[int] = None,
+    request_ctx: Optional[dict] = None,
+) -> int:
+    """
+    Varios eventos de la misma acción en un solo INSERT executemany
+    (operaciones masivas: conteos, importaciones).
+
+    registros: [{"entity_type", "entity_id", "before", "after", "extra"}, ...]
+    Mismo payload que audit(); mismas garantías (SAVEPOINT, nunca lanza).
+    Retorna cuántos registros se insertaron.
+    """
+    if not registros:
+        return 0
+    try:
+        nid = _resolve_negocio_id(db, negocio_id=negocio_id, user=user)
+        if not nid:
+            return 0
+
+        usuario = _resolve_actor(user, actor)
+        ahora = utcnow()
+        rows = []
+        for r in registros:
+            pack: dict[str, Any] = {
+                "action": action,
+                "entity": {"type": r.get("entity_type"), "id": r.get("entity_id")},
+                "before": r.get("before"),
+                "after": r.get("after"),
+                "extra": r.get("extra") or {},
+            }
+            if request_ctx:
+                pack["request"] = request_ctx
+            rows.append(
+                {
+                    "negocio_id": nid,
+                    "usuario": usuario,
+                    "accion": action,
+                    "detalle": _safe_json(pack),
+                    "fecha": ahora,
+                }
+            )
+
+        with db.begin_nested():
+            db.execute(Auditoria.__table__.insert(), rows)
+        return len(rows)
+
+    except Exception as exc:
+        logger.error("[AUDIT][ERROR] bulk action=%s n=%s error=%s", action, len(registros), exc)
+        return 0
+
+
 def audit_safe_commit(
     db: Session,
     *,
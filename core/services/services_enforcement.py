@@ -4,8 +4,9 @@ services_enforcement.py – ORBION SaaS (enterprise, baseline aligned)
 
 ✅ Decide ALLOW / WARN / BLOCK
 ✅ Centraliza reglas soft/hard
-✅ Usa snapshot de entitlements (read-only)
-✅ No incrementa usage
+✅ Fast-path: 1 query (entitlements + suscripción del módulo + 1 UsageCounter)
+✅ check_limit no incrementa usage
+✅ reserve_usage: check + incremento atómico (tope en el mismo UPDATE)
 ✅ No depende de Inbound / WMS
 ✅ Auditoría enterprise v2.1 en WARN/BLOCK (si actor disponible)
 
@@ -21,11 +22,23 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Optional, Any, Union
 
+from sqlalchemy import and_, case, literal, select
 from sqlalchemy.orm import Session
 
-from core.models.enums import ModuleKey
-from core.services.services_entitlements import get_entitlements_snapshot
+from core.models import Negocio
+from core.models.enums import ModuleKey, SubscriptionStatus, UsageCounterType
+from core.models.saas import SuscripcionModulo, UsageCounter
 from core.services.services_audit import audit, AuditAction
+from core.services.services_entitlements import (
+    _module_alias,
+    _norm_status,
+    normalize_entitlements,
+)
+from core.services.services_usage import (
+    increment_usage,
+    operational_month_window,
+    try_increment_usage_capped,
+)
 
 
 # =========================================================
@@ -80,17 +93,17 @@ def _norm_metric(metric_key: str) -> str:
     return _safe_str(metric_key, "").lower()
 
 
-def _get_period_end(mod: dict) -> Optional[Any]:
+def _get_period_end(mod: dict, sub_period_end: Optional[Any] = None) -> Optional[Any]:
     """
     period_end para UX:
-    - Preferimos overlay de suscripción si existe (subscription.period.end)
+    - Preferimos el período de la suscripción si existe
     - Si no existe, usamos entitlements.period.to / end
     """
-    sub = mod.get("subscription") or {}
-    if isinstance(sub, dict):
-        per = sub.get("period") or {}
-        if isinstance(per, dict) and per.get("end"):
-            return per.get("end")
+    if sub_period_end:
+        try:
+            return sub_period_end.isoformat()
+        except Exception:
+            return sub_period_end
 
     per2 = mod.get("period") or {}
     if isinstance(per2, dict):
@@ -144,6 +157,140 @@ def _audit_enforcement(
         return
 
 
+# =========================================================
+# ESTADO DE LÍMITE (FAST-PATH, 1 QUERY)
+# =========================================================
+
+@dataclass(frozen=True)
+class _LimitState:
+    enabled: bool
+    status: str
+    segment: str
+    has_limit: bool
+    limit: float
+    used: float
+    period_end: Optional[Any]
+
+
+def _load_limit_state(db: Session, negocio_id: int, mk: str, metric: str) -> Optional[_LimitState]:
+    """
+    Lee SOLO lo necesario para decidir una métrica de un módulo, en 1 query:
+      negocios.entitlements
+      LEFT JOIN suscripciones_modulo (negocio, módulo)
+      LEFT JOIN usage_counters BILLABLE (negocio, módulo, métrica, ventana vigente)
+
+    Ventana BILLABLE (igual que services_usage): período de la suscripción si
+    está ACTIVE con período válido; si no, mes operacional CL.
+    Retorna None si el negocio no existe.
+    """
+    try:
+        mk_enum = ModuleKey(mk)
+    except ValueError:
+        mk_enum = None
+
+    op = operational_month_window()
+    period_type = UsageCounter.period_start.type
+
+    if mk_enum is None:
+        row = db.execute(
+            select(Negocio.entitlements).where(Negocio.id == int(negocio_id))
+        ).first()
+        if row is None:
+            return None
+        entitlements_raw, sub_status, sub_end, used_raw = row[0], None, None, None
+    else:
+        sub_con_periodo = and_(
+            SuscripcionModulo.status == SubscriptionStatus.ACTIVE,
+            SuscripcionModulo.current_period_start.isnot(None),
+            SuscripcionModulo.current_period_end.isnot(None),
+            SuscripcionModulo.current_period_end > SuscripcionModulo.current_period_start,
+        )
+        win_start = case(
+            (sub_con_periodo, SuscripcionModulo.current_period_start),
+            else_=literal(op.period_start, type_=period_type),
+        )
+        win_end = case(
+            (sub_con_periodo, SuscripcionModulo.current_period_end),
+            else_=literal(op.period_end, type_=period_type),
+        )
+
+        stmt = (
+            select(
+                Negocio.entitlements,
+                SuscripcionModulo.status,
+                SuscripcionModulo.current_period_end,
+                UsageCounter.value,
+            )
+            .select_from(Negocio)
+            .outerjoin(
+                SuscripcionModulo,
+                and_(
+                    SuscripcionModulo.negocio_id == Negocio.id,
+                    SuscripcionModulo.module_key == mk_enum,
+                ),
+            )
+            .outerjoin(
+                UsageCounter,
+                and_(
+                    UsageCounter.negocio_id == Negocio.id,
+                    UsageCounter.module_key == mk_enum,
+                    UsageCounter.counter_type == UsageCounterType.BILLABLE,
+                    UsageCounter.metric_key == metric,
+                    UsageCounter.period_start == win_start,
+                    UsageCounter.period_end == win_end,
+                ),
+            )
+            .where(Negocio.id == int(negocio_id))
+        )
+        row = db.execute(stmt).first()
+        if row is None:
+            return None
+        entitlements_raw, sub_status, sub_end, used_raw = row
+
+    ent = normalize_entitlements(entitlements_raw if isinstance(entitlements_raw, dict) and entitlements_raw else None)
+    mod = (ent.get("modules") or {}).get(mk)
+    if not isinstance(mod, dict):
+        mod = None
+    limits_all = ent.get("limits") if isinstance(ent.get("limits"), dict) else {}
+    limits = limits_all.get(_module_alias(mk)) or {}
+    if not isinstance(limits, dict):
+        limits = {}
+
+    # enabled/status efectivos (mismo contrato que _effective_enabled_status)
+    if mod is None or bool(mod.get("coming_soon", False)):
+        enabled, status = False, "inactive"
+    elif sub_status is None:
+        enabled, status = bool(mod.get("enabled")), _norm_status(mod.get("status", "inactive"))
+    else:
+        status = _norm_status(getattr(sub_status, "value", sub_status))
+        enabled = bool(mod.get("enabled")) and status in {_ALLOWED_TRIAL, _ALLOWED_ACTIVE}
+
+    try:
+        limit = float(limits.get(metric, 0.0) or 0.0)
+    except Exception:
+        limit = 0.0
+
+    return _LimitState(
+        enabled=enabled,
+        status=status,
+        segment=_safe_str(ent.get("segment"), "emprendedor").lower(),
+        has_limit=metric in limits,
+        limit=limit,
+        used=float(used_raw or 0.0),
+        period_end=_get_period_end(mod or {}, sub_end),
+    )
+
+
+def _is_hard_cap(state: _LimitState) -> bool:
+    """BLOCK real al exceder: active + segmento hard + límite > 0."""
+    return (
+        state.status == _ALLOWED_ACTIVE
+        and state.segment in HARD_SEGMENTS
+        and state.has_limit
+        and state.limit > 0
+    )
+
+
 # =========================================================
 # API PUBLICA
 # =========================================================
@@ -159,6 +306,7 @@ def check_limit(
 ) -> EnforcementResult:
     """
     Decide si una acción que consume `metric_key` puede ejecutarse.
+    Lee solo el módulo/métrica pedidos (1 query, ver _load_limit_state).
 
     Retorna:
       - ALLOW: puede continuar
@@ -177,39 +325,39 @@ def check_limit(
         _audit_enforcement(db, actor=actor, decision=res.decision, negocio_id=negocio_id, module_key=mk, metric_key=metric, payload={"reason": res.reason})
         return res
 
-    snapshot = get_entitlements_snapshot(db, negocio_id)
+    state = _load_limit_state(db, negocio_id, mk, metric)
+    return _decide(db, state, negocio_id=negocio_id, mk=mk, metric=metric, delta=delta, actor=actor)
 
-    modules = snapshot.get("modules", {}) or {}
-    mod = modules.get(mk)
 
+def _decide(
+    db: Session,
+    state: Optional[_LimitState],
+    *,
+    negocio_id: int,
+    mk: str,
+    metric: str,
+    delta: float,
+    actor: Optional[dict],
+) -> EnforcementResult:
     # Módulo no contratado / no habilitado
-    if not mod or not mod.get("enabled"):
+    if state is None or not state.enabled:
         res = EnforcementResult(
             decision=EnforcementDecision.BLOCK,
             reason=f"Módulo '{mk}' no habilitado para el negocio.",
             metric_key=metric,
-            period_end=_get_period_end(mod or {}),
+            period_end=state.period_end if state else None,
         )
         _audit_enforcement(db, actor=actor, decision=res.decision, negocio_id=negocio_id, module_key=mk, metric_key=metric, payload={"reason": res.reason})
         return res
 
-    status = _safe_str(mod.get("status"), "inactive").lower()
+    status = state.status
 
     # Segmento: fuente única es entitlements.segment
-    segmento = _safe_str(
-        (snapshot.get("entitlements") or {}).get("segment")
-        or (snapshot.get("negocio") or {}).get("segment")
-        or "emprendedor",
-        "emprendedor",
-    ).lower()
-
-    limits = mod.get("limits", {}) or {}
-    usage = mod.get("usage", {}) or {}
-    remaining_map = mod.get("remaining", {}) or {}
-    period_end = _get_period_end(mod)
+    segmento = state.segment
+    period_end = state.period_end
 
     # Métrica sin límite → ALLOW
-    if metric not in limits:
+    if not state.has_limit:
         return EnforcementResult(
             decision=EnforcementDecision.ALLOW,
             reason="Métrica sin límite definido.",
@@ -223,12 +371,8 @@ def check_limit(
     except Exception:
         d = 0.0
 
-    used = float(usage.get(metric, 0.0) or 0.0)
-
-    try:
-        limit = float(limits.get(metric, 0.0) or 0.0)
-    except Exception:
-        limit = 0.0
+    used = state.used
+    limit = state.limit
 
     # limit <= 0 => sin cap
     if limit <= 0:
@@ -242,11 +386,8 @@ def check_limit(
             period_end=period_end,
         )
 
-    # remaining defensivo (pre-delta)
-    try:
-        rem0 = float(remaining_map.get(metric, max(0.0, limit - used)) or 0.0)
-    except Exception:
-        rem0 = max(0.0, limit - used)
+    # remaining (pre-delta)
+    rem0 = max(0.0, limit - used)
 
     if d <= 0:
         return EnforcementResult(
@@ -356,3 +497,75 @@ def check_limit(
     )
     _audit_enforcement(db, actor=actor, decision=res.decision, negocio_id=negocio_id, module_key=mk, metric_key=metric, payload={"status": status, "segment": segmento, "limit": limit, "used": used, "delta": d, "reason": res.reason})
     return res
+
+
+def reserve_usage(
+    db: Session,
+    negocio_id: int,
+    module_key: Union[ModuleKey, str],
+    metric_key: str,
+    delta: float = 1.0,
+    *,
+    actor: Optional[dict] = None,
+) -> EnforcementResult:
+    """
+    check_limit + consumo atómico del usage (Strategy C: BILLABLE + OPERATIONAL).
+
+    - BLOCK: no incrementa nada.
+    - Hard cap (active + pyme/enterprise): el incremento BILLABLE lleva el tope
+      en el mismo UPDATE (value + delta <= limit). Si una request concurrente
+      consumió el saldo entre el check y el UPDATE, el UPDATE no afecta filas
+      y se retorna BLOCK: dos reservas concurrentes no pueden pasar el límite.
+    - ALLOW / WARN (soft): incremento normal.
+    NO hace commit: el caller commitea junto con la acción.
+    """
+    mk = _module_key_str(module_key)
+    metric = _norm_metric(metric_key)
+    if not mk or not metric:
+        return check_limit(db, negocio_id, module_key, metric_key, delta, actor=actor)
+
+    state = _load_limit_state(db, negocio_id, mk, metric)
+    res = _decide(db, state, negocio_id=negocio_id, mk=mk, metric=metric, delta=delta, actor=actor)
+    if res.decision == EnforcementDecision.BLOCK:
+        return res
+
+    try:
+        d = float(delta)
+    except Exception:
+        d = 0.0
+    if d <= 0:
+        return res
+
+    try:
+        mk_enum = ModuleKey(mk)
+    except ValueError:
+        return res  # módulo sin contadores de usage
+
+    limit = float(state.limit)
+    if _is_hard_cap(state):
+        ok, used_now = try_increment_usage_capped(
+            db,
+            negocio_id,
+            mk_enum,
+            metric,
+            d,
+            limit=limit,
+            counter_type=UsageCounterType.BILLABLE,
+        )
+        if not ok:
+            res = EnforcementResult(
+                decision=EnforcementDecision.BLOCK,
+                reason="Límite alcanzado para el período.",
+                metric_key=metric,
+                limit=limit,
+                used=used_now,
+                remaining=max(0.0, limit - used_now),
+                period_end=res.period_end,
+            )
+            _audit_enforcement(db, actor=actor, decision=res.decision, negocio_id=negocio_id, module_key=mk, metric_key=metric, payload={"limit": limit, "used": used_now, "delta": d, "reason": "reserva concurrente"})
+            return res
+    else:
+        increment_usage(db, negocio_id, mk_enum, metric, d, counter_type=UsageCounterType.BILLABLE)
+
+    increment_usage(db, negocio_id, mk_enum, metric, d, counter_type=UsageCounterType.OPERATIONAL)
+    return res
@@ -12,6 +12,7 @@ services_entitlements.py – ORBION SaaS (enterprise, baseline aligned)
         * usage_operational = OPERATIONAL (para insights / analítica)
    - overlay SuscripcionModulo si existe (trial_ends, cancel_at_period_end, period*)
    - coming_soon (flag canónico para UI: no vendible / no activable aún)
+✅ Snapshot cacheado por negocio (services_entitlements_cache, LRU + TTL)
 """
 
 from __future__ import annotations
@@ -25,6 +26,10 @@ from core.logging_config import logger
 from core.models import Negocio
 from core.models.enums import ModuleKey, UsageCounterType
 from core.models.saas import SuscripcionModulo
+from core.services.services_entitlements_cache import (
+    get_cached_snapshot,
+    set_cached_snapshot,
+)
 from core.services.services_usage import list_usage_for_module_current_period
 
 
@@ -409,7 +414,34 @@ def _effective_enabled_status(
     return effective_enabled, effective_status
 
 
-def get_entitlements_snapshot(db: Session, negocio_id: int) -> Dict[str, Any]:
+def get_entitlements_snapshot(
+    db: Session,
+    negocio_id: int,
+    *,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Snapshot de entitlements + suscripciones + usage del negocio.
+
+    Cacheado por negocio (LRU + TTL, ver services_entitlements_cache); se
+    invalida en escrituras de suscripciones, entitlements y usage. Retorna
+    siempre una copia (el caller puede mutarla).
+    """
+    if use_cache:
+        cached = get_cached_snapshot(db, negocio_id)
+        if cached is not None:
+            return deepcopy(cached)
+
+    snap = _build_entitlements_snapshot(db, negocio_id)
+
+    if use_cache and (snap.get("negocio") or {}).get("nombre") is not None:
+        set_cached_snapshot(db, negocio_id, snap)
+        return deepcopy(snap)
+
+    return snap
+
+
+def _build_entitlements_snapshot(db: Session, negocio_id: int) -> Dict[str, Any]:
     n = db.query(Negocio).filter(Negocio.id == negocio_id).first()
     if not n:
         ent0 = normalize_entitlements(None)
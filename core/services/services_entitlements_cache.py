@@ -0,0 +1,133 @@
+﻿# core/services/services_entitlements_cache.py
+"""
+Cache de snapshots de entitlements – ORBION SaaS (enterprise)
+
+✔ Snapshot por negocio (get_entitlements_snapshot) cacheado en memoria (LRU + TTL)
+✔ Backend enchufable (get/set/delete/clear): por defecto LRUTTLCache por proceso;
+  para multi-proceso se puede registrar uno compartido (ej: Redis)
+✔ Invalidación explícita por negocio:
+   - increment_usage / increment_usage_dual (UPDATE Core, no pasa por el ORM)
+   - flush write-behind de acumular_usage* (upsert Core)
+   - cualquier flush ORM de SuscripcionModulo o Negocio
+     (activate_module, renew_subscription, suspend_subscription, jobs,
+      edición de entitlements/segmento en superadmin)
+✔ Transaccional: lo invalidado en una transacción se vuelve a invalidar al
+  commit/rollback, y mientras tanto esa sesión no lee ni escribe el cache
+  (no se cachean valores sin commit)
+"""
+
+from __future__ import annotations
+
+from itertools import chain
+from typing import Any, Optional, Protocol
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.cache import LRUTTLCache
+from core.config import settings
+from core.models import Negocio
+from core.models.saas import SuscripcionModulo
+
+
+# =========================================================
+# BACKEND
+# =========================================================
+
+class SnapshotCacheBackend(Protocol):
+    def get(self, key: str) -> Optional[Any]: ...
+    def set(self, key: str, value: Any) -> None: ...
+    def delete(self, key: str) -> None: ...
+    def clear(self) -> None: ...
+
+
+_backend: SnapshotCacheBackend = LRUTTLCache(
+    max_entries=settings.ENTITLEMENTS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ENTITLEMENTS_CACHE_TTL_SECONDS,
+)
+
+# negocio_ids invalidados dentro de la transacción en curso de una Session
+_PENDING_KEY = "entitlements_cache_pending"
+
+
+def set_entitlements_cache_backend(backend: SnapshotCacheBackend) -> None:
+    """Reemplaza el backend (ej: compartido entre procesos)."""
+    global _backend
+    _backend = backend
+
+
+def get_entitlements_cache_backend() -> SnapshotCacheBackend:
+    return _backend
+
+
+def _key(negocio_id: int) -> str:
+    return f"entitlements:snapshot:{int(negocio_id)}"
+
+
+# =========================================================
+# API
+# =========================================================
+
+def get_cached_snapshot(db: Session, negocio_id: int) -> Optional[dict]:
+    if has_pending_invalidation(db, negocio_id):
+        return None
+    return _backend.get(_key(negocio_id))
+
+
+def set_cached_snapshot(db: Session, negocio_id: int, snapshot: dict) -> None:
+    if has_pending_invalidation(db, negocio_id):
+        return
+    _backend.set(_key(negocio_id), snapshot)
+
+
+def has_pending_invalidation(db: Session, negocio_id: int) -> bool:
+    pending = db.info.get(_PENDING_KEY)
+    return bool(pending) and int(negocio_id) in pending
+
+
+def invalidate_entitlements_snapshot(negocio_id: int, *, db: Optional[Session] = None) -> None:
+    """
+    Invalida el snapshot del negocio. Con `db`, además se re-invalida al
+    commit/rollback de esa sesión (evita re-cachear el estado previo).
+    """
+    if negocio_id is None:
+        return
+    nid = int(negocio_id)
+    _backend.delete(_key(nid))
+    if db is not None:
+        db.info.setdefault(_PENDING_KEY, set()).add(nid)
+
+
+def clear_entitlements_cache() -> None:
+    _backend.clear()
+
+
+# =========================================================
+# SESSION HOOKS
+# =========================================================
+
+@event.listens_for(Session, "after_flush")
+def _track_entitlement_writes(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, SuscripcionModulo):
+            invalidate_entitlements_snapshot(obj.negocio_id, db=session)
+        elif isinstance(obj, Negocio):
+            invalidate_entitlements_snapshot(obj.id, db=session)
+
+
+def _flush_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for nid in pending:
+        _backend.delete(_key(nid))
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    _flush_pending(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    _flush_pending(session)
@@ -0,0 +1,538 @@
+﻿# core/services/services_export_jobs.py
+"""
+Exportaciones en background – ORBION
+
+✔ Submit -> fila en export_jobs (pendiente); la request responde de inmediato
+  (sin timeouts de proxy en exports grandes)
+✔ Pool de workers propio (EXPORT_JOBS_WORKERS hilos), separado del threadpool
+  de requests: los exports nunca ocupan hilos del tráfico interactivo
+✔ Cupo por negocio (EXPORT_JOBS_MAX_POR_NEGOCIO jobs en_proceso), contado en
+  BD dentro del mismo UPDATE del claim (+ lock de la fila del negocio en
+  Postgres): vale también con varios procesos
+✔ Claim atómico (UPDATE ... WHERE estado='pendiente' AND cupo libre): un job
+  lo toma un solo worker
+✔ Artefacto en $ORBION_STORAGE_DIR/exports/negocio_<id>/ (escritura a .part +
+  rename: nunca se sirve un archivo a medias)
+✔ Progreso y heartbeat (filas_procesadas / actualizado_en) desde una sesión
+  aparte: el cursor del export no se interrumpe con commits
+  (heartbeat periódico en un hilo propio: cubre construir() / COUNT). Los
+  UPDATE del worker exigen estado en_proceso: un job ya dado por caído no
+  vuelve a completado (su artefacto se descarta)
+✔ Descarga con link firmado (HMAC-SHA256 sobre APP_SECRET_KEY + expiración)
+✔ Retención: artefactos vencidos se borran y el job queda "expirado"
+
+Tipos de export: cada módulo registra los suyos con registrar_tipo_export()
+(ej: basic_wms -> movimientos.csv / stock.xlsx; inbound -> inbound_analytics.csv).
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.orm import Session, aliased
+
+from core.config import settings
+from core.database import IS_POSTGRES, SessionLocal
+from core.logging_config import logger
+from core.models import ExportJob, Negocio
+from core.models.time import utcnow
+
+
+STORAGE_ROOT = Path(os.getenv("ORBION_STORAGE_DIR", "./storage")).resolve()
+EXPORTS_ROOT = STORAGE_ROOT / "exports"
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+COMPLETADO = "completado"
+ERROR = "error"
+EXPIRADO = "expirado"
+
+ESTADOS_ACTIVOS = (PENDIENTE, EN_PROCESO)
+
+
+# =========================================================
+# REGISTRO DE TIPOS
+# =========================================================
+
+@dataclass
+class ArchivoExport:
+    """
+    Lo que produce un tipo de export: filas + cómo serializarlas.
+    El runner cuenta las filas al pasar (progreso) y escribe los chunks a disco.
+    """
+    filename: str
+    media_type: str
+    rows: Iterable[Sequence[Any]]
+    serializar: Callable[[Iterable[Sequence[Any]]], Iterable[bytes]]
+    total_filas: Optional[int] = None
+
+
+ConstructorExport = Callable[[Session, int, dict[str, Any]], ArchivoExport]
+
+_TIPOS: dict[str, ConstructorExport] = {}
+
+
+def registrar_tipo_export(tipo: str, construir: ConstructorExport) -> None:
+    _TIPOS[tipo] = construir
+
+
+def tipos_export() -> list[str]:
+    return sorted(_TIPOS)
+
+
+# =========================================================
+# SUBMIT / CONSULTA
+# =========================================================
+
+def crear_export_job(
+    db: Session,
+    *,
+    negocio_id: int,
+    usuario: str,
+    tipo: str,
+    parametros: Optional[dict[str, Any]] = None,
+) -> ExportJob:
+    """Encola un job (flush; el caller hace commit y luego despertar_export_worker())."""
+    if tipo not in _TIPOS:
+        raise ValueError(f"Tipo de export desconocido: {tipo}")
+
+    job = ExportJob(
+        negocio_id=int(negocio_id),
+        usuario=usuario or "desconocido",
+        tipo=tipo,
+        parametros_json=json.dumps(parametros or {}, ensure_ascii=False, default=str),
+        estado=PENDIENTE,
+        filas_procesadas=0,
+        creado_en=utcnow(),
+        actualizado_en=utcnow(),
+    )
+    db.add(job)
+    db.flush()
+    return job
+
+
+def listar_export_jobs(
+    db: Session,
+    *,
+    negocio_id: int,
+    usuario: Optional[str] = None,
+    limit: int = 50,
+) -> list[ExportJob]:
+    q = db.query(ExportJob).filter(ExportJob.negocio_id == int(negocio_id))
+    if usuario:
+        q = q.filter(ExportJob.usuario == usuario)
+    return q.order_by(ExportJob.creado_en.desc(), ExportJob.id.desc()).limit(int(limit)).all()
+
+
+def obtener_export_job(db: Session, *, negocio_id: int, job_id: int) -> Optional[ExportJob]:
+    job = db.get(ExportJob, int(job_id))
+    if job is None or int(job.negocio_id) != int(negocio_id):
+        return None
+    return job
+
+
+def progreso_pct(job: ExportJob) -> Optional[float]:
+    if job.estado == COMPLETADO:
+        return 100.0
+    if not job.filas_total:
+        return None
+    return round(min(100.0, 100.0 * float(job.filas_procesadas or 0) / float(job.filas_total)), 1)
+
+
+def ruta_artefacto(job: ExportJob) -> Optional[Path]:
+    """Ruta absoluta del artefacto (defensa traversal: dentro de EXPORTS_ROOT)."""
+    if not job.archivo_relpath:
+        return None
+    path = (STORAGE_ROOT / job.archivo_relpath).resolve()
+    try:
+        path.relative_to(EXPORTS_ROOT)
+    except ValueError:
+        return None
+    return path
+
+
+# =========================================================
+# LINK FIRMADO
+# =========================================================
+
+def _firma(job_id: int, negocio_id: int, exp: int) -> str:
+    msg = f"export:{int(job_id)}:{int(negocio_id)}:{int(exp)}".encode()
+    digest = hmac.new(settings.APP_SECRET_KEY.encode(), msg, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def url_descarga_firmada(job: ExportJob, *, ttl_seconds: Optional[int] = None) -> str:
+    ttl = int(settings.EXPORT_LINK_TTL_SECONDS if ttl_seconds is None else ttl_seconds)
+    exp = int(time.time()) + max(ttl, 1)
+    if job.expira_en is not None:
+        # el link no sobrevive al artefacto (SQLite devuelve naive: es UTC)
+        expira = job.expira_en if job.expira_en.tzinfo else job.expira_en.replace(tzinfo=timezone.utc)
+        exp = min(exp, int(expira.timestamp()))
+    sig = _firma(job.id, job.negocio_id, exp)
+    return f"/app/exports/{int(job.id)}/descargar?exp={exp}&sig={sig}"
+
+
+def verificar_firma_descarga(job: ExportJob, exp: int, sig: str) -> bool:
+    if int(exp) < int(time.time()):
+        return False
+    return hmac.compare_digest(_firma(job.id, job.negocio_id, exp), sig or "")
+
+
+# =========================================================
+# EJECUCIÓN
+# =========================================================
+
+def _marcar(job_id: int, **values: Any) -> bool:
+    """
+    UPDATE del job en su propia sesión/transacción (progreso, heartbeat, estado).
+
+    Solo aplica mientras el job sigue en_proceso: si limpiar_export_jobs() ya
+    lo dio por caído (y liberó el cupo del negocio) no se vuelve a pisar.
+    Retorna False si el job ya no estaba en_proceso (o si el UPDATE falló).
+    """
+    db = SessionLocal()
+    try:
+        values.setdefault("actualizado_en", utcnow())
+        res = db.execute(
+            update(ExportJob)
+            .where(ExportJob.id == int(job_id), ExportJob.estado == EN_PROCESO)
+            .values(**values)
+        )
+        db.commit()
+        return bool(res.rowcount)
+    except Exception:
+        db.rollback()
+        logger.exception("[EXPORT_JOBS] no se pudo actualizar job_id=%s", job_id)
+        return False
+    finally:
+        db.close()
+
+
+@contextmanager
+def _latido(job_id: int) -> Iterator[None]:
+    """
+    Heartbeat periódico (STALE/3) mientras corre el job: cubre las fases sin
+    filas (construir(), COUNT total, primer fetch del cursor) y los tramos
+    lentos entre avisos de progreso.
+    """
+    cada = max(int(settings.EXPORT_JOBS_STALE_SECONDS) / 3.0, 1.0)
+    parar = threading.Event()
+
+    def _loop() -> None:
+        while not parar.wait(cada):
+            _marcar(job_id)
+
+    hilo = threading.Thread(target=_loop, name=f"export-heartbeat-{job_id}", daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        parar.set()
+        hilo.join(timeout=cada)
+
+
+def _contar(job_id: int, rows: Iterable[Sequence[Any]], contador: list[int]) -> Iterator[Sequence[Any]]:
+    cada = max(int(settings.EXPORT_JOBS_PROGRESS_EVERY_ROWS), 1)
+    for row in rows:
+        contador[0] += 1
+        if contador[0] % cada == 0:
+            _marcar(job_id, filas_procesadas=contador[0])
+        yield row
+
+
+def ejecutar_export_job(job_id: int) -> None:
+    """Construye el artefacto de un job ya reclamado (estado en_proceso)."""
+    db = SessionLocal()
+    tmp: Optional[Path] = None
+    try:
+        if IS_POSTGRES:
+            # exports largos: sin el statement_timeout de requests interactivas
+            db.execute(text(f"SET LOCAL statement_timeout = {int(settings.EXPORT_JOBS_STATEMENT_TIMEOUT_MS)}"))
+
+        job = db.get(ExportJob, int(job_id))
+        if job is None:
+            return
+        negocio_id = int(job.negocio_id)
+        parametros = json.loads(job.parametros_json or "{}")
+
+        construir = _TIPOS.get(job.tipo)
+        if construir is None:
+            raise ValueError(f"Tipo de export no registrado en este proceso: {job.tipo}")
+
+        with _latido(job_id):
+            _marcar(job_id)
+            archivo = construir(db, negocio_id, parametros)
+            _marcar(
+                job_id,
+                filas_total=archivo.total_filas,
+                nombre_archivo=archivo.filename[:200],
+                media_type=archivo.media_type,
+            )
+
+            carpeta = EXPORTS_ROOT / f"negocio_{negocio_id}"
+            carpeta.mkdir(parents=True, exist_ok=True)
+            destino = carpeta / f"job_{int(job_id)}_{Path(archivo.filename).name}"
+            tmp = destino.with_name(destino.name + ".part")
+
+            contador = [0]
+            tamano = 0
+            with open(tmp, "wb") as fh:
+                for chunk in archivo.serializar(_contar(job_id, archivo.rows, contador)):
+                    fh.write(chunk)
+                    tamano += len(chunk)
+            os.replace(tmp, destino)
+            tmp = None
+
+        ahora = utcnow()
+        completado = _marcar(
+            job_id,
+            estado=COMPLETADO,
+            filas_procesadas=contador[0],
+            tamano_bytes=tamano,
+            archivo_relpath=str(destino.relative_to(STORAGE_ROOT)).replace("\\", "/"),
+            finalizado_en=ahora,
+            expira_en=ahora + timedelta(hours=int(settings.EXPORT_JOBS_RETENTION_HOURS)),
+        )
+        if not completado:
+            # Dado por caído mientras corría (ya en error, cupo liberado): el
+            # artefacto no queda referenciado por ningún job -> se borra
+            logger.warning("[EXPORT_JOBS] job_id=%s ya no estaba en_proceso; se descarta el artefacto", job_id)
+            try:
+                destino.unlink()
+            except OSError:
+                pass
+            return
+        logger.info(
+            "[EXPORT_JOBS] completado job_id=%s negocio_id=%s filas=%s bytes=%s",
+            job_id, negocio_id, contador[0], tamano,
+        )
+
+    except Exception as e:
+        logger.exception("[EXPORT_JOBS] error job_id=%s", job_id)
+        _marcar(job_id, estado=ERROR, error=str(e)[:2000], finalizado_en=utcnow())
+        if tmp is not None:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+    finally:
+        db.rollback()
+        db.close()
+
+
+# =========================================================
+# DISPATCHER (claim con cupo por negocio)
+# =========================================================
+
+def reclamar_export_jobs(max_jobs: int) -> list[int]:
+    """
+    Toma hasta max_jobs pendientes (FIFO) respetando el cupo por negocio.
+    Retorna los ids reclamados (ya en_proceso).
+    """
+    if max_jobs <= 0:
+        return []
+
+    cupo = max(int(settings.EXPORT_JOBS_MAX_POR_NEGOCIO), 1)
+    db = SessionLocal()
+    try:
+        activos = dict(
+            db.query(ExportJob.negocio_id, func.count(ExportJob.id))
+            .filter(ExportJob.estado == EN_PROCESO)
+            .group_by(ExportJob.negocio_id)
+            .all()
+        )
+        candidatos = (
+            db.query(ExportJob.id, ExportJob.negocio_id)
+            .filter(ExportJob.estado == PENDIENTE)
+            .order_by(ExportJob.creado_en.asc(), ExportJob.id.asc())
+            .limit(max(max_jobs * 20, 50))
+            .all()
+        )
+
+        reclamados: list[int] = []
+        for job_id, negocio_id in candidatos:
+            if len(reclamados) >= max_jobs:
+                break
+            if activos.get(negocio_id, 0) >= cupo:
+                continue
+
+            if IS_POSTGRES:
+                # serializa claims del mismo negocio entre procesos (hasta el commit);
+                # SQLite ya serializa escrituras: el UPDATE de abajo es atómico
+                db.query(Negocio.id).filter(Negocio.id == negocio_id).with_for_update().first()
+
+            # cupo re-verificado dentro del UPDATE (el conteo de arriba es solo un filtro rápido)
+            otros = aliased(ExportJob)
+            en_curso = (
+                select(func.count(otros.id))
+                .where(otros.negocio_id == negocio_id, otros.estado == EN_PROCESO)
+                .scalar_subquery()
+            )
+            ahora = utcnow()
+            res = db.execute(
+                update(ExportJob)
+                .where(ExportJob.id == job_id, ExportJob.estado == PENDIENTE, en_curso < cupo)
+                .values(estado=EN_PROCESO, iniciado_en=ahora, actualizado_en=ahora)
+            )
+            db.commit()
+            if res.rowcount == 1:
+                activos[negocio_id] = activos.get(negocio_id, 0) + 1
+                reclamados.append(int(job_id))
+            else:
+                # otro worker lo tomó o completó el cupo del negocio
+                activos[negocio_id] = max(activos.get(negocio_id, 0), cupo)
+        return reclamados
+    except Exception:
+        db.rollback()
+        logger.exception("[EXPORT_JOBS] claim falló")
+        return []
+    finally:
+        db.close()
+
+
+def limpiar_export_jobs() -> int:
+    """
+    - en_proceso sin heartbeat (proceso caído) -> error
+    - completados vencidos -> se borra el artefacto y quedan expirado
+    Retorna cuántos jobs cambiaron de estado.
+    """
+    ahora = utcnow()
+    db = SessionLocal()
+    try:
+        stale = db.execute(
+            update(ExportJob)
+            .where(
+                ExportJob.estado == EN_PROCESO,
+                ExportJob.actualizado_en < ahora - timedelta(seconds=int(settings.EXPORT_JOBS_STALE_SECONDS)),
+            )
+            .values(estado=ERROR, error="Interrumpido (sin heartbeat del worker)", finalizado_en=ahora)
+        ).rowcount
+
+        vencidos = (
+            db.query(ExportJob)
+            .filter(ExportJob.estado == COMPLETADO, ExportJob.expira_en < ahora)
+            .all()
+        )
+        for job in vencidos:
+            path = ruta_artefacto(job)
+            if path is not None:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    logger.warning("[EXPORT_JOBS] no se pudo borrar %s", path)
+                    continue
+            job.estado = EXPIRADO
+            job.archivo_relpath = None
+            job.actualizado_en = ahora
+        db.commit()
+        return int(stale or 0) + len(vencidos)
+    except Exception:
+        db.rollback()
+        logger.exception("[EXPORT_JOBS] limpieza falló")
+        return 0
+    finally:
+        db.close()
+
+
+# =========================================================
+# WORKER (hilo dispatcher + pool)
+# =========================================================
+
+_pool: Optional[ThreadPoolExecutor] = None
+_dispatch_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+_wake_event = threading.Event()
+
+_en_curso = 0
+_en_curso_lock = threading.Lock()
+
+_LIMPIEZA_CADA_SECONDS = 60.0
+
+
+def despertar_export_worker() -> None:
+    """Avisa al dispatcher que hay jobs nuevos (sin esperar el poll)."""
+    _wake_event.set()
+
+
+def _job_terminado(_future) -> None:
+    global _en_curso
+    with _en_curso_lock:
+        _en_curso -= 1
+    _wake_event.set()
+
+
+def _dispatch_loop() -> None:
+    global _en_curso
+    workers = max(int(settings.EXPORT_JOBS_WORKERS), 1)
+    intervalo = max(float(settings.EXPORT_JOBS_POLL_SECONDS), 0.5)
+    ultima_limpieza = 0.0
+
+    while not _stop_event.is_set():
+        if time.monotonic() - ultima_limpieza >= _LIMPIEZA_CADA_SECONDS:
+            limpiar_export_jobs()
+            ultima_limpieza = time.monotonic()
+
+        with _en_curso_lock:
+            libres = workers - _en_curso
+
+        for job_id in reclamar_export_jobs(libres):
+            with _en_curso_lock:
+                _en_curso += 1
+            _pool.submit(ejecutar_export_job, job_id).add_done_callback(_job_terminado)
+
+        _wake_event.wait(intervalo)
+        _wake_event.clear()
+
+
+def start_export_worker() -> None:
+    """Arranca dispatcher + pool (idempotente). Llamar en startup."""
+    global _pool, _dispatch_thread
+
+    if not settings.EXPORT_JOBS_ENABLED:
+        return
+    if _dispatch_thread is not None and _dispatch_thread.is_alive():
+        return
+
+    _stop_event.clear()
+    _pool = ThreadPoolExecutor(
+        max_workers=max(int(settings.EXPORT_JOBS_WORKERS), 1),
+        thread_name_prefix="orbion-export",
+    )
+    _dispatch_thread = threading.Thread(
+        target=_dispatch_loop,
+        name="orbion-export-dispatch",
+        daemon=True,
+    )
+    _dispatch_thread.start()
+
+
+def stop_export_worker(timeout: float = 5.0) -> None:
+    """
+    Detiene el dispatcher. Jobs en curso terminan en background (no se
+    esperan); si el proceso muere, la limpieza los marca como error.
+    """
+    global _pool, _dispatch_thread
+
+    _stop_event.set()
+    _wake_event.set()
+    if _dispatch_thread is not None:
+        _dispatch_thread.join(timeout=timeout)
+        _dispatch_thread = None
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
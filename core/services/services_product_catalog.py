@@ -0,0 +1,245 @@
+﻿# core/services/services_product_catalog.py
+"""
+Catálogo de productos en memoria por negocio – ORBION
+
+✔ Resolución O(1) en el hot path de escaneo (entrada / salida / transferencia,
+  alertas de stock, líneas inbound): dicts por id, SKU/EAN y nombre normalizado
+✔ Snapshot inmutable (ProductoCatalogo): no son objetos ORM, se comparten
+  entre requests/threads sin sesión
+✔ Invalidación por versión (contador por negocio):
+   - explícita desde rutas de producto (crear / editar / activar-desactivar)
+   - cualquier flush ORM de Producto (bridge inbound, imports, scripts)
+   Un catálogo construido con una versión vieja se descarta al leerlo.
+✔ Transaccional (igual que el cache de entitlements): si la sesión tiene
+  escrituras de productos sin commit, lee directo de BD y no cachea
+✔ TTL como cota de staleness entre procesos (cache por proceso)
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.cache import LRUTTLCache
+from core.config import settings
+from core.models import Producto
+
+
+_cache = LRUTTLCache(
+    max_entries=settings.PRODUCT_CATALOG_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRODUCT_CATALOG_CACHE_TTL_SECONDS,
+)
+
+_versiones: dict[int, int] = {}
+_versiones_lock = threading.Lock()
+
+# negocio_ids con escrituras de productos en la transacción en curso
+_PENDING_KEY = "product_catalog_pending"
+
+
+# =========================================================
+# MODELO
+# =========================================================
+
+@dataclass(frozen=True)
+class ProductoCatalogo:
+    id: int
+    negocio_id: int
+    nombre: str
+    unidad: str
+    activo: bool
+    sku: Optional[str] = None
+    ean13: Optional[str] = None
+    stock_min: Optional[int] = None
+    stock_max: Optional[int] = None
+    costo_unitario: Optional[float] = None
+
+
+@dataclass
+class CatalogoNegocio:
+    version: int
+    por_id: dict[int, ProductoCatalogo] = field(default_factory=dict)
+    # solo activos (SKU y EAN comparten espacio de claves; match exacto)
+    activos_por_codigo: dict[str, ProductoCatalogo] = field(default_factory=dict)
+    activos_por_nombre: dict[str, ProductoCatalogo] = field(default_factory=dict)
+    # todos (ej: alertas de un producto recién desactivado)
+    por_nombre: dict[str, ProductoCatalogo] = field(default_factory=dict)
+
+
+def normalizar_nombre(nombre: str | None) -> str:
+    return (nombre or "").strip().lower()
+
+
+# =========================================================
+# VERSIONES / INVALIDACIÓN
+# =========================================================
+
+def _version(negocio_id: int) -> int:
+    return _versiones.get(int(negocio_id), 0)
+
+
+def invalidar_catalogo_productos(negocio_id: int | None, *, db: Optional[Session] = None) -> None:
+    """
+    Sube la versión del catálogo del negocio. Con `db`, además se vuelve a
+    subir al commit/rollback de esa sesión.
+    """
+    if negocio_id is None:
+        return
+    nid = int(negocio_id)
+    with _versiones_lock:
+        _versiones[nid] = _versiones.get(nid, 0) + 1
+    _cache.delete(nid)
+    if db is not None:
+        db.info.setdefault(_PENDING_KEY, set()).add(nid)
+
+
+def clear_catalogo_productos() -> None:
+    _cache.clear()
+
+
+# =========================================================
+# CARGA
+# =========================================================
+
+def _cargar(db: Session, negocio_id: int, version: int) -> CatalogoNegocio:
+    rows = (
+        db.query(
+            Producto.id,
+            Producto.negocio_id,
+            Producto.nombre,
+            Producto.unidad,
+            Producto.activo,
+            Producto.sku,
+            Producto.ean13,
+            Producto.stock_min,
+            Producto.stock_max,
+            Producto.costo_unitario,
+        )
+        .filter(Producto.negocio_id == negocio_id)
+        .order_by(Producto.id.asc())
+        .all()
+    )
+
+    cat = CatalogoNegocio(version=version)
+    for r in rows:
+        p = ProductoCatalogo(
+            id=int(r.id),
+            negocio_id=int(r.negocio_id),
+            nombre=r.nombre,
+            unidad=r.unidad or "unidad",
+            activo=bool(r.activo),
+            sku=r.sku,
+            ean13=r.ean13,
+            stock_min=r.stock_min,
+            stock_max=r.stock_max,
+            costo_unitario=r.costo_unitario,
+        )
+        nombre_norm = normalizar_nombre(p.nombre)
+
+        cat.por_id[p.id] = p
+        cat.por_nombre.setdefault(nombre_norm, p)
+        if p.activo:
+            cat.activos_por_nombre.setdefault(nombre_norm, p)
+            # mismo orden que antes: primero el id más bajo
+            for codigo in (p.sku, p.ean13):
+                c = (codigo or "").strip()
+                if c:
+                    cat.activos_por_codigo.setdefault(c, p)
+    return cat
+
+
+def get_catalogo_productos(db: Session, negocio_id: int) -> CatalogoNegocio:
+    nid = int(negocio_id)
+
+    pending = db.info.get(_PENDING_KEY)
+    if pending and nid in pending:
+        # escrituras sin commit en esta sesión: leer de BD, no cachear
+        return _cargar(db, nid, -1)
+
+    version = _version(nid)
+    cat = _cache.get(nid)
+    if cat is not None and cat.version == version:
+        return cat
+
+    cat = _cargar(db, nid, version)
+    _cache.set(nid, cat)
+    return cat
+
+
+# =========================================================
+# LOOKUPS
+# =========================================================
+
+def buscar_producto_por_codigo(db: Session, negocio_id: int, codigo: str | None) -> Optional[ProductoCatalogo]:
+    """Producto activo por SKU o EAN (match exacto)."""
+    c = (codigo or "").strip()
+    if not c:
+        return None
+    return get_catalogo_productos(db, negocio_id).activos_por_codigo.get(c)
+
+
+def buscar_producto_por_nombre(
+    db: Session,
+    negocio_id: int,
+    nombre: str | None,
+    *,
+    solo_activos: bool = True,
+) -> Optional[ProductoCatalogo]:
+    """Producto por nombre (case-insensitive, sin espacios extremos)."""
+    n = normalizar_nombre(nombre)
+    if not n:
+        return None
+    cat = get_catalogo_productos(db, negocio_id)
+    return (cat.activos_por_nombre if solo_activos else cat.por_nombre).get(n)
+
+
+def get_producto_catalogo(
+    db: Session,
+    negocio_id: int,
+    producto_id: int | None,
+    *,
+    solo_activos: bool = False,
+) -> Optional[ProductoCatalogo]:
+    if producto_id is None:
+        return None
+    p = get_catalogo_productos(db, negocio_id).por_id.get(int(producto_id))
+    if p is None or (solo_activos and not p.activo):
+        return None
+    return p
+
+
+# =========================================================
+# SESSION HOOKS
+# =========================================================
+
+@event.listens_for(Session, "after_flush")
+def _track_product_writes(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Producto):
+            invalidar_catalogo_productos(obj.negocio_id, db=session)
+
+
+def _flush_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for nid in pending:
+        invalidar_catalogo_productos(nid)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    # commit de un SAVEPOINT: la transacción externa sigue abierta
+    if session.in_nested_transaction():
+        return
+    _flush_pending(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    _flush_pending(session)
@@ -0,0 +1,214 @@
+﻿# core/services/services_search.py
+"""
+Búsqueda por substring indexada – ORBION
+
+✔ Un solo servicio para los filtros "contiene" (movimientos, productos,
+  recepciones inbound): filtro_texto(indice, q) -> cláusula WHERE
+✔ PostgreSQL: índices GIN pg_trgm sobre lower(col); el filtro es
+  lower(col) LIKE '%q%' (el planner usa el índice trigram)
+✔ SQLite: tabla sombra FTS5 (tokenizer trigram, external content) por tabla,
+  mantenida por triggers en INSERT / UPDATE / DELETE; el filtro es
+  id IN (SELECT rowid FROM <tabla>_fts WHERE ... MATCH ...)
+✔ Fallback transparente a LIKE (queries < 3 caracteres, SQLite sin FTS5
+  trigram o índices aún no creados)
+
+Bootstrap: ensure_search_indexes() (startup, idempotente). En Postgres los
+índices los crea la migración; aquí solo se completan si faltan.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import func, literal_column, or_, select, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import ColumnElement
+
+from core.database import IS_POSTGRES, IS_SQLITE, engine
+from core.logging_config import logger
+from core.models import InboundRecepcion, Movimiento, Producto
+
+
+# Trigram: mínimo de caracteres para usar el índice
+MIN_CHARS_INDICE = 3
+
+
+# =========================================================
+# REGISTRO DE ÍNDICES
+# =========================================================
+
+@dataclass(frozen=True)
+class IndiceBusqueda:
+    model: type
+    columnas: tuple[str, ...]
+
+    @property
+    def tabla(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def tabla_fts(self) -> str:
+        return f"{self.tabla}_fts"
+
+
+INDICES: dict[str, IndiceBusqueda] = {
+    "movimientos": IndiceBusqueda(Movimiento, ("producto", "usuario")),
+    "productos": IndiceBusqueda(Producto, ("nombre", "sku", "ean13")),
+    "inbound_recepciones": IndiceBusqueda(
+        InboundRecepcion,
+        ("codigo_recepcion", "documento_ref", "contenedor", "patente_camion"),
+    ),
+}
+
+
+# tablas FTS5 presentes (SQLite); None = aún no detectado
+_fts_tablas: Optional[set[str]] = None
+
+
+def _sqlite_trigram_soportado() -> bool:
+    # tokenizer trigram: SQLite >= 3.34
+    return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+# =========================================================
+# DDL
+# =========================================================
+
+def _ddl_sqlite(ix: IndiceBusqueda) -> list[str]:
+    t, fts = ix.tabla, ix.tabla_fts
+    cols = ", ".join(ix.columnas)
+    new_vals = ", ".join(f"new.{c}" for c in ix.columnas)
+    old_vals = ", ".join(f"old.{c}" for c in ix.columnas)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{t}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {t} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {t} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {t} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END",
+    ]
+
+
+def _ddl_postgres(ix: IndiceBusqueda) -> list[str]:
+    return [
+        f"CREATE INDEX IF NOT EXISTS ix_trgm_{ix.tabla}_{c} "
+        f"ON {ix.tabla} USING gin (lower({c}) gin_trgm_ops)"
+        for c in ix.columnas
+    ]
+
+
+def _tablas_fts_existentes(conn: Connection) -> set[str]:
+    rows = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_fts' ESCAPE '\\'"))
+    return {r[0] for r in rows}
+
+
+def ensure_search_indexes(bind: Engine | None = None) -> None:
+    """
+    Crea lo que falte (idempotente):
+    - SQLite: tabla FTS5 + triggers; si la tabla es nueva, 'rebuild' desde la tabla base
+    - Postgres: extensión pg_trgm + índices GIN (sin privilegios: solo warning)
+    """
+    global _fts_tablas
+    bind = bind or engine
+
+    if IS_SQLITE:
+        if not _sqlite_trigram_soportado():
+            logger.warning("[SEARCH] SQLite %s sin tokenizer trigram: búsqueda por LIKE", sqlite3.sqlite_version)
+            _fts_tablas = set()
+            return
+
+        with bind.begin() as conn:
+            existentes = _tablas_fts_existentes(conn)
+            for ix in INDICES.values():
+                for stmt in _ddl_sqlite(ix):
+                    conn.execute(text(stmt))
+                if ix.tabla_fts not in existentes:
+                    conn.execute(text(f"INSERT INTO {ix.tabla_fts}({ix.tabla_fts}) VALUES ('rebuild')"))
+                    logger.info("[SEARCH] FTS5 %s creado y poblado", ix.tabla_fts)
+            _fts_tablas = _tablas_fts_existentes(conn)
+        return
+
+    if IS_POSTGRES:
+        try:
+            with bind.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                for ix in INDICES.values():
+                    for stmt in _ddl_postgres(ix):
+                        conn.execute(text(stmt))
+        except Exception as exc:
+            logger.warning("[SEARCH] no se pudieron asegurar índices pg_trgm: %s", exc)
+
+
+def rebuild_search_index(nombre: str | None = None) -> None:
+    """Re-sincroniza las tablas FTS5 con su tabla base (SQLite; no-op en Postgres)."""
+    disponibles = _fts_disponibles()
+    if not disponibles:
+        return
+    with engine.begin() as conn:
+        for key, ix in INDICES.items():
+            if (nombre is None or key == nombre) and ix.tabla_fts in disponibles:
+                conn.execute(text(f"INSERT INTO {ix.tabla_fts}({ix.tabla_fts}) VALUES ('rebuild')"))
+
+
+def _fts_disponibles() -> set[str]:
+    global _fts_tablas
+    if _fts_tablas is None:
+        if not IS_SQLITE or not _sqlite_trigram_soportado():
+            _fts_tablas = set()
+        else:
+            with engine.connect() as conn:
+                _fts_tablas = _tablas_fts_existentes(conn)
+    return _fts_tablas
+
+
+# =========================================================
+# FILTRO
+# =========================================================
+
+def _escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fts_match_expr(q: str, columnas: tuple[str, ...], todas: tuple[str, ...]) -> str:
+    frase = '"' + q.replace('"', '""') + '"'
+    if set(columnas) == set(todas):
+        return frase
+    return "{" + " ".join(columnas) + "} : " + frase
+
+
+def filtro_texto(
+    nombre: str,
+    q: str | None,
+    *,
+    columnas: tuple[str, ...] | None = None,
+) -> Optional[ColumnElement]:
+    """
+    Cláusula "alguna de las columnas contiene q" (case-insensitive) para el
+    índice `nombre`. Retorna None si q está vacío (sin filtro).
+
+        stmt = stmt.where(filtro_texto("productos", q))
+    """
+    q = (q or "").strip()
+    if not q:
+        return None
+
+    ix = INDICES[nombre]
+    columnas = tuple(columnas or ix.columnas)
+    if not set(columnas) <= set(ix.columnas):
+        raise ValueError(f"Columnas no indexadas en '{nombre}': {columnas}")
+
+    if len(q) >= MIN_CHARS_INDICE and ix.tabla_fts in _fts_disponibles():
+        sub = (
+            select(literal_column("rowid"))
+            .select_from(table(ix.tabla_fts))
+            .where(literal_column(ix.tabla_fts).op("MATCH")(_fts_match_expr(q, columnas, ix.columnas)))
+        )
+        return ix.model.id.in_(sub)
+
+    pattern = f"%{_escape_like(q.lower())}%"
+    return or_(*(func.lower(getattr(ix.model, c)).like(pattern, escape="\\") for c in columnas))
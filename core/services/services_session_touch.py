@@ -0,0 +1,166 @@
+﻿# core/services/services_session_touch.py
+"""
+Session touch (last_seen_at) – ORBION (SaaS enterprise)
+
+✔ Evita 1 UPDATE + COMMIT por request autenticado
+✔ Granularidad configurable: solo se persiste si el valor guardado es más
+  antiguo que SESSION_TOUCH_GRANULARITY_SECONDS
+✔ Coalesce en memoria (1 entrada por sesión, gana el touch más reciente)
+✔ Flush en background por lotes: UPDATE ... WHERE id IN (...)
+✔ Idle timeout correcto: get_current_user usa max(BD, pendiente en memoria)
+
+Notas:
+- Con varios procesos, cada uno ve solo sus touches pendientes; el desfase
+  máximo de last_seen_at en BD es granularidad + intervalo de flush
+  (segundos frente a SESSION_INACTIVITY_SECONDS de horas).
+- Si SESSION_TOUCH_GRANULARITY_SECONDS <= 0 se persiste en cada request
+  (comportamiento legacy, lo hace el caller).
+"""
+
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, update
+
+from core.config import settings
+from core.database import SessionLocal
+from core.logging_config import logger
+from core.models import SesionUsuario
+
+
+# =========================================================
+# BUFFER EN MEMORIA
+# =========================================================
+
+_lock = threading.Lock()
+_pendientes: dict[int, datetime] = {}  # sesion_id -> último touch no persistido
+
+_flush_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+
+
+def touch_habilitado() -> bool:
+    return int(settings.SESSION_TOUCH_GRANULARITY_SECONDS) > 0
+
+
+def ultimo_touch_pendiente(sesion_id: int) -> Optional[datetime]:
+    """Touch aún no persistido de la sesión (o None)."""
+    with _lock:
+        return _pendientes.get(int(sesion_id))
+
+
+def registrar_touch(
+    sesion_id: int,
+    last_seen_bd: Optional[datetime],
+    ahora: datetime,
+) -> bool:
+    """
+    Registra actividad de una sesión.
+
+    - Si ya hay un touch pendiente, solo se actualiza en memoria (coalesce).
+    - Si el valor en BD es más reciente que la granularidad, no se encola nada.
+    Retorna True si la sesión quedó pendiente de flush.
+    """
+    granularidad = int(settings.SESSION_TOUCH_GRANULARITY_SECONDS)
+    sid = int(sesion_id)
+
+    with _lock:
+        if sid in _pendientes:
+            if ahora > _pendientes[sid]:
+                _pendientes[sid] = ahora
+            return True
+
+        if last_seen_bd is not None and (ahora - last_seen_bd).total_seconds() < granularidad:
+            return False
+
+        _pendientes[sid] = ahora
+        return True
+
+
+def descartar_touch(sesion_id: int) -> None:
+    """Olvida el touch pendiente (sesión revocada / expirada)."""
+    with _lock:
+        _pendientes.pop(int(sesion_id), None)
+
+
+# =========================================================
+# FLUSH (BATCH)
+# =========================================================
+
+def flush_touches() -> int:
+    """
+    Persiste los touches pendientes en un solo UPDATE por lote:
+      UPDATE sesiones_usuario SET last_seen_at = CASE id ... END WHERE id IN (...)
+    Retorna cuántas sesiones se actualizaron. Si falla, re-encola.
+    """
+    with _lock:
+        if not _pendientes:
+            return 0
+        lote = dict(_pendientes)
+        _pendientes.clear()
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(SesionUsuario)
+            .where(SesionUsuario.id.in_(list(lote.keys())))
+            .values(last_seen_at=case(lote, value=SesionUsuario.id))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return len(lote)
+    except Exception:
+        db.rollback()
+        logger.exception("[SESSION_TOUCH] flush failed sesiones=%s", len(lote))
+        # Re-encolar sin pisar touches más nuevos llegados durante el flush
+        with _lock:
+            for sid, ts in lote.items():
+                actual = _pendientes.get(sid)
+                if actual is None or ts > actual:
+                    _pendientes[sid] = ts
+        return 0
+    finally:
+        db.close()
+
+
+def _flush_loop() -> None:
+    intervalo = max(float(settings.SESSION_TOUCH_FLUSH_SECONDS), 0.5)
+    while not _stop_event.wait(intervalo):
+        flush_touches()
+
+
+def start_session_touch_worker() -> None:
+    """Arranca el flusher en background (idempotente). Llamar en startup."""
+    global _flush_thread
+
+    if not touch_habilitado():
+        return
+    if _flush_thread is not None and _flush_thread.is_alive():
+        return
+
+    _stop_event.clear()
+    _flush_thread = threading.Thread(
+        target=_flush_loop,
+        name="orbion-session-touch",
+        daemon=True,
+    )
+    _flush_thread.start()
+    logger.info(
+        "[SESSION_TOUCH] worker iniciado granularidad=%ss flush=%ss",
+        settings.SESSION_TOUCH_GRANULARITY_SECONDS,
+        settings.SESSION_TOUCH_FLUSH_SECONDS,
+    )
+
+
+def stop_session_touch_worker() -> None:
+    """Detiene el flusher y persiste lo pendiente. Llamar en shutdown."""
+    global _flush_thread
+
+    _stop_event.set()
+    if _flush_thread is not None:
+        _flush_thread.join(timeout=5)
+        _flush_thread = None
+    flush_touches()
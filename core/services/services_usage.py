@@ -8,22 +8,37 @@ services_usage.py – ORBION SaaS (enterprise, baseline aligned)
 ✔ Resiliente ante concurrencia (UniqueConstraint + IntegrityError + retry)
 ✔ Incremento atómico (evita lost update)
 ✔ Strategy C: OPERATIONAL + BILLABLE (por el mismo evento)
+✔ Invalida el snapshot de entitlements cacheado del negocio al incrementar
+✔ Write-behind opcional (acumular_usage / acumular_usage_dual) para métricas de
+  alto volumen: deltas agregados por (negocio, módulo, tipo, métrica, ventana)
+  y persistidos con 1 upsert multi-fila (INSERT ... ON CONFLICT DO UPDATE
+  value = value + excluded.value):
+   - BILLABLE (crash-safe, default): en el mismo commit de la transacción
+   - OPERATIONAL: después del commit, por timer en background
 """
 
 from __future__ import annotations
 
+import threading
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import update
+from sqlalchemy import event, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from core.cache import LRUTTLCache
+from core.config import settings
+from core.database import SessionLocal
+from core.logging_config import logger
 from core.models.enums import ModuleKey, UsageCounterType, SubscriptionStatus
 from core.models.saas import UsageCounter, SuscripcionModulo
 from core.models.time import utcnow
- 
+from core.services.services_entitlements_cache import invalidate_entitlements_snapshot
 
 
 try:
@@ -209,6 +224,11 @@ def _get_or_create_counter(
 # API PÚBLICA
 # =========================================================
 
+def operational_month_window(now_utc: datetime | None = None) -> UsageWindow:
+    """Ventana OPERATIONAL vigente (mes calendario CL, en UTC)."""
+    return _operational_month_window(now_utc)
+
+
 def get_usage_value(
     db: Session,
     negocio_id: int,
@@ -238,7 +258,11 @@ def get_usage_value(
         .filter(UsageCounter.period_end == window.period_end)
         .first()
     )
-    return float(row[0]) if row and row[0] is not None else 0.0
+    value = float(row[0]) if row and row[0] is not None else 0.0
+
+    # deltas acumulados (write-behind) aún no persistidos
+    key = (int(negocio_id), module_key, counter_type, metric, window.period_start, window.period_end)
+    return value + _delta_pendiente(db, key)
 
 
 def increment_usage(
@@ -280,11 +304,72 @@ def increment_usage(
         )
     )
     db.flush()
+    invalidate_entitlements_snapshot(negocio_id, db=db)
 
     row2 = db.query(UsageCounter.value).filter(UsageCounter.id == row.id).first()
     return float(row2[0]) if row2 and row2[0] is not None else float(d)
 
 
+def try_increment_usage_capped(
+    db: Session,
+    negocio_id: int,
+    module_key: ModuleKey,
+    metric_key: str,
+    delta: float,
+    *,
+    limit: float,
+    counter_type: UsageCounterType = UsageCounterType.BILLABLE,
+) -> tuple[bool, float]:
+    """
+    Incremento con tope atómico (check-and-increment en 1 statement):
+      UPDATE usage_counters SET value = value + :d
+      WHERE id = :id AND value + :d <= :limit
+
+    En Postgres el UPDATE toma el lock de fila y re-evalúa el WHERE con el
+    valor ya commiteado por otra transacción; en SQLite las escrituras están
+    serializadas. Dos reservas concurrentes no pueden superar el límite.
+
+    Retorna (ok, valor_actual). Con ok=False no se modificó nada.
+    """
+    try:
+        d = float(delta)
+    except Exception:
+        d = 0.0
+
+    if d <= 0:
+        return True, get_usage_value(db, negocio_id, module_key, metric_key, counter_type=counter_type)
+
+    metric = _norm_metric_key(metric_key)
+    if not metric:
+        return False, 0.0
+
+    window = _resolve_window(
+        db,
+        negocio_id=negocio_id,
+        module_key=module_key,
+        counter_type=counter_type,
+    )
+    row = _get_or_create_counter(db, negocio_id, module_key, counter_type, metric, window)
+
+    res = db.execute(
+        update(UsageCounter)
+        .where(UsageCounter.id == row.id)
+        .where(UsageCounter.value + d <= float(limit) + 1e-9)
+        .values(
+            value=UsageCounter.value + d,
+            updated_at=utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    ok = (res.rowcount or 0) > 0
+    if ok:
+        db.flush()
+        invalidate_entitlements_snapshot(negocio_id, db=db)
+
+    row2 = db.query(UsageCounter.value).filter(UsageCounter.id == row.id).first()
+    return ok, float(row2[0]) if row2 and row2[0] is not None else 0.0
+
+
 def increment_usage_dual(
     db: Session,
     negocio_id: int,
@@ -344,3 +429,310 @@ def list_usage_for_module_current_period(
     for k, v in rows:
         out[str(k)] = float(v or 0.0)
     return out
+
+
+# =========================================================
+# WRITE-BEHIND (ACUMULADOR)
+# =========================================================
+# Clave: (negocio_id, module_key, counter_type, metric_key, period_start, period_end)
+_UsageKey = tuple
+
+_PENDING_TX_KEY = "usage_pending"          # deltas de la transacción en curso
+_PENDING_POST_KEY = "usage_pending_post"   # deltas a encolar tras el commit
+_WINDOW_DIRTY_KEY = "usage_window_dirty"   # negocios con suscripción modificada
+
+_buffer_lock = threading.Lock()
+_buffer: dict[_UsageKey, float] = defaultdict(float)  # commiteado, no persistido
+
+_flush_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+
+# Ventana BILLABLE por (negocio, módulo): evita 1 query de suscripción por evento
+_window_cache = LRUTTLCache(max_entries=4096, ttl_seconds=60.0)
+
+
+def write_behind_habilitado() -> bool:
+    return bool(settings.USAGE_WRITE_BEHIND_ENABLED)
+
+
+def _resolve_window_cached(
+    db: Session,
+    *,
+    negocio_id: int,
+    module_key: ModuleKey,
+    counter_type: UsageCounterType,
+) -> UsageWindow:
+    if counter_type == UsageCounterType.OPERATIONAL:
+        return _operational_month_window()
+
+    ck = (int(negocio_id), module_key)
+    w = _window_cache.get(ck)
+    if w is not None and w.period_end > _ensure_utc_aware(utcnow()):
+        return w
+
+    w = _resolve_window(db, negocio_id=negocio_id, module_key=module_key, counter_type=counter_type)
+    if int(negocio_id) not in (db.info.get(_WINDOW_DIRTY_KEY) or ()):
+        _window_cache.set(ck, w)
+    return w
+
+
+def _delta_pendiente(db: Session, key: _UsageKey) -> float:
+    total = 0.0
+    for k in (_PENDING_TX_KEY, _PENDING_POST_KEY):
+        pend = db.info.get(k)
+        if pend:
+            total += float(pend.get(key, 0.0))
+    if _buffer:
+        with _buffer_lock:
+            total += float(_buffer.get(key, 0.0))
+    return total
+
+
+def acumular_usage(
+    db: Session,
+    negocio_id: int,
+    module_key: ModuleKey,
+    metric_key: str,
+    delta: float = 1.0,
+    *,
+    counter_type: UsageCounterType = UsageCounterType.BILLABLE,
+) -> None:
+    """
+    Variante write-behind de increment_usage (sin queries por evento).
+
+    El delta queda asociado a la transacción de `db`:
+    - rollback => se descarta
+    - commit   => BILLABLE se persiste dentro del mismo commit (crash-safe,
+      USAGE_BILLABLE_CRASH_SAFE); OPERATIONAL (y BILLABLE si crash-safe está
+      apagado) pasa al buffer del proceso y lo persiste el worker por timer.
+
+    Si USAGE_WRITE_BEHIND_ENABLED está apagado, equivale a increment_usage.
+    """
+    if not write_behind_habilitado():
+        increment_usage(db, negocio_id, module_key, metric_key, delta, counter_type=counter_type)
+        return
+
+    try:
+        d = float(delta)
+    except Exception:
+        d = 0.0
+    metric = _norm_metric_key(metric_key)
+    if d <= 0 or not metric:
+        return
+
+    window = _resolve_window_cached(
+        db,
+        negocio_id=negocio_id,
+        module_key=module_key,
+        counter_type=counter_type,
+    )
+    key = (int(negocio_id), module_key, counter_type, metric, window.period_start, window.period_end)
+
+    # sin query previa no hay transacción: la abrimos para que commit/rollback
+    # disparen los hooks que persisten o descartan el delta
+    if not db.in_transaction():
+        db.begin()
+
+    pend = db.info.setdefault(_PENDING_TX_KEY, defaultdict(float))
+    pend[key] += d
+
+
+def acumular_usage_dual(
+    db: Session,
+    negocio_id: int,
+    module_key: ModuleKey,
+    metric_key: str,
+    delta: float = 1.0,
+) -> None:
+    """Strategy C (OPERATIONAL + BILLABLE) vía write-behind."""
+    acumular_usage(db, negocio_id, module_key, metric_key, delta, counter_type=UsageCounterType.OPERATIONAL)
+    acumular_usage(db, negocio_id, module_key, metric_key, delta, counter_type=UsageCounterType.BILLABLE)
+
+
+def _upsert_deltas(db: Session, deltas: dict[_UsageKey, float]) -> None:
+    """
+    Persiste deltas en 1 statement:
+      INSERT INTO usage_counters (...) VALUES (...), (...)
+      ON CONFLICT (negocio_id, module_key, counter_type, metric_key, period_start, period_end)
+      DO UPDATE SET value = usage_counters.value + excluded.value
+    Otros dialectos: get-or-create + UPDATE atómico por clave.
+    """
+    if not deltas:
+        return
+
+    now = utcnow()
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        rows = [
+            {
+                "negocio_id": nid,
+                "module_key": mk,
+                "counter_type": ct,
+                "metric_key": metric,
+                "period_start": ps,
+                "period_end": pe,
+                "value": float(d),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for (nid, mk, ct, metric, ps, pe), d in sorted(deltas.items(), key=lambda kv: repr(kv[0]))
+        ]
+        insert_fn = pg_insert if dialect == "postgresql" else sqlite_insert
+        stmt = insert_fn(UsageCounter).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                UsageCounter.negocio_id,
+                UsageCounter.module_key,
+                UsageCounter.counter_type,
+                UsageCounter.metric_key,
+                UsageCounter.period_start,
+                UsageCounter.period_end,
+            ],
+            set_={
+                "value": UsageCounter.value + stmt.excluded.value,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        db.execute(stmt)
+    else:
+        for (nid, mk, ct, metric, ps, pe), d in deltas.items():
+            row = _get_or_create_counter(db, nid, mk, ct, metric, UsageWindow(ps, pe))
+            db.execute(
+                update(UsageCounter)
+                .where(UsageCounter.id == row.id)
+                .values(value=UsageCounter.value + float(d), updated_at=now)
+            )
+
+    for nid in {k[0] for k in deltas}:
+        invalidate_entitlements_snapshot(nid, db=db)
+
+
+def flush_usage_buffer() -> int:
+    """
+    Persiste el buffer del proceso (deltas ya commiteados) en 1 upsert.
+    Retorna cuántos contadores se actualizaron. Si falla, re-encola.
+    """
+    with _buffer_lock:
+        if not _buffer:
+            return 0
+        lote = dict(_buffer)
+        _buffer.clear()
+
+    db = SessionLocal()
+    try:
+        _upsert_deltas(db, lote)
+        db.commit()
+        return len(lote)
+    except Exception:
+        db.rollback()
+        logger.exception("[USAGE] flush write-behind falló contadores=%s", len(lote))
+        with _buffer_lock:
+            for k, d in lote.items():
+                _buffer[k] += d
+        return 0
+    finally:
+        db.close()
+
+
+def _flush_loop() -> None:
+    intervalo = max(float(settings.USAGE_FLUSH_SECONDS), 0.5)
+    while not _stop_event.wait(intervalo):
+        flush_usage_buffer()
+
+
+def start_usage_flush_worker() -> None:
+    """Arranca el flusher en background (idempotente). Llamar en startup."""
+    global _flush_thread
+
+    if not write_behind_habilitado():
+        return
+    if _flush_thread is not None and _flush_thread.is_alive():
+        return
+
+    _stop_event.clear()
+    _flush_thread = threading.Thread(
+        target=_flush_loop,
+        name="orbion-usage-flush",
+        daemon=True,
+    )
+    _flush_thread.start()
+    logger.info(
+        "[USAGE] write-behind iniciado flush=%ss billable_crash_safe=%s",
+        settings.USAGE_FLUSH_SECONDS,
+        settings.USAGE_BILLABLE_CRASH_SAFE,
+    )
+
+
+def stop_usage_flush_worker() -> None:
+    """Detiene el flusher y persiste lo pendiente. Llamar en shutdown."""
+    global _flush_thread
+
+    _stop_event.set()
+    if _flush_thread is not None:
+        _flush_thread.join(timeout=5)
+        _flush_thread = None
+    flush_usage_buffer()
+
+
+# =========================================================
+# SESSION HOOKS (write-behind)
+# =========================================================
+
+@event.listens_for(Session, "before_commit")
+def _usage_before_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # SAVEPOINT: se persiste con el commit de la transacción raíz
+
+    pend = session.info.pop(_PENDING_TX_KEY, None)
+    if not pend:
+        return
+
+    if settings.USAGE_BILLABLE_CRASH_SAFE:
+        en_tx = {k: d for k, d in pend.items() if k[2] == UsageCounterType.BILLABLE}
+    else:
+        en_tx = {}
+    post = {k: d for k, d in pend.items() if k not in en_tx}
+
+    if en_tx:
+        _upsert_deltas(session, en_tx)
+    if post:
+        acum = session.info.setdefault(_PENDING_POST_KEY, defaultdict(float))
+        for k, d in post.items():
+            acum[k] += d
+
+
+@event.listens_for(Session, "after_commit")
+def _usage_after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+
+    post = session.info.pop(_PENDING_POST_KEY, None)
+    if post:
+        with _buffer_lock:
+            for k, d in post.items():
+                _buffer[k] += d
+
+    for nid in session.info.pop(_WINDOW_DIRTY_KEY, None) or ():
+        _window_cache.delete_where(lambda k, _v, nid=nid: k[0] == nid)
+
+
+@event.listens_for(Session, "after_rollback")
+def _usage_after_rollback(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+
+    session.info.pop(_PENDING_TX_KEY, None)
+    session.info.pop(_PENDING_POST_KEY, None)
+    for nid in session.info.pop(_WINDOW_DIRTY_KEY, None) or ():
+        _window_cache.delete_where(lambda k, _v, nid=nid: k[0] == nid)
+
+
+@event.listens_for(Session, "after_flush")
+def _usage_track_subscription_writes(session: Session, flush_context) -> None:
+    # cambio de suscripción => cambia la ventana BILLABLE del negocio
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, SuscripcionModulo) and obj.negocio_id is not None:
+            nid = int(obj.negocio_id)
+            _window_cache.delete_where(lambda k, _v, nid=nid: k[0] == nid)
+            session.info.setdefault(_WINDOW_DIRTY_KEY, set()).add(nid)
@@ -0,0 +1,163 @@
+﻿# core/streaming.py
+"""
+Descargas en streaming – ORBION
+
+✔ CSV / NDJSON serializados fila a fila desde un iterador (cursor server-side
+  vía Query.yield_per): nunca se arma el archivo completo en memoria
+✔ Chunks de tamaño fijo (~chunk_bytes); el encabezado sale de inmediato
+  (TTFB independiente del volumen)
+✔ gzip opcional al vuelo (zlib streaming, formato .gz estándar)
+
+Uso:
+    chunks = iter_csv(headers, rows)
+    return streaming_download(chunks, filename="x.csv", media_type=CSV_MEDIA_TYPE, gzip=True)
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from typing import Any, Iterable, Iterator, Sequence
+
+from fastapi.responses import StreamingResponse
+
+
+# Bytes por chunk enviado al cliente
+STREAM_CHUNK_BYTES = 64 * 1024
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+GZIP_MEDIA_TYPE = "application/gzip"
+
+
+# =========================================================
+# CSV
+# =========================================================
+
+def iter_csv(
+    headers: Sequence[str] | None,
+    rows: Iterable[Sequence[Any]],
+    *,
+    chunk_bytes: int = STREAM_CHUNK_BYTES,
+    bom: bool = True,
+) -> Iterator[bytes]:
+    """
+    CSV en chunks de ~chunk_bytes. `bom=True` antepone BOM UTF-8 (Excel
+    reconoce tildes/ñ). None se escribe como celda vacía.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+
+    if bom:
+        buf.write("\ufeff")
+    if headers:
+        writer.writerow(headers)
+    if buf.tell():
+        # encabezado de inmediato: el cliente empieza a recibir antes de la query
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= chunk_bytes:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+# =========================================================
+# NDJSON
+# =========================================================
+
+def iter_ndjson(
+    campos: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    *,
+    chunk_bytes: int = STREAM_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """Un objeto JSON por línea ({campo: valor}), en chunks de ~chunk_bytes."""
+    lote: list[bytes] = []
+    pendiente = 0
+
+    for row in rows:
+        linea = json.dumps(dict(zip(campos, row)), ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+        lote.append(linea)
+        pendiente += len(linea)
+        if pendiente >= chunk_bytes:
+            yield b"".join(lote)
+            lote.clear()
+            pendiente = 0
+
+    if lote:
+        yield b"".join(lote)
+
+
+# =========================================================
+# GZIP
+# =========================================================
+
+def iter_gzip(
+    chunks: Iterable[bytes],
+    *,
+    level: int = 6,
+    chunk_bytes: int = STREAM_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """
+    Comprime al vuelo (gzip). El primer chunk se fuerza con Z_SYNC_FLUSH para
+    que el cliente reciba bytes de inmediato; luego acumula hasta chunk_bytes.
+    """
+    comp = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> contenedor gzip
+    pendiente = bytearray()
+    primero = True
+
+    for chunk in chunks:
+        pendiente += comp.compress(chunk)
+        if primero:
+            pendiente += comp.flush(zlib.Z_SYNC_FLUSH)
+            primero = False
+            yield bytes(pendiente)
+            pendiente.clear()
+        elif len(pendiente) >= chunk_bytes:
+            yield bytes(pendiente)
+            pendiente.clear()
+
+    pendiente += comp.flush()
+    yield bytes(pendiente)
+
+
+# =========================================================
+# RESPONSE
+# =========================================================
+
+def streaming_download(
+    chunks: Iterable[bytes],
+    *,
+    filename: str,
+    media_type: str,
+    gzip: bool = False,
+) -> StreamingResponse:
+    """
+    Descarga como adjunto. Con gzip=True el archivo es `<filename>.gz`
+    (application/gzip): explícito para loaders BI, sin depender de
+    Content-Encoding.
+    """
+    if gzip:
+        chunks = iter_gzip(chunks)
+        filename = f"{filename}.gz"
+        media_type = GZIP_MEDIA_TYPE
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # proxies (nginx): no bufferizar la respuesta completa
+            "X-Accel-Buffering": "no",
+        },
+    )
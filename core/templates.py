@@ -4,16 +4,48 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from pathlib import Path
 
+import jinja2
 from fastapi.templating import Jinja2Templates
 
+from core.config import settings
+
+
+def _bytecode_cache() -> jinja2.BytecodeCache | None:
+    if not settings.TEMPLATES_BYTECODE_CACHE_ENABLED:
+        return None
+
+    directory = (settings.TEMPLATES_BYTECODE_CACHE_DIR or "").strip()
+    if not directory:
+        # tmp del sistema (_jinja2-cache-<uid>), compartido entre workers
+        return jinja2.FileSystemBytecodeCache()
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    return jinja2.FileSystemBytecodeCache(directory)
+
+
+def _auto_reload() -> bool:
+    if settings.TEMPLATES_AUTO_RELOAD is not None:
+        return bool(settings.TEMPLATES_AUTO_RELOAD)
+    return (settings.APP_ENV or "development").lower() != "production"
+
 
 def create_templates(base_dir: Path) -> Jinja2Templates:
     """
     Crea y configura el motor de templates Jinja2 para ORBION.
-    - Define directory raíz /templates
+    - Define directory raíz /templates (otros dirs: core.web.add_template_dir)
+    - Bytecode cache en disco + auto_reload off en producción
     - Registra globals enterprise (UTC, nombre app, env, etc.)
+
+    Usar una sola instancia por proceso (core.web.templates): cada
+    Environment tiene su propio cache de templates compilados.
     """
-    templates = Jinja2Templates(directory=str(base_dir / "templates"))
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(base_dir / "templates")),
+        autoescape=True,
+        auto_reload=_auto_reload(),
+        bytecode_cache=_bytecode_cache(),
+    )
+    templates = Jinja2Templates(env=env)
 
     # Globals (fuente de verdad: servidor, UTC)
     templates.env.globals.update(
@@ -6,6 +6,7 @@ from jinja2 import ChoiceLoader, FileSystemLoader
 
 from core.templates import create_templates
 from core.formatting import clp, cl_num, cl_datetime, cl_date
+from core.logging_config import logger
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 templates = create_templates(BASE_DIR)
@@ -23,7 +24,19 @@ templates.env.globals["clp"] = clp
 templates.env.globals["cl_num"] = cl_num
 
 
+def _searchpaths(loader) -> list[str]:
+    loaders = loader.loaders if isinstance(loader, ChoiceLoader) else [loader]
+    out: list[str] = []
+    for l in loaders:
+        out.extend(str(p) for p in (getattr(l, "searchpath", None) or []))
+    return out
+
+
 def add_template_dir(path: Path) -> None:
+    """
+    Encadena un directorio de templates al Environment compartido.
+    Idempotente: los routers de un mismo módulo pueden llamarlo cada uno.
+    """
     loader = templates.env.loader
     new_loader = FileSystemLoader(str(path))
 
@@ -31,12 +44,26 @@ def add_template_dir(path: Path) -> None:
         templates.env.loader = new_loader
         return
 
+    if str(path) in _searchpaths(loader):
+        return
+
     if isinstance(loader, ChoiceLoader):
-        loaders = list(loader.loaders)
-        for l in loaders:
-            sp = getattr(l, "searchpath", None)
-            if sp and str(path) in list(sp):
-                return
-        templates.env.loader = ChoiceLoader([*loaders, new_loader])
+        templates.env.loader = ChoiceLoader([*loader.loaders, new_loader])
     else:
         templates.env.loader = ChoiceLoader([loader, new_loader])
+
+
+def precompile_templates() -> int:
+    """
+    Compila todos los .html de los dirs registrados (cache en memoria +
+    bytecode en disco). Llamar al arrancar, con los routers ya importados.
+    """
+    env = templates.env
+    compilados = 0
+    for name in env.list_templates(filter_func=lambda n: n.endswith(".html")):
+        try:
+            env.get_template(name)
+            compilados += 1
+        except Exception:
+            logger.exception("[TEMPLATES] no se pudo compilar %s", name)
+    return compilados
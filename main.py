@@ -1,16 +1,16 @@
 ﻿# main.py
 from contextlib import asynccontextmanager
-from pathlib import Path
+
+import anyio.to_thread
 
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, FileResponse
 
 from core.config import settings
-from core.database import init_db
+from core.database import SessionLocal, init_db
 from core.logging_config import setup_logging, logger
-from core.templates import create_templates  # ✅ nuevo
-from core.web import templates
+from core.web import precompile_templates, templates
 
 # Routers
 from core.routes import routes_health
@@ -31,15 +31,35 @@ from modules.basic_wms.routes.routes_audit import router as audit_router
 from modules.basic_wms.routes.routes_alerts import router as alerts_router
 from modules.basic_wms.routes.routes_backups import router as backups_router
 from modules.basic_wms.routes.routes_export import router as export_router
+from modules.basic_wms.services.services_stock_saldos import ensure_stock_saldos
+from modules.inbound_orbion.services.services_inbound_rollup import ensure_inbound_rollup
 from core.middleware.auth_redirect import redirect_middleware
 from modules.inbound_orbion.routes import routes_inbound 
 from core.middleware.audit_context import audit_context_middleware
 from core.routes.routes_app_planes import router as planes_router
+from core.routes.routes_export_jobs import router as export_jobs_router
 
 
 
 
 from core.bootstrap import ensure_superadmin
+from core.services.services_session_touch import (
+    start_session_touch_worker,
+    stop_session_touch_worker,
+)
+from core.services.services_export_jobs import (
+    start_export_worker,
+    stop_export_worker,
+)
+from modules.basic_wms.services.services_alerts import (
+    start_alert_worker,
+    stop_alert_worker,
+)
+from core.services.services_search import ensure_search_indexes
+from core.services.services_usage import (
+    start_usage_flush_worker,
+    stop_usage_flush_worker,
+)
 
 
 
@@ -49,8 +69,16 @@ from core.bootstrap import ensure_superadmin
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Handlers con BD sync son `def`: corren en este threadpool acotado, no en el event loop
+    anyio.to_thread.current_default_thread_limiter().total_tokens = int(
+        settings.THREADPOOL_MAX_WORKERS
+    )
+
     init_db()
 
+    # Índices de búsqueda (FTS5 en SQLite / pg_trgm en Postgres)
+    ensure_search_indexes()
+
     ensure_superadmin(
         email=settings.SUPERADMIN_EMAIL,
         password=settings.SUPERADMIN_PASSWORD,
@@ -58,8 +86,38 @@ async def lifespan(app: FastAPI):
         user_display_name=settings.SUPERADMIN_DISPLAY_NAME,  
     )
 
+    # Saldos de stock materializados (backfill si la tabla es nueva)
+    db = SessionLocal()
+    try:
+        ensure_stock_saldos(db)
+        # Rollup diario inbound (backfill si la tabla es nueva)
+        ensure_inbound_rollup(db)
+    finally:
+        db.close()
+
+    # last_seen_at de sesiones: flush por lotes en background
+    start_session_touch_worker()
+
+    # usage counters write-behind (si está habilitado)
+    start_usage_flush_worker()
+
+    # exports en background (pool propio, cupo por negocio)
+    start_export_worker()
+
+    # alertas de stock / vencimiento: cola con coalesce + escritura por lotes
+    start_alert_worker()
+
+    # templates compilados antes del primer request (routers ya registraron sus dirs)
+    if settings.TEMPLATES_PRECOMPILE:
+        logger.info("[TEMPLATES] precompilados=%s", precompile_templates())
+
     yield
 
+    stop_alert_worker()
+    stop_export_worker()
+    stop_usage_flush_worker()
+    stop_session_touch_worker()
+
 
 setup_logging()
 
@@ -75,10 +133,6 @@ logger.info("ORBION iniciado")
 # Static
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Templates (global)
-BASE_DIR = Path(__file__).resolve().parent
-templates = create_templates(BASE_DIR)
-
 
 # ============================
 #   RUTA PÚBLICA: LANDING
@@ -131,6 +185,7 @@ app.include_router(alerts_router)
 app.include_router(export_router)
 app.include_router(routes_inbound.router)
 app.include_router(planes_router)
+app.include_router(export_jobs_router)
 
 
 if __name__ == "__main__":
@@ -8,13 +8,13 @@ from fastapi import (
     HTTPException,
 )
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import join  # opcional, pero no estrictamente necesario
 
 from core.database import get_db
 from core.models import Alerta, Negocio
 from core.security import require_roles_dep
+from core.web import add_template_dir, templates
 
 
 # ============================
@@ -22,7 +22,7 @@ from core.security import require_roles_dep
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -40,7 +40,7 @@ router = APIRouter(
 # ============================
 
 @router.get("/alertas", response_class=HTMLResponse)
-async def alertas_view(
+def alertas_view(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
@@ -85,7 +85,7 @@ async def alertas_view(
 # ============================
 
 @router.post("/alertas/{alerta_id}/marcar-leida")
-async def alerta_marcar_leida(
+def alerta_marcar_leida(
     alerta_id: int,
     request: Request,
     db: Session = Depends(get_db),
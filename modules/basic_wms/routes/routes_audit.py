@@ -7,12 +7,12 @@ from fastapi import (
     Depends,
 )
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 
 from core.database import get_db
 from core.models import Auditoria
 from core.security import require_roles_dep
+from core.web import add_template_dir, templates
 
 
 # ============================
@@ -20,7 +20,7 @@ from core.security import require_roles_dep
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -38,7 +38,7 @@ router = APIRouter(
 # ============================
 
 @router.get("/auditoria", response_class=HTMLResponse)
-async def auditoria_view(
+def auditoria_view(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
@@ -12,7 +12,7 @@ router = APIRouter(
 
 
 @router.post("/sqlite")
-async def trigger_sqlite_backup(user = Depends(require_superadmin_dep)):
+def trigger_sqlite_backup(user = Depends(require_superadmin_dep)):
     ok, path = backup_sqlite_db()
     if not ok:
         return JSONResponse(
@@ -5,20 +5,25 @@ from pathlib import Path
 
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from core.database import get_db
-from core.models import Producto, Movimiento, Zona, Slot, Ubicacion, Alerta
+from core.models import Producto, Movimiento, StockSaldo, Zona, Slot, Ubicacion, Alerta
 from core.security import require_user_dep
+from core.web import add_template_dir, templates
+from modules.basic_wms.services.services_stock_saldos import (
+    get_totales_producto,
+    get_vencimiento_min_por_producto,
+    producto_key,
+)
 
 # ============================
 #   TEMPLATES
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 # ============================
 #   ROUTER DASHBOARD
@@ -34,7 +39,7 @@ router = APIRouter(
 # ============================
 
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard_view(
+def dashboard_view(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_user_dep),
@@ -60,18 +65,20 @@ async def dashboard_view(
         .order_by(Producto.nombre.asc())
         .all()
     )
-    productos_by_name = {p.nombre.lower(): p for p in productos}
+    productos_by_name = {producto_key(p.nombre): p for p in productos}
     total_skus = len(productos)
 
     # ============================
-    # 2) Movimientos del negocio
+    # 2) Stock total por producto (stock_saldos materializado)
     # ============================
 
-    movimientos_all = (
-        db.query(Movimiento)
+    totales_producto = get_totales_producto(db, negocio_id)  # producto_key -> qty total
+
+    hay_movimientos = (
+        db.query(Movimiento.id)
         .filter(Movimiento.negocio_id == negocio_id)
-        .order_by(Movimiento.fecha.asc(), Movimiento.id.asc())
-        .all()
+        .first()
+        is not None
     )
 
     # ============================
@@ -97,7 +104,7 @@ async def dashboard_view(
     faltan_zonas = (total_zonas == 0)
     faltan_slots = (total_slots == 0)
     faltan_productos = (total_skus == 0)
-    faltan_movimientos = (len(movimientos_all) == 0)
+    faltan_movimientos = not hay_movimientos
 
     onboarding_completo = not (
         faltan_zonas
@@ -107,57 +114,18 @@ async def dashboard_view(
     )
 
     # ============================
-    # 4) Totales por producto + FEFO
+    # 4) Vencimiento más próximo por producto (lotes FEFO persistidos)
     # ============================
 
-    totales_producto: dict[str, int] = {}   # "producto_key" -> qty total
-    lotes_por_producto: dict[str, list] = {}  # "producto" -> [{fv, qty}]
-
-    for mov in movimientos_all:
-        prod_name = mov.producto or ""
-        prod_key = prod_name.lower()
-        if not prod_key:
-            continue
-
-        qty = mov.cantidad or 0
-
-        # Salidas/ajustes negativos restan
-        if mov.tipo == "salida" or (mov.tipo == "ajuste" and qty < 0):
-            signed_delta = -abs(qty)
-        else:
-            signed_delta = abs(qty)
-
-        # total por producto
-        totales_producto[prod_key] = totales_producto.get(prod_key, 0) + signed_delta
-
-        # Lotes por producto (simplificado, sin por-slot aquí)
-        if signed_delta > 0:
-            fv = mov.fecha_vencimiento
-            lotes_por_producto.setdefault(prod_name, []).append(
-                {"fv": fv, "qty": signed_delta}
-            )
-        elif signed_delta < 0:
-            lotes = lotes_por_producto.setdefault(prod_name, [])
-            qty_to_remove = -signed_delta
-
-            lotes.sort(
-                key=lambda l: (
-                    l["fv"] is None,
-                    l["fv"] or date(9999, 12, 31),
-                )
-            )
-
-            for lote in lotes:
-                if qty_to_remove <= 0:
-                    break
-                disp = lote["qty"]
-                if disp <= 0:
-                    continue
-                usar = min(disp, qty_to_remove)
-                lote["qty"] -= usar
-                qty_to_remove -= usar
-
-            lotes[:] = [l for l in lotes if l["qty"] > 0]
+    # Productos con historial (saldo registrado, aunque hoy esté en 0)
+    productos_con_historial = [
+        r[0]
+        for r in db.query(StockSaldo.producto_key)
+        .filter(StockSaldo.negocio_id == negocio_id)
+        .distinct()
+        .all()
+    ]
+    venc_min_por_producto = get_vencimiento_min_por_producto(db, negocio_id)
 
     # ============================
     # 5) Resumen de estados de stock
@@ -173,7 +141,7 @@ async def dashboard_view(
     estado_producto: dict[str, str] = {}
 
     for p in productos:
-        key = p.nombre.lower()
+        key = producto_key(p.nombre)
         stock_total = totales_producto.get(key, 0)
         stock_min = p.stock_min
         stock_max = p.stock_max
@@ -210,12 +178,8 @@ async def dashboard_view(
         "Sin fecha": 0,
     }
 
-    for prod_name, lotes in lotes_por_producto.items():
-        fv_min = None
-        for l in lotes:
-            if l["fv"] is not None:
-                if fv_min is None or l["fv"] < fv_min:
-                    fv_min = l["fv"]
+    for prod_key in productos_con_historial:
+        fv_min = venc_min_por_producto.get(prod_key)
 
         if fv_min is None:
             resumen_venc["Sin fecha"] += 1
@@ -270,7 +234,7 @@ async def dashboard_view(
 
     perdidas_merma_30d = 0.0
     for m in salidas_merma:
-        p = productos_by_name.get((m.producto or "").lower())
+        p = productos_by_name.get(producto_key(m.producto))
         if p and p.costo_unitario is not None:
             perdidas_merma_30d += abs(m.cantidad or 0) * float(p.costo_unitario)
 
@@ -1,21 +1,28 @@
 ﻿# routes_export.py
 from pathlib import Path
-from datetime import date, datetime
-from io import BytesIO
+from datetime import datetime
 
-from fastapi import APIRouter, Request, Depends, Query
-from fastapi.responses import HTMLResponse, StreamingResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Request, Depends, Form, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
 
 from core.database import get_db
 from core.security import require_roles_dep
-from core.logging_config import logger
-from core.models import Movimiento
+from core.services.services_export_jobs import crear_export_job, despertar_export_worker
+from core.streaming import CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE, iter_csv, iter_ndjson, streaming_download
+from core.web import add_template_dir, templates
+from modules.basic_wms.services.services_export import (
+    MOVIMIENTOS_CAMPOS,
+    MOVIMIENTOS_HEADERS,
+    STOCK_HEADERS,
+    TIPOS_EXPORT_WMS,
+    XLSX_MEDIA_TYPE,
+    iter_movimientos_rows,
+    iter_stock_rows,
+    iter_xlsx,
+    parse_rango_fechas,
+)
 
-import openpyxl
-from openpyxl.utils import get_column_letter
 from typing import Optional
 
 
@@ -24,7 +31,7 @@ from typing import Optional
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -42,7 +49,7 @@ router = APIRouter(
 # =====================================================
 
 @router.get("/exportar", response_class=HTMLResponse)
-async def export_home(
+def export_home(
     request: Request,
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
 ):
@@ -55,46 +62,17 @@ async def export_home(
         {
             "request": request,
             "user": user,
+            "tipos_export": TIPOS_EXPORT_WMS,
         },
     )
 
 
-# =====================================================
-# Utilidad genérica para construir un Excel en memoria
-# =====================================================
-
-def build_excel(headers: list[str], rows: list[tuple], title: str = "Reporte"):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = title[:31]  # Excel limita a 31 caracteres
-
-    # Encabezados
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.font = openpyxl.styles.Font(bold=True)
-
-    # Filas
-    for row_idx, row in enumerate(rows, start=2):
-        for col_idx, value in enumerate(row, start=1):
-            ws.cell(row=row_idx, column=col_idx, value=value)
-
-    # Auto-ajustar ancho de columnas (simple)
-    for col_idx, _ in enumerate(headers, start=1):
-        column_letter = get_column_letter(col_idx)
-        ws.column_dimensions[column_letter].width = 18
-
-    stream = BytesIO()
-    wb.save(stream)
-    stream.seek(0)
-    return stream
-
-
 # =====================================================
 # EXPORT: STOCK ACTUAL
 # =====================================================
 
 @router.get("/exportar/stock")
-async def export_stock_actual(
+def export_stock_actual(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
@@ -102,57 +80,20 @@ async def export_stock_actual(
     """
     Exporta el stock actual por producto y slot (código_full) a Excel.
 
-    - Se basa en la tabla movimientos.
-    - Asume que Movimiento.tipo indica si la cantidad suma o resta:
-        - tipo = 'salida'  -> cantidad negativa
-        - otros tipos      -> cantidad positiva (entrada, ajuste+, etc.)
+    - Se basa en stock_saldos (saldo materializado por producto + slot).
+    - Nombre de producto y código de slot vigentes vía FK (producto_id / slot_id);
+      si el saldo no tiene FK se usa el string guardado.
+    - Solo filas con stock distinto de 0.
     - Filtra por negocio_id del usuario.
+    - Streaming: cursor (yield_per) -> XLSX write-only -> chunks.
     """
 
     negocio_id = user.get("negocio_id")
 
-    # Cantidad neta con signo según tipo
-    cantidad_neta = case(
-        (Movimiento.tipo == "salida", -Movimiento.cantidad),
-        else_=Movimiento.cantidad,
-    )
-
-    query = (
-        db.query(
-            Movimiento.producto.label("producto"),
-            Movimiento.zona.label("slot_codigo_full"),
-            func.sum(cantidad_neta).label("stock"),
-        )
-        .filter(Movimiento.negocio_id == negocio_id)
-        .group_by(
-            Movimiento.producto,
-            Movimiento.zona,
-        )
-        .having(func.sum(cantidad_neta) != 0)
-        .order_by(Movimiento.producto, Movimiento.zona)
-    )
-
-    resultados = query.all()
-
-    headers = ["Producto", "Slot (código full)", "Stock actual"]
-    rows = [
-        (
-            r.producto,
-            r.slot_codigo_full,
-            int(r.stock) if r.stock is not None else 0,
-        )
-        for r in resultados
-    ]
-
-    if not rows:
-        logger.info(f"[EXPORT_STOCK] Sin resultados para negocio_id={negocio_id}")
-
-    stream = build_excel(headers, rows, title="Stock actual")
-
     filename = f"stock_actual_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
     return StreamingResponse(
-        stream,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        iter_xlsx(STOCK_HEADERS, iter_stock_rows(db, negocio_id), title="Stock actual"),
+        media_type=XLSX_MEDIA_TYPE,
         headers={"Content-Disposition": f'attachment; filename=\"{filename}\"'},
     )
 
@@ -162,7 +103,7 @@ async def export_stock_actual(
 # =====================================================
 
 @router.get("/exportar/movimientos")
-async def export_movimientos(
+def export_movimientos(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
@@ -177,91 +118,116 @@ async def export_movimientos(
         fecha_vencimiento, motivo_salida.
     - Filtra por negocio_id del usuario.
     - Si no se envía rango de fechas (o vienen vacías), exporta todos los movimientos.
+    - Streaming: cursor (yield_per) -> XLSX write-only -> chunks (memoria acotada).
     """
 
     negocio_id = user.get("negocio_id")
+    start_dt, end_dt = parse_rango_fechas(start_date, end_date)
 
-    # Parseo suave de fechas (admite "", None → None)
-    start_dt: datetime | None = None
-    end_dt: datetime | None = None
-
-    if start_date:
-        try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        except ValueError:
-            logger.warning(f"[EXPORT_MOV] start_date inválida: {start_date}")
-            start_dt = None
-
-    if end_date:
-        try:
-            # usamos max.time() para incluir todo el día
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-            end_dt = datetime.combine(end_dt.date(), datetime.max.time())
-        except ValueError:
-            logger.warning(f"[EXPORT_MOV] end_date inválida: {end_date}")
-            end_dt = None
-
-    q = (
-        db.query(
-            Movimiento.fecha,
-            Movimiento.tipo,
-            Movimiento.cantidad,
-            Movimiento.producto,
-            Movimiento.zona,
-            Movimiento.usuario,
-            Movimiento.fecha_vencimiento,
-            Movimiento.motivo_salida,
-        )
-        .filter(Movimiento.negocio_id == negocio_id)
-    )
-
-    if start_dt:
-        q = q.filter(Movimiento.fecha >= start_dt)
-    if end_dt:
-        q = q.filter(Movimiento.fecha <= end_dt)
-
-    q = q.order_by(Movimiento.fecha.desc())
-    resultados = q.all()
-
-    headers = [
-        "Fecha",
-        "Tipo",
-        "Cantidad",
-        "Cantidad neta",           # con signo según tipo
-        "Producto",
-        "Slot (código full)",
-        "Usuario",
-        "Fecha vencimiento",
-        "Motivo salida",
-    ]
-
-    rows: list[tuple] = []
-    for r in resultados:
-        # Cantidad neta por movimiento (misma lógica que en stock)
-        if r.tipo == "salida":
-            cantidad_neta = -(r.cantidad or 0)
-        else:
-            cantidad_neta = r.cantidad or 0
-
-        rows.append(
-            (
-                r.fecha.isoformat() if r.fecha else None,
-                r.tipo,
-                int(r.cantidad) if r.cantidad is not None else 0,
-                int(cantidad_neta),
-                r.producto,
-                r.zona,  # código_full
-                r.usuario,
-                r.fecha_vencimiento.isoformat() if r.fecha_vencimiento else None,
-                r.motivo_salida,
-            )
-        )
-
-    stream = build_excel(headers, rows, title="Movimientos")
+    rows = iter_movimientos_rows(db, negocio_id, start_dt, end_dt)
 
     filename = f"movimientos_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
     return StreamingResponse(
-        stream,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        iter_xlsx(MOVIMIENTOS_HEADERS, rows, title="Movimientos"),
+        media_type=XLSX_MEDIA_TYPE,
         headers={"Content-Disposition": f'attachment; filename=\"{filename}\"'},
     )
+
+
+# =====================================================
+# EXPORT: MOVIMIENTOS (CSV / NDJSON para BI)
+# =====================================================
+
+@router.get("/exportar/movimientos.csv")
+def export_movimientos_csv(
+    request: Request,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "superadmin")),
+    start_date: Optional[str] = Query(None, description="Fecha inicio (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Fecha fin (YYYY-MM-DD)"),
+    gzip: bool = Query(False, description="Comprimir al vuelo (.csv.gz)"),
+):
+    """
+    Movimientos en CSV (mismas columnas que el Excel).
+
+    - Streaming desde cursor server-side (yield_per): el encabezado sale de
+      inmediato y las filas en chunks de tamaño fijo; memoria acotada aunque
+      se exporte el historial completo del negocio.
+    - gzip=true: .csv.gz comprimido al vuelo.
+    """
+
+    negocio_id = user.get("negocio_id")
+    start_dt, end_dt = parse_rango_fechas(start_date, end_date)
+
+    rows = iter_movimientos_rows(db, negocio_id, start_dt, end_dt)
+
+    filename = f"movimientos_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
+    return streaming_download(
+        iter_csv(MOVIMIENTOS_HEADERS, rows),
+        filename=filename,
+        media_type=CSV_MEDIA_TYPE,
+        gzip=gzip,
+    )
+
+
+@router.get("/exportar/movimientos.ndjson")
+def export_movimientos_ndjson(
+    request: Request,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "superadmin")),
+    start_date: Optional[str] = Query(None, description="Fecha inicio (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Fecha fin (YYYY-MM-DD)"),
+    gzip: bool = Query(False, description="Comprimir al vuelo (.ndjson.gz)"),
+):
+    """
+    Movimientos en NDJSON (un objeto por línea; claves = MOVIMIENTOS_CAMPOS).
+    Mismo streaming que el CSV; pensado para loaders BI.
+    """
+
+    negocio_id = user.get("negocio_id")
+    start_dt, end_dt = parse_rango_fechas(start_date, end_date)
+
+    rows = iter_movimientos_rows(db, negocio_id, start_dt, end_dt)
+
+    filename = f"movimientos_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.ndjson"
+    return streaming_download(
+        iter_ndjson(MOVIMIENTOS_CAMPOS, rows),
+        filename=filename,
+        media_type=NDJSON_MEDIA_TYPE,
+        gzip=gzip,
+    )
+
+
+# =====================================================
+# EXPORT EN BACKGROUND (jobs)
+# =====================================================
+
+@router.post("/exportar/jobs")
+def export_job_crear(
+    request: Request,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "superadmin")),
+    tipo: str = Form(...),
+    start_date: str = Form(""),
+    end_date: str = Form(""),
+    gzip: bool = Form(False),
+):
+    """
+    Encola el export y responde de inmediato; el archivo se genera en el
+    worker de exports y se descarga desde /app/exports (link firmado).
+    """
+    if tipo not in TIPOS_EXPORT_WMS:
+        return RedirectResponse(url="/exportar", status_code=302)
+
+    negocio_id = user.get("negocio_id")
+    crear_export_job(
+        db,
+        negocio_id=negocio_id,
+        usuario=user.get("email"),
+        tipo=tipo,
+        parametros={"start_date": start_date or None, "end_date": end_date or None, "gzip": gzip},
+    )
+    db.commit()
+    despertar_export_worker()
+
+    return RedirectResponse(url="/app/exports?ok=Export+encolado", status_code=302)
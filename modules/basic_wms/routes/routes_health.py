@@ -15,7 +15,7 @@ router = APIRouter(
 
 
 @router.get("/health", include_in_schema=False)
-async def health():
+def health():
     """
     Health check básico de la API.
     No toca la base de datos, solo indica que la app está viva.
@@ -29,7 +29,7 @@ async def health():
 
 
 @router.get("/health/db", include_in_schema=False)
-async def health_db(db: Session = Depends(get_db)):
+def health_db(db: Session = Depends(get_db)):
     """
     Health check de la base de datos.
     Ejecuta un SELECT 1 para verificar conectividad.
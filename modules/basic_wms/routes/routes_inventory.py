@@ -1,20 +1,36 @@
 ﻿# routes_inventory.py
+import json
 from pathlib import Path
-from datetime import datetime
+from urllib.parse import urlencode
 
 from fastapi import (
     APIRouter,
     Request,
     Depends,
+    Form,
 )
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from core.database import get_db
-from core.models import Movimiento, Producto
+from core.models import Producto, Ubicacion, Zona
 from core.security import require_roles_dep
-from core.services.services_audit import audit, AuditAction
+from core.web import add_template_dir, templates
+from modules.basic_wms.services.services_conteo_ciclico import (
+    ESTADO_ABIERTO,
+    MODO_FIJAR,
+    MODO_SUMAR,
+    cancelar_conteo,
+    contabilizar_conteo,
+    crear_conteo,
+    lineas_conteo,
+    listar_conteos,
+    obtener_conteo,
+    registrar_escaneos,
+    slots_alcance,
+)
+from modules.basic_wms.services.services_stock_saldos import get_saldos_negocio
 
 
 # ============================
@@ -22,7 +38,7 @@ from core.services.services_audit import audit, AuditAction
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -34,6 +50,9 @@ router = APIRouter(
     tags=["inventario"],
 )
 
+# Tope de filas del listado de stock teórico (refinar con filtros)
+INVENTARIO_MAX_ITEMS = 500
+
 
 # ============================
 #  HELPERS INVENTARIO
@@ -44,46 +63,61 @@ def _calcular_resumen_inventario(
     negocio_id: int,
 ) -> dict[tuple[str, str], dict]:
     """
-    Calcula el stock teórico por (producto_norm, zona) a partir de la tabla de movimientos.
+    Stock teórico por (producto_norm, zona) leído desde stock_saldos
+    (incluye pares con historial aunque hoy estén en 0).
     Devuelve un dict:
       (producto_norm, zona_norm) -> {
           "producto_display": str,
           "zona": str,
-          "entradas": int,
-          "salidas": int,
+          "stock_actual": float,
       }
     """
-    movimientos = (
-        db.query(Movimiento)
-        .filter(Movimiento.negocio_id == negocio_id)
+    resumen: dict[tuple[str, str], dict] = {}
+
+    for saldo in get_saldos_negocio(db, negocio_id, incluir_vacios=True):
+        zona_norm = (saldo.zona or "").strip()
+        resumen[(saldo.producto_key, zona_norm)] = {
+            "producto_display": saldo.producto,
+            "zona": zona_norm,
+            "stock_actual": saldo.cantidad or 0,
+        }
+
+    return resumen
+
+
+def _contexto_conteos(db: Session, negocio_id: int, params) -> dict:
+    """Sesiones de conteo + zonas/ubicaciones para el formulario de alcance."""
+    ubicaciones = (
+        db.query(Ubicacion.id, Ubicacion.nombre, Zona.id, Zona.nombre)
+        .join(Zona, Ubicacion.zona_id == Zona.id)
+        .filter(Zona.negocio_id == negocio_id)
+        .order_by(Zona.nombre.asc(), Ubicacion.nombre.asc())
         .all()
     )
+    zonas: dict[int, dict] = {}
+    for ub_id, ub_nombre, zona_id, zona_nombre in ubicaciones:
+        zonas.setdefault(zona_id, {"id": zona_id, "nombre": zona_nombre, "ubicaciones": []})["ubicaciones"].append(
+            {"id": ub_id, "nombre": ub_nombre}
+        )
 
-    resumen: dict[tuple[str, str], dict] = {}
-
-    for m in movimientos:
-        nombre_original = (m.producto or "").strip()
-        if not nombre_original:
-            continue
+    return {
+        "conteos": listar_conteos(db, negocio_id),
+        "zonas": list(zonas.values()),
+        "msg": params.get("msg"),
+        "error": params.get("error"),
+    }
 
-        nombre_norm = nombre_original.lower()
-        zona_norm = (m.zona or "").strip()
 
-        key = (nombre_norm, zona_norm)
-        if key not in resumen:
-            resumen[key] = {
-                "producto_display": nombre_original,
-                "zona": zona_norm,
-                "entradas": 0,
-                "salidas": 0,
-            }
+def _redirect(url: str, **qs: str) -> RedirectResponse:
+    qs = {k: v for k, v in qs.items() if v}
+    return RedirectResponse(url + ("?" + urlencode(qs) if qs else ""), status_code=302)
 
-        if m.tipo == "entrada":
-            resumen[key]["entradas"] += m.cantidad or 0
-        elif m.tipo == "salida":
-            resumen[key]["salidas"] += m.cantidad or 0
 
-    return resumen
+def _id_opcional(valor: str | None) -> int | None:
+    try:
+        return int(valor) if (valor or "").strip() else None
+    except ValueError:
+        return None
 
 
 # ============================
@@ -91,7 +125,7 @@ def _calcular_resumen_inventario(
 # ============================
 
 @router.get("/inventario", response_class=HTMLResponse)
-async def inventario_form(
+def inventario_form(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "operador")),
@@ -140,8 +174,10 @@ async def inventario_form(
                 "request": request,
                 "user": user,
                 "stock_items": [],
+                "total_items": 0,
                 "f_producto": f_producto,
                 "f_codigo": f_codigo,
+                **_contexto_conteos(db, negocio_id, params),
             },
         )
 
@@ -156,7 +192,7 @@ async def inventario_form(
     for (_prod_norm, _zona_norm), data in resumen.items():
         producto_nombre = data["producto_display"]
         zona = data["zona"]
-        stock_actual = (data["entradas"] or 0) - (data["salidas"] or 0)
+        stock_actual = data["stock_actual"]
         # Filtro por nombre (substring, case-insensitive)
         if f_producto and f_producto.lower() not in producto_nombre.lower():
             continue
@@ -175,15 +211,18 @@ async def inventario_form(
 
     # Ordenamos por zona y nombre de producto
     stock_items.sort(key=lambda x: (x["zona"], x["producto"]))
+    total_items = len(stock_items)
 
     return templates.TemplateResponse(
         "inventario.html",
         {
             "request": request,
             "user": user,
-            "stock_items": stock_items,
+            "stock_items": stock_items[:INVENTARIO_MAX_ITEMS],
+            "total_items": total_items,
             "f_producto": f_producto,
             "f_codigo": f_codigo,
+            **_contexto_conteos(db, negocio_id, params),
         },
     )
 
@@ -202,86 +241,237 @@ async def inventario_submit(
 
     Solo accesible para roles: admin y operador.
     """
-    negocio_id = user["negocio_id"]
-
     form = await request.form()
+
+    # El parseo del form es async; el trabajo de BD va al threadpool (no bloquea el loop)
+    return await run_in_threadpool(_procesar_conteo_inventario, db, user, form)
+
+
+def _procesar_conteo_inventario(db: Session, user: dict, form) -> RedirectResponse:
+    """
+    Compat con el formulario anterior (producto_i / zona_i / conteo_i): se
+    registra como un conteo del negocio completo y se contabiliza en el acto
+    (mismo camino por lotes que las sesiones). Campos vacíos = no contados.
+
+    Todo o nada: si alguna fila se rechaza (producto/ubicación desconocidos,
+    cantidad inválida) no se contabiliza nada y se vuelve a /inventario con
+    el detalle de las filas rechazadas.
+    """
     try:
         total_items = int(form.get("total_items", 0))
     except ValueError:
         total_items = 0
 
-    # 1) Recalcular stock teórico igual que en el GET
-    resumen = _calcular_resumen_inventario(db, negocio_id)
-
-    # 2) Procesar conteos y generar ajustes
-    ajustes_realizados = 0
-
+    escaneos = []
+    filas: list[tuple[int, str, str]] = []  # (fila del form, producto, zona) por escaneo
     for i in range(total_items):
         producto = (form.get(f"producto_{i}") or "").strip()
         zona = (form.get(f"zona_{i}") or "").strip()
-        conteo_str = form.get(f"conteo_{i}") or ""
-
-        if not producto:
+        conteo_str = (form.get(f"conteo_{i}") or "").strip()
+        if not producto or not conteo_str:
             continue
+        escaneos.append({"producto": producto, "slot": zona, "cantidad": conteo_str, "modo": MODO_FIJAR})
+        filas.append((i + 1, producto, zona or "sin zona"))
 
-        try:
-            conteo = int(conteo_str)
-        except ValueError:
-            conteo = 0
-
-        key_norm = (producto.lower(), zona)
-        data = resumen.get(key_norm)
-
-        stock_teorico = 0
-        if data is not None:
-            stock_teorico = (data["entradas"] or 0) - (data["salidas"] or 0)
-
-        diff = conteo - stock_teorico
-        if diff == 0:
-            continue  # no hay ajuste
-
-        # Si diff > 0 → faltaba stock en el sistema → registramos una "entrada".
-        # Si diff < 0 → sobraba stock en el sistema → registramos una "salida".
-        tipo_mov = "entrada" if diff > 0 else "salida"
-        cantidad_ajuste = abs(diff)
-
-        movimiento = Movimiento(
-            negocio_id=negocio_id,
-            usuario=user["email"],
-            tipo=tipo_mov,
-            producto=producto,
-            cantidad=cantidad_ajuste,
-            zona=zona,
-            fecha=datetime.utcnow(),
-            # usamos este campo para marcar claramente que es ajuste
-            motivo_salida="ajuste_inventario",
-        )
-        db.add(movimiento)
-        ajustes_realizados += 1
+    if not escaneos:
+        return RedirectResponse(url="/stock", status_code=302)
 
-        print(
-            f">>> AJUSTE INVENTARIO: {tipo_mov} {cantidad_ajuste} x '{producto}' en {zona} "
-            f"(teórico={stock_teorico}, conteo={conteo})"
-        )
+    try:
+        conteo = crear_conteo(db, user=user, nombre="Conteo rápido")
+        res = registrar_escaneos(db, conteo, escaneos)
+        if res["errores"]:
+            # Nada se contabiliza: el conteo recién creado se descarta con el rollback
+            db.rollback()
+            detalle = "; ".join(
+                "fila {} ({} / {}): {}".format(*filas[e["indice"]], e["error"])
+                for e in res["errores"][:5]
+            )
+            return _redirect(
+                "/inventario",
+                error=f"{len(res['errores'])} filas rechazadas, no se aplicó ningún ajuste: {detalle}",
+            )
+        contabilizar_conteo(db, int(conteo.id), user=user)
+    except ValueError as e:
+        db.rollback()
+        return _redirect("/inventario", error=str(e))
+
+    # Luego de ajustar, volvemos al /stock para ver el resultado
+    return RedirectResponse(url="/stock", status_code=302)
+
+
+# ============================
+#   SESIONES DE CONTEO CÍCLICO
+# ============================
 
-        # Auditoría del ajuste
-        registrar_auditoria(
+@router.post("/inventario/conteos")
+def conteo_crear(
+    zona_id: str = Form(""),
+    ubicacion_id: str = Form(""),
+    nombre: str = Form(""),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "operador")),
+):
+    try:
+        conteo = crear_conteo(
             db,
-            user,
-            accion="ajuste_inventario",
-            detalle={
-                "producto": producto,
-                "zona": zona,
-                "tipo_mov": tipo_mov,
-                "cantidad_ajuste": cantidad_ajuste,
-                "stock_teorico": stock_teorico,
-                "conteo": conteo,
-                "motivo": "ajuste_inventario",
-            },
+            user=user,
+            zona_id=_id_opcional(zona_id),
+            ubicacion_id=_id_opcional(ubicacion_id),
+            nombre=nombre,
+        )
+    except ValueError as e:
+        return _redirect("/inventario", error=str(e))
+
+    db.commit()
+    return _redirect(f"/inventario/conteos/{conteo.id}")
+
+
+@router.get("/inventario/conteos/{conteo_id}", response_class=HTMLResponse)
+def conteo_detalle(
+    request: Request,
+    conteo_id: int,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "operador")),
+):
+    """
+    Sesión de conteo: escaneo por lotes (slot + códigos), líneas contadas con
+    stock teórico y diferencia, contabilizar / cancelar.
+    """
+    conteo = obtener_conteo(db, user["negocio_id"], conteo_id)
+    if not conteo:
+        return _redirect("/inventario", error="Conteo no encontrado.")
+
+    slots = sorted(cf for _sid, cf in slots_alcance(
+        db,
+        user["negocio_id"],
+        zona_id=conteo.zona_id,
+        ubicacion_id=conteo.ubicacion_id,
+    ).values()) if conteo.estado == ESTADO_ABIERTO else []
+
+    return templates.TemplateResponse(
+        "conteo_ciclico.html",
+        {
+            "request": request,
+            "user": user,
+            "conteo": conteo,
+            "abierto": conteo.estado == ESTADO_ABIERTO,
+            "lineas": lineas_conteo(db, conteo),
+            "resumen": json.loads(conteo.resumen_json) if conteo.resumen_json else None,
+            "slots": slots,
+            "f_slot": request.query_params.get("slot", ""),
+            "msg": request.query_params.get("msg"),
+            "error": request.query_params.get("error"),
+        },
+    )
+
+
+def _parse_lote_codigos(slot: str, codigos: str, modo: str) -> list[dict]:
+    """
+    Textarea del escáner: una lectura por línea, `codigo` o `codigo;cantidad`
+    (también `,` o tab como separador).
+    """
+    escaneos = []
+    for linea in (codigos or "").splitlines():
+        linea = linea.strip()
+        if not linea:
+            continue
+        for sep in (";", "\t", ","):
+            if sep in linea:
+                codigo, cantidad = linea.split(sep, 1)
+                break
+        else:
+            codigo, cantidad = linea, ""
+        escaneos.append({"codigo": codigo.strip(), "slot": slot, "cantidad": cantidad.strip(), "modo": modo})
+    return escaneos
+
+
+@router.post("/inventario/conteos/{conteo_id}/escanear")
+def conteo_escanear(
+    conteo_id: int,
+    slot: str = Form(...),
+    codigos: str = Form(""),
+    modo: str = Form(MODO_SUMAR),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "operador")),
+):
+    """Lote de lecturas desde el formulario (pistola / teclado)."""
+    url = f"/inventario/conteos/{conteo_id}"
+    conteo = obtener_conteo(db, user["negocio_id"], conteo_id)
+    if not conteo:
+        return _redirect("/inventario", error="Conteo no encontrado.")
+
+    try:
+        res = registrar_escaneos(db, conteo, _parse_lote_codigos(slot, codigos, modo))
+    except ValueError as e:
+        return _redirect(url, error=str(e))
+    db.commit()
+
+    error = None
+    if res["errores"]:
+        error = f"{len(res['errores'])} lecturas rechazadas: " + "; ".join(
+            e["error"] for e in res["errores"][:5]
         )
+    return _redirect(url, slot=slot, msg=f"{res['aceptados']} lecturas registradas.", error=error)
+
 
-    if ajustes_realizados > 0:
+@router.post("/inventario/conteos/{conteo_id}/escaneos")
+async def conteo_escaneos_api(
+    request: Request,
+    conteo_id: int,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "operador")),
+):
+    """
+    API para escáneres / apps: {"escaneos": [{"codigo"|"producto", "slot",
+    "cantidad", "modo"}]} -> {"aceptados", "lineas", "errores"}.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse({"ok": False, "error": "JSON inválido."}, status_code=400)
+
+    escaneos = payload.get("escaneos") if isinstance(payload, dict) else None
+    if not isinstance(escaneos, list):
+        return JSONResponse({"ok": False, "error": "Falta la lista 'escaneos'."}, status_code=400)
+
+    def _aplicar():
+        conteo = obtener_conteo(db, user["negocio_id"], conteo_id)
+        if not conteo:
+            return JSONResponse({"ok": False, "error": "Conteo no encontrado."}, status_code=404)
+        try:
+            res = registrar_escaneos(db, conteo, [e for e in escaneos if isinstance(e, dict)])
+        except ValueError as e:
+            return JSONResponse({"ok": False, "error": str(e)}, status_code=409)
         db.commit()
+        return JSONResponse({"ok": True, **res})
 
-    # Luego de ajustar, volvemos al /stock para ver el resultado
-    return RedirectResponse(url="/stock", status_code=302)
+    # Parseo async; el trabajo de BD va al threadpool (no bloquea el loop)
+    return await run_in_threadpool(_aplicar)
+
+
+@router.post("/inventario/conteos/{conteo_id}/contabilizar")
+def conteo_contabilizar(
+    conteo_id: int,
+    ceros_no_contados: bool = Form(False),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "operador")),
+):
+    url = f"/inventario/conteos/{conteo_id}"
+    try:
+        resumen = contabilizar_conteo(db, conteo_id, user=user, ceros_no_contados=ceros_no_contados)
+    except ValueError as e:
+        return _redirect(url, error=str(e))
+
+    return _redirect(url, msg=f"Conteo contabilizado: {resumen['ajustes']} ajustes sobre {resumen['lineas']} líneas.")
+
+
+@router.post("/inventario/conteos/{conteo_id}/cancelar")
+def conteo_cancelar(
+    conteo_id: int,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin", "operador")),
+):
+    if not cancelar_conteo(db, user["negocio_id"], conteo_id):
+        return _redirect(f"/inventario/conteos/{conteo_id}", error="Solo se pueden cancelar conteos abiertos.")
+    db.commit()
+    return _redirect("/inventario", msg="Conteo cancelado.")
@@ -8,13 +8,13 @@ from fastapi import (
     Form,
 )
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from core.database import get_db
 from core.models import Zona, Ubicacion
 from core.security import require_roles_dep
+from core.web import add_template_dir, templates
 from modules.basic_wms.services.services_plan_limits import check_plan_limit
 
 
@@ -23,7 +23,7 @@ from modules.basic_wms.services.services_plan_limits import check_plan_limit
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -41,7 +41,7 @@ router = APIRouter(
 # ============================
 
 @router.get("/zonas/{zona_id}/ubicaciones", response_class=HTMLResponse)
-async def ubicaciones_list(
+def ubicaciones_list(
     zona_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -94,7 +94,7 @@ async def ubicaciones_list(
 
 
 @router.get("/zonas/{zona_id}/ubicaciones/nueva", response_class=HTMLResponse)
-async def ubicacion_nueva_form(
+def ubicacion_nueva_form(
     zona_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -131,7 +131,7 @@ async def ubicacion_nueva_form(
 
 
 @router.post("/zonas/{zona_id}/ubicaciones/nueva", response_class=HTMLResponse)
-async def ubicacion_nueva_submit(
+def ubicacion_nueva_submit(
     zona_id: int,
     request: Request,
     nombre: str = Form(...),
@@ -1,24 +1,40 @@
 ﻿# routes_movements.py
+from dataclasses import asdict
 from pathlib import Path
 from datetime import datetime
+from urllib.parse import urlencode
 
 from fastapi import (
     APIRouter,
     Request,
     Depends,
+    File,
     Form,
+    UploadFile,
 )
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 from core.database import get_db
 from core.models import Movimiento, Producto, Slot, Ubicacion, Zona
 from core.security import require_roles_dep
 from modules.basic_wms.services.services_slots import get_slots_negocio
 from core.services.services_audit import audit, AuditAction
+from core.services.services_product_catalog import buscar_producto_por_codigo, buscar_producto_por_nombre
+from core.web import add_template_dir, templates
 from modules.basic_wms.services.services_alerts import evaluar_alertas_stock, evaluar_alertas_vencimiento
+from modules.basic_wms.services.services_stock_saldos import get_stock_slot, registrar_movimiento
+from modules.basic_wms.services.services_import_movimientos import (
+    PLANTILLA_HEADERS,
+    importar_movimientos,
+    plantilla_csv,
+)
+from modules.basic_wms.services.services_movimientos import (
+    FiltrosMovimientos,
+    get_facetas_movimientos,
+    kpis_movimientos,
+    listar_movimientos_keyset,
+)
 
 
 # ============================
@@ -26,7 +42,7 @@ from modules.basic_wms.services.services_alerts import evaluar_alertas_stock, ev
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -38,13 +54,15 @@ router = APIRouter(
     tags=["movimientos"],
 )
 
+MOVIMIENTOS_POR_PAGINA = 100
+
 
 # ============================
 #   LISTADO DE MOVIMIENTOS
 # ============================
 
 @router.get("/movimientos", response_class=HTMLResponse)
-async def movimientos_view(
+def movimientos_view(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "operador")),
@@ -56,128 +74,66 @@ async def movimientos_view(
     - producto (contiene)
     - usuario (contiene)
 
+    Paginación por cursor (keyset sobre fecha, id): ?despues=<cursor> / ?antes=<cursor>.
+    KPIs sobre el total filtrado (1 agregado SQL); combos desde cache por negocio.
+
     Solo accesible para roles: admin y operador.
     """
     params = request.query_params
 
-    fecha_desde_str = params.get("desde", "")
-    fecha_hasta_str = params.get("hasta", "")
-    tipo_filtro = params.get("tipo", "")
-    producto_filtro = params.get("producto", "")
-    usuario_filtro = params.get("usuario", "")
+    filtros = FiltrosMovimientos(
+        desde=params.get("desde", ""),
+        hasta=params.get("hasta", ""),
+        tipo=params.get("tipo", ""),
+        producto=params.get("producto", ""),
+        usuario=params.get("usuario", ""),
+    )
 
     negocio_id = user["negocio_id"]
 
-    query = db.query(Movimiento).filter(Movimiento.negocio_id == negocio_id)
-
-    # Filtro por fecha desde
-    if fecha_desde_str:
-        try:
-            dt_desde = datetime.strptime(fecha_desde_str, "%Y-%m-%d")
-            query = query.filter(Movimiento.fecha >= dt_desde)
-        except ValueError:
-            pass
-
-    # Filtro por fecha hasta (inclusive día completo)
-    if fecha_hasta_str:
-        try:
-            dt_hasta = datetime.strptime(fecha_hasta_str, "%Y-%m-%d")
-            dt_hasta_fin = dt_hasta.replace(hour=23, minute=59, second=59)
-            query = query.filter(Movimiento.fecha <= dt_hasta_fin)
-        except ValueError:
-            pass
-
-    # Filtro por tipo
-    if tipo_filtro:
-        query = query.filter(Movimiento.tipo == tipo_filtro)
-
-    # Filtro por producto (contiene, case-insensitive)
-    if producto_filtro:
-        query = query.filter(
-            func.lower(Movimiento.producto).like(f"%{producto_filtro.lower()}%")
-        )
-
-    # Filtro por usuario (contiene, case-insensitive)
-    if usuario_filtro:
-        query = query.filter(
-            func.lower(Movimiento.usuario).like(f"%{usuario_filtro.lower()}%")
-        )
-
-    # Orden más reciente primero + límite de seguridad
-    movimientos = (
-        query.order_by(Movimiento.fecha.desc(), Movimiento.id.desc())
-        .limit(500)
-        .all()
+    pagina = listar_movimientos_keyset(
+        db,
+        negocio_id,
+        filtros,
+        despues=params.get("despues"),
+        antes=params.get("antes"),
+        limit=MOVIMIENTOS_POR_PAGINA,
     )
 
-    # ==========================
-    # KPIs sobre los movimientos
-    # ==========================
-    total_movimientos = len(movimientos)
+    # KPIs sobre el set filtrado completo (no solo la página)
+    kpis = kpis_movimientos(db, negocio_id, filtros)
 
-    def es_ajuste(m: Movimiento) -> bool:
-        """
-        Consideramos como 'ajuste' cualquier movimiento cuyo motivo_salida
-        sea 'ajuste_inventario' (los generados desde /inventario).
-        """
-        return (m.motivo_salida or "").strip().lower() == "ajuste_inventario"
+    # Combos de filtro (cache por negocio)
+    facetas = get_facetas_movimientos(db, negocio_id)
 
-    total_ajustes = sum(1 for m in movimientos if es_ajuste(m))
+    # Links de paginación (conservan filtros)
+    base_qs = {k: v for k, v in asdict(filtros).items() if v}
 
-    total_entradas = sum(
-        1 for m in movimientos
-        if m.tipo == "entrada" and not es_ajuste(m)
-    )
-    total_salidas = sum(
-        1 for m in movimientos
-        if m.tipo == "salida" and not es_ajuste(m)
-    )
-
-    # Combos de filtro
-    productos_distintos = (
-        db.query(Movimiento.producto)
-        .filter(Movimiento.negocio_id == negocio_id)
-        .distinct()
-        .order_by(Movimiento.producto.asc())
-        .all()
-    )
-    usuarios_distintos = (
-        db.query(Movimiento.usuario)
-        .filter(Movimiento.negocio_id == negocio_id)
-        .distinct()
-        .order_by(Movimiento.usuario.asc())
-        .all()
-    )
-    tipos_distintos = (
-        db.query(Movimiento.tipo)
-        .filter(Movimiento.negocio_id == negocio_id)
-        .distinct()
-        .order_by(Movimiento.tipo.asc())
-        .all()
-    )
-
-    productos_list = [r[0] for r in productos_distintos if r[0]]
-    usuarios_list = [r[0] for r in usuarios_distintos if r[0]]
-    tipos_list = [r[0] for r in tipos_distintos if r[0]]
+    def _url(**cursor: str) -> str:
+        return "/movimientos?" + urlencode({**base_qs, **cursor})
 
     return templates.TemplateResponse(
         "movimientos.html",
         {
             "request": request,
             "user": user,
-            "movimientos": movimientos,
-            "productos_list": productos_list,
-            "usuarios_list": usuarios_list,
-            "tipos_list": tipos_list,
-            "f_desde": fecha_desde_str,
-            "f_hasta": fecha_hasta_str,
-            "f_tipo": tipo_filtro,
-            "f_producto": producto_filtro,
-            "f_usuario": usuario_filtro,
-            "total_movimientos": total_movimientos,
-            "total_entradas": total_entradas,
-            "total_salidas": total_salidas,
-            "total_ajustes": total_ajustes,
+            "movimientos": pagina.items,
+            "productos_list": facetas["productos"],
+            "usuarios_list": facetas["usuarios"],
+            "tipos_list": facetas["tipos"],
+            "f_desde": filtros.desde,
+            "f_hasta": filtros.hasta,
+            "f_tipo": filtros.tipo,
+            "f_producto": filtros.producto,
+            "f_usuario": filtros.usuario,
+            "total_movimientos": kpis["total"],
+            "total_entradas": kpis["entradas"],
+            "total_salidas": kpis["salidas"],
+            "total_ajustes": kpis["ajustes"],
+            "por_pagina": MOVIMIENTOS_POR_PAGINA,
+            "url_primera": _url() if pagina.cursor_anterior else None,
+            "url_anterior": _url(antes=pagina.cursor_anterior) if pagina.cursor_anterior else None,
+            "url_siguiente": _url(despues=pagina.cursor_siguiente) if pagina.cursor_siguiente else None,
         },
     )
 
@@ -191,24 +147,13 @@ def _get_stock_actual(
     negocio_id: int,
     producto: str,
     zona_str: str,
-) -> int:
+) -> float:
     """
-    Calcula el stock actual de un producto en una zona (slot.codigo_full)
-    a partir de la tabla de movimientos.
+    Stock actual de un producto en una zona (slot.codigo_full) desde stock_saldos.
+    Bloquea la fila del saldo (Postgres) para que validar + descontar ocurra
+    en la misma transacción.
     """
-    movimientos = (
-        db.query(Movimiento)
-        .filter(
-            Movimiento.negocio_id == negocio_id,
-            func.lower(Movimiento.producto) == producto.lower(),
-            Movimiento.zona == zona_str,
-        )
-        .all()
-    )
-
-    entradas = sum((m.cantidad or 0) for m in movimientos if m.tipo == "entrada")
-    salidas = sum((m.cantidad or 0) for m in movimientos if m.tipo == "salida")
-    return entradas - salidas
+    return get_stock_slot(db, negocio_id, producto, zona_str, for_update=True)
 
 
 def _obtener_producto_negocio(
@@ -217,22 +162,10 @@ def _obtener_producto_negocio(
     nombre_producto: str,
 ):
     """
-    Busca el producto por nombre (case-insensitive) dentro del negocio.
-    Devuelve el objeto Producto o None.
+    Busca el producto activo por nombre (case-insensitive) dentro del negocio.
+    Devuelve ProductoCatalogo (catálogo en memoria) o None.
     """
-    nombre_norm = (nombre_producto or "").strip().lower()
-    if not nombre_norm:
-        return None
-
-    return (
-        db.query(Producto)
-        .filter(
-            Producto.negocio_id == negocio_id,
-            Producto.activo == 1,
-            func.lower(Producto.nombre) == nombre_norm,
-        )
-        .first()
-    )
+    return buscar_producto_por_nombre(db, negocio_id, nombre_producto)
 
 
 def _buscar_producto_por_codigo(
@@ -242,21 +175,9 @@ def _buscar_producto_por_codigo(
 ):
     """
     Busca un producto activo del negocio por SKU o EAN (match exacto).
-    Devuelve Producto o None.
+    Devuelve ProductoCatalogo (catálogo en memoria) o None.
     """
-    codigo_norm = (codigo or "").strip()
-    if not codigo_norm:
-        return None
-
-    return (
-        db.query(Producto)
-        .filter(
-            Producto.negocio_id == negocio_id,
-            Producto.activo == 1,
-            (Producto.sku == codigo_norm) | (Producto.ean13 == codigo_norm),
-        )
-        .first()
-    )
+    return buscar_producto_por_codigo(db, negocio_id, codigo)
 
 
 # ============================
@@ -264,7 +185,7 @@ def _buscar_producto_por_codigo(
 # ============================
 
 @router.get("/movimientos/salida", response_class=HTMLResponse)
-async def salida_form(
+def salida_form(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "operador")),
@@ -312,7 +233,7 @@ async def salida_form(
 
 
 @router.post("/movimientos/salida", response_class=HTMLResponse)
-async def salida_submit(
+def salida_submit(
     request: Request,
     producto: str = Form(""),
     codigo: str = Form(""),
@@ -490,12 +411,14 @@ async def salida_submit(
         producto=producto_nombre,
         cantidad=cantidad,
         zona=zona_str,
+        producto_id=producto_obj.id,
+        slot_id=slot.id,
         fecha=datetime.utcnow(),
         motivo_salida=motivo_salida or None,
         codigo_producto=codigo or None,
     )
 
-    db.add(movimiento)
+    registrar_movimiento(db, movimiento)
     db.commit()
     db.refresh(movimiento)
 
@@ -521,6 +444,7 @@ async def salida_submit(
         producto_nombre=producto_nombre,
         origen="salida",
         motivo=(motivo_salida or None),
+        producto_id=producto_obj.id,
     )
 
     print(
@@ -543,7 +467,7 @@ async def salida_submit(
 # ============================
 
 @router.get("/movimientos/entrada", response_class=HTMLResponse)
-async def entrada_form(
+def entrada_form(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "operador")),
@@ -592,7 +516,7 @@ async def entrada_form(
 
 
 @router.post("/movimientos/entrada", response_class=HTMLResponse)
-async def entrada_submit(
+def entrada_submit(
     request: Request,
     producto: str = Form(...),
     codigo: str = Form(""),
@@ -762,12 +686,14 @@ async def entrada_submit(
         producto=producto_nombre,
         cantidad=cantidad,
         zona=zona_str,
+        producto_id=producto_obj.id,
+        slot_id=slot.id,
         fecha=datetime.utcnow(),
         fecha_vencimiento=fv_date,
         codigo_producto=codigo or None,
     )
 
-    db.add(movimiento)
+    registrar_movimiento(db, movimiento)
     db.commit()
     db.refresh(movimiento)
 
@@ -791,6 +717,7 @@ async def entrada_submit(
         producto_nombre=producto_nombre,
         origen="entrada",
         motivo=None,
+        producto_id=producto_obj.id,
     )
 
     evaluar_alertas_vencimiento(
@@ -816,12 +743,87 @@ async def entrada_submit(
     return RedirectResponse(url="/dashboard", status_code=302)
 
 
+# ============================
+#     IMPORTACIÓN MASIVA (CSV / XLSX)
+# ============================
+
+@router.get("/movimientos/importar", response_class=HTMLResponse)
+def importar_form(
+    request: Request,
+    user: dict = Depends(require_roles_dep("admin")),
+):
+    """
+    Formulario de importación masiva de entradas (saldos de apertura).
+    Solo accesible para rol admin.
+    """
+    return templates.TemplateResponse(
+        "importar_movimientos.html",
+        {
+            "request": request,
+            "user": user,
+            "columnas": PLANTILLA_HEADERS,
+            "error": None,
+            "resultado": None,
+        },
+    )
+
+
+@router.get("/movimientos/importar/plantilla.csv")
+def importar_plantilla(
+    user: dict = Depends(require_roles_dep("admin")),
+):
+    return Response(
+        content=plantilla_csv(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="plantilla_entradas.csv"'},
+    )
+
+
+@router.post("/movimientos/importar", response_class=HTMLResponse)
+def importar_submit(
+    request: Request,
+    archivo: UploadFile = File(...),
+    omitir_invalidas: bool = Form(False),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin")),
+):
+    """
+    Importa entradas desde CSV / XLSX (lectura en streaming, inserción por
+    lotes, una transacción). Con filas inválidas no se importa nada salvo
+    que se marque omitir_invalidas.
+    """
+    error = None
+    resultado = None
+    try:
+        resultado = importar_movimientos(
+            db,
+            user=user,
+            archivo=archivo.file,
+            filename=archivo.filename or "",
+            omitir_invalidas=omitir_invalidas,
+        )
+    except ValueError as e:
+        error = str(e)
+
+    return templates.TemplateResponse(
+        "importar_movimientos.html",
+        {
+            "request": request,
+            "user": user,
+            "columnas": PLANTILLA_HEADERS,
+            "error": error,
+            "resultado": resultado,
+        },
+        status_code=400 if error else 200,
+    )
+
+
 # ============================
 #     MOVIMIENTO DE TRANSFERENCIA
 # ============================
 
 @router.get("/transferencia", response_class=HTMLResponse)
-async def transferencia_form(
+def transferencia_form(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "operador")),
@@ -867,7 +869,7 @@ async def transferencia_form(
 
 
 @router.post("/transferencia", response_class=HTMLResponse)
-async def transferencia_submit(
+def transferencia_submit(
     request: Request,
     producto: str = Form(...),
     cantidad: int = Form(...),
@@ -1083,6 +1085,8 @@ async def transferencia_submit(
         producto=producto_nombre,
         cantidad=cantidad,
         zona=zona_origen_str,
+        producto_id=producto_obj.id,
+        slot_id=slot_origen.id,
         fecha=datetime.utcnow(),
         codigo_producto=codigo or None,
     )
@@ -1095,12 +1099,14 @@ async def transferencia_submit(
         producto=producto_nombre,
         cantidad=cantidad,
         zona=zona_destino_str,
+        producto_id=producto_obj.id,
+        slot_id=slot_destino.id,
         fecha=datetime.utcnow(),
         codigo_producto=codigo or None,
     )
 
-    db.add(mov_salida)
-    db.add(mov_entrada)
+    registrar_movimiento(db, mov_salida)
+    registrar_movimiento(db, mov_entrada)
     db.commit()
     db.refresh(mov_salida)
     db.refresh(mov_entrada)
@@ -1136,7 +1142,7 @@ async def transferencia_submit(
 # ============================
 
 @router.get("/movimientos/historial", response_class=HTMLResponse)
-async def movimientos_historial(
+def movimientos_historial(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "operador", "superadmin")),
@@ -9,7 +9,6 @@ from fastapi import (
     HTTPException,
 )
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
@@ -18,6 +17,9 @@ from core.models import Producto
 from core.security import require_roles_dep
 from modules.basic_wms.services.services_plan_limits import check_plan_limit
 from core.services.services_audit import audit, AuditAction
+from core.services.services_product_catalog import invalidar_catalogo_productos
+from core.services.services_search import filtro_texto
+from core.web import add_template_dir, templates
 
 
 # ============================
@@ -25,7 +27,7 @@ from core.services.services_audit import audit, AuditAction
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -43,7 +45,7 @@ router = APIRouter(
 # ============================
 
 @router.get("/productos", response_class=HTMLResponse)
-async def productos_list(
+def productos_list(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
@@ -52,21 +54,19 @@ async def productos_list(
     Lista los productos.
     - admin: ve productos de su negocio
     - superadmin: ve todos los productos
+    - ?q= : nombre / SKU / EAN contiene (índice de búsqueda)
     """
-    if user["rol"] == "superadmin":
-        productos = (
-            db.query(Producto)
-            .order_by(Producto.nombre.asc())
-            .all()
-        )
-    else:
-        negocio_id = user["negocio_id"]
-        productos = (
-            db.query(Producto)
-            .filter(Producto.negocio_id == negocio_id)
-            .order_by(Producto.nombre.asc())
-            .all()
-        )
+    q_texto = (request.query_params.get("q") or "").strip()
+
+    query = db.query(Producto)
+    if user["rol"] != "superadmin":
+        query = query.filter(Producto.negocio_id == user["negocio_id"])
+
+    filtro_q = filtro_texto("productos", q_texto)
+    if filtro_q is not None:
+        query = query.filter(filtro_q)
+
+    productos = query.order_by(Producto.nombre.asc()).all()
 
     return templates.TemplateResponse(
         "productos.html",
@@ -74,12 +74,13 @@ async def productos_list(
             "request": request,
             "user": user,
             "productos": productos,
+            "q": q_texto,
         },
     )
 
 
 @router.get("/productos/nuevo", response_class=HTMLResponse)
-async def producto_nuevo_form(
+def producto_nuevo_form(
     request: Request,
     user: dict = Depends(require_roles_dep("admin")),
 ):
@@ -106,7 +107,7 @@ async def producto_nuevo_form(
 
 
 @router.post("/productos/nuevo", response_class=HTMLResponse)
-async def producto_nuevo_submit(
+def producto_nuevo_submit(
     request: Request,
     nombre: str = Form(...),
     unidad: str = Form(...),
@@ -254,6 +255,7 @@ async def producto_nuevo_submit(
     db.add(producto)
     db.commit()
     db.refresh(producto)
+    invalidar_catalogo_productos(negocio_id)
 
     registrar_auditoria(
         db,
@@ -289,7 +291,7 @@ async def producto_nuevo_submit(
 
 
 @router.get("/productos/{producto_id}/editar", response_class=HTMLResponse)
-async def producto_editar_form(
+def producto_editar_form(
     producto_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -324,7 +326,7 @@ async def producto_editar_form(
 
 
 @router.post("/productos/{producto_id}/editar", response_class=HTMLResponse)
-async def producto_editar_submit(
+def producto_editar_submit(
     producto_id: int,
     request: Request,
     nombre: str = Form(...),
@@ -460,6 +462,7 @@ async def producto_editar_submit(
 
     db.commit()
     db.refresh(producto)
+    invalidar_catalogo_productos(producto.negocio_id)
 
     registrar_auditoria(
         db,
@@ -482,7 +485,7 @@ async def producto_editar_submit(
 
 
 @router.post("/productos/{producto_id}/toggle")
-async def producto_toggle(
+def producto_toggle(
     producto_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -509,6 +512,7 @@ async def producto_toggle(
     # Cambiar estado: 1 <-> 0
     producto.activo = 0 if producto.activo else 1
     db.commit()
+    invalidar_catalogo_productos(negocio_id)
 
     # Registrar auditoría
     registrar_auditoria(
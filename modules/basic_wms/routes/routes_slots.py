@@ -8,13 +8,13 @@ from fastapi import (
     Form,
 )
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from core.database import get_db
 from core.models import Slot, Ubicacion, Zona
 from core.security import require_roles_dep
+from core.web import add_template_dir, templates
 from modules.basic_wms.services.services_plan_limits import check_plan_limit
 
 
@@ -23,7 +23,7 @@ from modules.basic_wms.services.services_plan_limits import check_plan_limit
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -41,7 +41,7 @@ router = APIRouter(
 # ============================
 
 @router.get("/ubicaciones/{ubicacion_id}/slots", response_class=HTMLResponse)
-async def slots_list(
+def slots_list(
     ubicacion_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -95,7 +95,7 @@ async def slots_list(
 
 
 @router.get("/ubicaciones/{ubicacion_id}/slots/nuevo", response_class=HTMLResponse)
-async def slot_nuevo_form(
+def slot_nuevo_form(
     ubicacion_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -134,7 +134,7 @@ async def slot_nuevo_form(
 
 
 @router.post("/ubicaciones/{ubicacion_id}/slots/nuevo", response_class=HTMLResponse)
-async def slot_nuevo_submit(
+def slot_nuevo_submit(
     ubicacion_id: int,
     request: Request,
     codigo: str = Form(...),
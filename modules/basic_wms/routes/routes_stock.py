@@ -7,14 +7,20 @@ from fastapi import (
     Request,
     Depends,
 )
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, JSONResponse
 from sqlalchemy.orm import Session
 
 from core.database import get_db
-from core.models import Movimiento, Producto, Slot, Ubicacion, Zona
+from core.models import Producto, Slot, StockSaldo, Ubicacion, Zona
 from core.security import require_roles_dep
+from core.web import add_template_dir, templates
 from modules.basic_wms.services.services_stock import calcular_estado_stock, estado_css
+from modules.basic_wms.services.services_stock_saldos import (
+    get_vencimiento_min_por_slot,
+    producto_key,
+    reconstruir_stock_saldos,
+    verificar_stock_saldos,
+)
 
 
 # ============================
@@ -22,7 +28,7 @@ from modules.basic_wms.services.services_stock import calcular_estado_stock, est
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -40,16 +46,16 @@ router = APIRouter(
 # ============================
 
 @router.get("/stock", response_class=HTMLResponse)
-async def stock_view(
+def stock_view(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "operador")),
 ):
     """
     Vista de stock consolidado por producto y slot:
-    - Calcula stock por slot y por producto (entradas - salidas / ajustes).
+    - Lee stock por slot y por producto desde stock_saldos (materializado).
     - Evalúa estado por reglas de stock_min / stock_max.
-    - Evalúa estado de vencimiento por FEFO basado en movimientos.
+    - Evalúa estado de vencimiento por FEFO desde stock_lotes (persistido).
     - Aplica filtros por producto, zona, estado y vencimiento.
 
     Solo accesible para roles: admin y operador.
@@ -76,7 +82,7 @@ async def stock_view(
         .order_by(Producto.nombre.asc())
         .all()
     )
-    productos_by_name = {p.nombre.lower(): p for p in productos}
+    productos_by_name = {producto_key(p.nombre): p for p in productos}
 
     # NUEVO: productos que matchean el SKU/EAN ingresado
     codigo_match_nombres: set[str] = set()
@@ -88,99 +94,52 @@ async def stock_view(
                 codigo_match_nombres.add(p.nombre)
 
     # ============================
-    # 2) Movimientos con join Slot/Ubic/Zona (orden FEFO)
+    # 2) Saldos materializados (solo filas con stock) + Slot/Ubic/Zona
     # ============================
-    movimientos = (
-        db.query(Movimiento, Slot, Ubicacion, Zona)
-        .outerjoin(Slot, Movimiento.zona == Slot.codigo_full)
+    saldos = (
+        db.query(StockSaldo, Slot, Ubicacion, Zona)
+        .outerjoin(Slot, StockSaldo.slot_id == Slot.id)
         .outerjoin(Ubicacion, Slot.ubicacion_id == Ubicacion.id)
         .outerjoin(Zona, Ubicacion.zona_id == Zona.id)
-        .filter(Movimiento.negocio_id == negocio_id)
-        .order_by(Movimiento.fecha.asc(), Movimiento.id.asc())
+        .filter(
+            StockSaldo.negocio_id == negocio_id,
+            StockSaldo.cantidad != 0,
+        )
         .all()
     )
 
-    totales_producto: dict[str, int] = {}      # prod_key -> qty total
+    totales_producto: dict[str, float] = {}      # prod_key -> qty total
     stock_por_slot: dict[tuple[str, str], dict] = {}
-    lotes_por_slot: dict[tuple[str, str], list] = {}
 
-    for mov, slot, ubic, zona in movimientos:
-        prod_name = mov.producto
-        if not prod_name:
-            continue
+    for saldo, slot, ubic, zona in saldos:
+        slot_key = (saldo.producto_key, saldo.zona)
 
-        prod_key = prod_name.lower()
-        zona_str = mov.zona  # código full del slot
-
-        qty = mov.cantidad or 0
-        # salidas/ajustes negativos restan, el resto suma
-        if mov.tipo == "salida" or (mov.tipo == "ajuste" and qty < 0):
-            signed_delta = -abs(qty)
-        else:
-            signed_delta = abs(qty)
-
-        # Totales por producto (nivel global)
-        totales_producto[prod_key] = totales_producto.get(prod_key, 0) + signed_delta
-
-        # Stock por slot
-        slot_key = (prod_name, zona_str)
-        if slot_key not in stock_por_slot:
-            stock_por_slot[slot_key] = {
-                "producto": prod_name,
-                "zona_str": zona_str,
-                "cantidad": 0,
-                "slot": slot,
-                "ubic": ubic,
-                "zona": zona,
-            }
+        stock_por_slot[slot_key] = {
+            "producto": saldo.producto,
+            "zona_str": saldo.zona,
+            "cantidad": saldo.cantidad,
+            "slot": slot,
+            "ubic": ubic,
+            "zona": zona,
+        }
+        totales_producto[saldo.producto_key] = (
+            totales_producto.get(saldo.producto_key, 0) + saldo.cantidad
+        )
 
-        info = stock_por_slot[slot_key]
-        info["cantidad"] += signed_delta
-
-        # aseguramos tener las referencias más recientes
-        if slot is not None:
-            info["slot"] = slot
-        if ubic is not None:
-            info["ubic"] = ubic
-        if zona is not None:
-            info["zona"] = zona
-
-        # Lotes por vencimiento (FEFO simplificado)
-        lotes = lotes_por_slot.setdefault(slot_key, [])
-        if signed_delta > 0:
-            fv = mov.fecha_vencimiento
-            lotes.append({"fv": fv, "qty": signed_delta})
-        elif signed_delta < 0:
-            # consumir lotes (FEFO)
-            qty_to_remove = -signed_delta
-            lotes.sort(
-                key=lambda l: (
-                    l["fv"] is None,
-                    l["fv"] or date(9999, 12, 31),
-                )
-            )
-            for lote in lotes:
-                if qty_to_remove <= 0:
-                    break
-                disp = lote["qty"]
-                if disp <= 0:
-                    continue
-                usar = min(disp, qty_to_remove)
-                lote["qty"] -= usar
-                qty_to_remove -= usar
-            lotes[:] = [l for l in lotes if l["qty"] > 0]
+    # Vencimiento más próximo por slot desde lotes FEFO persistidos
+    venc_min_por_slot = get_vencimiento_min_por_slot(db, negocio_id)
 
     # ============================
     # 3) Construir filas base (todas)
     # ============================
     filas_all: list[dict] = []
 
-    for (producto_nombre, zona_str), info in stock_por_slot.items():
+    for (prod_key, zona_str), info in stock_por_slot.items():
+        producto_nombre = info["producto"]
         cantidad_slot = info["cantidad"]
         if cantidad_slot == 0:
             continue
 
-        prod_key = producto_nombre.lower()
         prod = productos_by_name.get(prod_key)
 
         stock_total = totales_producto.get(prod_key, 0)
@@ -203,12 +162,7 @@ async def stock_view(
             ocupacion_pct = round(cantidad_slot * 100 / capacidad, 1)
 
         # Estado de vencimiento según lotes restantes
-        lotes = lotes_por_slot.get((producto_nombre, zona_str), [])
-        fv_min = None
-        for l in lotes:
-            if l["fv"] is not None:
-                if fv_min is None or l["fv"] < fv_min:
-                    fv_min = l["fv"]
+        fv_min = venc_min_por_slot.get((prod_key, zona_str))
 
         venc_estado = "Sin fecha"
         venc_css = "bg-slate-100 text-slate-700 border border-slate-200"
@@ -264,7 +218,7 @@ async def stock_view(
 
     # Productos sin stock pero con reglas configuradas
     for p in productos:
-        key = p.nombre.lower()
+        key = producto_key(p.nombre)
         if totales_producto.get(key, 0) == 0:
             stock_min = p.stock_min
             stock_max = p.stock_max
@@ -381,3 +335,32 @@ async def stock_view(
             "f_codigo": f_codigo,
         },
     )
+
+
+# ============================
+#   STOCK SALDOS (REBUILD / VERIFY)
+# ============================
+
+@router.get("/stock/saldos/verificar")
+def stock_saldos_verificar(
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin")),
+):
+    """
+    Compara stock_saldos del negocio contra el replay del ledger (solo lectura).
+    """
+    return verificar_stock_saldos(db, user["negocio_id"])
+
+
+@router.post("/stock/saldos/reconstruir")
+def stock_saldos_reconstruir(
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_roles_dep("admin")),
+):
+    """
+    Reconstruye stock_saldos del negocio desde movimientos (idempotente).
+    """
+    res = reconstruir_stock_saldos(db, user["negocio_id"], commit=True)
+    if not res.get("ok"):
+        return JSONResponse(status_code=500, content=res)
+    return res
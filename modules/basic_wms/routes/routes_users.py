@@ -8,12 +8,12 @@ from fastapi import (
     Form,
 )
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 
 from core.database import get_db
 from core.models import Usuario
 from core.security import require_roles_dep, hash_password
+from core.web import add_template_dir, templates
 from modules.basic_wms.services.services_plan_limits import check_plan_limit
 
 
@@ -22,7 +22,7 @@ from modules.basic_wms.services.services_plan_limits import check_plan_limit
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -40,7 +40,7 @@ router = APIRouter(
 # ============================
 
 @router.get("/usuarios", response_class=HTMLResponse)
-async def listar_usuarios(
+def listar_usuarios(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
@@ -75,7 +75,7 @@ async def listar_usuarios(
 
 
 @router.get("/usuarios/nuevo", response_class=HTMLResponse)
-async def nuevo_usuario_get(
+def nuevo_usuario_get(
     request: Request,
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
 ):
@@ -96,7 +96,7 @@ async def nuevo_usuario_get(
 
 
 @router.post("/usuarios/nuevo", response_class=HTMLResponse)
-async def nuevo_usuario_post(
+def nuevo_usuario_post(
     request: Request,
     nombre: str = Form(""),
     email: str = Form(...),
@@ -8,13 +8,13 @@ from fastapi import (
     Form,
 )
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from core.database import get_db
 from core.models import Zona
 from core.security import require_roles_dep
+from core.web import add_template_dir, templates
 from modules.basic_wms.services.services_plan_limits import check_plan_limit
 
 
@@ -23,7 +23,7 @@ from modules.basic_wms.services.services_plan_limits import check_plan_limit
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+add_template_dir(BASE_DIR / "templates")  # Environment compartido (core.web)
 
 
 # ============================
@@ -41,7 +41,7 @@ router = APIRouter(
 # ============================
 
 @router.get("/zonas", response_class=HTMLResponse)
-async def zonas_list(
+def zonas_list(
     request: Request,
     db: Session = Depends(get_db),
     user: dict = Depends(require_roles_dep("admin", "superadmin")),
@@ -77,7 +77,7 @@ async def zonas_list(
 
 
 @router.get("/zonas/nueva", response_class=HTMLResponse)
-async def zona_nueva_form(
+def zona_nueva_form(
     request: Request,
     user: dict = Depends(require_roles_dep("admin")),
 ):
@@ -98,7 +98,7 @@ async def zona_nueva_form(
 
 
 @router.post("/zonas/nueva", response_class=HTMLResponse)
-async def zona_nueva_submit(
+def zona_nueva_submit(
     request: Request,
     nombre: str = Form(...),
     sigla: str = Form(""),
@@ -1,13 +1,46 @@
 ﻿# services_alerts.py
+"""
+Alertas internas de stock / vencimiento – ORBION WMS
+
+✔ Evaluación asíncrona: los writers (entrada / salida / importación / conteo)
+  solo encolan (negocio, producto); el request no paga la evaluación
+✔ Coalesce en memoria: eventos repetidos del mismo (negocio, producto)
+  dentro de ALERTS_COALESCE_SECONDS se evalúan una sola vez
+✔ Evaluación por lotes contra stock materializado (stock_saldos / stock_lotes):
+  un agregado por negocio, sin releer el historial de movimientos
+✔ Dedupe 24h en un solo SELECT y alertas escritas con un INSERT executemany
+  + un commit por lote
+✔ Sin worker (scripts, ALERTS_ASYNC_ENABLED=False) se evalúa en línea con
+  el mismo camino por lotes
+
+Notas:
+- Con varios procesos cada uno coalesce sus propios eventos; el dedupe de 24h
+  en BD evita alertas duplicadas entre procesos.
+- Los eventos pendientes se evalúan en el shutdown (stop_alert_worker).
+"""
+
 from __future__ import annotations
 
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, date, timedelta
 import json
+from typing import Optional
 
-from sqlalchemy import func
+from sqlalchemy import func, or_, tuple_
 from sqlalchemy.orm import Session
 
-from core.models import Negocio, Producto, Movimiento, Alerta
+from core.config import settings
+from core.database import SessionLocal
+from core.logging_config import logger
+from core.models import Alerta, StockLote, StockSaldo
+from core.services.services_product_catalog import ProductoCatalogo, get_catalogo_productos
+from modules.basic_wms.services.services_stock_saldos import producto_key
+
+
+# Días antes del vencimiento desde los que se alerta "proximo_vencer"
+DIAS_PROXIMO_VENCER = 7
 
 
 def crear_alerta_interna(
@@ -67,189 +100,459 @@ def crear_alerta_interna(
     return alerta
 
 
-def evaluar_alertas_stock(
-    db: Session,
-    user: dict,
-    producto_nombre: str,
-    origen: str,
-    motivo: str | None = None,
-) -> None:
+def crear_alertas_lote(db: Session, alertas: list[dict]) -> int:
     """
-    Evalúa si el producto está en stock crítico o sobre-stock
-    y genera alertas internas en base a stock_min / stock_max.
+    Inserta varias alertas con el mismo dedupe de crear_alerta_interna
+    (negocio, tipo, mensaje en 24h) resuelto en un SELECT, y un INSERT
+    executemany. No hace commit. Retorna cuántas se insertaron.
 
-    Se llama después de entradas/salidas/ajustes.
+    alertas: [{"negocio_id", "tipo", "mensaje", "origen", "destino", "datos"}, ...]
     """
-    negocio_id = user["negocio_id"]
+    if not alertas:
+        return 0
 
-    negocio = db.query(Negocio).filter(Negocio.id == negocio_id).first()
-    if not negocio:
-        return
+    ahora = datetime.utcnow()
+    hace_24h = ahora - timedelta(hours=24)
 
-    # Producto del negocio por negocio_id
-    producto = (
-        db.query(Producto)
+    claves = {(a["negocio_id"], a["tipo"], a["mensaje"]) for a in alertas}
+    existentes = set(
+        db.query(Alerta.negocio_id, Alerta.tipo, Alerta.mensaje)
         .filter(
-            Producto.negocio_id == negocio_id,
-            func.lower(Producto.nombre) == producto_nombre.lower(),
+            Alerta.negocio_id.in_(sorted({c[0] for c in claves})),
+            Alerta.tipo.in_(sorted({c[1] for c in claves})),
+            Alerta.fecha_creacion >= hace_24h,
+            tuple_(Alerta.negocio_id, Alerta.tipo, Alerta.mensaje).in_(sorted(claves)),
         )
-        .first()
+        .all()
     )
-    if not producto:
-        return
-
-    # Si no tiene reglas, no genera alertas
-    if producto.stock_min is None and producto.stock_max is None:
-        return
 
-    # Calcular stock total del producto en el negocio (entradas - salidas/ajustes negativos)
-    movimientos = (
-        db.query(Movimiento)
-        .filter(
-            Movimiento.negocio_id == negocio_id,
-            func.lower(Movimiento.producto) == producto_nombre.lower(),
+    rows = []
+    for a in alertas:
+        clave = (a["negocio_id"], a["tipo"], a["mensaje"])
+        if clave in existentes:
+            continue
+        existentes.add(clave)  # dedupe también dentro del lote
+        rows.append(
+            {
+                "negocio_id": a["negocio_id"],
+                "tipo": a["tipo"],
+                "mensaje": a["mensaje"],
+                "destino": a.get("destino"),
+                "estado": "pendiente",  # flujo interno: pendiente → leida / enviada
+                "fecha_creacion": ahora,
+                "fecha_envio": None,
+                "origen": a.get("origen"),
+                "datos_json": json.dumps(a["datos"], ensure_ascii=False) if a.get("datos") else None,
+            }
         )
-        .all()
-    )
 
-    stock_total = 0
-    for m in movimientos:
-        qty = m.cantidad or 0
-        if m.tipo == "salida" or (m.tipo == "ajuste" and qty < 0):
-            stock_total -= abs(qty)
-        else:
-            stock_total += abs(qty)
+    if rows:
+        db.execute(Alerta.__table__.insert(), rows)
+    return len(rows)
 
-    destino = motivo
 
-    # Debug opcional:
-    # print(
-    #     f"[ALERTAS_STOCK] producto='{producto.nombre}' "
-    #     f"negocio_id={negocio_id} stock_total={stock_total} "
-    #     f"min={producto.stock_min} max={producto.stock_max}"
-    # )
+# =========================================================
+# EVALUACIÓN POR LOTES (STOCK MATERIALIZADO)
+# =========================================================
+
+@dataclass
+class EventoAlerta:
+    """Evaluación pendiente de un (negocio, producto), ya coalescida."""
+    negocio_id: int
+    producto_key: str
+    producto_nombre: str
+    producto_id: Optional[int] = None
+    origen: str = "sistema"
+    motivo: Optional[str] = None
+    stock: bool = False
+    vencimiento: bool = False
+    eventos: int = 1
+    desde: float = 0.0  # monotonic del primer evento
+
+
+def _alertas_stock(producto: ProductoCatalogo, stock_total: float, ev: EventoAlerta) -> list[dict]:
+    """stock_min / stock_max (mismos mensajes que la evaluación en línea histórica)."""
+    out = []
+    destino = ev.motivo
 
     # 🔴 Alerta por stock mínimo
     if producto.stock_min is not None and stock_total < producto.stock_min:
-        mensaje = (
-            f"Stock CRÍTICO de '{producto.nombre}': {stock_total} unidades "
-            f"(mínimo configurado: {producto.stock_min})."
-        )
-        crear_alerta_interna(
-            db=db,
-            negocio_id=negocio_id,
-            tipo="stock_min",
-            mensaje=mensaje,
-            origen=origen,
-            destino=destino,
-            datos={
+        out.append({
+            "negocio_id": ev.negocio_id,
+            "tipo": "stock_min",
+            "mensaje": (
+                f"Stock CRÍTICO de '{producto.nombre}': {stock_total} unidades "
+                f"(mínimo configurado: {producto.stock_min})."
+            ),
+            "origen": ev.origen,
+            "destino": destino,
+            "datos": {
                 "producto": producto.nombre,
                 "stock_total": stock_total,
                 "stock_min": producto.stock_min,
-                "motivo": motivo,
+                "motivo": ev.motivo,
             },
-        )
+        })
 
     # 🟠 Alerta por sobre-stock
     if producto.stock_max is not None and stock_total > producto.stock_max:
-        mensaje = (
-            f"SOBRE-STOCK de '{producto.nombre}': {stock_total} unidades "
-            f"(máximo configurado: {producto.stock_max})."
-        )
-        crear_alerta_interna(
-            db=db,
-            negocio_id=negocio_id,
-            tipo="stock_max",
-            mensaje=mensaje,
-            origen=origen,
-            destino=destino,
-            datos={
+        out.append({
+            "negocio_id": ev.negocio_id,
+            "tipo": "stock_max",
+            "mensaje": (
+                f"SOBRE-STOCK de '{producto.nombre}': {stock_total} unidades "
+                f"(máximo configurado: {producto.stock_max})."
+            ),
+            "origen": ev.origen,
+            "destino": destino,
+            "datos": {
                 "producto": producto.nombre,
                 "stock_total": stock_total,
                 "stock_max": producto.stock_max,
-                "motivo": motivo,
+                "motivo": ev.motivo,
             },
+        })
+
+    return out
+
+
+def _alertas_vencimiento(nombre: str, fv: date, hoy: date, ev: EventoAlerta) -> Optional[dict]:
+    dias = (fv - hoy).days  # días restantes
+
+    # 🔴 Producto ya vencido
+    if dias < 0:
+        tipo = "vencido"
+        mensaje = (
+            f"ALERTA: El producto '{nombre}' está VENCIDO "
+            f"(fecha: {fv.strftime('%d-%m-%Y')})."
+        )
+    # 🟠 Próximo a vencer (dentro de 7 días)
+    elif dias <= DIAS_PROXIMO_VENCER:
+        tipo = "proximo_vencer"
+        mensaje = (
+            f"Advertencia: El producto '{nombre}' vencerá en {dias} días "
+            f"(fecha: {fv.strftime('%d-%m-%Y')})."
         )
+    else:
+        return None
+
+    return {
+        "negocio_id": ev.negocio_id,
+        "tipo": tipo,
+        "mensaje": mensaje,
+        "origen": ev.origen,
+        "destino": "vencimiento",
+        "datos": {
+            "producto": nombre,
+            "fecha_vencimiento": fv.isoformat(),
+            "dias_restantes": dias,
+        },
+    }
+
+
+def _evaluar_negocio(db: Session, negocio_id: int, eventos: list[EventoAlerta]) -> list[dict]:
+    """Alertas candidatas de un negocio: 1 agregado de saldos + 1 de lotes."""
+    catalogo = get_catalogo_productos(db, negocio_id)
+    alertas: list[dict] = []
+
+    # --- Stock (stock_min / stock_max) ---------------------------------
+    con_reglas: list[tuple[EventoAlerta, ProductoCatalogo]] = []
+    for ev in eventos:
+        if not ev.stock:
+            continue
+        if ev.producto_id is not None:
+            producto = catalogo.por_id.get(int(ev.producto_id))
+        else:
+            producto = catalogo.por_nombre.get(ev.producto_key)
+        # Si no tiene reglas, no genera alertas
+        if producto and (producto.stock_min is not None or producto.stock_max is not None):
+            con_reglas.append((ev, producto))
+
+    if con_reglas:
+        # Con producto_id se suma por FK (incluye saldos bajo nombres anteriores)
+        # + saldos sin FK bajo el nombre actual (ledger que el backfill no resolvió)
+        ids = sorted({p.id for ev, p in con_reglas if ev.producto_id is not None})
+        keys = sorted(
+            {ev.producto_key for ev, _p in con_reglas if ev.producto_id is None}
+            | {producto_key(p.nombre) for ev, p in con_reglas if ev.producto_id is not None}
+        )
+        ids_set = set(ids)
+        por_id: dict[int, float] = {}
+        por_key: dict[str, float] = {}
+        por_key_sin_fk: dict[str, float] = {}
+        for pid, k, total in (
+            db.query(StockSaldo.producto_id, StockSaldo.producto_key, func.sum(StockSaldo.cantidad))
+            .filter(
+                StockSaldo.negocio_id == negocio_id,
+                or_(StockSaldo.producto_id.in_(ids), StockSaldo.producto_key.in_(keys)),
+            )
+            .group_by(StockSaldo.producto_id, StockSaldo.producto_key)
+            .all()
+        ):
+            total = float(total or 0.0)
+            if pid is not None and int(pid) in ids_set:
+                por_id[int(pid)] = por_id.get(int(pid), 0.0) + total
+            if k in keys:
+                por_key[k] = por_key.get(k, 0.0) + total
+                if pid is None:
+                    por_key_sin_fk[k] = por_key_sin_fk.get(k, 0.0) + total
+
+        for ev, producto in con_reglas:
+            if ev.producto_id is not None:
+                stock_total = por_id.get(producto.id, 0.0) + por_key_sin_fk.get(producto_key(producto.nombre), 0.0)
+            else:
+                stock_total = por_key.get(ev.producto_key, 0.0)
+            alertas.extend(_alertas_stock(producto, stock_total, ev))
+
+    # --- Vencimiento (lotes FEFO con stock vivo) -----------------------
+    por_key_ev = {ev.producto_key: ev for ev in eventos if ev.vencimiento}
+    if por_key_ev:
+        hoy = date.today()
+        lotes = (
+            db.query(
+                StockLote.producto_key,
+                func.min(StockLote.producto),
+                StockLote.fecha_vencimiento,
+            )
+            .filter(
+                StockLote.negocio_id == negocio_id,
+                StockLote.producto_key.in_(sorted(por_key_ev)),
+                StockLote.fecha_vencimiento.isnot(None),
+                StockLote.fecha_vencimiento <= hoy + timedelta(days=DIAS_PROXIMO_VENCER),
+                StockLote.cantidad_restante > 0,
+            )
+            .group_by(StockLote.producto_key, StockLote.fecha_vencimiento)
+            .all()
+        )
+        for key, nombre, fv in lotes:
+            if not fv:
+                continue
+            alerta = _alertas_vencimiento(nombre, fv, hoy, por_key_ev[key])
+            if alerta:
+                alertas.append(alerta)
 
+    return alertas
 
-def evaluar_alertas_vencimiento(
+
+def evaluar_eventos_alertas(db: Session, eventos: list[EventoAlerta]) -> int:
+    """
+    Evalúa un lote de eventos coalescidos y escribe las alertas (un commit).
+    Retorna cuántas alertas nuevas se crearon.
+    """
+    por_negocio: dict[int, list[EventoAlerta]] = {}
+    for ev in eventos:
+        por_negocio.setdefault(ev.negocio_id, []).append(ev)
+
+    candidatas: list[dict] = []
+    for negocio_id, evs in por_negocio.items():
+        candidatas.extend(_evaluar_negocio(db, negocio_id, evs))
+
+    creadas = crear_alertas_lote(db, candidatas)
+    db.commit()
+    return creadas
+
+
+# =========================================================
+# COLA EN MEMORIA (COALESCE POR NEGOCIO + PRODUCTO)
+# =========================================================
+
+_lock = threading.Lock()
+_pendientes: dict[tuple[int, str], EventoAlerta] = {}
+
+_worker_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+
+_stats = {"eventos": 0, "evaluados": 0, "alertas": 0, "lotes": 0}
+
+
+def _encolar(
+    negocio_id: int,
+    producto_nombre: str,
+    *,
+    producto_id: Optional[int],
+    origen: str,
+    motivo: Optional[str],
+    stock: bool,
+    vencimiento: bool,
+) -> None:
+    key = producto_key(producto_nombre)
+    if not negocio_id or not key:
+        return
+
+    ev_nuevo = EventoAlerta(
+        negocio_id=int(negocio_id),
+        producto_key=key,
+        producto_nombre=producto_nombre,
+        producto_id=int(producto_id) if producto_id is not None else None,
+        origen=origen,
+        motivo=motivo,
+        stock=stock,
+        vencimiento=vencimiento,
+        desde=time.monotonic(),
+    )
+
+    if not _worker_activo():
+        # Sin worker: evaluación en línea (mismo camino por lotes, sesión propia)
+        _evaluar([ev_nuevo])
+        return
+
+    with _lock:
+        _stats["eventos"] += 1
+        ev = _pendientes.get((ev_nuevo.negocio_id, key))
+        if ev is None:
+            _pendientes[(ev_nuevo.negocio_id, key)] = ev_nuevo
+            return
+        # Coalesce: gana el contexto más reciente; los tipos se acumulan
+        ev.eventos += 1
+        ev.origen = origen
+        ev.motivo = motivo
+        ev.stock = ev.stock or stock
+        ev.vencimiento = ev.vencimiento or vencimiento
+        ev.producto_nombre = producto_nombre
+        if ev_nuevo.producto_id is not None:
+            ev.producto_id = ev_nuevo.producto_id
+
+
+def evaluar_alertas_stock(
     db: Session,
     user: dict,
     producto_nombre: str,
     origen: str,
+    motivo: str | None = None,
+    producto_id: int | None = None,
 ) -> None:
     """
-    Genera alertas internas cuando un producto está vencido o próximo a vencer.
-    Se basa en las fechas de vencimiento registradas en las ENTRADAS.
+    Encola la evaluación de stock crítico / sobre-stock (stock_min / stock_max)
+    del producto. Se llama después del commit de entradas/salidas/ajustes.
+    Con producto_id, producto y stock se resuelven por FK.
     """
-    negocio_id = user["negocio_id"]
+    _encolar(
+        user["negocio_id"],
+        producto_nombre,
+        producto_id=producto_id,
+        origen=origen,
+        motivo=motivo,
+        stock=True,
+        vencimiento=False,
+    )
 
-    negocio = db.query(Negocio).filter(Negocio.id == negocio_id).first()
-    if not negocio:
-        return
 
-    # Filtrar ENTRADAS del producto con fecha de vencimiento válida
-    entradas = (
-        db.query(Movimiento)
-        .filter(
-            Movimiento.negocio_id == negocio_id,
-            Movimiento.tipo == "entrada",
-            func.lower(Movimiento.producto) == producto_nombre.lower(),
-            Movimiento.fecha_vencimiento.isnot(None),
-        )
-        .all()
+def evaluar_alertas_vencimiento(
+    db: Session,
+    user: dict,
+    producto_nombre: str,
+    origen: str,
+) -> None:
+    """
+    Encola la evaluación de vencidos / próximos a vencer del producto.
+    Se basa en los lotes FEFO con stock vivo (stock_lotes): lotes ya consumidos
+    por salidas no generan alertas.
+    """
+    _encolar(
+        user["negocio_id"],
+        producto_nombre,
+        producto_id=None,
+        origen=origen,
+        motivo=None,
+        stock=False,
+        vencimiento=True,
     )
 
-    if not entradas:
-        return
 
-    hoy = date.today()
-    destino = "vencimiento"
+def _evaluar(eventos: list[EventoAlerta]) -> int:
+    db = SessionLocal()
+    try:
+        creadas = evaluar_eventos_alertas(db, eventos)
+        with _lock:
+            _stats["evaluados"] += len(eventos)
+            _stats["alertas"] += creadas
+            _stats["lotes"] += 1
+        return creadas
+    except Exception:
+        db.rollback()
+        logger.exception("[ALERTAS] evaluación por lote falló eventos=%s", len(eventos))
+        return 0
+    finally:
+        db.close()
+
+
+def procesar_alertas_pendientes(*, forzar: bool = False) -> int:
+    """
+    Evalúa los (negocio, producto) cuya ventana de coalesce ya venció
+    (todos con forzar=True), en lotes de ALERTS_BATCH_MAX.
+    Retorna cuántos eventos coalescidos se evaluaron.
+    """
+    ventana = float(settings.ALERTS_COALESCE_SECONDS)
+    maximo = max(int(settings.ALERTS_BATCH_MAX), 1)
+    total = 0
 
-    for e in entradas:
-        fv = e.fecha_vencimiento
-        if not fv:
-            continue
+    while True:
+        limite = time.monotonic() - ventana
+        with _lock:
+            listos = [
+                k for k, ev in _pendientes.items()
+                if forzar or ev.desde <= limite
+            ][:maximo]
+            lote = [_pendientes.pop(k) for k in listos]
+        if not lote:
+            return total
 
-        dias = (fv - hoy).days  # días restantes
+        _evaluar(lote)
+        total += len(lote)
 
-        # 🔴 Producto ya vencido
-        if dias < 0:
-            mensaje = (
-                f"ALERTA: El producto '{e.producto}' está VENCIDO "
-                f"(fecha: {fv.strftime('%d-%m-%Y')})."
-            )
-            crear_alerta_interna(
-                db=db,
-                negocio_id=negocio_id,
-                tipo="vencido",
-                mensaje=mensaje,
-                origen=origen,
-                destino=destino,
-                datos={
-                    "producto": e.producto,
-                    "fecha_vencimiento": fv.isoformat(),
-                    "dias_restantes": dias,
-                },
-            )
-            continue
 
-        # 🟠 Próximo a vencer (dentro de 7 días)
-        if dias <= 7:
-            mensaje = (
-                f"Advertencia: El producto '{e.producto}' vencerá en {dias} días "
-                f"(fecha: {fv.strftime('%d-%m-%Y')})."
-            )
-            crear_alerta_interna(
-                db=db,
-                negocio_id=negocio_id,
-                tipo="proximo_vencer",
-                mensaje=mensaje,
-                origen=origen,
-                destino=destino,
-                datos={
-                    "producto": e.producto,
-                    "fecha_vencimiento": fv.isoformat(),
-                    "dias_restantes": dias,
-                },
-            )
+def alert_queue_stats() -> dict:
+    """Contadores del worker (eventos recibidos vs evaluaciones efectivas)."""
+    with _lock:
+        return {**_stats, "pendientes": len(_pendientes)}
+
+
+# =========================================================
+# WORKER
+# =========================================================
+
+def _worker_activo() -> bool:
+    return _worker_thread is not None and _worker_thread.is_alive() and not _stop_event.is_set()
+
+
+def _worker_loop() -> None:
+    intervalo = max(float(settings.ALERTS_WORKER_POLL_SECONDS), 0.1)
+    while not _stop_event.wait(intervalo):
+        try:
+            procesar_alertas_pendientes()
+        except Exception:
+            logger.exception("[ALERTAS] worker loop falló")
+
+
+def start_alert_worker() -> None:
+    """Arranca el evaluador en background (idempotente). Llamar en startup."""
+    global _worker_thread
+
+    if not settings.ALERTS_ASYNC_ENABLED:
+        return
+    if _worker_thread is not None and _worker_thread.is_alive():
+        return
+
+    _stop_event.clear()
+    _worker_thread = threading.Thread(
+        target=_worker_loop,
+        name="orbion-alerts",
+        daemon=True,
+    )
+    _worker_thread.start()
+    logger.info(
+        "[ALERTAS] worker iniciado coalesce=%ss poll=%ss",
+        settings.ALERTS_COALESCE_SECONDS,
+        settings.ALERTS_WORKER_POLL_SECONDS,
+    )
+
+
+def stop_alert_worker() -> None:
+    """Detiene el evaluador y evalúa lo pendiente. Llamar en shutdown."""
+    global _worker_thread
+
+    _stop_event.set()
+    if _worker_thread is not None:
+        _worker_thread.join(timeout=5)
+        _worker_thread = None
+    procesar_alertas_pendientes(forzar=True)
@@ -0,0 +1,613 @@
+﻿# services/services_conteo_ciclico.py
+"""
+Conteos cíclicos (inventario físico por alcance) – ORBION WMS
+
+✔ Sesiones persistidas (ConteoCiclico) con alcance por zona / ubicación
+✔ Escaneos incrementales por lotes: cada lote se agrega en memoria por
+  (producto, slot) y se aplica con un UPDATE / INSERT executemany
+  (modo "sumar": acumula; modo "fijar": reemplaza la cantidad contada)
+✔ Contabilización en UNA transacción:
+   - claim atómico del conteo (abierto -> contabilizado, sin doble posteo)
+   - diferencias contra stock_saldos materializado (sin replay del ledger)
+   - ajustes vía registrar_movimientos_bulk + auditoría en un INSERT masivo
+✔ Alertas de stock evaluadas una vez por producto ajustado, tras el commit
+
+Ajustes con la convención histórica de /inventario: entrada / salida con
+motivo_salida = "ajuste_inventario".
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.logging_config import logger
+from core.models import ConteoCiclico, ConteoCiclicoLinea, Slot, StockSaldo, Ubicacion, Zona
+from core.models.time import utcnow
+from core.services.services_audit import AuditAction, audit, audit_bulk
+from core.services.services_product_catalog import get_catalogo_productos, normalizar_nombre
+from modules.basic_wms.services.services_alerts import evaluar_alertas_stock
+from modules.basic_wms.services.services_movimientos import MOTIVO_AJUSTE_INVENTARIO
+from modules.basic_wms.services.services_stock_saldos import producto_key, registrar_movimientos_bulk
+
+
+ESTADO_ABIERTO = "abierto"
+ESTADO_CONTABILIZADO = "contabilizado"
+ESTADO_CANCELADO = "cancelado"
+
+MODO_SUMAR = "sumar"
+MODO_FIJAR = "fijar"
+
+_EPS = 1e-6
+
+
+# =========================================================
+# ALCANCE
+# =========================================================
+
+def slots_alcance(
+    db: Session,
+    negocio_id: int,
+    *,
+    zona_id: Optional[int] = None,
+    ubicacion_id: Optional[int] = None,
+) -> dict[str, tuple[int, str]]:
+    """codigo_full normalizado (upper) -> (slot_id, codigo_full) dentro del alcance."""
+    q = (
+        db.query(Slot.id, Slot.codigo_full)
+        .join(Ubicacion, Slot.ubicacion_id == Ubicacion.id)
+        .join(Zona, Ubicacion.zona_id == Zona.id)
+        .filter(Zona.negocio_id == negocio_id)
+    )
+    if ubicacion_id:
+        q = q.filter(Ubicacion.id == ubicacion_id)
+    elif zona_id:
+        q = q.filter(Zona.id == zona_id)
+
+    return {
+        (codigo or "").strip().upper(): (int(sid), (codigo or "").strip())
+        for sid, codigo in q.all()
+        if codigo
+    }
+
+
+def _slots_conteo(db: Session, conteo: ConteoCiclico) -> dict[str, tuple[int, str]]:
+    return slots_alcance(
+        db,
+        int(conteo.negocio_id),
+        zona_id=conteo.zona_id,
+        ubicacion_id=conteo.ubicacion_id,
+    )
+
+
+# =========================================================
+# SESIONES
+# =========================================================
+
+def crear_conteo(
+    db: Session,
+    *,
+    user: dict,
+    zona_id: Optional[int] = None,
+    ubicacion_id: Optional[int] = None,
+    nombre: Optional[str] = None,
+) -> ConteoCiclico:
+    """Crea un conteo abierto (flush, sin commit). ValueError si el alcance no es del negocio."""
+    negocio_id = int(user["negocio_id"])
+    alcance = "Todo el negocio"
+
+    if ubicacion_id:
+        row = (
+            db.query(Ubicacion, Zona)
+            .join(Zona, Ubicacion.zona_id == Zona.id)
+            .filter(Ubicacion.id == ubicacion_id, Zona.negocio_id == negocio_id)
+            .first()
+        )
+        if not row:
+            raise ValueError("La ubicación seleccionada no es válida.")
+        ubicacion, zona = row
+        zona_id = int(zona.id)
+        alcance = f"{zona.nombre} / {ubicacion.nombre}"
+    elif zona_id:
+        zona = db.query(Zona).filter(Zona.id == zona_id, Zona.negocio_id == negocio_id).first()
+        if not zona:
+            raise ValueError("La zona seleccionada no es válida.")
+        alcance = f"Zona {zona.nombre}"
+
+    conteo = ConteoCiclico(
+        negocio_id=negocio_id,
+        nombre=(nombre or "").strip() or None,
+        zona_id=zona_id or None,
+        ubicacion_id=ubicacion_id or None,
+        alcance=alcance,
+        estado=ESTADO_ABIERTO,
+        total_lineas=0,
+        total_ajustes=0,
+        creado_por=user["email"],
+    )
+    db.add(conteo)
+    db.flush()
+    return conteo
+
+
+def obtener_conteo(db: Session, negocio_id: int, conteo_id: int) -> Optional[ConteoCiclico]:
+    return (
+        db.query(ConteoCiclico)
+        .filter(ConteoCiclico.id == conteo_id, ConteoCiclico.negocio_id == negocio_id)
+        .first()
+    )
+
+
+def listar_conteos(db: Session, negocio_id: int, *, limit: int = 20) -> list[ConteoCiclico]:
+    """Abiertos primero, luego los más recientes."""
+    return (
+        db.query(ConteoCiclico)
+        .filter(ConteoCiclico.negocio_id == negocio_id)
+        .order_by(
+            (ConteoCiclico.estado != ESTADO_ABIERTO).asc(),
+            ConteoCiclico.creado_en.desc(),
+        )
+        .limit(limit)
+        .all()
+    )
+
+
+def cancelar_conteo(db: Session, negocio_id: int, conteo_id: int) -> bool:
+    """abierto -> cancelado (condicional). Sin commit."""
+    res = db.execute(
+        update(ConteoCiclico)
+        .where(
+            ConteoCiclico.id == conteo_id,
+            ConteoCiclico.negocio_id == negocio_id,
+            ConteoCiclico.estado == ESTADO_ABIERTO,
+        )
+        .values(estado=ESTADO_CANCELADO, actualizado_en=utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return res.rowcount == 1
+
+
+# =========================================================
+# ESCANEOS (LOTES INCREMENTALES)
+# =========================================================
+
+def _parse_cantidad(valor: Any, modo: str) -> float:
+    num = float(str(valor if valor not in (None, "") else 1).strip().replace(",", "."))
+    if num < 0 or (modo == MODO_SUMAR and num == 0):
+        raise ValueError
+    return num
+
+
+def registrar_escaneos(
+    db: Session,
+    conteo: ConteoCiclico,
+    escaneos: list[dict],
+) -> dict:
+    """
+    Aplica un lote de escaneos al conteo (sin commit).
+
+    Cada escaneo: {"codigo" | "producto", "slot", "cantidad" (default 1),
+    "modo": "sumar" | "fijar"}. Dentro del lote se respeta el orden
+    (fijar reinicia, sumar acumula).
+
+    Retorna {"aceptados", "lineas", "errores": [{"indice", "error"}]}.
+    ValueError si el conteo no está abierto.
+    """
+    if conteo.estado != ESTADO_ABIERTO:
+        raise ValueError("El conteo no está abierto.")
+
+    negocio_id = int(conteo.negocio_id)
+    catalogo = get_catalogo_productos(db, negocio_id)
+    slots = _slots_conteo(db, conteo)
+
+    acc: dict[tuple[int, int], dict] = {}
+    errores: list[dict] = []
+    aceptados = 0
+
+    for i, esc in enumerate(escaneos):
+        modo = str(esc.get("modo") or MODO_SUMAR).strip().lower()
+        if modo not in (MODO_SUMAR, MODO_FIJAR):
+            errores.append({"indice": i, "error": f"Modo inválido ({modo})."})
+            continue
+
+        codigo = str(esc.get("codigo") or "").strip()
+        nombre = str(esc.get("producto") or "").strip()
+        producto = catalogo.activos_por_codigo.get(codigo) if codigo else None
+        if producto is None and nombre:
+            producto = catalogo.por_nombre.get(normalizar_nombre(nombre))
+        if producto is None:
+            errores.append({"indice": i, "error": f"Producto no encontrado ({codigo or nombre or 'vacío'})."})
+            continue
+
+        slot = slots.get(str(esc.get("slot") or "").strip().upper())
+        if slot is None:
+            errores.append({"indice": i, "error": f"Slot fuera del alcance del conteo ({esc.get('slot') or 'vacío'})."})
+            continue
+
+        try:
+            cantidad = _parse_cantidad(esc.get("cantidad"), modo)
+        except ValueError:
+            errores.append({"indice": i, "error": "Cantidad inválida."})
+            continue
+
+        item = acc.setdefault(
+            (producto.id, slot[0]),
+            {"producto": producto.nombre, "zona": slot[1], "base": None, "suma": 0.0, "escaneos": 0},
+        )
+        if modo == MODO_FIJAR:
+            item["base"] = cantidad
+            item["suma"] = 0.0
+        else:
+            item["suma"] += cantidad
+        item["escaneos"] += 1
+        aceptados += 1
+
+    if acc:
+        _aplicar_lineas(db, conteo, acc)
+
+    return {"aceptados": aceptados, "lineas": len(acc), "errores": errores}
+
+
+def _lineas_existentes(db: Session, conteo_id: int, keys) -> set[tuple[int, int]]:
+    producto_ids = sorted({pid for pid, _ in keys})
+    return {
+        (int(pid), int(sid))
+        for pid, sid in db.execute(
+            select(ConteoCiclicoLinea.producto_id, ConteoCiclicoLinea.slot_id)
+            .where(ConteoCiclicoLinea.conteo_id == conteo_id)
+            .where(ConteoCiclicoLinea.producto_id.in_(producto_ids))
+        )
+    }
+
+
+def _actualizar_lineas(db: Session, conteo_id: int, acc: dict, keys, ahora) -> None:
+    """UPDATE executemany: cantidad = coalesce(base, cantidad) + suma (atómico, sin read-modify-write)."""
+    if not keys:
+        return
+    tabla = ConteoCiclicoLinea.__table__
+    db.execute(
+        tabla.update()
+        .where(tabla.c.conteo_id == conteo_id)
+        .where(tabla.c.producto_id == bindparam("_producto_id"))
+        .where(tabla.c.slot_id == bindparam("_slot_id"))
+        .values(
+            cantidad_contada=func.coalesce(bindparam("_base"), tabla.c.cantidad_contada) + bindparam("_suma"),
+            escaneos=tabla.c.escaneos + bindparam("_escaneos"),
+            actualizado_en=ahora,
+        ),
+        [
+            {
+                "_producto_id": key[0],
+                "_slot_id": key[1],
+                "_base": acc[key]["base"],
+                "_suma": acc[key]["suma"],
+                "_escaneos": acc[key]["escaneos"],
+            }
+            for key in keys
+        ],
+    )
+
+
+def _aplicar_lineas(db: Session, conteo: ConteoCiclico, acc: dict[tuple[int, int], dict]) -> None:
+    conteo_id = int(conteo.id)
+    ahora = utcnow()
+
+    existentes = _lineas_existentes(db, conteo_id, acc)
+    nuevas = [key for key in acc if key not in existentes]
+    _actualizar_lineas(db, conteo_id, acc, [key for key in acc if key in existentes], ahora)
+
+    if nuevas:
+        rows = [
+            {
+                "conteo_id": conteo_id,
+                "negocio_id": int(conteo.negocio_id),
+                "producto_id": key[0],
+                "producto": acc[key]["producto"],
+                "producto_key": producto_key(acc[key]["producto"]),
+                "slot_id": key[1],
+                "zona": acc[key]["zona"],
+                "cantidad_contada": (acc[key]["base"] or 0.0) + acc[key]["suma"],
+                "escaneos": acc[key]["escaneos"],
+                "actualizado_en": ahora,
+            }
+            for key in nuevas
+        ]
+        try:
+            with db.begin_nested():
+                db.execute(ConteoCiclicoLinea.__table__.insert(), rows)
+        except IntegrityError:
+            # otro escáner creó alguna línea en paralelo: esas pasan a UPDATE
+            creadas = _lineas_existentes(db, conteo_id, nuevas)
+            _actualizar_lineas(db, conteo_id, acc, [key for key in nuevas if key in creadas], ahora)
+            faltantes = [r for r in rows if (r["producto_id"], r["slot_id"]) not in creadas]
+            if faltantes:
+                db.execute(ConteoCiclicoLinea.__table__.insert(), faltantes)
+
+    total = (
+        db.query(func.count(ConteoCiclicoLinea.id))
+        .filter(ConteoCiclicoLinea.conteo_id == conteo_id)
+        .scalar()
+    )
+    conteo.total_lineas = int(total or 0)
+    conteo.actualizado_en = ahora
+
+
+# =========================================================
+# LECTURA
+# =========================================================
+
+def _saldos_alcance(db: Session, negocio_id: int, zonas: list[str], *, for_update: bool = False):
+    q = (
+        db.query(
+            StockSaldo.producto_key,
+            StockSaldo.zona,
+            StockSaldo.producto,
+            StockSaldo.producto_id,
+            StockSaldo.slot_id,
+            StockSaldo.cantidad,
+        )
+        .filter(StockSaldo.negocio_id == negocio_id)
+        .filter(StockSaldo.zona.in_(zonas))
+    )
+    if for_update:
+        q = q.with_for_update()
+    return q.all()
+
+
+def lineas_conteo(db: Session, conteo: ConteoCiclico) -> list[dict]:
+    """
+    Líneas para la UI con stock teórico actual (stock_saldos) y diferencia.
+    En conteos contabilizados se usan los valores fijados al contabilizar.
+    """
+    lineas = (
+        db.query(ConteoCiclicoLinea)
+        .filter(ConteoCiclicoLinea.conteo_id == conteo.id)
+        .order_by(ConteoCiclicoLinea.zona.asc(), ConteoCiclicoLinea.producto.asc())
+        .all()
+    )
+    if not lineas:
+        return []
+
+    teorico: dict[tuple[str, str], float] = {}
+    if conteo.estado == ESTADO_ABIERTO:
+        zonas = sorted({l.zona for l in lineas})
+        for key, zona, _p, _pid, _sid, cantidad in _saldos_alcance(db, int(conteo.negocio_id), zonas):
+            teorico[(key, zona)] = float(cantidad or 0.0)
+
+    out = []
+    for l in lineas:
+        if conteo.estado == ESTADO_ABIERTO:
+            stock = teorico.get((l.producto_key, l.zona), 0.0)
+            diff = float(l.cantidad_contada or 0.0) - stock
+        else:
+            stock = l.stock_teorico
+            diff = l.diferencia
+        out.append(
+            {
+                "producto": l.producto,
+                "zona": l.zona,
+                "contado": float(l.cantidad_contada or 0.0),
+                "escaneos": int(l.escaneos or 0),
+                "stock_teorico": stock,
+                "diferencia": diff,
+            }
+        )
+    return out
+
+
+# =========================================================
+# CONTABILIZACIÓN
+# =========================================================
+
+def contabilizar_conteo(
+    db: Session,
+    conteo_id: int,
+    *,
+    user: dict,
+    ceros_no_contados: bool = False,
+) -> dict:
+    """
+    Contabiliza un conteo abierto en UNA transacción (commit incluido):
+    diferencias contra stock_saldos del alcance, ajustes por lotes, una fila
+    de auditoría por ajuste (INSERT masivo) + resumen.
+
+    ceros_no_contados=True: los (producto, slot) del alcance con stock que no
+    fueron escaneados se cuentan como 0 (conteo ciego completo del alcance).
+
+    ValueError si el conteo no existe o ya no está abierto.
+    """
+    negocio_id = int(user["negocio_id"])
+    ahora = utcnow()
+
+    try:
+        # Claim atómico: dos posteos simultáneos no generan ajustes duplicados
+        res = db.execute(
+            update(ConteoCiclico)
+            .where(
+                ConteoCiclico.id == conteo_id,
+                ConteoCiclico.negocio_id == negocio_id,
+                ConteoCiclico.estado == ESTADO_ABIERTO,
+            )
+            .values(
+                estado=ESTADO_CONTABILIZADO,
+                contabilizado_por=user["email"],
+                contabilizado_en=ahora,
+                actualizado_en=ahora,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount != 1:
+            raise ValueError("El conteo no existe o ya fue contabilizado / cancelado.")
+
+        conteo = obtener_conteo(db, negocio_id, conteo_id)
+        db.refresh(conteo)
+        slots = _slots_conteo(db, conteo)
+        por_zona = {cf: sid for sid, cf in slots.values()}
+
+        lineas = {
+            (l.producto_key, l.zona): l
+            for l in db.query(ConteoCiclicoLinea).filter(ConteoCiclicoLinea.conteo_id == conteo_id).all()
+        }
+
+        # Stock teórico materializado del alcance (bloqueado hasta el commit)
+        saldos = {
+            (key, zona): (producto, pid, sid, float(cantidad or 0.0))
+            for key, zona, producto, pid, sid, cantidad in _saldos_alcance(
+                db, negocio_id, sorted(por_zona), for_update=True
+            )
+        }
+
+        # Pares con stock no escaneados -> contado 0
+        if ceros_no_contados:
+            catalogo = get_catalogo_productos(db, negocio_id)
+            nuevas = []
+            for (key, zona), (producto, pid, sid, cantidad) in saldos.items():
+                if (key, zona) in lineas or abs(cantidad) <= _EPS:
+                    continue
+                if pid is None:
+                    p = catalogo.por_nombre.get(key)
+                    pid = p.id if p else None
+                sid = sid or por_zona.get(zona)
+                if pid is None or sid is None:
+                    continue
+                nuevas.append(
+                    ConteoCiclicoLinea(
+                        conteo_id=conteo_id,
+                        negocio_id=negocio_id,
+                        producto_id=int(pid),
+                        producto=producto,
+                        producto_key=key,
+                        slot_id=int(sid),
+                        zona=zona,
+                        cantidad_contada=0.0,
+                        escaneos=0,
+                    )
+                )
+            if nuevas:
+                db.add_all(nuevas)
+                db.flush()
+                lineas.update({(l.producto_key, l.zona): l for l in nuevas})
+
+        ajustes: list[dict] = []
+        fijar: list[dict] = []
+        for par, linea in lineas.items():
+            teorico = saldos.get(par, (None, None, None, 0.0))[3]
+            contado = float(linea.cantidad_contada or 0.0)
+            diff = contado - teorico
+            fijar.append({"_id": linea.id, "_teorico": teorico, "_diferencia": diff})
+            if abs(diff) <= _EPS:
+                continue
+            ajustes.append(
+                {
+                    "linea": linea,
+                    "teorico": teorico,
+                    "contado": contado,
+                    "diff": diff,
+                    # Si diff > 0 → faltaba stock en el sistema → "entrada"; si diff < 0 → "salida"
+                    "tipo": "entrada" if diff > 0 else "salida",
+                }
+            )
+
+        if fijar:
+            tabla = ConteoCiclicoLinea.__table__
+            db.execute(
+                tabla.update()
+                .where(tabla.c.id == bindparam("_id"))
+                .values(stock_teorico=bindparam("_teorico"), diferencia=bindparam("_diferencia")),
+                fijar,
+            )
+
+        mov_ids = registrar_movimientos_bulk(
+            db,
+            negocio_id,
+            [
+                {
+                    "usuario": user["email"],
+                    "tipo": a["tipo"],
+                    "producto": a["linea"].producto,
+                    "cantidad": abs(a["diff"]),
+                    "zona": a["linea"].zona,
+                    "producto_id": a["linea"].producto_id,
+                    "slot_id": a["linea"].slot_id,
+                    "fecha": ahora,
+                    "fecha_vencimiento": None,
+                    # usamos este campo para marcar claramente que es ajuste
+                    "motivo_salida": MOTIVO_AJUSTE_INVENTARIO,
+                }
+                for a in ajustes
+            ],
+        )
+
+        audit_bulk(
+            db,
+            action=AuditAction.INVENTARIO_AJUSTE,
+            user=user,
+            registros=[
+                {
+                    "entity_type": "movimiento",
+                    "entity_id": mov_id,
+                    "before": {"stock_teorico": a["teorico"]},
+                    "after": {"conteo": a["contado"]},
+                    "extra": {
+                        "conteo_id": conteo_id,
+                        "producto": a["linea"].producto,
+                        "zona": a["linea"].zona,
+                        "tipo_mov": a["tipo"],
+                        "cantidad_ajuste": abs(a["diff"]),
+                        "motivo": MOTIVO_AJUSTE_INVENTARIO,
+                    },
+                }
+                for mov_id, a in zip(mov_ids, ajustes)
+            ],
+        )
+
+        resumen = {
+            "lineas": len(lineas),
+            "ajustes": len(ajustes),
+            "entradas": sum(1 for a in ajustes if a["diff"] > 0),
+            "salidas": sum(1 for a in ajustes if a["diff"] < 0),
+            "unidades_sobrantes": sum(a["diff"] for a in ajustes if a["diff"] > 0),
+            "unidades_faltantes": sum(-a["diff"] for a in ajustes if a["diff"] < 0),
+            "ceros_no_contados": ceros_no_contados,
+        }
+        conteo.total_lineas = len(lineas)
+        conteo.total_ajustes = len(ajustes)
+        conteo.resumen_json = json.dumps(resumen, ensure_ascii=False)
+
+        audit(
+            db,
+            action=AuditAction.INVENTARIO_CONTEO_CONTABILIZAR,
+            user=user,
+            entity_type="conteo_ciclico",
+            entity_id=conteo_id,
+            extra={"alcance": conteo.alcance, **resumen},
+        )
+        productos = {int(a["linea"].producto_id): a["linea"].producto for a in ajustes}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # Una evaluación por producto ajustado, con los saldos ya finales
+    for producto_id, nombre in productos.items():
+        evaluar_alertas_stock(
+            db=db,
+            user=user,
+            producto_nombre=nombre,
+            origen="inventario",
+            motivo=MOTIVO_AJUSTE_INVENTARIO,
+            producto_id=producto_id,
+        )
+
+    logger.info(
+        "[CONTEO] contabilizado negocio_id=%s conteo_id=%s lineas=%s ajustes=%s",
+        negocio_id,
+        conteo_id,
+        resumen["lineas"],
+        resumen["ajustes"],
+    )
+    return resumen
@@ -0,0 +1,491 @@
+﻿# services_export.py
+"""
+Exportaciones – ORBION WMS
+
+✔ Filas desde cursor (Query.yield_per): en Postgres usa cursor server-side;
+  nunca se materializa el resultado completo (.all())
+✔ XLSX streaming: las filas se serializan y comprimen a medida que llegan y
+  salen en chunks de tamaño fijo (sin Workbook en memoria ni BytesIO)
+✔ CSV / NDJSON: mismas filas serializadas con core.streaming (gzip opcional)
+✔ Memoria acotada e independiente del número de filas
+✔ Tipos registrados para exports en background (core.services.services_export_jobs)
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import zipfile
+from datetime import date, datetime
+from functools import partial
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, Optional
+from xml.sax.saxutils import escape as xml_escape
+
+from openpyxl.utils import get_column_letter
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from core.logging_config import logger
+from core.models import Movimiento, Producto, Slot, StockSaldo
+from core.services.services_export_jobs import ArchivoExport, registrar_tipo_export
+from core.streaming import (
+    CSV_MEDIA_TYPE,
+    GZIP_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    STREAM_CHUNK_BYTES,
+    iter_csv,
+    iter_gzip,
+    iter_ndjson,
+)
+
+
+# Filas por fetch del cursor
+EXPORT_YIELD_PER = 2000
+# Bytes por chunk enviado al cliente
+EXPORT_CHUNK_BYTES = STREAM_CHUNK_BYTES
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+# =========================================================
+# HELPERS
+# =========================================================
+
+def parse_rango_fechas(
+    start_date: Optional[str],
+    end_date: Optional[str],
+) -> tuple[Optional[datetime], Optional[datetime]]:
+    """Parseo suave de fechas YYYY-MM-DD ("" / None / inválida -> None). end incluye todo el día."""
+    start_dt: datetime | None = None
+    end_dt: datetime | None = None
+
+    if start_date:
+        try:
+            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+        except ValueError:
+            logger.warning(f"[EXPORT_MOV] start_date inválida: {start_date}")
+
+    if end_date:
+        try:
+            end_dt = datetime.combine(datetime.strptime(end_date, "%Y-%m-%d").date(), datetime.max.time())
+        except ValueError:
+            logger.warning(f"[EXPORT_MOV] end_date inválida: {end_date}")
+
+    return start_dt, end_dt
+
+
+# =========================================================
+# STOCK ACTUAL
+# =========================================================
+
+STOCK_HEADERS = ["Producto", "Slot (código full)", "Stock actual"]
+
+
+def query_stock_export(db: Session, negocio_id: int) -> Query:
+    """
+    Stock por producto y slot desde stock_saldos. Nombre de producto y código
+    de slot vigentes vía FK; si el saldo no tiene FK se usa el string guardado.
+    """
+    producto_col = func.coalesce(Producto.nombre, StockSaldo.producto)
+    slot_col = func.coalesce(Slot.codigo_full, StockSaldo.zona)
+
+    return (
+        db.query(
+            producto_col.label("producto"),
+            slot_col.label("slot_codigo_full"),
+            StockSaldo.cantidad.label("stock"),
+        )
+        .outerjoin(Producto, StockSaldo.producto_id == Producto.id)
+        .outerjoin(Slot, StockSaldo.slot_id == Slot.id)
+        .filter(
+            StockSaldo.negocio_id == negocio_id,
+            StockSaldo.cantidad != 0,
+        )
+        .order_by(producto_col, slot_col)
+    )
+
+
+def iter_stock_rows(db: Session, negocio_id: int) -> Iterator[tuple]:
+    n = 0
+    for r in query_stock_export(db, negocio_id).yield_per(EXPORT_YIELD_PER):
+        n += 1
+        yield (
+            r.producto,
+            r.slot_codigo_full,
+            int(r.stock) if r.stock is not None else 0,
+        )
+
+    if not n:
+        logger.info(f"[EXPORT_STOCK] Sin resultados para negocio_id={negocio_id}")
+
+
+# =========================================================
+# MOVIMIENTOS
+# =========================================================
+
+MOVIMIENTOS_HEADERS = [
+    "Fecha",
+    "Tipo",
+    "Cantidad",
+    "Cantidad neta",           # con signo según tipo
+    "Producto",
+    "Slot (código full)",
+    "Usuario",
+    "Fecha vencimiento",
+    "Motivo salida",
+]
+
+# Claves NDJSON (mismo orden que MOVIMIENTOS_HEADERS / iter_movimientos_rows)
+MOVIMIENTOS_CAMPOS = [
+    "fecha",
+    "tipo",
+    "cantidad",
+    "cantidad_neta",
+    "producto",
+    "slot",
+    "usuario",
+    "fecha_vencimiento",
+    "motivo_salida",
+]
+
+
+def query_movimientos_export(
+    db: Session,
+    negocio_id: int,
+    start_dt: Optional[datetime] = None,
+    end_dt: Optional[datetime] = None,
+) -> Query:
+    q = (
+        db.query(
+            Movimiento.fecha,
+            Movimiento.tipo,
+            Movimiento.cantidad,
+            Movimiento.producto,
+            Movimiento.zona,
+            Movimiento.usuario,
+            Movimiento.fecha_vencimiento,
+            Movimiento.motivo_salida,
+        )
+        .filter(Movimiento.negocio_id == negocio_id)
+    )
+
+    if start_dt:
+        q = q.filter(Movimiento.fecha >= start_dt)
+    if end_dt:
+        q = q.filter(Movimiento.fecha <= end_dt)
+
+    # (negocio_id, fecha, id): recorre el índice, sin sort
+    return q.order_by(Movimiento.fecha.desc(), Movimiento.id.desc())
+
+
+def iter_movimientos_rows(
+    db: Session,
+    negocio_id: int,
+    start_dt: Optional[datetime] = None,
+    end_dt: Optional[datetime] = None,
+) -> Iterator[tuple]:
+    for r in query_movimientos_export(db, negocio_id, start_dt, end_dt).yield_per(EXPORT_YIELD_PER):
+        # Cantidad neta por movimiento (misma lógica que en stock)
+        if r.tipo == "salida":
+            cantidad_neta = -(r.cantidad or 0)
+        else:
+            cantidad_neta = r.cantidad or 0
+
+        yield (
+            r.fecha.isoformat() if r.fecha else None,
+            r.tipo,
+            int(r.cantidad) if r.cantidad is not None else 0,
+            int(cantidad_neta),
+            r.producto,
+            r.zona,  # código_full
+            r.usuario,
+            r.fecha_vencimiento.isoformat() if r.fecha_vencimiento else None,
+            r.motivo_salida,
+        )
+
+
+# =========================================================
+# XLSX (streaming)
+# =========================================================
+# SpreadsheetML mínimo escrito directo a un ZIP no seekable: cada entrada
+# lleva data descriptor, así los bytes salen a medida que se generan filas
+# (TTFB constante). Strings inline (sin sharedStrings en memoria); estilo 1 =
+# encabezado en negrita. Sobre el límite de filas de Excel se abre otra hoja.
+
+XLSX_MAX_ROWS = 1_048_576
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_STYLES_XML = (
+    _XML_DECL
+    + f'<styleSheet xmlns="{_NS_MAIN}">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+class _ZipSink:
+    """Destino no seekable para ZipFile: acumula bytes hasta que se drenan."""
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._pos = 0
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _xml_text(value: str) -> str:
+    return xml_escape(_XML_INVALID.sub("", value)[:32767])
+
+
+def _xlsx_cell(ref: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, (float, Decimal)):
+        if not math.isfinite(value):
+            return ""
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    text = _xml_text(str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}" t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+
+def _xlsx_row(n: int, letras: list[str], values: Iterable[Any], style: str = "") -> str:
+    cells = "".join(_xlsx_cell(f"{l}{n}", v) for l, v in zip(letras, values))
+    if style:
+        cells = cells.replace("<c ", f'<c s="{style}" ')
+    return f'<row r="{n}">{cells}</row>'
+
+
+def _xlsx_package(titulos: list[str]) -> dict[str, str]:
+    sheets = "".join(
+        f'<sheet name="{xml_escape(t)}" sheetId="{i}" r:id="rId{i}"/>' for i, t in enumerate(titulos, start=1)
+    )
+    sheet_rels = "".join(
+        f'<Relationship Id="rId{i}" Type="{_NS_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(titulos) + 1)
+    )
+    overrides = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(titulos) + 1)
+    )
+    return {
+        "xl/styles.xml": _STYLES_XML,
+        "xl/workbook.xml": (
+            _XML_DECL
+            + f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}"><sheets>{sheets}</sheets></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            _XML_DECL
+            + f'<Relationships xmlns="{_NS_PKG_REL}">{sheet_rels}'
+            f'<Relationship Id="rId{len(titulos) + 1}" Type="{_NS_REL}/styles" Target="styles.xml"/>'
+            "</Relationships>"
+        ),
+        "_rels/.rels": (
+            _XML_DECL
+            + f'<Relationships xmlns="{_NS_PKG_REL}">'
+            f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ),
+        "[Content_Types].xml": (
+            _XML_DECL
+            + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f"{overrides}</Types>"
+        ),
+    }
+
+
+def iter_xlsx(
+    headers: list[str],
+    rows: Iterable[tuple],
+    *,
+    title: str = "Reporte",
+    chunk_bytes: int = EXPORT_CHUNK_BYTES,
+    max_rows_por_hoja: int = XLSX_MAX_ROWS,
+) -> Iterator[bytes]:
+    """
+    Genera un .xlsx en chunks de ~chunk_bytes a medida que consume `rows`
+    (memoria acotada: solo el buffer comprimido pendiente).
+    """
+    title = title[:31]  # Excel limita a 31 caracteres
+    letras = [get_column_letter(i) for i in range(1, len(headers) + 1)]
+    sheet_head = (
+        _XML_DECL
+        + f'<worksheet xmlns="{_NS_MAIN}"><cols>'
+        f'<col min="1" max="{max(len(headers), 1)}" width="18" customWidth="1"/>'
+        "</cols><sheetData>"
+    )
+    sheet_tail = "</sheetData></worksheet>"
+    header_row = _xlsx_row(1, letras, headers, style="1")
+
+    sink = _ZipSink()
+    titulos: list[str] = []
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        rows_it = iter(rows)
+        pendiente = next(rows_it, None)
+
+        while True:
+            titulos.append(title if not titulos else f"{title[:25]} ({len(titulos) + 1})")
+            with zf.open(f"xl/worksheets/sheet{len(titulos)}.xml", "w") as ws:
+                ws.write((sheet_head + header_row).encode())
+                n = 1
+                lote: list[str] = []
+                while pendiente is not None and n < max_rows_por_hoja:
+                    n += 1
+                    lote.append(_xlsx_row(n, letras, pendiente))
+                    pendiente = next(rows_it, None)
+                    if len(lote) >= 500:
+                        ws.write("".join(lote).encode())
+                        lote.clear()
+                        if sink.pending() >= chunk_bytes:
+                            yield sink.drain()
+                if lote:
+                    ws.write("".join(lote).encode())
+                ws.write(sheet_tail.encode())
+
+            if pendiente is None:
+                break
+
+        for nombre, contenido in _xlsx_package(titulos).items():
+            zf.writestr(nombre, contenido)
+
+    if sink.pending():
+        yield sink.drain()
+
+
+# =========================================================
+# EXPORT JOBS (background)
+# =========================================================
+# Mismas filas/serializadores que los endpoints; el worker escribe a disco.
+# Parámetros: start_date / end_date (YYYY-MM-DD), gzip (csv / ndjson).
+
+FORMATOS_EXPORT = ("xlsx", "csv", "ndjson")
+
+
+def _archivo_export(
+    formato: str,
+    *,
+    nombre: str,
+    headers: list[str],
+    campos: list[str],
+    titulo: str,
+    rows: Iterable[tuple],
+    total_filas: Optional[int],
+    gzip: bool = False,
+) -> ArchivoExport:
+    filename = f"{nombre}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{formato}"
+
+    if formato == "xlsx":
+        return ArchivoExport(
+            filename=filename,
+            media_type=XLSX_MEDIA_TYPE,
+            rows=rows,
+            serializar=lambda r: iter_xlsx(headers, r, title=titulo),
+            total_filas=total_filas,
+        )
+
+    if formato == "csv":
+        media_type = CSV_MEDIA_TYPE
+        serializar = lambda r: iter_csv(headers, r)  # noqa: E731
+    else:
+        media_type = NDJSON_MEDIA_TYPE
+        serializar = lambda r: iter_ndjson(campos, r)  # noqa: E731
+
+    if gzip:
+        return ArchivoExport(
+            filename=f"{filename}.gz",
+            media_type=GZIP_MEDIA_TYPE,
+            rows=rows,
+            serializar=lambda r: iter_gzip(serializar(r)),
+            total_filas=total_filas,
+        )
+    return ArchivoExport(
+        filename=filename,
+        media_type=media_type,
+        rows=rows,
+        serializar=serializar,
+        total_filas=total_filas,
+    )
+
+
+def _job_movimientos(formato: str, db: Session, negocio_id: int, parametros: dict[str, Any]) -> ArchivoExport:
+    start_dt, end_dt = parse_rango_fechas(parametros.get("start_date"), parametros.get("end_date"))
+    total = query_movimientos_export(db, negocio_id, start_dt, end_dt).order_by(None).count()
+
+    return _archivo_export(
+        formato,
+        nombre="movimientos",
+        headers=MOVIMIENTOS_HEADERS,
+        campos=MOVIMIENTOS_CAMPOS,
+        titulo="Movimientos",
+        rows=iter_movimientos_rows(db, negocio_id, start_dt, end_dt),
+        total_filas=total,
+        gzip=bool(parametros.get("gzip")),
+    )
+
+
+def _job_stock(formato: str, db: Session, negocio_id: int, parametros: dict[str, Any]) -> ArchivoExport:
+    total = query_stock_export(db, negocio_id).order_by(None).count()
+
+    return _archivo_export(
+        formato,
+        nombre="stock_actual",
+        headers=STOCK_HEADERS,
+        campos=["producto", "slot", "stock"],
+        titulo="Stock actual",
+        rows=iter_stock_rows(db, negocio_id),
+        total_filas=total,
+        gzip=bool(parametros.get("gzip")),
+    )
+
+
+for _formato in FORMATOS_EXPORT:
+    registrar_tipo_export(f"movimientos.{_formato}", partial(_job_movimientos, _formato))
+    registrar_tipo_export(f"stock.{_formato}", partial(_job_stock, _formato))
+
+TIPOS_EXPORT_WMS = tuple(f"{base}.{f}" for base in ("movimientos", "stock") for f in FORMATOS_EXPORT)
@@ -0,0 +1,416 @@
+﻿# services/services_import_movimientos.py
+"""
+Importación masiva de movimientos (CSV / XLSX) – ORBION WMS
+
+Caso típico: saldos de apertura de una bodega (miles de entradas).
+
+✔ Lectura en streaming (csv.reader sobre el upload / openpyxl read_only):
+  nunca se carga el archivo completo en memoria
+✔ Validación contra lookups cacheados: catálogo de productos en memoria
+  (SKU / EAN / nombre) y slots del negocio (codigo_full -> slot), una carga
+  por importación
+✔ Escritura por lotes (executemany): movimientos (INSERT ... RETURNING id),
+  saldos agregados por (producto, slot) y lotes FEFO; sin flush ORM por fila
+✔ Una transacción: todo o nada (o `omitir_invalidas=True`: se importan las
+  filas válidas y se reportan las demás)
+✔ Un único registro de auditoría resumen
+✔ Alertas de stock / vencimiento evaluadas una vez por producto tocado, al final
+
+Solo entradas: salidas y ajustes negativos requieren validar stock y consumir
+lotes FEFO fila a fila (flujo normal de /movimientos).
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, BinaryIO, Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.logging_config import logger
+from core.models.time import utcnow
+from core.services.services_audit import AuditAction, audit
+from core.services.services_product_catalog import (
+    ProductoCatalogo,
+    get_catalogo_productos,
+    normalizar_nombre,
+)
+from modules.basic_wms.services.services_alerts import evaluar_alertas_stock, evaluar_alertas_vencimiento
+from modules.basic_wms.services.services_slots import get_slots_negocio
+from modules.basic_wms.services.services_stock_saldos import registrar_movimientos_bulk
+
+
+FORMATOS_IMPORT = ("csv", "xlsx")
+
+# Columnas reconocidas (encabezado normalizado -> campo)
+_ALIAS_COLUMNAS = {
+    "producto": "producto",
+    "nombre": "producto",
+    "codigo": "codigo",
+    "codigo_producto": "codigo",
+    "sku": "codigo",
+    "ean": "codigo",
+    "ean13": "codigo",
+    "cantidad": "cantidad",
+    "slot": "slot",
+    "ubicacion": "slot",
+    "zona": "slot",
+    "fecha_vencimiento": "fecha_vencimiento",
+    "vencimiento": "fecha_vencimiento",
+    "fecha": "fecha",
+}
+
+PLANTILLA_HEADERS = ["codigo", "producto", "cantidad", "slot", "fecha_vencimiento"]
+
+_FORMATOS_FECHA = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y")
+
+
+# =========================================================
+# RESULTADO
+# =========================================================
+
+@dataclass
+class ResultadoImport:
+    filas_leidas: int = 0
+    filas_validas: int = 0
+    filas_importadas: int = 0
+    filas_con_error: int = 0
+    cantidad_total: float = 0.0
+    productos: int = 0
+    aplicado: bool = False
+    duracion_s: float = 0.0
+    # primeras N filas con error: {"fila": n, "error": "..."}
+    errores: list[dict] = field(default_factory=list)
+
+
+@dataclass
+class _FilaImport:
+    producto: ProductoCatalogo
+    slot_id: int
+    zona: str
+    cantidad: int
+    fecha: datetime
+    fecha_vencimiento: Optional[date]
+    codigo: Optional[str]
+
+
+# =========================================================
+# LECTURA (STREAMING)
+# =========================================================
+
+def _normalizar_header(valor: Any) -> str:
+    s = unicodedata.normalize("NFKD", str(valor or "").strip().lower())
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return s.replace(" ", "_").replace("-", "_")
+
+
+def _iter_filas_csv(archivo: BinaryIO) -> Iterator[list[Any]]:
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    try:
+        muestra = texto.read(4096)
+        texto.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        yield from csv.reader(texto, dialecto)
+    finally:
+        # no cerrar el upload subyacente
+        texto.detach()
+
+
+def _iter_filas_xlsx(archivo: BinaryIO) -> Iterator[list[Any]]:
+    import openpyxl
+
+    wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def formato_import(filename: str | None) -> str:
+    """Formato por extensión; ValueError si no es CSV / XLSX."""
+    ext = (filename or "").rsplit(".", 1)[-1].lower()
+    if ext not in FORMATOS_IMPORT:
+        raise ValueError("Formato no soportado: sube un archivo .csv o .xlsx.")
+    return ext
+
+
+def iter_registros(archivo: BinaryIO, formato: str) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    (número de fila en el archivo, {campo: valor}) desde la fila 2.
+    El encabezado se mapea por alias; filas completamente vacías se omiten.
+    """
+    filas = _iter_filas_xlsx(archivo) if formato == "xlsx" else _iter_filas_csv(archivo)
+
+    header = next(filas, None)
+    if not header:
+        raise ValueError("El archivo está vacío.")
+
+    columnas = [_ALIAS_COLUMNAS.get(_normalizar_header(h)) for h in header]
+    presentes = set(columnas)
+    if "cantidad" not in presentes or "slot" not in presentes:
+        raise ValueError("Faltan columnas obligatorias: cantidad y slot.")
+    if "producto" not in presentes and "codigo" not in presentes:
+        raise ValueError("Falta la columna producto o codigo (SKU / EAN).")
+
+    for n, row in enumerate(filas, start=2):
+        if not any(v not in (None, "") for v in row):
+            continue
+        reg: dict[str, Any] = {}
+        for campo, valor in zip(columnas, row):
+            if campo and reg.get(campo) in (None, ""):
+                reg[campo] = valor.strip() if isinstance(valor, str) else valor
+        yield n, reg
+
+
+# =========================================================
+# VALIDACIÓN
+# =========================================================
+
+def _parse_cantidad(valor: Any) -> int:
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        num = float(valor)
+    else:
+        num = float(str(valor or "").strip().replace(",", "."))
+    if num <= 0 or num != int(num):
+        raise ValueError
+    return int(num)
+
+
+def _parse_fecha(valor: Any) -> Optional[date]:
+    if valor in (None, ""):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    s = str(valor).strip()[:10]
+    for fmt in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError
+
+
+def _validar(
+    reg: dict[str, Any],
+    catalogo,
+    slots: dict[str, tuple[int, str]],
+    ahora: datetime,
+) -> _FilaImport:
+    """Fila -> _FilaImport; ValueError con mensaje para el reporte."""
+    codigo = str(reg.get("codigo") or "").strip() or None
+    nombre = str(reg.get("producto") or "").strip()
+
+    # Igual que entrada_submit: primero SKU/EAN, luego nombre (solo activos)
+    producto = catalogo.activos_por_codigo.get(codigo) if codigo else None
+    if producto is None and nombre:
+        producto = catalogo.activos_por_nombre.get(normalizar_nombre(nombre))
+    if producto is None:
+        raise ValueError(f"Producto no encontrado o inactivo ({codigo or nombre or 'vacío'}).")
+
+    slot = slots.get(str(reg.get("slot") or "").strip().upper())
+    if slot is None:
+        raise ValueError(f"Slot no válido ({reg.get('slot') or 'vacío'}).")
+
+    try:
+        cantidad = _parse_cantidad(reg.get("cantidad"))
+    except ValueError:
+        raise ValueError("La cantidad debe ser un número entero positivo.") from None
+
+    try:
+        fv = _parse_fecha(reg.get("fecha_vencimiento"))
+    except ValueError:
+        raise ValueError("Fecha de vencimiento inválida (YYYY-MM-DD).") from None
+
+    try:
+        fecha = _parse_fecha(reg.get("fecha"))
+    except ValueError:
+        raise ValueError("Fecha de movimiento inválida (YYYY-MM-DD).") from None
+
+    return _FilaImport(
+        producto=producto,
+        slot_id=slot[0],
+        zona=slot[1],
+        cantidad=cantidad,
+        fecha=datetime.combine(fecha, datetime.min.time()) if fecha else ahora,
+        fecha_vencimiento=fv,
+        codigo=codigo,
+    )
+
+
+# =========================================================
+# ESCRITURA POR LOTES
+# =========================================================
+
+def _escribir_lote(db: Session, negocio_id: int, usuario: str, lote: list[_FilaImport]) -> None:
+    """Movimientos + saldos + lotes FEFO del lote vía registrar_movimientos_bulk."""
+    movimientos = [
+        {
+            "usuario": usuario,
+            "tipo": "entrada",
+            "producto": f.producto.nombre,
+            "cantidad": f.cantidad,
+            "zona": f.zona,
+            "producto_id": f.producto.id,
+            "slot_id": f.slot_id,
+            "fecha": f.fecha,
+            "fecha_vencimiento": f.fecha_vencimiento,
+            "codigo_producto": f.codigo,
+        }
+        for f in lote
+    ]
+    registrar_movimientos_bulk(db, negocio_id, movimientos)
+
+
+# =========================================================
+# API
+# =========================================================
+
+def importar_movimientos(
+    db: Session,
+    *,
+    user: dict,
+    archivo: BinaryIO,
+    filename: str,
+    omitir_invalidas: bool = False,
+) -> ResultadoImport:
+    """
+    Importa entradas desde un CSV / XLSX (ver PLANTILLA_HEADERS).
+
+    - Sin errores (o con omitir_invalidas=True): commit único + auditoría
+      resumen + alertas por producto tocado.
+    - Con errores y omitir_invalidas=False: rollback, no se importa nada; el
+      resultado trae las filas con error.
+    ValueError: formato / encabezado inválido o archivo sobre el máximo de filas.
+    """
+    t0 = time.perf_counter()
+    negocio_id = int(user["negocio_id"])
+    formato = formato_import(filename)
+
+    catalogo = get_catalogo_productos(db, negocio_id)
+    slots = {
+        (s.codigo_full or "").strip().upper(): (int(s.id), s.codigo_full)
+        for s in get_slots_negocio(db, negocio_id)
+        if s.codigo_full
+    }
+
+    res = ResultadoImport()
+    tocados: dict[int, str] = {}
+    lote: list[_FilaImport] = []
+    batch = max(1, settings.MOVIMIENTOS_IMPORT_BATCH_SIZE)
+    ahora = utcnow()
+
+    try:
+        for n, reg in iter_registros(archivo, formato):
+            res.filas_leidas += 1
+            if res.filas_leidas > settings.MOVIMIENTOS_IMPORT_MAX_FILAS:
+                raise ValueError(
+                    f"El archivo supera el máximo de {settings.MOVIMIENTOS_IMPORT_MAX_FILAS} filas por importación."
+                )
+
+            try:
+                fila = _validar(reg, catalogo, slots, ahora)
+            except ValueError as e:
+                res.filas_con_error += 1
+                if len(res.errores) < settings.MOVIMIENTOS_IMPORT_MAX_ERRORES:
+                    res.errores.append({"fila": n, "error": str(e)})
+                continue
+
+            res.filas_validas += 1
+            res.cantidad_total += fila.cantidad
+            tocados[fila.producto.id] = fila.producto.nombre
+
+            # Con errores y todo-o-nada ya no se escribe: solo se sigue validando
+            if res.filas_con_error and not omitir_invalidas:
+                lote.clear()
+                continue
+
+            lote.append(fila)
+            if len(lote) >= batch:
+                _escribir_lote(db, negocio_id, user["email"], lote)
+                res.filas_importadas += len(lote)
+                lote.clear()
+
+        if res.filas_con_error and not omitir_invalidas:
+            db.rollback()
+            res.filas_importadas = 0
+            res.duracion_s = time.perf_counter() - t0
+            return res
+
+        if lote:
+            _escribir_lote(db, negocio_id, user["email"], lote)
+            res.filas_importadas += len(lote)
+            lote.clear()
+    except Exception:
+        db.rollback()
+        raise
+
+    res.productos = len(tocados)
+    res.aplicado = res.filas_importadas > 0
+
+    if res.aplicado:
+        audit(
+            db,
+            action=AuditAction.MOVIMIENTOS_IMPORT,
+            user=user,
+            entity_type="movimiento",
+            extra={
+                "archivo": filename,
+                "filas_leidas": res.filas_leidas,
+                "filas_importadas": res.filas_importadas,
+                "filas_con_error": res.filas_con_error,
+                "productos": res.productos,
+                "cantidad_total": res.cantidad_total,
+            },
+        )
+        db.commit()
+
+        # Una evaluación por producto (no por fila), ya con los saldos finales
+        for producto_id, nombre in tocados.items():
+            evaluar_alertas_stock(
+                db=db,
+                user=user,
+                producto_nombre=nombre,
+                origen="importacion",
+                motivo=None,
+                producto_id=producto_id,
+            )
+            evaluar_alertas_vencimiento(
+                db=db,
+                user=user,
+                producto_nombre=nombre,
+                origen="importacion",
+            )
+
+    res.duracion_s = time.perf_counter() - t0
+    logger.info(
+        "[IMPORT_MOVIMIENTOS] negocio_id=%s archivo=%s leidas=%s importadas=%s errores=%s productos=%s %.2fs",
+        negocio_id,
+        filename,
+        res.filas_leidas,
+        res.filas_importadas,
+        res.filas_con_error,
+        res.productos,
+        res.duracion_s,
+    )
+    return res
+
+
+def plantilla_csv() -> str:
+    """CSV de ejemplo (encabezado + una fila) para descargar desde la UI."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(PLANTILLA_HEADERS)
+    writer.writerow(["7801234567890", "Producto ejemplo", 10, "A-01-01", "2026-12-31"])
+    return "\ufeff" + buf.getvalue()
@@ -0,0 +1,305 @@
+﻿# services/services_movimientos.py
+"""
+Listado de movimientos – ORBION WMS
+
+✔ Paginación keyset sobre (fecha, id) DESC: profundidad arbitraria, costo
+  constante por página (índice negocio_id, fecha, id)
+✔ KPIs en 1 agregado SQL (COUNT + SUM(CASE ...)) sobre el set filtrado
+✔ Facetas de filtro (productos / usuarios / tipos) cacheadas por negocio:
+   - carga en frío con DISTINCT sobre el ledger (incluye nombres históricos)
+   - movimientos nuevos agregan sus valores al cache recién al commit
+     (buffer por sesión; un rollback los descarta). Los INSERT masivos de
+     Core los encolan con encolar_facetas_movimientos
+   - edición / borrado de movimientos invalida el cache del negocio
+   - el cache guarda frozensets: se reemplazan bajo lock, nunca se mutan
+"""
+
+from __future__ import annotations
+
+import base64
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import chain
+from typing import Optional
+
+from sqlalchemy import and_, case, event, func, or_
+from sqlalchemy.orm import Query, Session
+
+from core.cache import LRUTTLCache
+from core.config import settings
+from core.models import Movimiento
+from core.services.services_search import filtro_texto
+
+
+# Tipos base del ledger (siempre disponibles en el filtro)
+TIPOS_BASE = ("ajuste", "entrada", "salida")
+
+MOTIVO_AJUSTE_INVENTARIO = "ajuste_inventario"
+
+
+# =========================================================
+# FILTROS
+# =========================================================
+
+@dataclass(frozen=True)
+class FiltrosMovimientos:
+    desde: str = ""
+    hasta: str = ""
+    tipo: str = ""
+    producto: str = ""
+    usuario: str = ""
+
+
+def aplicar_filtros(query: Query, negocio_id: int, f: FiltrosMovimientos) -> Query:
+    query = query.filter(Movimiento.negocio_id == negocio_id)
+
+    # Filtro por fecha desde
+    if f.desde:
+        try:
+            query = query.filter(Movimiento.fecha >= datetime.strptime(f.desde, "%Y-%m-%d"))
+        except ValueError:
+            pass
+
+    # Filtro por fecha hasta (inclusive día completo)
+    if f.hasta:
+        try:
+            dt_hasta = datetime.strptime(f.hasta, "%Y-%m-%d")
+            query = query.filter(Movimiento.fecha <= dt_hasta.replace(hour=23, minute=59, second=59))
+        except ValueError:
+            pass
+
+    if f.tipo:
+        query = query.filter(Movimiento.tipo == f.tipo)
+
+    # producto / usuario: contiene, case-insensitive (índice de búsqueda)
+    if f.producto:
+        query = query.filter(filtro_texto("movimientos", f.producto, columnas=("producto",)))
+    if f.usuario:
+        query = query.filter(filtro_texto("movimientos", f.usuario, columnas=("usuario",)))
+
+    return query
+
+
+# =========================================================
+# KEYSET (fecha, id)
+# =========================================================
+
+def encode_cursor(fecha: datetime, mov_id: int) -> str:
+    raw = f"{fecha.isoformat()}|{int(mov_id)}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> Optional[tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        fecha_str, id_str = base64.urlsafe_b64decode(cursor + pad).decode().split("|", 1)
+        return datetime.fromisoformat(fecha_str), int(id_str)
+    except Exception:
+        return None
+
+
+@dataclass
+class PaginaMovimientos:
+    items: list
+    cursor_siguiente: Optional[str]  # página más antigua
+    cursor_anterior: Optional[str]   # página más reciente
+
+
+def listar_movimientos_keyset(
+    db: Session,
+    negocio_id: int,
+    filtros: FiltrosMovimientos,
+    *,
+    despues: str | None = None,
+    antes: str | None = None,
+    limit: int = 100,
+) -> PaginaMovimientos:
+    """
+    Página de movimientos (más reciente primero).
+
+    - despues=<cursor>: filas más antiguas que el cursor (página siguiente)
+    - antes=<cursor>:   filas más recientes que el cursor (página anterior)
+    - sin cursor:       primera página
+    Se lee limit+1 para saber si hay más filas en esa dirección.
+    """
+    limit = max(1, min(int(limit or 100), 500))
+    q = aplicar_filtros(db.query(Movimiento), negocio_id, filtros)
+
+    cur_despues = decode_cursor(despues)
+    cur_antes = None if cur_despues else decode_cursor(antes)
+
+    if cur_antes:
+        f, i = cur_antes
+        q = q.filter(or_(Movimiento.fecha > f, and_(Movimiento.fecha == f, Movimiento.id > i)))
+        filas = q.order_by(Movimiento.fecha.asc(), Movimiento.id.asc()).limit(limit + 1).all()
+        hay_mas = len(filas) > limit
+        items = list(reversed(filas[:limit]))
+        hay_siguiente, hay_anterior = True, hay_mas
+    else:
+        if cur_despues:
+            f, i = cur_despues
+            q = q.filter(or_(Movimiento.fecha < f, and_(Movimiento.fecha == f, Movimiento.id < i)))
+        filas = q.order_by(Movimiento.fecha.desc(), Movimiento.id.desc()).limit(limit + 1).all()
+        items = filas[:limit]
+        hay_siguiente, hay_anterior = len(filas) > limit, cur_despues is not None
+
+    return PaginaMovimientos(
+        items=items,
+        cursor_siguiente=encode_cursor(items[-1].fecha, items[-1].id) if items and hay_siguiente else None,
+        cursor_anterior=encode_cursor(items[0].fecha, items[0].id) if items and hay_anterior else None,
+    )
+
+
+# =========================================================
+# KPIs (1 agregado)
+# =========================================================
+
+def kpis_movimientos(db: Session, negocio_id: int, filtros: FiltrosMovimientos) -> dict[str, int]:
+    """
+    Totales sobre el set filtrado completo:
+      total, entradas, salidas (sin ajustes de inventario) y ajustes.
+    """
+    es_ajuste = func.lower(func.trim(func.coalesce(Movimiento.motivo_salida, ""))) == MOTIVO_AJUSTE_INVENTARIO
+
+    q = db.query(
+        func.count(Movimiento.id),
+        func.coalesce(func.sum(case((es_ajuste, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((and_(Movimiento.tipo == "entrada", ~es_ajuste), 1), else_=0)), 0),
+        func.coalesce(func.sum(case((and_(Movimiento.tipo == "salida", ~es_ajuste), 1), else_=0)), 0),
+    )
+    total, ajustes, entradas, salidas = aplicar_filtros(q, negocio_id, filtros).one()
+
+    return {
+        "total": int(total or 0),
+        "entradas": int(entradas or 0),
+        "salidas": int(salidas or 0),
+        "ajustes": int(ajustes or 0),
+    }
+
+
+# =========================================================
+# FACETAS (cache por negocio)
+# =========================================================
+
+_facetas_cache = LRUTTLCache(
+    max_entries=settings.MOVIMIENTOS_FACETAS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.MOVIMIENTOS_FACETAS_CACHE_TTL_SECONDS,
+)
+
+
+_facetas_lock = threading.Lock()
+
+_FACETAS_INFO_KEY = "movimientos_facetas_pendientes"
+_FACETAS_CAMPOS = ("productos", "usuarios", "tipos")
+
+
+def _distintos(db: Session, col, negocio_id: int) -> frozenset[str]:
+    rows = db.query(col).filter(Movimiento.negocio_id == negocio_id).distinct().all()
+    return frozenset(r[0] for r in rows if r[0])
+
+
+def _cargar_facetas(db: Session, negocio_id: int) -> dict[str, frozenset[str]]:
+    return {
+        "productos": _distintos(db, Movimiento.producto, negocio_id),
+        "usuarios": _distintos(db, Movimiento.usuario, negocio_id),
+        "tipos": _distintos(db, Movimiento.tipo, negocio_id) | frozenset(TIPOS_BASE),
+    }
+
+
+def get_facetas_movimientos(db: Session, negocio_id: int) -> dict[str, list[str]]:
+    """productos / usuarios / tipos para los combos de filtro (ordenados)."""
+    facetas = _facetas_cache.get(int(negocio_id))
+    if facetas is None:
+        facetas = _cargar_facetas(db, negocio_id)
+        _facetas_cache.set(int(negocio_id), facetas)
+
+    return {k: sorted(v) for k, v in facetas.items()}
+
+
+def invalidar_facetas_movimientos(negocio_id: int) -> None:
+    _facetas_cache.delete(int(negocio_id))
+
+
+def _agregar_facetas(negocio_id: int, nuevos: dict[str, set[str]]) -> None:
+    with _facetas_lock:
+        facetas = _facetas_cache.get(negocio_id)
+        if facetas is None:
+            return
+        if all(nuevos[k] <= facetas[k] for k in _FACETAS_CAMPOS):
+            return
+        _facetas_cache.set(negocio_id, {k: facetas[k] | nuevos[k] for k in _FACETAS_CAMPOS})
+
+
+# =========================================================
+# SESSION HOOKS (aplicar solo lo commiteado)
+# =========================================================
+
+def _pendientes(session: Session) -> dict:
+    return session.info.setdefault(_FACETAS_INFO_KEY, {"nuevos": {}, "invalidar": set()})
+
+
+def _anotar_valores(pend: dict, nid: int, producto: str | None, usuario: str | None, tipo: str | None) -> None:
+    # valores nuevos del ledger (ej: nombre histórico, usuario externo)
+    nuevos = pend["nuevos"].setdefault(nid, {k: set() for k in _FACETAS_CAMPOS})
+    if producto:
+        nuevos["productos"].add(producto)
+    if usuario:
+        nuevos["usuarios"].add(usuario)
+    if tipo:
+        nuevos["tipos"].add(tipo)
+
+
+def encolar_facetas_movimientos(session: Session, negocio_id: int, movimientos: list[dict]) -> None:
+    """
+    Para movimientos insertados por fuera del ORM (INSERT masivo de Core, que
+    no pasa por after_flush): encola sus valores en el buffer de la sesión;
+    se aplican al commit / se descartan en rollback igual que los del ORM.
+    """
+    pend = _pendientes(session)
+    nid = int(negocio_id)
+    for m in movimientos:
+        _anotar_valores(pend, nid, m.get("producto"), m.get("usuario"), m.get("tipo"))
+
+
+@event.listens_for(Session, "after_flush")
+def _track_facetas(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Movimiento) or obj.negocio_id is None:
+            continue
+        nid = int(obj.negocio_id)
+
+        if obj in session.new:
+            _anotar_valores(_pendientes(session), nid, obj.producto, obj.usuario, obj.tipo)
+        else:
+            _pendientes(session)["invalidar"].add(nid)
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_facetas(session: Session) -> None:
+    # commit de un SAVEPOINT: la transacción externa sigue abierta
+    if session.in_nested_transaction():
+        return
+    pend = session.info.pop(_FACETAS_INFO_KEY, None)
+    if not pend:
+        return
+    for nid in pend["invalidar"]:
+        invalidar_facetas_movimientos(nid)
+    for nid, nuevos in pend["nuevos"].items():
+        if nid not in pend["invalidar"]:
+            _agregar_facetas(nid, nuevos)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_facetas(session: Session) -> None:
+    pend = session.info.get(_FACETAS_INFO_KEY)
+    if not pend:
+        return
+    if session.in_nested_transaction():
+        # rollback de un SAVEPOINT: no se sabe qué valores sobreviven -> recargar al commit
+        pend["invalidar"].update(pend["nuevos"])
+        pend["nuevos"].clear()
+        return
+    session.info.pop(_FACETAS_INFO_KEY, None)
@@ -0,0 +1,961 @@
+﻿# services/services_stock_saldos.py
+"""
+Saldos de stock materializados – ORBION WMS
+
+✔ Tabla stock_saldos = proyección del ledger (movimientos)
+✔ Tabla stock_lotes = lotes FEFO vivos (consumidos al registrar salidas)
+✔ Mantenimiento incremental en la MISMA transacción del movimiento
+✔ Variante por lotes (registrar_movimientos_bulk) para importaciones / conteos
+✔ Lecturas O(filas con stock) (sin re-sumar el historial)
+✔ Rebuild / verify desde el ledger (job operativo)
+✔ producto_id / slot_id (FK) en movimientos y saldos: readers agrupan/joinean por entero
+
+Regla de signo (única para todo el WMS):
+- salida  -> resta
+- ajuste con cantidad negativa -> resta
+- resto (entrada, ajuste+) -> suma
+"""
+
+from __future__ import annotations
+
+import bisect
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import and_, bindparam, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.logging_config import logger
+from core.models import Movimiento, Producto, Slot, StockLote, StockSaldo, Ubicacion, Zona
+from core.models.time import utcnow
+from modules.basic_wms.services.services_movimientos import encolar_facetas_movimientos
+
+
+# Tolerancia para comparar saldos float en verify
+_EPS = 1e-6
+
+
+# =========================================================
+# HELPERS
+# =========================================================
+
+def producto_key(nombre: str | None) -> str:
+    """Clave normalizada de producto (misma regla en writers y readers)."""
+    return (nombre or "").strip().lower()
+
+
+def delta_movimiento(tipo: str | None, cantidad: float | int | None) -> float:
+    """Cantidad con signo que aporta un movimiento al saldo."""
+    qty = float(cantidad or 0)
+    if tipo == "salida" or (tipo == "ajuste" and qty < 0):
+        return -abs(qty)
+    return abs(qty)
+
+
+def _query_saldo(db: Session, negocio_id: int, key: str, zona: str):
+    return (
+        db.query(StockSaldo)
+        .filter(StockSaldo.negocio_id == negocio_id)
+        .filter(StockSaldo.producto_key == key)
+        .filter(StockSaldo.zona == zona)
+    )
+
+
+def _get_or_create_saldo(
+    db: Session,
+    negocio_id: int,
+    producto: str,
+    zona: str,
+    *,
+    producto_id: Optional[int] = None,
+    slot_id: Optional[int] = None,
+) -> StockSaldo:
+    key = producto_key(producto)
+
+    row = _query_saldo(db, negocio_id, key, zona).first()
+    if row:
+        return row
+
+    for _ in range(2):
+        try:
+            with db.begin_nested():
+                row_new = StockSaldo(
+                    negocio_id=negocio_id,
+                    producto_key=key,
+                    producto=producto.strip(),
+                    zona=zona,
+                    producto_id=producto_id,
+                    slot_id=slot_id,
+                    cantidad=0.0,
+                )
+                db.add(row_new)
+                db.flush()
+                return row_new
+        except IntegrityError:
+            row2 = _query_saldo(db, negocio_id, key, zona).first()
+            if row2:
+                return row2
+            continue
+
+    raise IntegrityError(
+        statement=None,
+        params=None,
+        orig=Exception("No se pudo crear/obtener StockSaldo tras colisión."),
+    )
+
+
+def _orden_fefo(fv: date | None, ref: int) -> tuple:
+    """Orden FEFO: vence antes primero, sin fecha al final, luego por llegada."""
+    return (fv is None, fv or date(9999, 12, 31), ref)
+
+
+def _consumir_lotes_fefo(
+    db: Session,
+    negocio_id: int,
+    key: str,
+    zona: str,
+    cantidad: float,
+) -> float:
+    """
+    Consume `cantidad` de los lotes vivos del (producto, slot) en orden FEFO.
+    Lotes agotados se eliminan. Retorna lo que no se pudo cubrir con lotes.
+    """
+    lotes = (
+        db.query(StockLote)
+        .filter(StockLote.negocio_id == negocio_id)
+        .filter(StockLote.producto_key == key)
+        .filter(StockLote.zona == zona)
+        .order_by(
+            StockLote.fecha_vencimiento.is_(None),
+            StockLote.fecha_vencimiento.asc(),
+            StockLote.id.asc(),
+        )
+        .with_for_update()
+        .all()
+    )
+
+    pendiente = float(cantidad)
+    for lote in lotes:
+        if pendiente <= _EPS:
+            break
+        disp = float(lote.cantidad_restante or 0.0)
+        usar = min(disp, pendiente)
+        pendiente -= usar
+        if disp - usar <= _EPS:
+            db.delete(lote)
+        else:
+            lote.cantidad_restante = disp - usar
+
+    return max(pendiente, 0.0)
+
+
+# =========================================================
+# WRITE PATH
+# =========================================================
+
+def resolver_ids_movimiento(db: Session, mov: Movimiento) -> Movimiento:
+    """
+    Completa producto_id / slot_id desde los strings si el caller no los trae
+    (rutas que ya tienen Producto/Slot cargados los pasan directo, sin query).
+    """
+    nid = int(mov.negocio_id)
+
+    if mov.producto_id is None and (mov.producto or "").strip():
+        row = (
+            db.query(Producto.id)
+            .filter(Producto.negocio_id == nid)
+            .filter(func.lower(func.trim(Producto.nombre)) == producto_key(mov.producto))
+            .order_by(Producto.id.asc())
+            .first()
+        )
+        mov.producto_id = int(row[0]) if row else None
+
+    if mov.slot_id is None and (mov.zona or "").strip():
+        row = (
+            db.query(Slot.id)
+            .join(Ubicacion, Slot.ubicacion_id == Ubicacion.id)
+            .join(Zona, Ubicacion.zona_id == Zona.id)
+            .filter(Zona.negocio_id == nid)
+            .filter(Slot.codigo_full == mov.zona.strip())
+            .order_by(Slot.id.asc())
+            .first()
+        )
+        mov.slot_id = int(row[0]) if row else None
+
+    return mov
+
+
+def aplicar_movimiento(db: Session, mov: Movimiento) -> float:
+    """
+    Aplica el delta de un Movimiento a su saldo (producto, slot) y a sus lotes FEFO.
+
+    - NO hace commit: el caller commitea movimiento + saldo + lotes juntos.
+    - Incremento atómico (UPDATE cantidad = cantidad + delta), sin lost update.
+    - Delta positivo crea lote; delta negativo consume lotes FEFO.
+    Retorna el saldo resultante.
+    """
+    nombre = (mov.producto or "").strip()
+    zona = (mov.zona or "").strip()
+    if not nombre:
+        return 0.0
+
+    row = _get_or_create_saldo(
+        db,
+        int(mov.negocio_id),
+        nombre,
+        zona,
+        producto_id=mov.producto_id,
+        slot_id=mov.slot_id,
+    )
+    delta = delta_movimiento(mov.tipo, mov.cantidad)
+
+    valores = {
+        "cantidad": StockSaldo.cantidad + delta,
+        "producto": nombre,
+        "updated_at": utcnow(),
+    }
+    if mov.producto_id is not None:
+        valores["producto_id"] = mov.producto_id
+    if mov.slot_id is not None:
+        valores["slot_id"] = mov.slot_id
+
+    db.execute(
+        update(StockSaldo)
+        .where(StockSaldo.id == row.id)
+        .values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+
+    if delta > 0:
+        db.add(
+            StockLote(
+                negocio_id=int(mov.negocio_id),
+                movimiento_id=mov.id,
+                producto_key=producto_key(nombre),
+                producto=nombre,
+                zona=zona,
+                fecha_vencimiento=mov.fecha_vencimiento,
+                cantidad_inicial=delta,
+                cantidad_restante=delta,
+            )
+        )
+    elif delta < 0:
+        _consumir_lotes_fefo(db, int(mov.negocio_id), producto_key(nombre), zona, -delta)
+
+    db.flush()
+    db.expire(row)
+
+    return float(row.cantidad or 0.0)
+
+
+def registrar_movimiento(db: Session, mov: Movimiento) -> Movimiento:
+    """
+    Helper para las rutas: agrega el movimiento y actualiza su saldo
+    en la misma unidad de trabajo (commit lo hace el caller).
+    """
+    resolver_ids_movimiento(db, mov)
+    db.add(mov)
+    db.flush()
+    aplicar_movimiento(db, mov)
+    return mov
+
+
+# =========================================================
+# WRITE PATH (LOTES / BULK)
+# =========================================================
+
+def _saldo_ids_bulk(
+    db: Session,
+    negocio_id: int,
+    pares: dict[tuple[str, str], dict],
+) -> dict[tuple[str, str], int]:
+    """
+    (producto_key, zona) -> StockSaldo.id. Los que faltan se crean en un
+    INSERT executemany; ante colisión concurrente, fallback fila a fila.
+    """
+    keys = sorted({k for k, _ in pares})
+    existentes = {
+        (k, z): int(sid)
+        for sid, k, z in db.execute(
+            select(StockSaldo.id, StockSaldo.producto_key, StockSaldo.zona)
+            .where(StockSaldo.negocio_id == negocio_id)
+            .where(StockSaldo.producto_key.in_(keys))
+        )
+        if (k, z) in pares
+    }
+
+    faltantes = [par for par in pares if par not in existentes]
+    if not faltantes:
+        return existentes
+
+    ahora = utcnow()
+    try:
+        with db.begin_nested():
+            ids = db.execute(
+                StockSaldo.__table__.insert().returning(StockSaldo.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "negocio_id": negocio_id,
+                        "producto_key": par[0],
+                        "producto": pares[par]["producto"],
+                        "zona": par[1],
+                        "producto_id": pares[par]["producto_id"],
+                        "slot_id": pares[par]["slot_id"],
+                        "cantidad": 0.0,
+                        "updated_at": ahora,
+                    }
+                    for par in faltantes
+                ],
+            ).scalars().all()
+        existentes.update(zip(faltantes, (int(i) for i in ids)))
+    except IntegrityError:
+        for par in faltantes:
+            info = pares[par]
+            row = _get_or_create_saldo(
+                db,
+                negocio_id,
+                info["producto"],
+                par[1],
+                producto_id=info["producto_id"],
+                slot_id=info["slot_id"],
+            )
+            existentes[par] = int(row.id)
+
+    return existentes
+
+
+def _lotes_vivos_bulk(
+    db: Session,
+    negocio_id: int,
+    pares: set[tuple[str, str]],
+) -> dict[tuple[str, str], list]:
+    """
+    Lotes vivos de los pares en orden FEFO (un SELECT ... FOR UPDATE):
+      (producto_key, zona) -> [[orden, {"id", "cantidad_restante", "original"}], ...]
+    """
+    rows = (
+        db.query(StockLote.id, StockLote.producto_key, StockLote.zona, StockLote.fecha_vencimiento, StockLote.cantidad_restante)
+        .filter(StockLote.negocio_id == negocio_id)
+        .filter(StockLote.producto_key.in_(sorted({k for k, _ in pares})))
+        .order_by(
+            StockLote.fecha_vencimiento.is_(None),
+            StockLote.fecha_vencimiento.asc(),
+            StockLote.id.asc(),
+        )
+        .with_for_update()
+        .all()
+    )
+
+    out: dict[tuple[str, str], list] = {}
+    for lote_id, key, zona, fv, restante in rows:
+        if (key, zona) not in pares:
+            continue
+        out.setdefault((key, zona), []).append(
+            [(*_orden_fefo(fv, 0), int(lote_id)), {"id": int(lote_id), "cantidad_restante": float(restante or 0.0), "original": float(restante or 0.0)}]
+        )
+    return out
+
+
+def registrar_movimientos_bulk(db: Session, negocio_id: int, movimientos: list[dict]) -> list[int]:
+    """
+    Equivalente por lotes de registrar_movimiento (importaciones, conteos):
+    mismo efecto sobre ledger + saldos + lotes FEFO, en pocas sentencias
+    executemany en vez de flush + UPDATE + lotes por fila.
+
+    - movimientos: dicts con columnas de Movimiento (producto_id / slot_id ya
+      resueltos por el caller).
+    - Saldos: un UPDATE cantidad = cantidad + delta por (producto, slot).
+    - Lotes: deltas positivos crean lotes; negativos consumen FEFO en memoria
+      (lotes vivos cargados con un solo SELECT FOR UPDATE) y se persisten
+      con DELETE / UPDATE / INSERT por lote de sentencias.
+    - Facetas de /movimientos: encoladas en la sesión (se aplican al commit).
+    - NO hace commit. Retorna los ids de movimientos en el mismo orden.
+    """
+    if not movimientos:
+        return []
+
+    ids = [
+        int(i)
+        for i in db.execute(
+            Movimiento.__table__.insert().returning(Movimiento.id, sort_by_parameter_order=True),
+            [{**m, "negocio_id": negocio_id} for m in movimientos],
+        ).scalars()
+    ]
+    # El INSERT de Core no pasa por after_flush: facetas de /movimientos al commit
+    encolar_facetas_movimientos(db, negocio_id, movimientos)
+
+    # Deltas agregados por (producto, slot)
+    pares: dict[tuple[str, str], dict] = {}
+    deltas: list[float] = []
+    for m in movimientos:
+        nombre = (m.get("producto") or "").strip()
+        par = (producto_key(nombre), (m.get("zona") or "").strip())
+        delta = delta_movimiento(m.get("tipo"), m.get("cantidad"))
+        deltas.append(delta)
+        info = pares.setdefault(par, {"producto": nombre, "producto_id": None, "slot_id": None, "delta": 0.0})
+        info["producto"] = nombre
+        if m.get("producto_id") is not None:
+            info["producto_id"] = m["producto_id"]
+        if m.get("slot_id") is not None:
+            info["slot_id"] = m["slot_id"]
+        info["delta"] += delta
+
+    saldo_ids = _saldo_ids_bulk(db, negocio_id, pares)
+    tabla = StockSaldo.__table__
+    ahora = utcnow()
+    db.execute(
+        tabla.update()
+        .where(tabla.c.id == bindparam("_id"))
+        .values(
+            cantidad=tabla.c.cantidad + bindparam("_delta"),
+            producto=bindparam("_producto"),
+            producto_id=func.coalesce(bindparam("_producto_id"), tabla.c.producto_id),
+            slot_id=func.coalesce(bindparam("_slot_id"), tabla.c.slot_id),
+            updated_at=ahora,
+        ),
+        [
+            {
+                "_id": saldo_ids[par],
+                "_delta": info["delta"],
+                "_producto": info["producto"],
+                "_producto_id": info["producto_id"],
+                "_slot_id": info["slot_id"],
+            }
+            for par, info in pares.items()
+        ],
+    )
+
+    # Lotes FEFO, en orden de llegada (igual que el replay del ledger)
+    con_salida = {
+        (producto_key(m.get("producto")), (m.get("zona") or "").strip())
+        for m, delta in zip(movimientos, deltas)
+        if delta < 0
+    }
+    vivos = _lotes_vivos_bulk(db, negocio_id, con_salida) if con_salida else {}
+    nuevos: list[dict] = []
+    borrar: set[int] = set()
+
+    for seq, (mov_id, m, delta) in enumerate(zip(ids, movimientos, deltas), start=1):
+        nombre = (m.get("producto") or "").strip()
+        par = (producto_key(nombre), (m.get("zona") or "").strip())
+        if not nombre or delta == 0:
+            continue
+
+        if delta > 0:
+            fv = m.get("fecha_vencimiento")
+            lote = {
+                "negocio_id": negocio_id,
+                "movimiento_id": mov_id,
+                "producto_key": par[0],
+                "producto": nombre,
+                "zona": par[1],
+                "fecha_vencimiento": fv,
+                "cantidad_inicial": delta,
+                "cantidad_restante": delta,
+                "created_at": ahora,
+            }
+            nuevos.append(lote)
+            if par in con_salida:
+                # lotes nuevos van después de los existentes con igual vencimiento
+                bisect.insort(vivos.setdefault(par, []), [(*_orden_fefo(fv, 1), seq), lote])
+            continue
+
+        pendiente = -delta
+        lotes = vivos.get(par, [])
+        agotados = 0
+        for _orden, lote in lotes:
+            if pendiente <= _EPS:
+                break
+            usar = min(lote["cantidad_restante"], pendiente)
+            lote["cantidad_restante"] -= usar
+            pendiente -= usar
+            if lote["cantidad_restante"] <= _EPS:
+                agotados += 1
+                if "id" in lote:
+                    borrar.add(lote["id"])
+        del lotes[:agotados]
+
+    if borrar:
+        db.execute(delete(StockLote).where(StockLote.id.in_(sorted(borrar))).execution_options(synchronize_session=False))
+
+    parciales = [
+        {"_id": lote["id"], "_restante": lote["cantidad_restante"]}
+        for lotes in vivos.values()
+        for _orden, lote in lotes
+        if "id" in lote and abs(lote["cantidad_restante"] - lote["original"]) > _EPS
+    ]
+    if parciales:
+        tabla_lotes = StockLote.__table__
+        db.execute(
+            tabla_lotes.update()
+            .where(tabla_lotes.c.id == bindparam("_id"))
+            .values(cantidad_restante=bindparam("_restante")),
+            parciales,
+        )
+
+    nuevos = [lote for lote in nuevos if lote["cantidad_restante"] > _EPS]
+    if nuevos:
+        db.execute(StockLote.__table__.insert(), nuevos)
+
+    return ids
+
+
+# =========================================================
+# READ PATH
+# =========================================================
+
+def get_stock_slot(
+    db: Session,
+    negocio_id: int,
+    producto: str,
+    zona: str,
+    *,
+    for_update: bool = False,
+) -> float:
+    """
+    Stock actual de un producto en un slot (codigo_full).
+    for_update=True bloquea la fila (Postgres) para validar + descontar
+    dentro de la misma transacción.
+    """
+    q = (
+        db.query(StockSaldo.cantidad)
+        .filter(StockSaldo.negocio_id == negocio_id)
+        .filter(StockSaldo.producto_key == producto_key(producto))
+        .filter(StockSaldo.zona == (zona or "").strip())
+    )
+    if for_update:
+        q = q.with_for_update()
+
+    row = q.first()
+    return float(row[0]) if row and row[0] is not None else 0.0
+
+
+def get_total_producto(db: Session, negocio_id: int, producto: str) -> float:
+    """Stock total de un producto en el negocio (suma de todos sus slots)."""
+    total = (
+        db.query(func.coalesce(func.sum(StockSaldo.cantidad), 0.0))
+        .filter(StockSaldo.negocio_id == negocio_id)
+        .filter(StockSaldo.producto_key == producto_key(producto))
+        .scalar()
+    )
+    return float(total or 0.0)
+
+
+def get_total_producto_id(db: Session, negocio_id: int, producto_id: int) -> float:
+    """
+    Stock total de un producto por FK (incluye saldos bajo nombres anteriores)
+    + saldos sin FK bajo su nombre actual (ledger que el backfill no resolvió).
+    """
+    nombre = (
+        db.query(Producto.nombre)
+        .filter(Producto.negocio_id == negocio_id, Producto.id == int(producto_id))
+        .scalar()
+    )
+    cond = StockSaldo.producto_id == int(producto_id)
+    if nombre:
+        cond = or_(cond, and_(StockSaldo.producto_id.is_(None), StockSaldo.producto_key == producto_key(nombre)))
+
+    total = (
+        db.query(func.coalesce(func.sum(StockSaldo.cantidad), 0.0))
+        .filter(StockSaldo.negocio_id == negocio_id)
+        .filter(cond)
+        .scalar()
+    )
+    return float(total or 0.0)
+
+
+def get_totales_producto(db: Session, negocio_id: int) -> dict[str, float]:
+    """producto_key -> stock total del negocio (solo productos con saldo)."""
+    rows = (
+        db.query(StockSaldo.producto_key, func.sum(StockSaldo.cantidad))
+        .filter(StockSaldo.negocio_id == negocio_id)
+        .filter(StockSaldo.cantidad != 0)
+        .group_by(StockSaldo.producto_key)
+        .all()
+    )
+    return {str(k): float(v or 0.0) for k, v in rows}
+
+
+def get_saldos_negocio(
+    db: Session,
+    negocio_id: int,
+    *,
+    incluir_vacios: bool = False,
+) -> list[StockSaldo]:
+    """
+    Saldos (producto, slot) del negocio.
+    incluir_vacios=True devuelve también pares que alguna vez tuvieron stock.
+    """
+    q = db.query(StockSaldo).filter(StockSaldo.negocio_id == negocio_id)
+    if not incluir_vacios:
+        q = q.filter(StockSaldo.cantidad != 0)
+    return q.order_by(StockSaldo.zona.asc(), StockSaldo.producto_key.asc()).all()
+
+
+def get_vencimiento_min_por_slot(
+    db: Session,
+    negocio_id: int,
+) -> dict[tuple[str, str], date]:
+    """(producto_key, zona) -> fecha de vencimiento más próxima con stock vivo."""
+    rows = (
+        db.query(
+            StockLote.producto_key,
+            StockLote.zona,
+            func.min(StockLote.fecha_vencimiento),
+        )
+        .filter(StockLote.negocio_id == negocio_id)
+        .filter(StockLote.fecha_vencimiento.isnot(None))
+        .filter(StockLote.cantidad_restante > 0)
+        .group_by(StockLote.producto_key, StockLote.zona)
+        .all()
+    )
+    return {(str(k), str(z)): fv for k, z, fv in rows if fv is not None}
+
+
+def get_vencimiento_min_por_producto(db: Session, negocio_id: int) -> dict[str, date]:
+    """producto_key -> fecha de vencimiento más próxima con stock vivo (todos los slots)."""
+    rows = (
+        db.query(StockLote.producto_key, func.min(StockLote.fecha_vencimiento))
+        .filter(StockLote.negocio_id == negocio_id)
+        .filter(StockLote.fecha_vencimiento.isnot(None))
+        .filter(StockLote.cantidad_restante > 0)
+        .group_by(StockLote.producto_key)
+        .all()
+    )
+    return {str(k): fv for k, fv in rows if fv is not None}
+
+
+def get_vencimientos_producto(db: Session, negocio_id: int, producto: str) -> list[date]:
+    """Fechas de vencimiento distintas con stock vivo de un producto (ascendente)."""
+    rows = (
+        db.query(StockLote.fecha_vencimiento)
+        .filter(StockLote.negocio_id == negocio_id)
+        .filter(StockLote.producto_key == producto_key(producto))
+        .filter(StockLote.fecha_vencimiento.isnot(None))
+        .filter(StockLote.cantidad_restante > 0)
+        .distinct()
+        .order_by(StockLote.fecha_vencimiento.asc())
+        .all()
+    )
+    return [r[0] for r in rows if r[0] is not None]
+
+
+# =========================================================
+# REBUILD / VERIFY (ledger replay)
+# =========================================================
+
+def calcular_saldos_desde_movimientos(
+    db: Session,
+    negocio_id: int,
+) -> dict[tuple[str, str], dict]:
+    """
+    Replay del ledger de un negocio:
+      (producto_key, zona) -> {producto, producto_id, slot_id, cantidad, lotes}
+    lotes = lotes FEFO vivos [(orden, fv, qty, movimiento_id)] ordenados.
+    Se usa solo en rebuild/verify (streaming con yield_per).
+    """
+    q = (
+        db.query(
+            Movimiento.id,
+            Movimiento.producto,
+            Movimiento.zona,
+            Movimiento.tipo,
+            Movimiento.cantidad,
+            Movimiento.fecha_vencimiento,
+            Movimiento.producto_id,
+            Movimiento.slot_id,
+        )
+        .filter(Movimiento.negocio_id == negocio_id)
+        .order_by(Movimiento.fecha.asc(), Movimiento.id.asc())
+        .yield_per(5000)
+    )
+
+    out: dict[tuple[str, str], dict] = {}
+    llegada = 0
+    for mov_id, producto, zona, tipo, cantidad, fv, prod_id, slot_id in q:
+        nombre = (producto or "").strip()
+        if not nombre:
+            continue
+        key = (producto_key(nombre), (zona or "").strip())
+        info = out.setdefault(
+            key,
+            {"producto": nombre, "producto_id": None, "slot_id": None, "cantidad": 0.0, "lotes": []},
+        )
+        info["producto"] = nombre
+        if prod_id is not None:
+            info["producto_id"] = int(prod_id)
+        if slot_id is not None:
+            info["slot_id"] = int(slot_id)
+
+        delta = delta_movimiento(tipo, cantidad)
+        info["cantidad"] += delta
+
+        lotes = info["lotes"]
+        if delta > 0:
+            llegada += 1
+            bisect.insort(lotes, [_orden_fefo(fv, llegada), fv, delta, mov_id])
+        elif delta < 0:
+            pendiente = -delta
+            consumidos = 0
+            for lote in lotes:
+                if pendiente <= _EPS:
+                    break
+                usar = min(lote[2], pendiente)
+                lote[2] -= usar
+                pendiente -= usar
+                if lote[2] <= _EPS:
+                    consumidos += 1
+            del lotes[:consumidos]
+
+    return out
+
+
+def _lotes_por_fecha(lotes) -> dict:
+    """Agrega lotes por fecha de vencimiento (para comparar replay vs tabla)."""
+    out: dict = {}
+    for fv, qty in lotes:
+        out[fv] = out.get(fv, 0.0) + float(qty or 0.0)
+    return {k: v for k, v in out.items() if abs(v) > _EPS}
+
+
+def _negocio_ids_con_ledger(db: Session, negocio_id: Optional[int]) -> list[int]:
+    if negocio_id:
+        return [int(negocio_id)]
+
+    ids = {int(r[0]) for r in db.query(Movimiento.negocio_id).distinct().all()}
+    ids |= {int(r[0]) for r in db.query(StockSaldo.negocio_id).distinct().all()}
+    ids |= {int(r[0]) for r in db.query(StockLote.negocio_id).distinct().all()}
+    return sorted(ids)
+
+
+def verificar_stock_saldos(db: Session, negocio_id: Optional[int] = None) -> dict:
+    """
+    Compara stock_saldos y stock_lotes contra el replay del ledger (no escribe).
+    Retorna resumen + hasta 50 diferencias para diagnóstico.
+    """
+    counters = {"scanned": 0, "ok": 0, "mismatch": 0, "missing": 0, "orphan": 0, "lotes_mismatch": 0}
+    diffs: list[dict] = []
+
+    for nid in _negocio_ids_con_ledger(db, negocio_id):
+        esperado = calcular_saldos_desde_movimientos(db, nid)
+        actuales = {
+            (r.producto_key, r.zona): float(r.cantidad or 0.0)
+            for r in db.query(StockSaldo).filter(StockSaldo.negocio_id == nid).all()
+        }
+
+        lotes_actuales: dict[tuple[str, str], list] = {}
+        for r in db.query(StockLote).filter(StockLote.negocio_id == nid).all():
+            lotes_actuales.setdefault((r.producto_key, r.zona), []).append(
+                (r.fecha_vencimiento, r.cantidad_restante)
+            )
+
+        for key in set(esperado) | set(lotes_actuales):
+            lotes_esp = esperado.get(key, {}).get("lotes", [])
+            esp = _lotes_por_fecha((l[1], l[2]) for l in lotes_esp)
+            act = _lotes_por_fecha(lotes_actuales.get(key, []))
+            if set(esp) != set(act) or any(abs(esp[k] - act[k]) > _EPS for k in esp):
+                counters["lotes_mismatch"] += 1
+                if len(diffs) < 50:
+                    diffs.append({
+                        "negocio_id": nid,
+                        "producto": key[0],
+                        "zona": key[1],
+                        "lotes_esperados": {str(k): v for k, v in esp.items()},
+                        "lotes_actuales": {str(k): v for k, v in act.items()},
+                    })
+
+        for key, info in esperado.items():
+            counters["scanned"] += 1
+            actual = actuales.pop(key, None)
+            if actual is None:
+                if abs(info["cantidad"]) <= _EPS:
+                    counters["ok"] += 1
+                    continue
+                counters["missing"] += 1
+            elif abs(actual - info["cantidad"]) <= _EPS:
+                counters["ok"] += 1
+                continue
+            else:
+                counters["mismatch"] += 1
+
+            if len(diffs) < 50:
+                diffs.append({
+                    "negocio_id": nid,
+                    "producto": info["producto"],
+                    "zona": key[1],
+                    "esperado": info["cantidad"],
+                    "actual": actual,
+                })
+
+        # Saldos sin ledger (deberían ser 0)
+        for key, actual in actuales.items():
+            counters["scanned"] += 1
+            if abs(actual) <= _EPS:
+                counters["ok"] += 1
+                continue
+            counters["orphan"] += 1
+            if len(diffs) < 50:
+                diffs.append({
+                    "negocio_id": nid,
+                    "producto": key[0],
+                    "zona": key[1],
+                    "esperado": 0.0,
+                    "actual": actual,
+                })
+
+    ok = (
+        counters["mismatch"]
+        + counters["missing"]
+        + counters["orphan"]
+        + counters["lotes_mismatch"]
+    ) == 0
+    return {"ok": ok, "now": utcnow().isoformat(), "counters": counters, "diffs": diffs}
+
+
+def _resolver_producto_ids(db: Session, negocio_id: int, esperado: dict[tuple[str, str], dict]) -> None:
+    """
+    Saldos cuyo ledger no trae producto_id: se resuelve por nombre normalizado
+    en Python (lower() de SQLite solo cubre ASCII: 'Ñandú' vs 'ñandú').
+    """
+    if all(info["producto_id"] is not None for info in esperado.values()):
+        return
+    por_key: dict[str, int] = {}
+    for pid, nombre in (
+        db.query(Producto.id, Producto.nombre)
+        .filter(Producto.negocio_id == negocio_id)
+        .order_by(Producto.id.asc())
+    ):
+        por_key.setdefault(producto_key(nombre), int(pid))
+    for (key, _zona), info in esperado.items():
+        if info["producto_id"] is None:
+            info["producto_id"] = por_key.get(key)
+
+
+def reconstruir_stock_saldos(
+    db: Session,
+    negocio_id: Optional[int] = None,
+    *,
+    commit: bool = True,
+) -> dict:
+    """
+    Reconstruye stock_saldos y stock_lotes desde el ledger (por negocio, en una
+    transacción por negocio). Idempotente.
+    """
+    counters = {"negocios": 0, "saldos": 0, "lotes": 0, "errors": 0}
+
+    for nid in _negocio_ids_con_ledger(db, negocio_id):
+        try:
+            esperado = calcular_saldos_desde_movimientos(db, nid)
+            _resolver_producto_ids(db, nid, esperado)
+
+            db.query(StockSaldo).filter(StockSaldo.negocio_id == nid).delete(
+                synchronize_session=False
+            )
+            db.bulk_insert_mappings(
+                StockSaldo,
+                [
+                    {
+                        "negocio_id": nid,
+                        "producto_key": key[0],
+                        "producto": info["producto"],
+                        "zona": key[1],
+                        "producto_id": info["producto_id"],
+                        "slot_id": info["slot_id"],
+                        "cantidad": info["cantidad"],
+                        "updated_at": utcnow(),
+                    }
+                    for key, info in esperado.items()
+                ],
+            )
+
+            db.query(StockLote).filter(StockLote.negocio_id == nid).delete(
+                synchronize_session=False
+            )
+            lotes_rows = [
+                {
+                    "negocio_id": nid,
+                    "movimiento_id": mov_id,
+                    "producto_key": key[0],
+                    "producto": info["producto"],
+                    "zona": key[1],
+                    "fecha_vencimiento": fv,
+                    "cantidad_inicial": qty,
+                    "cantidad_restante": qty,
+                    "created_at": utcnow(),
+                }
+                for key, info in esperado.items()
+                for _orden, fv, qty, mov_id in info["lotes"]
+                if qty > _EPS
+            ]
+            db.bulk_insert_mappings(StockLote, lotes_rows)
+
+            if commit:
+                db.commit()
+            else:
+                db.flush()
+
+            counters["negocios"] += 1
+            counters["saldos"] += len(esperado)
+            counters["lotes"] += len(lotes_rows)
+        except Exception:
+            db.rollback()
+            counters["errors"] += 1
+            logger.exception("[STOCK_SALDOS] rebuild falló negocio_id=%s", nid)
+
+    logger.info(
+        "[STOCK_SALDOS] rebuild negocios=%s saldos=%s lotes=%s errors=%s",
+        counters["negocios"],
+        counters["saldos"],
+        counters["lotes"],
+        counters["errors"],
+    )
+    return {"ok": counters["errors"] == 0, "now": utcnow().isoformat(), "counters": counters}
+
+
+def ensure_stock_saldos(db: Session) -> int:
+    """
+    Bootstrap idempotente (startup): reconstruye los negocios que tienen
+    movimientos pero aún no tienen saldos, o que tienen stock positivo sin
+    ningún lote (tablas recién creadas por create_all).
+    Retorna cuántos negocios se reconstruyeron.
+    """
+    con_ledger = {int(r[0]) for r in db.query(Movimiento.negocio_id).distinct().all()}
+    con_saldos = {int(r[0]) for r in db.query(StockSaldo.negocio_id).distinct().all()}
+    con_stock = {
+        int(r[0])
+        for r in db.query(StockSaldo.negocio_id).filter(StockSaldo.cantidad > 0).distinct().all()
+    }
+    con_lotes = {int(r[0]) for r in db.query(StockLote.negocio_id).distinct().all()}
+
+    pendientes = sorted((con_ledger - con_saldos) | (con_stock - con_lotes))
+    for nid in pendientes:
+        reconstruir_stock_saldos(db, nid, commit=True)
+
+    if pendientes:
+        logger.info("[STOCK_SALDOS] bootstrap reconstruyó negocios=%s", pendientes)
+    return len(pendientes)
+
+
+if __name__ == "__main__":
+    # Uso operativo:
+    #   python -m modules.basic_wms.services.services_stock_saldos verify [negocio_id]
+    #   python -m modules.basic_wms.services.services_stock_saldos rebuild [negocio_id]
+    import json
+    import sys
+
+    from core.database import SessionLocal
+
+    accion = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    nid_arg = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    _db = SessionLocal()
+    try:
+        if accion == "rebuild":
+            res = reconstruir_stock_saldos(_db, nid_arg)
+        else:
+            res = verificar_stock_saldos(_db, nid_arg)
+        print(json.dumps(res, ensure_ascii=False, indent=2, default=str))
+        sys.exit(0 if res.get("ok") else 1)
+    finally:
+        _db.close()
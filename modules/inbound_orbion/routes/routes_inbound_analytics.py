@@ -5,10 +5,12 @@ from datetime import datetime
 from urllib.parse import quote_plus
 
 from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from sqlalchemy.orm import Session
 
 from core.database import get_db
+from core.services.services_export_jobs import crear_export_job, despertar_export_worker
+from core.streaming import CSV_MEDIA_TYPE, iter_csv, streaming_download
 
 from modules.inbound_orbion.services.services_inbound_core import InboundDomainError
 from modules.inbound_orbion.services.services_inbound_logging import (
@@ -19,7 +21,10 @@ from modules.inbound_orbion.services.services_inbound_proveedores import listar_
 from modules.inbound_orbion.services.services_inbound_analytics import (
     _dt_from_iso,  # helper interno OK
     obtener_analytics_inbound,
-    exportar_analytics_csv,
+    obtener_analytics_inbound_cacheado,
+    analytics_cache_stats,
+    ANALYTICS_CSV_HEADERS,
+    iter_analytics_csv_rows,
     crear_snapshot_analytics,
     listar_snapshots_analytics,
     obtener_snapshot_analytics,
@@ -56,11 +61,13 @@ def _negocio_id(user: dict) -> int:
     return int(nid)
 
 
-def _norm_proveedor_id(v: int | None) -> int | None:
-    # UI a veces manda 0 o vacío
-    if v in (None, 0):
+def _norm_proveedor_id(v: str | int | None) -> int | None:
+    # UI manda "" (opción "todos") o 0; los links arman ?proveedor_id= vacío
+    try:
+        pid = int(str(v).strip()) if v is not None and str(v).strip() else 0
+    except ValueError:
         return None
-    return int(v)
+    return pid or None
 
 
 def _build_analytics_url(*, desde: str | None, hasta: str | None, proveedor_id: int | None) -> str:
@@ -82,11 +89,11 @@ def _build_analytics_url(*, desde: str | None, hasta: str | None, proveedor_id:
 # =========================================================
 
 @router.get("/analytics", response_class=HTMLResponse)
-async def inbound_analytics_view(
+def inbound_analytics_view(
     request: Request,
     desde: str | None = None,
     hasta: str | None = None,
-    proveedor_id: int | None = None,
+    proveedor_id: str | None = None,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
 ):
@@ -100,7 +107,7 @@ async def inbound_analytics_view(
     try:
         proveedores = listar_proveedores(db, negocio_id=negocio_id, solo_activos=True)
 
-        payload = obtener_analytics_inbound(
+        payload = obtener_analytics_inbound_cacheado(
             db,
             negocio_id=negocio_id,
             desde=dt_desde,
@@ -198,16 +205,25 @@ async def inbound_analytics_view(
         )
 
 
+@router.get("/analytics/cache/stats")
+def inbound_analytics_cache_stats(
+    user=Depends(inbound_roles_dep()),
+):
+    """Métricas del cache de analytics del proceso (hits / misses / stale)."""
+    return JSONResponse(analytics_cache_stats())
+
+
 # =========================================================
 # v1.1 Export CSV
 # =========================================================
 
 @router.get("/analytics/export.csv")
-async def inbound_analytics_export_csv(
+def inbound_analytics_export_csv(
     request: Request,
     desde: str | None = None,
     hasta: str | None = None,
-    proveedor_id: int | None = None,
+    proveedor_id: str | None = None,
+    gzip: bool = False,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
 ):
@@ -219,14 +235,14 @@ async def inbound_analytics_export_csv(
     dt_hasta = _dt_from_iso(hasta)
 
     try:
-        payload = obtener_analytics_inbound(
+        # KPIs se calculan aquí; la tabla por proveedor se lee del cursor al enviar
+        rows = iter_analytics_csv_rows(
             db,
             negocio_id=negocio_id,
             desde=dt_desde,
             hasta=dt_hasta,
             proveedor_id=proveedor_id,
         )
-        csv_text = exportar_analytics_csv(payload)
 
         # Nombre friendly para operación (Chile):
         # orbion_inbound_analytics_2025-12-01_2025-12-31_prov-12.csv
@@ -242,13 +258,12 @@ async def inbound_analytics_export_csv(
             filtros={"desde": desde, "hasta": hasta, "proveedor_id": proveedor_id},
         )
 
-        # Excel-friendly (tildes/ñ): utf-8-sig agrega BOM
-        content = csv_text.encode("utf-8-sig")
-
-        return Response(
-            content=content,
-            media_type="text/csv; charset=utf-8",
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        # Excel-friendly (tildes/ñ): iter_csv agrega BOM
+        return streaming_download(
+            iter_csv(ANALYTICS_CSV_HEADERS, rows),
+            filename=filename,
+            media_type=CSV_MEDIA_TYPE,
+            gzip=gzip,
         )
 
     except Exception as e:
@@ -262,16 +277,63 @@ async def inbound_analytics_export_csv(
                          error="No se pudo exportar CSV. Revisa logs.")
 
 
+@router.post("/analytics/export-job")
+def inbound_analytics_export_job(
+    request: Request,
+    desde: str | None = None,
+    hasta: str | None = None,
+    proveedor_id: str | None = None,
+    gzip: bool = False,
+    db: Session = Depends(get_db),
+    user=Depends(inbound_roles_dep()),
+):
+    """Mismo CSV que /analytics/export.csv, generado en background (ver /app/exports)."""
+    negocio_id = _negocio_id(user)
+    get_negocio_or_404(db, negocio_id)
+
+    proveedor_id = _norm_proveedor_id(proveedor_id)
+
+    try:
+        crear_export_job(
+            db,
+            negocio_id=negocio_id,
+            usuario=user.get("email"),
+            tipo="inbound_analytics.csv",
+            parametros={"desde": desde, "hasta": hasta, "proveedor_id": proveedor_id, "gzip": gzip},
+        )
+        db.commit()
+        despertar_export_worker()
+
+        log_inbound_event(
+            "analytics_export_job",
+            negocio_id=negocio_id,
+            user_email=user.get("email"),
+            filtros={"desde": desde, "hasta": hasta, "proveedor_id": proveedor_id},
+        )
+        return RedirectResponse(url="/app/exports?ok=Export+encolado", status_code=302)
+
+    except Exception as e:
+        db.rollback()
+        log_inbound_error(
+            "analytics_export_job_error",
+            negocio_id=negocio_id,
+            user_email=user.get("email"),
+            error=str(e),
+        )
+        return _redirect(_build_analytics_url(desde=desde, hasta=hasta, proveedor_id=proveedor_id),
+                         error="No se pudo encolar el export. Revisa logs.")
+
+
 # =========================================================
 # v2 Snapshots
 # =========================================================
 
 @router.post("/analytics/snapshots/crear", response_class=HTMLResponse)
-async def inbound_analytics_snapshot_crear(
+def inbound_analytics_snapshot_crear(
     request: Request,
     desde: str | None = None,
     hasta: str | None = None,
-    proveedor_id: int | None = None,
+    proveedor_id: str | None = None,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
 ):
@@ -314,7 +376,7 @@ async def inbound_analytics_snapshot_crear(
 
 
 @router.get("/analytics/snapshots/{snapshot_id}", response_class=HTMLResponse)
-async def inbound_analytics_snapshot_ver(
+def inbound_analytics_snapshot_ver(
     request: Request,
     snapshot_id: int,
     db: Session = Depends(get_db),
@@ -138,7 +138,7 @@ def _vm_to_json(vm) -> dict:
     response_class=HTMLResponse,
     name="inbound_checklist_recepcion",
 )
-async def inbound_checklist_recepcion(
+def inbound_checklist_recepcion(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -196,7 +196,7 @@ async def inbound_checklist_recepcion(
 # =========================================================
 
 @router.get("/recepciones/{recepcion_id}/checklist/vm")
-async def inbound_checklist_vm_json(
+def inbound_checklist_vm_json(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -65,7 +65,7 @@ def _parse_datetime_local(value: str) -> datetime:
 # ==========================================================
 
 @router.get("/citas", response_class=HTMLResponse)
-async def inbound_citas_lista(
+def inbound_citas_lista(
     request: Request,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -132,7 +132,7 @@ async def inbound_citas_lista(
 # ==========================================================
 
 @router.post("/citas/nueva")
-async def inbound_cita_crear(
+def inbound_cita_crear(
     fecha_programada: str = Form(...),
     proveedor_id: int | None = Form(None),
     plantilla_id: int | None = Form(None),
@@ -196,7 +196,7 @@ async def inbound_cita_crear(
 # ==========================================================
 
 @router.post("/citas/{cita_id}/estado")
-async def inbound_cita_estado(
+def inbound_cita_estado(
     cita_id: int,
     estado: str = Form(...),
     db: Session = Depends(get_db),
@@ -246,7 +246,7 @@ async def inbound_cita_estado(
 # ==========================================================
 
 @router.post("/citas/{cita_id}/cancelar")
-async def inbound_cita_cancelar(
+def inbound_cita_cancelar(
     cita_id: int,
     motivo: str = Form(""),
     db: Session = Depends(get_db),
@@ -88,7 +88,7 @@ def _require_admin_if_needed(user: dict) -> None:
 # ============================
 
 @router.get("/config", response_class=HTMLResponse)
-async def inbound_config_view(
+def inbound_config_view(
     request: Request,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -36,7 +36,7 @@ def _utcnow() -> datetime:
 
 
 @router.get("/", include_in_schema=False)
-async def inbound_root_legacy(
+def inbound_root_legacy(
     request: Request,
     _user=Depends(inbound_roles_dep()),
 ):
@@ -48,7 +48,7 @@ async def inbound_root_legacy(
 # ============================
 
 @router.get("/nuevo", include_in_schema=False)
-async def inbound_nuevo_legacy(
+def inbound_nuevo_legacy(
     request: Request,
     _user=Depends(inbound_roles_dep()),
 ):
@@ -60,7 +60,7 @@ async def inbound_nuevo_legacy(
 # ============================
 
 @router.get("/health", response_class=JSONResponse)
-async def inbound_health(
+def inbound_health(
     request: Request,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -104,7 +104,7 @@ def _abs_doc_path(uri: str) -> Path:
 # =========================================================
 
 @router.get("/recepciones/{recepcion_id}/documentos", response_class=HTMLResponse)
-async def inbound_documentos_view(
+def inbound_documentos_view(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -280,7 +280,7 @@ async def inbound_documentos_upload(
 # =========================================================
 
 @router.get("/recepciones/{recepcion_id}/documentos/{documento_id}/download")
-async def inbound_documentos_download(
+def inbound_documentos_download(
     recepcion_id: int,
     documento_id: int,
     db: Session = Depends(get_db),
@@ -347,7 +347,7 @@ async def inbound_documentos_download(
 # =========================================================
 
 @router.post("/recepciones/{recepcion_id}/documentos/{documento_id}/eliminar", response_class=HTMLResponse)
-async def inbound_documentos_delete(
+def inbound_documentos_delete(
     request: Request,
     recepcion_id: int,
     documento_id: int,
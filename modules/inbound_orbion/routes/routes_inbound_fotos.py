@@ -109,7 +109,7 @@ def _validate_upload_file(archivo: UploadFile | None) -> None:
 # =========================================================
 
 @router.get("/recepciones/{recepcion_id}/fotos", response_class=HTMLResponse)
-async def inbound_fotos_recepcion(
+def inbound_fotos_recepcion(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -302,7 +302,7 @@ async def inbound_fotos_subir(
 # =========================================================
 
 @router.get("/recepciones/{recepcion_id}/fotos/{foto_id}/archivo", response_class=HTMLResponse)
-async def inbound_fotos_archivo(
+def inbound_fotos_archivo(
     request: Request,
     recepcion_id: int,
     foto_id: int,
@@ -375,7 +375,7 @@ async def inbound_fotos_archivo(
 # =========================================================
 
 @router.post("/recepciones/{recepcion_id}/fotos/{foto_id}/eliminar", response_class=HTMLResponse)
-async def inbound_fotos_eliminar(
+def inbound_fotos_eliminar(
     request: Request,
     recepcion_id: int,
     foto_id: int,
@@ -158,7 +158,7 @@ def _resolve_linea_context(
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}/incidencias", response_class=HTMLResponse)
-async def inbound_incidencias_recepcion(
+def inbound_incidencias_recepcion(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -237,7 +237,7 @@ async def inbound_incidencias_recepcion(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/incidencias/nueva", response_class=HTMLResponse)
-async def inbound_incidencia_crear(
+def inbound_incidencia_crear(
     request: Request,
     recepcion_id: int,
     tipo: str = Form(...),
@@ -312,7 +312,7 @@ async def inbound_incidencia_crear(
 # ============================================================
 
 @router.post("/incidencias/{incidencia_id}/editar", response_class=HTMLResponse)
-async def inbound_incidencia_editar(
+def inbound_incidencia_editar(
     incidencia_id: int,
     recepcion_id: int = Form(...),
 
@@ -379,7 +379,7 @@ async def inbound_incidencia_editar(
 # ============================================================
 
 @router.get("/incidencias/{incidencia_id}", response_class=HTMLResponse)
-async def inbound_incidencia_detalle(
+def inbound_incidencia_detalle(
     request: Request,
     incidencia_id: int,
     recepcion_id: int,
@@ -448,7 +448,7 @@ async def inbound_incidencia_detalle(
 # ============================================================
 
 @router.post("/incidencias/{incidencia_id}/en-analisis", response_class=HTMLResponse)
-async def inbound_incidencia_en_analisis(
+def inbound_incidencia_en_analisis(
     incidencia_id: int,
     recepcion_id: int = Form(...),
     db: Session = Depends(get_db),
@@ -479,7 +479,7 @@ async def inbound_incidencia_en_analisis(
 
 
 @router.post("/incidencias/{incidencia_id}/cerrar", response_class=HTMLResponse)
-async def inbound_incidencia_cerrar(
+def inbound_incidencia_cerrar(
     incidencia_id: int,
     recepcion_id: int = Form(...),
     resolucion: str | None = Form(None),
@@ -515,7 +515,7 @@ async def inbound_incidencia_cerrar(
 
 
 @router.post("/incidencias/{incidencia_id}/reabrir", response_class=HTMLResponse)
-async def inbound_incidencia_reabrir(
+def inbound_incidencia_reabrir(
     incidencia_id: int,
     recepcion_id: int = Form(...),
     db: Session = Depends(get_db),
@@ -543,7 +543,7 @@ async def inbound_incidencia_reabrir(
 
 
 @router.post("/incidencias/{incidencia_id}/cancelar", response_class=HTMLResponse)
-async def inbound_incidencia_cancelar(
+def inbound_incidencia_cancelar(
     incidencia_id: int,
     recepcion_id: int = Form(...),
     motivo: str | None = Form(None),
@@ -583,7 +583,7 @@ async def inbound_incidencia_cancelar(
 # ============================================================
 
 @router.post("/incidencias/{incidencia_id}/eliminar", response_class=HTMLResponse)
-async def inbound_incidencia_eliminar(
+def inbound_incidencia_eliminar(
     incidencia_id: int,
     recepcion_id: int = Form(...),
     db: Session = Depends(get_db),
@@ -617,7 +617,7 @@ async def inbound_incidencia_eliminar(
 # ============================================================
 
 @router.post("/incidencias/{incidencia_id}/fotos/agregar", response_class=HTMLResponse)
-async def inbound_incidencia_foto_agregar(
+def inbound_incidencia_foto_agregar(
     incidencia_id: int,
     recepcion_id: int = Form(...),
     titulo: str | None = Form(None),
@@ -665,7 +665,7 @@ async def inbound_incidencia_foto_agregar(
 
 
 @router.post("/incidencias/{incidencia_id}/fotos/{foto_id}/eliminar", response_class=HTMLResponse)
-async def inbound_incidencia_foto_eliminar(
+def inbound_incidencia_foto_eliminar(
     incidencia_id: int,
     foto_id: int,
     recepcion_id: int = Form(...),
@@ -153,7 +153,7 @@ def _listar_productos_activos(db: Session, negocio_id: int) -> list[Producto]:
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}/lineas", response_class=HTMLResponse)
-async def inbound_lineas_lista(
+def inbound_lineas_lista(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -247,7 +247,7 @@ async def inbound_lineas_lista(
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}/lineas/nueva", response_class=HTMLResponse)
-async def inbound_nueva_linea_form(
+def inbound_nueva_linea_form(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -283,7 +283,7 @@ async def inbound_nueva_linea_form(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/lineas", response_class=HTMLResponse)
-async def inbound_agregar_linea(
+def inbound_agregar_linea(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -405,7 +405,7 @@ async def inbound_agregar_linea(
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}/lineas/{linea_id}/editar", response_class=HTMLResponse)
-async def inbound_editar_linea_form(
+def inbound_editar_linea_form(
     request: Request,
     recepcion_id: int,
     linea_id: int,
@@ -454,7 +454,7 @@ async def inbound_editar_linea_form(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/lineas/{linea_id}/editar", response_class=HTMLResponse)
-async def inbound_editar_linea_submit(
+def inbound_editar_linea_submit(
     request: Request,
     recepcion_id: int,
     linea_id: int,
@@ -569,7 +569,7 @@ async def inbound_editar_linea_submit(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/lineas/{linea_id}/eliminar", response_class=HTMLResponse)
-async def inbound_eliminar_linea(
+def inbound_eliminar_linea(
     request: Request,
     recepcion_id: int,
     linea_id: int,
@@ -606,7 +606,7 @@ async def inbound_eliminar_linea(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/lineas/reconciliar", response_class=HTMLResponse)
-async def inbound_lineas_reconciliar(
+def inbound_lineas_reconciliar(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
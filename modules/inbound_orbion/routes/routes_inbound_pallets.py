@@ -144,7 +144,7 @@ def _post_mutation_recon(db: Session, *, negocio_id: int, recepcion_id: int) ->
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}/pallets", response_class=HTMLResponse)
-async def inbound_pallets_lista(
+def inbound_pallets_lista(
     recepcion_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -195,7 +195,7 @@ async def inbound_pallets_lista(
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}/pallets/{pallet_id}", response_class=HTMLResponse)
-async def inbound_pallet_detalle(
+def inbound_pallet_detalle(
     recepcion_id: int,
     pallet_id: int,
     request: Request,
@@ -334,7 +334,7 @@ async def inbound_pallet_detalle(
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}/pallets/{pallet_id}/editar", response_class=HTMLResponse)
-async def inbound_pallet_editar_get(
+def inbound_pallet_editar_get(
     recepcion_id: int,
     pallet_id: int,
     request: Request,
@@ -385,7 +385,7 @@ async def inbound_pallet_editar_get(
 
 
 @router.post("/recepciones/{recepcion_id}/pallets/{pallet_id}/editar", response_class=HTMLResponse)
-async def inbound_pallet_editar_post(
+def inbound_pallet_editar_post(
     recepcion_id: int,
     pallet_id: int,
     db: Session = Depends(get_db),
@@ -454,7 +454,7 @@ async def inbound_pallet_editar_post(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/pallets/nuevo", response_class=HTMLResponse)
-async def inbound_pallet_nuevo(
+def inbound_pallet_nuevo(
     recepcion_id: int,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -515,7 +515,7 @@ async def inbound_pallet_nuevo(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/pallets/{pallet_id}/items/agregar", response_class=HTMLResponse)
-async def inbound_pallet_item_agregar(
+def inbound_pallet_item_agregar(
     recepcion_id: int,
     pallet_id: int,
     db: Session = Depends(get_db),
@@ -584,7 +584,7 @@ async def inbound_pallet_item_agregar(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/pallets/{pallet_id}/items/{pallet_item_id}/quitar", response_class=HTMLResponse)
-async def inbound_pallet_item_quitar(
+def inbound_pallet_item_quitar(
     recepcion_id: int,
     pallet_id: int,
     pallet_item_id: int,
@@ -644,7 +644,7 @@ async def inbound_pallet_item_quitar(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/pallets/{pallet_id}/cerrar", response_class=HTMLResponse)
-async def inbound_pallet_cerrar(
+def inbound_pallet_cerrar(
     recepcion_id: int,
     pallet_id: int,
     db: Session = Depends(get_db),
@@ -690,7 +690,7 @@ async def inbound_pallet_cerrar(
 
 
 @router.post("/recepciones/{recepcion_id}/pallets/{pallet_id}/reabrir", response_class=HTMLResponse)
-async def inbound_pallet_reabrir(
+def inbound_pallet_reabrir(
     recepcion_id: int,
     pallet_id: int,
     db: Session = Depends(get_db),
@@ -736,7 +736,7 @@ async def inbound_pallet_reabrir(
 
 
 @router.post("/recepciones/{recepcion_id}/pallets/{pallet_id}/eliminar", response_class=HTMLResponse)
-async def inbound_pallet_eliminar(
+def inbound_pallet_eliminar(
     recepcion_id: int,
     pallet_id: int,
     db: Session = Depends(get_db),
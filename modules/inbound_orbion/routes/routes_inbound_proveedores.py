@@ -91,7 +91,7 @@ def _to_str_or_none(v: str | None) -> str | None:
 # ==========================================================
 
 @router.get("/proveedores", response_class=HTMLResponse)
-async def inbound_proveedores_lista(
+def inbound_proveedores_lista(
     request: Request,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -131,7 +131,7 @@ async def inbound_proveedores_lista(
 
 
 @router.post("/proveedores/nuevo", response_class=HTMLResponse)
-async def inbound_proveedor_crear(
+def inbound_proveedor_crear(
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
     nombre: str = Form(...),
@@ -181,7 +181,7 @@ async def inbound_proveedor_crear(
 
 
 @router.post("/proveedores/{proveedor_id}/estado", response_class=HTMLResponse)
-async def inbound_proveedor_toggle(
+def inbound_proveedor_toggle(
     proveedor_id: int,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -224,7 +224,7 @@ async def inbound_proveedor_toggle(
 # ==========================================================
 
 @router.get("/proveedores/{proveedor_id}/plantillas", response_class=HTMLResponse)
-async def inbound_proveedor_plantillas(
+def inbound_proveedor_plantillas(
     proveedor_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -259,7 +259,7 @@ async def inbound_proveedor_plantillas(
 
 
 @router.post("/proveedores/{proveedor_id}/plantillas/nueva", response_class=HTMLResponse)
-async def inbound_plantilla_crear(
+def inbound_plantilla_crear(
     proveedor_id: int,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -298,7 +298,7 @@ async def inbound_plantilla_crear(
 
 
 @router.post("/proveedores/plantillas/{plantilla_id}/estado", response_class=HTMLResponse)
-async def inbound_plantilla_toggle(
+def inbound_plantilla_toggle(
     plantilla_id: int,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -340,7 +340,7 @@ async def inbound_plantilla_toggle(
 
 
 @router.post("/proveedores/plantillas/{plantilla_id}/eliminar", response_class=HTMLResponse)
-async def inbound_plantilla_eliminar(
+def inbound_plantilla_eliminar(
     plantilla_id: int,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -379,7 +379,7 @@ async def inbound_plantilla_eliminar(
 # ==========================================================
 
 @router.get("/proveedores/plantillas/{plantilla_id}", response_class=HTMLResponse)
-async def inbound_plantilla_detalle(
+def inbound_plantilla_detalle(
     plantilla_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -425,7 +425,7 @@ async def inbound_plantilla_detalle(
 
 
 @router.post("/proveedores/plantillas/{plantilla_id}/lineas/nueva", response_class=HTMLResponse)
-async def inbound_plantilla_linea_crear(
+def inbound_plantilla_linea_crear(
     plantilla_id: int,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -511,7 +511,7 @@ async def inbound_plantilla_linea_crear(
 
 
 @router.post("/proveedores/plantillas/lineas/{linea_id}/estado", response_class=HTMLResponse)
-async def inbound_plantilla_linea_toggle(
+def inbound_plantilla_linea_toggle(
     linea_id: int,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -551,7 +551,7 @@ async def inbound_plantilla_linea_toggle(
 
 
 @router.post("/proveedores/plantillas/lineas/{linea_id}/eliminar", response_class=HTMLResponse)
-async def inbound_plantilla_linea_eliminar(
+def inbound_plantilla_linea_eliminar(
     linea_id: int,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
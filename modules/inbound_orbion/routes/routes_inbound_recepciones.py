@@ -150,7 +150,7 @@ def _flag(inbound_cfg: dict, key: str, default: bool = False) -> bool:
 # ============================================================
 
 @router.get("/recepciones", response_class=HTMLResponse)
-async def inbound_recepciones_lista(
+def inbound_recepciones_lista(
     request: Request,
     q: str | None = None,
     estado: str | None = None,
@@ -225,7 +225,7 @@ async def inbound_recepciones_lista(
 # ============================================================
 
 @router.get("/recepciones/nueva", response_class=HTMLResponse)
-async def inbound_recepcion_nueva_form(
+def inbound_recepcion_nueva_form(
     request: Request,
     db: Session = Depends(get_db),
     user=Depends(inbound_roles_dep()),
@@ -257,7 +257,7 @@ async def inbound_recepcion_nueva_form(
 
 
 @router.post("/recepciones/nueva", response_class=HTMLResponse)
-async def inbound_recepcion_nueva_submit(
+def inbound_recepcion_nueva_submit(
     request: Request,
     proveedor_id: int | None = Form(None),
     proveedor_nombre: str | None = Form(None),
@@ -360,7 +360,7 @@ async def inbound_recepcion_nueva_submit(
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}", response_class=HTMLResponse)
-async def inbound_recepcion_detalle(
+def inbound_recepcion_detalle(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -462,7 +462,7 @@ async def inbound_recepcion_detalle(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/recalcular", response_class=HTMLResponse)
-async def inbound_recepcion_recalcular(
+def inbound_recepcion_recalcular(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -512,7 +512,7 @@ async def inbound_recepcion_recalcular(
 # ============================================================
 
 @router.post("/recepciones/{recepcion_id}/estado", response_class=HTMLResponse)
-async def inbound_recepcion_estado_submit(
+def inbound_recepcion_estado_submit(
     request: Request,
     recepcion_id: int,
     accion: str = Form(...),
@@ -559,7 +559,7 @@ async def inbound_recepcion_estado_submit(
 # ============================================================
 
 @router.get("/recepciones/{recepcion_id}/editar", response_class=HTMLResponse)
-async def inbound_recepcion_editar_form(
+def inbound_recepcion_editar_form(
     request: Request,
     recepcion_id: int,
     db: Session = Depends(get_db),
@@ -598,7 +598,7 @@ async def inbound_recepcion_editar_form(
 
 
 @router.post("/recepciones/{recepcion_id}/editar", response_class=HTMLResponse)
-async def inbound_recepcion_editar_submit(
+def inbound_recepcion_editar_submit(
     request: Request,
     recepcion_id: int,
     proveedor_id: int | None = Form(None),
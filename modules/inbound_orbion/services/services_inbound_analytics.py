@@ -1,22 +1,30 @@
 ﻿from __future__ import annotations
 
+import hashlib
 import json
+import threading
 from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Any, Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Iterator, Optional
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func, case, and_
+from sqlalchemy.orm import Query, Session
+from sqlalchemy import func
 
+from core.config import settings
+from core.formatting import ensure_utc_aware
+from core.logging_config import logger
 from core.models.time import utcnow
+from core.services.services_export_jobs import ArchivoExport, registrar_tipo_export
+from core.streaming import CSV_MEDIA_TYPE, GZIP_MEDIA_TYPE, iter_csv, iter_gzip
 from core.models.inbound.recepciones import InboundRecepcion
-from core.models.inbound.lineas import InboundLinea
 from core.models.inbound.incidencias import InboundIncidencia
 from core.models.inbound.proveedores import Proveedor
-from core.models.inbound.checklist import InboundChecklistPlantilla, InboundChecklistSeccion, InboundChecklistItem, InboundChecklistEjecucion, InboundChecklistRespuesta
 from core.models.inbound.analytics_snapshots import InboundAnalyticsSnapshot
+from core.models.inbound.rollup import InboundRollupDiario
 
 from modules.inbound_orbion.services.services_inbound_core import InboundDomainError
+from modules.inbound_orbion.services.services_inbound_data_version import obtener_inbound_data_version
+from modules.inbound_orbion.services.services_inbound_rollup import SIN_PROVEEDOR, inicio_dia_utc
 
 
 # =========================================================
@@ -71,6 +79,46 @@ def _json_loads(s: str) -> dict[str, Any]:
         return {}
 
 
+def _filtros_analytics(
+    *,
+    negocio_id: int,
+    desde: datetime | None,
+    hasta: datetime | None,
+    proveedor_id: int | None,
+) -> list:
+    """
+    Filtros sobre recepciones crudas. desde/hasta son días calendario CL
+    (inclusive), igual que el rollup diario.
+    """
+    filtros = [InboundRecepcion.negocio_id == negocio_id]
+    if proveedor_id:
+        filtros.append(InboundRecepcion.proveedor_id == proveedor_id)
+
+    if desde:
+        filtros.append(InboundRecepcion.created_at >= inicio_dia_utc(desde.date()))
+    if hasta:
+        filtros.append(InboundRecepcion.created_at < inicio_dia_utc(hasta.date() + timedelta(days=1)))
+    return filtros
+
+
+def _filtros_rollup(
+    *,
+    negocio_id: int,
+    desde: datetime | None,
+    hasta: datetime | None,
+    proveedor_id: int | None,
+) -> list:
+    filtros = [InboundRollupDiario.negocio_id == negocio_id]
+    if proveedor_id:
+        filtros.append(InboundRollupDiario.proveedor_id == proveedor_id)
+
+    if desde:
+        filtros.append(InboundRollupDiario.dia >= desde.date())
+    if hasta:
+        filtros.append(InboundRollupDiario.dia <= hasta.date())
+    return filtros
+
+
 # =========================================================
 # Contrato Analytics v1 (source-of-truth)
 # =========================================================
@@ -86,92 +134,23 @@ def obtener_analytics_inbound(
     """
     v1: KPIs + tablas + series para charts (sin snapshots).
     - Multi-tenant estricto: negocio_id
-    - Filtros por fecha sobre InboundRecepcion.created_at (baseline simple y consistente)
+    - Filtros por día CL de InboundRecepcion.created_at
+    - KPIs, tabla por proveedor y kg/día leen inbound_rollup_diario
+      (costo ~ proveedores x días, no recepciones x líneas)
     """
 
     # ---------- filtros ----------
-    filtros = [InboundRecepcion.negocio_id == negocio_id]
-    if proveedor_id:
-        filtros.append(InboundRecepcion.proveedor_id == proveedor_id)
-
-    if desde:
-        filtros.append(InboundRecepcion.created_at >= desde)
-    if hasta:
-        filtros.append(InboundRecepcion.created_at <= hasta)
-
-    # ---------- KPIs base ----------
-    kpi_total_recepciones = (
-        db.query(func.count(InboundRecepcion.id))
-        .filter(*filtros)
-        .scalar()
-        or 0
-    )
-
-    kpi_cerradas = (
-        db.query(func.count(InboundRecepcion.id))
-        .filter(*filtros)
-        .filter(InboundRecepcion.fecha_cierre.isnot(None))
-        .scalar()
-        or 0
-    )
-
-    # kg recibido real (truth): suma de lineas.peso_recibido_kg
-    # join recepciones para aplicar filtros (incluye proveedor y rango)
-    kg_recibidos = (
-        db.query(func.coalesce(func.sum(InboundLinea.peso_recibido_kg), 0.0))
-        .join(InboundRecepcion, InboundRecepcion.id == InboundLinea.recepcion_id)
-        .filter(InboundRecepcion.negocio_id == negocio_id)
-        .filter(*[f for f in filtros if f.left.key != "negocio_id"])  # evita duplicar negocio_id
-        .scalar()
-        or 0.0
-    )
-    kg_recibidos = float(kg_recibidos)
-
-    incidencias_total = (
-        db.query(func.count(InboundIncidencia.id))
-        .join(InboundRecepcion, InboundRecepcion.id == InboundIncidencia.recepcion_id)
-        .filter(InboundRecepcion.negocio_id == negocio_id)
-        .filter(*[f for f in filtros if f.left.key != "negocio_id"])
-        .scalar()
-        or 0
-    )
-
-    # checklist: % completado
-    checklist_total = (
-        db.query(func.count(InboundChecklistRecepcion.id))
-        .join(InboundRecepcion, InboundRecepcion.id == InboundChecklistRecepcion.recepcion_id)
-        .filter(InboundRecepcion.negocio_id == negocio_id)
-        .filter(*[f for f in filtros if f.left.key != "negocio_id"])
-        .scalar()
-        or 0
-    )
-    checklist_completados = (
-        db.query(func.count(InboundChecklistRecepcion.id))
-        .join(InboundRecepcion, InboundRecepcion.id == InboundChecklistRecepcion.recepcion_id)
-        .filter(InboundRecepcion.negocio_id == negocio_id)
-        .filter(*[f for f in filtros if f.left.key != "negocio_id"])
-        .filter(InboundChecklistRecepcion.estado.in_(["COMPLETADO", "CERRADO", "FINALIZADO"]))
-        .scalar()
-        or 0
-    )
-    checklist_pct = round(_safe_div(checklist_completados, checklist_total) * 100.0, 1)
-
-    # ---------- tiempos (minutos) ----------
-    # SLA: ETA -> Arribo (si hay ambos)
-    sla_eta_arribo_min = _avg_minutes(db, filtros, InboundRecepcion.fecha_estimada_llegada, InboundRecepcion.fecha_arribo)
-    # Operación: Arribo -> Fin descarga
-    sla_arribo_descarga_min = _avg_minutes(db, filtros, InboundRecepcion.fecha_arribo, InboundRecepcion.fecha_fin_descarga)
-    # Ciclo: Arribo -> Cierre
-    sla_arribo_cierre_min = _avg_minutes(db, filtros, InboundRecepcion.fecha_arribo, InboundRecepcion.fecha_cierre)
+    filtros = _filtros_analytics(negocio_id=negocio_id, desde=desde, hasta=hasta, proveedor_id=proveedor_id)
+    rfiltros = _filtros_rollup(negocio_id=negocio_id, desde=desde, hasta=hasta, proveedor_id=proveedor_id)
 
     # ---------- tablas ----------
-    tabla_proveedores = _tabla_por_proveedor(db, filtros, negocio_id)
+    tabla_proveedores = _tabla_por_proveedor(db, rfiltros)
     tabla_incidencias = _tabla_incidencias(db, filtros, negocio_id)
 
     # ---------- series charts ----------
     series_recepciones_por_estado = _series_recepciones_por_estado(db, filtros)
     series_incidencias_por_criticidad = _series_incidencias_por_criticidad(db, filtros, negocio_id)
-    series_kg_por_dia = _series_kg_por_dia(db, filtros, negocio_id)
+    series_kg_por_dia = _series_kg_por_dia(db, rfiltros)
 
     payload = {
         "meta": {
@@ -182,16 +161,7 @@ def obtener_analytics_inbound(
             "generado_en": utcnow().isoformat(),
             "version": "v1",
         },
-        "kpis": {
-            "recepciones_total": int(kpi_total_recepciones),
-            "recepciones_cerradas": int(kpi_cerradas),
-            "kg_recibidos": round(kg_recibidos, 3),
-            "incidencias_total": int(incidencias_total),
-            "checklist_pct": float(checklist_pct),
-            "sla_eta_arribo_min": sla_eta_arribo_min,
-            "sla_arribo_descarga_min": sla_arribo_descarga_min,
-            "sla_arribo_cierre_min": sla_arribo_cierre_min,
-        },
+        "kpis": _kpis_inbound(db, rfiltros),
         "tablas": {
             "por_proveedor": tabla_proveedores,
             "incidencias": tabla_incidencias,
@@ -205,97 +175,96 @@ def obtener_analytics_inbound(
     return payload
 
 
-def _avg_minutes(db: Session, filtros: list, col_ini, col_fin) -> float:
-    """
-    Promedio de minutos entre col_fin y col_ini para InboundRecepcion.
+def _minutos_promedio(suma: Any, n: Any) -> float:
+    """Promedio de minutos desde (suma, n) del rollup. 0.0 si no hay datos."""
+    if not n:
+        return 0.0
+    # En SLA reales no debería ser negativo; si llega negativo por datos sucios, lo clamp a 0
+    minutes = float(suma or 0.0) / float(n)
+    if minutes < 0:
+        minutes = 0.0
+    return round(minutes, 1)
+
+
+def _kpis_inbound(db: Session, rfiltros: list) -> dict[str, Any]:
+    R = InboundRollupDiario
+    r = (
+        db.query(
+            func.coalesce(func.sum(R.recepciones), 0).label("recepciones"),
+            func.coalesce(func.sum(R.recepciones_cerradas), 0).label("cerradas"),
+            func.coalesce(func.sum(R.kg), 0.0).label("kg"),
+            func.coalesce(func.sum(R.incidencias), 0).label("incidencias"),
+            func.coalesce(func.sum(R.chk_total), 0).label("chk_total"),
+            func.coalesce(func.sum(R.chk_ok), 0).label("chk_ok"),
+            func.sum(R.eta_arribo_min_sum).label("eta_sum"),
+            func.sum(R.eta_arribo_n).label("eta_n"),
+            func.sum(R.arribo_descarga_min_sum).label("descarga_sum"),
+            func.sum(R.arribo_descarga_n).label("descarga_n"),
+            func.sum(R.arribo_cierre_min_sum).label("cierre_sum"),
+            func.sum(R.arribo_cierre_n).label("cierre_n"),
+        )
+        .filter(*rfiltros)
+        .one()
+    )
+
+    # checklist: % completado
+    checklist_pct = round(_safe_div(r.chk_ok or 0, r.chk_total or 0) * 100.0, 1)
+
+    return {
+        "recepciones_total": int(r.recepciones or 0),
+        "recepciones_cerradas": int(r.cerradas or 0),
+        "kg_recibidos": round(float(r.kg or 0.0), 3),
+        "incidencias_total": int(r.incidencias or 0),
+        "checklist_pct": float(checklist_pct),
+        # SLA: ETA -> Arribo / Arribo -> Fin descarga / Arribo -> Cierre
+        "sla_eta_arribo_min": _minutos_promedio(r.eta_sum, r.eta_n),
+        "sla_arribo_descarga_min": _minutos_promedio(r.descarga_sum, r.descarga_n),
+        "sla_arribo_cierre_min": _minutos_promedio(r.cierre_sum, r.cierre_n),
+    }
 
-    - Postgres: extract(epoch from (fin - ini)) / 60
-    - SQLite: (julianday(fin) - julianday(ini)) * 24 * 60
 
-    Devuelve 0.0 si no hay datos o si falla.
+def _query_por_proveedor(db: Session, rfiltros: list) -> Query:
     """
-    try:
-        dialect = getattr(getattr(db, "bind", None), "dialect", None)
-        name = (getattr(dialect, "name", "") or "").lower()
+    Una fila por proveedor desde el rollup diario. Recepciones sin proveedor
+    (o con proveedor inexistente) se agrupan en proveedor_id = None.
+    """
+    R = InboundRollupDiario
+    kg_total = func.coalesce(func.sum(R.kg), 0.0)
 
-        q = (
-            db.query(
-                func.avg(
-                    # SQLite
-                    ((func.julianday(col_fin) - func.julianday(col_ini)) * 24.0 * 60.0)
-                    if name == "sqlite"
-                    # Postgres / otros con extract(epoch)
-                    else (func.extract("epoch", col_fin - col_ini) / 60.0)
-                )
-            )
-            .select_from(InboundRecepcion)
-            .filter(*filtros)
-            .filter(col_ini.isnot(None))
-            .filter(col_fin.isnot(None))
+    return (
+        db.query(
+            Proveedor.id.label("proveedor_id"),
+            Proveedor.nombre.label("proveedor_nombre"),
+            func.sum(R.recepciones).label("recepciones"),
+            kg_total.label("kg"),
+            func.coalesce(func.sum(R.incidencias), 0).label("incidencias"),
+            func.sum(R.chk_total).label("chk_total"),
+            func.sum(R.chk_ok).label("chk_ok"),
         )
+        .select_from(R)
+        .join(Proveedor, Proveedor.id == R.proveedor_id, isouter=True)
+        .filter(*rfiltros)
+        .group_by(Proveedor.id, Proveedor.nombre)
+        .order_by(kg_total.desc(), Proveedor.id.asc())
+    )
 
-        v = q.scalar()
-        if v is None:
-            return 0.0
-
-        # En SLA reales no debería ser negativo; si llega negativo por datos sucios, lo clamp a 0
-        minutes = float(v)
-        if minutes < 0:
-            minutes = 0.0
-
-        return round(minutes, 1)
-
-    except Exception:
-        return 0.0
 
+def _fila_por_proveedor(r) -> dict[str, Any]:
+    chk_pct = round(_safe_div(r.chk_ok or 0, r.chk_total or 0) * 100.0, 1) if (r.chk_total or 0) else 0.0
+    return {
+        "proveedor_id": r.proveedor_id,
+        "proveedor_nombre": r.proveedor_nombre or "—",
+        "recepciones": int(r.recepciones or 0),
+        "kg": round(float(r.kg or 0.0), 3),
+        "incidencias": int(r.incidencias or 0),
+        "checklist_pct": float(chk_pct),
+    }
 
 
-def _tabla_por_proveedor(db: Session, filtros: list, negocio_id: int) -> list[dict[str, Any]]:
-    # recepciones, kg, incidencias, checklist_pct, avg cierre-min
+def _tabla_por_proveedor(db: Session, rfiltros: list) -> list[dict[str, Any]]:
+    # recepciones, kg, incidencias, checklist_pct
     try:
-        base = (
-            db.query(
-                Proveedor.id.label("proveedor_id"),
-                Proveedor.nombre.label("proveedor_nombre"),
-                func.count(InboundRecepcion.id).label("recepciones"),
-                func.coalesce(func.sum(InboundLinea.peso_recibido_kg), 0.0).label("kg"),
-                func.count(func.distinct(InboundIncidencia.id)).label("incidencias"),
-                func.count(func.distinct(InboundChecklistRecepcion.id)).label("chk_total"),
-                func.count(
-                    func.distinct(
-                        case(
-                            (InboundChecklistRecepcion.estado.in_(["COMPLETADO", "CERRADO", "FINALIZADO"]), InboundChecklistRecepcion.id),
-                            else_=None,
-                        )
-                    )
-                ).label("chk_ok"),
-            )
-            .select_from(InboundRecepcion)
-            .join(Proveedor, Proveedor.id == InboundRecepcion.proveedor_id, isouter=True)
-            .join(InboundLinea, InboundLinea.recepcion_id == InboundRecepcion.id, isouter=True)
-            .join(InboundIncidencia, InboundIncidencia.recepcion_id == InboundRecepcion.id, isouter=True)
-            .join(InboundChecklistRecepcion, InboundChecklistRecepcion.recepcion_id == InboundRecepcion.id, isouter=True)
-            .filter(InboundRecepcion.negocio_id == negocio_id)
-            .filter(*[f for f in filtros if f.left.key != "negocio_id"])
-            .group_by(Proveedor.id, Proveedor.nombre)
-            .order_by(func.coalesce(func.sum(InboundLinea.peso_recibido_kg), 0.0).desc())
-        )
-        rows = base.all()
-
-        out: list[dict[str, Any]] = []
-        for r in rows:
-            chk_pct = round(_safe_div(r.chk_ok or 0, r.chk_total or 0) * 100.0, 1) if (r.chk_total or 0) else 0.0
-            out.append(
-                {
-                    "proveedor_id": r.proveedor_id,
-                    "proveedor_nombre": r.proveedor_nombre or "—",
-                    "recepciones": int(r.recepciones or 0),
-                    "kg": round(float(r.kg or 0.0), 3),
-                    "incidencias": int(r.incidencias or 0),
-                    "checklist_pct": float(chk_pct),
-                }
-            )
-        return out
+        return [_fila_por_proveedor(r) for r in _query_por_proveedor(db, rfiltros).all()]
     except Exception:
         return []
 
@@ -364,27 +333,23 @@ def _series_incidencias_por_criticidad(db: Session, filtros: list, negocio_id: i
         return {"labels": [], "values": []}
 
 
-def _series_kg_por_dia(db: Session, filtros: list, negocio_id: int) -> dict[str, Any]:
+def _series_kg_por_dia(db: Session, rfiltros: list) -> dict[str, Any]:
     """
-    Serie simple: kg por día usando created_at de recepción como bucket.
-    (Si luego quieres: por fecha_arribo o fecha_recepcion, se agrega un switch.)
+    Serie simple: kg por día CL (bucket = día de created_at de la recepción),
+    una fila del rollup por proveedor y día.
     """
     try:
-        # date_trunc solo Postgres; fallback: string slice.
-        # Para v1: devolvemos vacío si no soporta.
-        q = (
+        R = InboundRollupDiario
+        rows = (
             db.query(
-                func.date(InboundRecepcion.created_at).label("dia"),
-                func.coalesce(func.sum(InboundLinea.peso_recibido_kg), 0.0).label("kg"),
+                R.dia.label("dia"),
+                func.coalesce(func.sum(R.kg), 0.0).label("kg"),
             )
-            .select_from(InboundRecepcion)
-            .join(InboundLinea, InboundLinea.recepcion_id == InboundRecepcion.id, isouter=True)
-            .filter(InboundRecepcion.negocio_id == negocio_id)
-            .filter(*[f for f in filtros if f.left.key != "negocio_id"])
-            .group_by(func.date(InboundRecepcion.created_at))
-            .order_by(func.date(InboundRecepcion.created_at).asc())
+            .filter(*rfiltros)
+            .group_by(R.dia)
+            .order_by(R.dia.asc())
+            .all()
         )
-        rows = q.all()
         return {
             "labels": [str(r.dia) for r in rows],
             "values": [round(float(r.kg or 0.0), 3) for r in rows],
@@ -397,53 +362,90 @@ def _series_kg_por_dia(db: Session, filtros: list, negocio_id: int) -> dict[str,
 # v1.1 Export CSV
 # =========================================================
 
-def exportar_analytics_csv(payload: dict[str, Any]) -> str:
+ANALYTICS_CSV_HEADERS = ["seccion", "clave", "valor"]
+
+ANALYTICS_CSV_KPIS = [
+    "recepciones_total",
+    "recepciones_cerradas",
+    "kg_recibidos",
+    "incidencias_total",
+    "checklist_pct",
+    "sla_eta_arribo_min",
+    "sla_arribo_descarga_min",
+    "sla_arribo_cierre_min",
+]
+
+ANALYTICS_CSV_PROVEEDORES = ["proveedor_id", "proveedor_nombre", "recepciones", "kg", "incidencias", "checklist_pct"]
+
+# Filas por fetch del cursor de proveedores
+ANALYTICS_CSV_YIELD_PER = 1000
+
+
+def iter_analytics_csv_rows(
+    db: Session,
+    *,
+    negocio_id: int,
+    desde: datetime | None,
+    hasta: datetime | None,
+    proveedor_id: int | None = None,
+) -> Iterator[list[Any]]:
     """
-    v1.1: Export simple en CSV (texto).
-    Exporta KPIs + tabla por proveedor.
+    v1.1: filas del export CSV (KPIs + tabla por proveedor), para core.streaming.iter_csv.
+
+    - KPIs se calculan al llamar (un error sale antes de empezar la respuesta).
+    - Proveedores se leen del cursor (yield_per) a medida que se itera:
+      no se arma el payload completo ni el CSV como string.
     """
-    k = payload.get("kpis", {}) or {}
-    proveedores = (payload.get("tablas", {}) or {}).get("por_proveedor", []) or []
-
-    def _csv_escape(value: Any) -> str:
-        s = "" if value is None else str(value)
-        # CSV safe: doblar comillas y envolver en comillas si hay separadores/quotes/newlines
-        if any(ch in s for ch in [",", '"', "\n", "\r"]):
-            s = s.replace('"', '""')
-            return f'"{s}"'
-        return s
-
-    lines: list[str] = []
-    lines.append("seccion,clave,valor")
-
-    keys = [
-        "recepciones_total",
-        "recepciones_cerradas",
-        "kg_recibidos",
-        "incidencias_total",
-        "checklist_pct",
-        "sla_eta_arribo_min",
-        "sla_arribo_descarga_min",
-        "sla_arribo_cierre_min",
-    ]
-    for key in keys:
-        lines.append(f"kpi,{key},{_csv_escape(k.get(key, ''))}")
+    rfiltros = _filtros_rollup(negocio_id=negocio_id, desde=desde, hasta=hasta, proveedor_id=proveedor_id)
+    kpis = _kpis_inbound(db, rfiltros)
+
+    def _filas() -> Iterator[list[Any]]:
+        for key in ANALYTICS_CSV_KPIS:
+            yield ["kpi", key, kpis.get(key, "")]
 
-    lines.append("")  # separador
-    lines.append("proveedores,proveedor_id,proveedor_nombre,recepciones,kg,incidencias,checklist_pct")
+        yield []  # separador
+        yield ["proveedores", *ANALYTICS_CSV_PROVEEDORES]
 
-    for r in proveedores:
-        lines.append(",".join([
-            "proveedores",
-            _csv_escape(r.get("proveedor_id", "")),
-            _csv_escape(r.get("proveedor_nombre", "")),
-            _csv_escape(r.get("recepciones", 0)),
-            _csv_escape(r.get("kg", 0)),
-            _csv_escape(r.get("incidencias", 0)),
-            _csv_escape(r.get("checklist_pct", 0)),
-        ]))
+        for r in _query_por_proveedor(db, rfiltros).yield_per(ANALYTICS_CSV_YIELD_PER):
+            fila = _fila_por_proveedor(r)
+            yield ["proveedores", *(fila[k] for k in ANALYTICS_CSV_PROVEEDORES)]
 
-    return "\n".join(lines)
+    return _filas()
+
+
+def _job_analytics_csv(db: Session, negocio_id: int, parametros: dict[str, Any]) -> ArchivoExport:
+    """Export en background (core.services.services_export_jobs): mismo CSV que /analytics/export.csv."""
+    desde = parametros.get("desde")
+    hasta = parametros.get("hasta")
+    proveedor_id = parametros.get("proveedor_id")
+
+    rows = iter_analytics_csv_rows(
+        db,
+        negocio_id=negocio_id,
+        desde=_dt_from_iso(desde),
+        hasta=_dt_from_iso(hasta),
+        proveedor_id=int(proveedor_id) if proveedor_id else None,
+    )
+
+    ptag = f"_prov-{proveedor_id}" if proveedor_id else ""
+    filename = f"orbion_inbound_analytics_{(desde or '').strip() or 'all'}_{(hasta or '').strip() or 'all'}{ptag}.csv"
+
+    if parametros.get("gzip"):
+        return ArchivoExport(
+            filename=f"{filename}.gz",
+            media_type=GZIP_MEDIA_TYPE,
+            rows=rows,
+            serializar=lambda r: iter_gzip(iter_csv(ANALYTICS_CSV_HEADERS, r)),
+        )
+    return ArchivoExport(
+        filename=filename,
+        media_type=CSV_MEDIA_TYPE,
+        rows=rows,
+        serializar=lambda r: iter_csv(ANALYTICS_CSV_HEADERS, r),
+    )
+
+
+registrar_tipo_export("inbound_analytics.csv", _job_analytics_csv)
 
 
 
@@ -459,6 +461,7 @@ def crear_snapshot_analytics(
 ) -> InboundAnalyticsSnapshot:
     snap = InboundAnalyticsSnapshot(
         negocio_id=negocio_id,
+        origen="manual",
         payload_json=_json_dumps(payload),
         creado_en=utcnow(),
     )
@@ -476,6 +479,7 @@ def listar_snapshots_analytics(
     return (
         db.query(InboundAnalyticsSnapshot)
         .filter(InboundAnalyticsSnapshot.negocio_id == negocio_id)
+        .filter(InboundAnalyticsSnapshot.origen != ANALYTICS_CACHE_ORIGEN)
         .order_by(InboundAnalyticsSnapshot.creado_en.desc())
         .limit(int(limit))
         .all()
@@ -504,6 +508,175 @@ def obtener_snapshot_analytics(
     return payload
 
 
+# =========================================================
+# v2.1 Cache de resultados (snapshots con clave)
+# =========================================================
+
+ANALYTICS_CACHE_ORIGEN = "cache"
+
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "stale": 0, "stores": 0, "errors": 0}
+
+
+def _cache_contar(campo: str) -> None:
+    with _cache_lock:
+        _cache_stats[campo] += 1
+
+
+def analytics_cache_stats() -> dict[str, Any]:
+    """Métricas del cache de analytics (por proceso)."""
+    with _cache_lock:
+        stats = dict(_cache_stats)
+    consultas = stats["hits"] + stats["misses"] + stats["stale"]
+    stats["hit_ratio"] = round(_safe_div(stats["hits"], consultas), 3)
+    return stats
+
+
+def _filtros_hash(*, proveedor_id: int | None) -> str:
+    # filtros fuera de (desde, hasta) + versión del contrato del payload
+    base = _json_dumps({"proveedor_id": proveedor_id, "payload": "v1"})
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+def _col_igual(col, valor):
+    return col.is_(None) if valor is None else col == valor
+
+
+def _guardar_cache(
+    db: Session,
+    *,
+    negocio_id: int,
+    desde: date | None,
+    hasta: date | None,
+    filtros_hash: str,
+    data_version: int,
+    payload: dict[str, Any],
+) -> InboundAnalyticsSnapshot:
+    S = InboundAnalyticsSnapshot
+    clave = [
+        S.negocio_id == negocio_id,
+        S.origen == ANALYTICS_CACHE_ORIGEN,
+        S.filtros_hash == filtros_hash,
+        _col_igual(S.desde, desde),
+        _col_igual(S.hasta, hasta),
+    ]
+    # "fetch": saca del identity map el snapshot viejo (el id puede reutilizarse)
+    db.query(S).filter(*clave).delete(synchronize_session="fetch")
+
+    snap = S(
+        negocio_id=negocio_id,
+        origen=ANALYTICS_CACHE_ORIGEN,
+        desde=desde,
+        hasta=hasta,
+        filtros_hash=filtros_hash,
+        data_version=data_version,
+        payload_json=_json_dumps(payload),
+        creado_en=utcnow(),
+    )
+    db.add(snap)
+    db.flush()
+
+    # acota entradas por negocio (rangos distintos): conserva las más recientes
+    recientes = (
+        db.query(S.id)
+        .filter(S.negocio_id == negocio_id, S.origen == ANALYTICS_CACHE_ORIGEN)
+        .order_by(S.creado_en.desc(), S.id.desc())
+        .limit(int(settings.INBOUND_ANALYTICS_CACHE_MAX_ENTRIES))
+        .scalar_subquery()
+    )
+    db.query(S).filter(
+        S.negocio_id == negocio_id,
+        S.origen == ANALYTICS_CACHE_ORIGEN,
+        S.id.notin_(recientes),
+    ).delete(synchronize_session=False)
+    return snap
+
+
+def obtener_analytics_inbound_cacheado(
+    db: Session,
+    *,
+    negocio_id: int,
+    desde: datetime | None,
+    hasta: datetime | None,
+    proveedor_id: int | None = None,
+) -> dict[str, Any]:
+    """
+    obtener_analytics_inbound con cache persistido en InboundAnalyticsSnapshot.
+
+    Clave: (negocio_id, día desde, día hasta, hash de filtros). Un snapshot
+    sirve si su data_version es la versión inbound actual del negocio y no
+    supera INBOUND_ANALYTICS_CACHE_MAX_AGE_SECONDS; si no, se recalcula y se
+    guarda (commit propio). meta.cache indica hit / miss / stale.
+    """
+    if not settings.INBOUND_ANALYTICS_CACHE_ENABLED:
+        return obtener_analytics_inbound(
+            db, negocio_id=negocio_id, desde=desde, hasta=hasta, proveedor_id=proveedor_id
+        )
+
+    S = InboundAnalyticsSnapshot
+    d_desde = desde.date() if desde else None
+    d_hasta = hasta.date() if hasta else None
+    fhash = _filtros_hash(proveedor_id=proveedor_id)
+
+    # versión ANTES de calcular: una escritura concurrente deja el snapshot
+    # con versión vieja (miss en la próxima consulta, nunca un hit obsoleto)
+    version = obtener_inbound_data_version(db, negocio_id)
+
+    snap = (
+        db.query(S)
+        .filter(
+            S.negocio_id == negocio_id,
+            S.origen == ANALYTICS_CACHE_ORIGEN,
+            S.filtros_hash == fhash,
+            _col_igual(S.desde, d_desde),
+            _col_igual(S.hasta, d_hasta),
+        )
+        .order_by(S.creado_en.desc(), S.id.desc())
+        .first()
+    )
+
+    estado = "miss"
+    if snap is not None:
+        edad = (utcnow() - ensure_utc_aware(snap.creado_en)).total_seconds()
+        if snap.data_version == version and edad <= settings.INBOUND_ANALYTICS_CACHE_MAX_AGE_SECONDS:
+            payload = _json_loads(snap.payload_json or "{}")
+            if payload:
+                _cache_contar("hits")
+                payload.setdefault("meta", {})
+                payload["meta"]["cache"] = {
+                    "estado": "hit",
+                    "snapshot_id": snap.id,
+                    "data_version": version,
+                }
+                return payload
+        estado = "stale"
+
+    _cache_contar("misses" if estado == "miss" else "stale")
+    payload = obtener_analytics_inbound(
+        db, negocio_id=negocio_id, desde=desde, hasta=hasta, proveedor_id=proveedor_id
+    )
+
+    try:
+        snap = _guardar_cache(
+            db,
+            negocio_id=negocio_id,
+            desde=d_desde,
+            hasta=d_hasta,
+            filtros_hash=fhash,
+            data_version=version,
+            payload=payload,
+        )
+        db.commit()
+        _cache_contar("stores")
+    except Exception:
+        db.rollback()
+        _cache_contar("errors")
+        logger.exception("[INBOUND_ANALYTICS] no se pudo guardar cache negocio_id=%s", negocio_id)
+
+    payload["meta"]["cache"] = {"estado": estado, "data_version": version}
+    return payload
+
+
 # =========================================================
 # v3 Scoring Proveedores (0-100)
 # =========================================================
@@ -523,82 +696,49 @@ def calcular_scoring_proveedores(
       - puntualidad ETA->Arribo (más bajo mejor)
       - ciclo Arribo->Cierre (más bajo mejor)
 
+    Una sola query agrupada por proveedor_id sobre inbound_rollup_diario
+    (costo ~ proveedores x días del rango).
+
     Nota: si no hay datos, devolvemos score neutral.
     """
-    # filtros base sobre recepción
-    filtros = [InboundRecepcion.negocio_id == negocio_id]
-    if desde:
-        filtros.append(InboundRecepcion.created_at >= desde)
-    if hasta:
-        filtros.append(InboundRecepcion.created_at <= hasta)
-
-    # armamos dataset por proveedor vía consulta simple + algunos agregados
-    # (preferimos robustez sobre micro-optimización en v3)
-    proveedores_ids = (
-        db.query(func.distinct(InboundRecepcion.proveedor_id))
-        .filter(*filtros)
+    R = InboundRollupDiario
+    rows = (
+        db.query(
+            R.proveedor_id.label("proveedor_id"),
+            Proveedor.id.label("proveedor_existe"),
+            Proveedor.nombre.label("proveedor_nombre"),
+            func.sum(R.recepciones).label("recepciones"),
+            func.coalesce(func.sum(R.incidencias), 0).label("incidencias"),
+            func.sum(R.chk_total).label("chk_total"),
+            func.sum(R.chk_ok).label("chk_ok"),
+            func.sum(R.eta_arribo_min_sum).label("eta_sum"),
+            func.sum(R.eta_arribo_n).label("eta_n"),
+            func.sum(R.arribo_cierre_min_sum).label("cierre_sum"),
+            func.sum(R.arribo_cierre_n).label("cierre_n"),
+        )
+        .select_from(R)
+        .join(Proveedor, Proveedor.id == R.proveedor_id, isouter=True)
+        .filter(*_filtros_rollup(negocio_id=negocio_id, desde=desde, hasta=hasta, proveedor_id=None))
+        .filter(R.proveedor_id != SIN_PROVEEDOR)
+        .group_by(R.proveedor_id, Proveedor.id, Proveedor.nombre)
+        .order_by(R.proveedor_id.asc())
         .all()
     )
-    prov_ids = [pid[0] for pid in proveedores_ids if pid and pid[0] is not None]
 
     out: list[dict[str, Any]] = []
 
-    for pid in prov_ids:
-        # KPIs por proveedor en el rango
-        p = db.get(Proveedor, pid)
-        nombre = p.nombre if p else "—"
-
-        recep_ids = (
-            db.query(InboundRecepcion.id)
-            .filter(*filtros)
-            .filter(InboundRecepcion.proveedor_id == pid)
-            .all()
-        )
-        recep_ids = [x[0] for x in recep_ids]
-        n_recep = len(recep_ids)
+    for r in rows:
+        n_recep = int(r.recepciones or 0)
         if n_recep == 0:
             continue
 
-        # incidencias por recepción
-        inc_total = (
-            db.query(func.count(InboundIncidencia.id))
-            .filter(InboundIncidencia.recepcion_id.in_(recep_ids))
-            .scalar()
-            or 0
-        )
-        inc_rate = _safe_div(float(inc_total), float(n_recep))  # incidencias/recepción
-
-        # checklist pct
-        chk_total = (
-            db.query(func.count(InboundChecklistRecepcion.id))
-            .filter(InboundChecklistRecepcion.recepcion_id.in_(recep_ids))
-            .scalar()
-            or 0
-        )
-        chk_ok = (
-            db.query(func.count(InboundChecklistRecepcion.id))
-            .filter(InboundChecklistRecepcion.recepcion_id.in_(recep_ids))
-            .filter(InboundChecklistRecepcion.estado.in_(["COMPLETADO", "CERRADO", "FINALIZADO"]))
-            .scalar()
-            or 0
-        )
-        chk_pct = _safe_div(float(chk_ok), float(chk_total)) * 100.0 if chk_total else 0.0
+        inc_rate = _safe_div(float(r.incidencias or 0), float(n_recep))  # incidencias/recepción
 
-        # puntualidad: avg(Arribo - ETA) en minutos (abs)
-        eta_arribo = _avg_minutes(
-            db,
-            filtros + [InboundRecepcion.proveedor_id == pid],
-            InboundRecepcion.fecha_estimada_llegada,
-            InboundRecepcion.fecha_arribo,
-        )
+        chk_total = int(r.chk_total or 0)
+        chk_pct = _safe_div(float(r.chk_ok or 0), float(chk_total)) * 100.0 if chk_total else 0.0
 
-        # ciclo: avg(Cierre - Arribo) en minutos
-        arribo_cierre = _avg_minutes(
-            db,
-            filtros + [InboundRecepcion.proveedor_id == pid],
-            InboundRecepcion.fecha_arribo,
-            InboundRecepcion.fecha_cierre,
-        )
+        eta_min = _minutos_promedio(r.eta_sum, r.eta_n)
+        ciclo_min = _minutos_promedio(r.cierre_sum, r.cierre_n)
 
         # ---- normalización (heurística enterprise v3) ----
         # checklist: 0..100 directo
@@ -609,10 +749,10 @@ def calcular_scoring_proveedores(
         s_inc = _clamp(100.0 * (1.0 - _clamp(inc_rate / 2.0, 0.0, 1.0)), 0.0, 100.0)
 
         # puntualidad: ideal 0..30 min, malo >= 240 min
-        s_eta = _clamp(100.0 * (1.0 - _clamp(eta_arribo / 240.0, 0.0, 1.0)), 0.0, 100.0)
+        s_eta = _clamp(100.0 * (1.0 - _clamp(eta_min / 240.0, 0.0, 1.0)), 0.0, 100.0)
 
         # ciclo: ideal <= 120 min, malo >= 720 min
-        s_ciclo = _clamp(100.0 * (1.0 - _clamp(arribo_cierre / 720.0, 0.0, 1.0)), 0.0, 100.0)
+        s_ciclo = _clamp(100.0 * (1.0 - _clamp(ciclo_min / 720.0, 0.0, 1.0)), 0.0, 100.0)
 
         # pesos (v3)
         score = (
@@ -625,13 +765,13 @@ def calcular_scoring_proveedores(
 
         out.append(
             {
-                "proveedor_id": pid,
-                "proveedor_nombre": nombre,
+                "proveedor_id": r.proveedor_id,
+                "proveedor_nombre": r.proveedor_nombre if r.proveedor_existe is not None else "—",
                 "recepciones": n_recep,
                 "checklist_pct": round(s_chk, 1),
                 "inc_rate": round(inc_rate, 2),
-                "eta_arribo_min": float(eta_arribo),
-                "arribo_cierre_min": float(arribo_cierre),
+                "eta_arribo_min": float(eta_min),
+                "arribo_cierre_min": float(ciclo_min),
                 "score": score,
             }
         )
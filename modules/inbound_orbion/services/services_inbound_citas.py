@@ -21,7 +21,7 @@ from core.models.inbound.proveedores import Proveedor
 from core.formatting import assume_cl_local_to_utc, to_cl_tz
 
 # ✅ Usage counters (Strategy C: OPERATIONAL + BILLABLE)
-from core.services.services_usage import increment_usage_dual
+from core.services.services_usage import acumular_usage_dual
 
 from modules.inbound_orbion.services.services_inbound_core import InboundDomainError
 
@@ -320,8 +320,8 @@ def crear_cita_y_recepcion(
         # - Al crear cita se crea recepción 1:1 => ambos se cuentan
         # - Se hace ANTES del commit para quedar en la misma transacción
         # ==========================================================
-        increment_usage_dual(db, int(negocio_id), ModuleKey.INBOUND, "citas_mes", 1.0)
-        increment_usage_dual(db, int(negocio_id), ModuleKey.INBOUND, "recepciones_mes", 1.0)
+        acumular_usage_dual(db, int(negocio_id), ModuleKey.INBOUND, "citas_mes", 1.0)
+        acumular_usage_dual(db, int(negocio_id), ModuleKey.INBOUND, "recepciones_mes", 1.0)
 
         db.commit()
         db.refresh(cita)
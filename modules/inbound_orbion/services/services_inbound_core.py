@@ -15,8 +15,8 @@ from typing import Final
 
 from sqlalchemy.orm import Session
 
-from core.models import Producto
 from core.models.inbound import InboundConfig, InboundRecepcion, RecepcionEstado
+from core.services.services_product_catalog import ProductoCatalogo, get_producto_catalogo
 
 
 # =========================================================
@@ -151,19 +151,12 @@ def validar_producto_para_negocio(
     db: Session,
     producto_id: int,
     negocio_id: int,
-) -> Producto:
+) -> ProductoCatalogo:
     """
     Valida que el producto exista, pertenezca al negocio y esté activo.
+    Resuelve desde el catálogo en memoria del negocio (id, nombre, unidad, códigos).
     """
-    producto = (
-        db.query(Producto)
-        .filter(
-            Producto.id == producto_id,
-            Producto.negocio_id == negocio_id,
-            Producto.activo == 1,
-        )
-        .first()
-    )
+    producto = get_producto_catalogo(db, negocio_id, producto_id, solo_activos=True)
     if producto is None:
         raise InboundDomainError(
             "El producto seleccionado no pertenece al negocio, no existe o se encuentra inactivo."
@@ -0,0 +1,133 @@
+﻿# modules/inbound_orbion/services/services_inbound_data_version.py
+"""
+Versión de datos inbound por negocio – ORBION
+
+✔ Contador por negocio (inbound_data_versiones) que invalida los resultados
+  cacheados de analytics (InboundAnalyticsSnapshot origen="cache")
+✔ Se incrementa al commitear cualquier escritura ORM de recepciones, líneas,
+  incidencias, checklist o proveedores (hooks de Session, misma transacción)
+✔ Un UPDATE/upsert por negocio tocado y commit; nunca bloquea la operación
+"""
+
+from __future__ import annotations
+
+from itertools import chain
+from typing import Iterable
+
+from sqlalchemy import event, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from core.logging_config import logger
+from core.models.inbound.analytics_snapshots import InboundDataVersion
+from core.models.inbound.checklist import InboundChecklistEjecucion, InboundChecklistRespuesta
+from core.models.inbound.incidencias import InboundIncidencia
+from core.models.inbound.lineas import InboundLinea
+from core.models.inbound.proveedores import Proveedor
+from core.models.inbound.recepciones import InboundRecepcion
+from core.models.time import utcnow
+
+
+_INFO_KEY = "inbound_data_version_pendientes"
+
+# Escrituras que cambian lo que muestra /inbound/analytics
+_TIPOS_VERSIONADOS = (
+    InboundRecepcion,
+    InboundLinea,
+    InboundIncidencia,
+    InboundChecklistEjecucion,
+    InboundChecklistRespuesta,
+    Proveedor,
+)
+
+
+# =========================================================
+# API
+# =========================================================
+
+def obtener_inbound_data_version(db: Session, negocio_id: int) -> int:
+    """Versión actual (0 si el negocio nunca escribió datos inbound)."""
+    v = (
+        db.query(InboundDataVersion.version)
+        .filter(InboundDataVersion.negocio_id == int(negocio_id))
+        .scalar()
+    )
+    return int(v or 0)
+
+
+def incrementar_inbound_data_version(db: Session, negocio_ids: Iterable[int]) -> None:
+    """+1 a la versión de cada negocio (upsert). Sin commit."""
+    ids = sorted({int(n) for n in negocio_ids if n is not None})
+    if not ids:
+        return
+
+    now = utcnow()
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        insert_fn = pg_insert if dialect == "postgresql" else sqlite_insert
+        stmt = insert_fn(InboundDataVersion).values(
+            [{"negocio_id": nid, "version": 1, "actualizado_en": now} for nid in ids]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[InboundDataVersion.negocio_id],
+            set_={
+                "version": InboundDataVersion.version + 1,
+                "actualizado_en": stmt.excluded.actualizado_en,
+            },
+        )
+        db.execute(stmt)
+        return
+
+    for nid in ids:
+        res = db.execute(
+            update(InboundDataVersion)
+            .where(InboundDataVersion.negocio_id == nid)
+            .values(version=InboundDataVersion.version + 1, actualizado_en=now)
+        )
+        if not res.rowcount:
+            db.execute(InboundDataVersion.__table__.insert().values(negocio_id=nid, version=1, actualizado_en=now))
+
+
+# =========================================================
+# HOOKS DE SESSION
+# =========================================================
+
+@event.listens_for(Session, "after_flush")
+def _track_data_version(session: Session, flush_context) -> None:
+    negocios = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, _TIPOS_VERSIONADOS) or obj.negocio_id is None:
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if negocios is None:
+            negocios = session.info.setdefault(_INFO_KEY, set())
+        negocios.add(int(obj.negocio_id))
+
+
+@event.listens_for(Session, "before_commit")
+def _aplicar_data_version(session: Session) -> None:
+    # solo el commit de la transacción externa (no al liberar SAVEPOINTs)
+    if session.get_nested_transaction() is not None:
+        return
+
+    # before_commit corre antes del flush del commit (no-op si no hay cambios)
+    session.flush()
+    negocios = session.info.pop(_INFO_KEY, None)
+    if not negocios:
+        return
+
+    try:
+        with session.begin_nested():
+            incrementar_inbound_data_version(session, negocios)
+    except Exception:
+        # peor caso: el cache de analytics sirve datos hasta su max_age
+        logger.exception("[INBOUND_DATA_VERSION] incremento falló negocios=%s", sorted(negocios))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _descartar_data_version(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_INFO_KEY, None)
@@ -18,7 +18,12 @@ from core.models.time import utcnow
 from core.models.enums import InboundDocumentoEstado, InboundDocumentoTipo, ModuleKey, UsageCounterType
 from core.models.inbound.documentos import InboundDocumento
 from core.services.services_entitlements import resolve_entitlements
-from core.services.services_usage import get_usage_value, increment_usage_dual
+from core.services.services_usage import (
+    acumular_usage,
+    acumular_usage_dual,
+    get_usage_value,
+    try_increment_usage_capped,
+)
 
 from .services_inbound_core import InboundDomainError, obtener_recepcion_segura
 
@@ -213,6 +218,71 @@ def _enforce_evidencias_mb(
         )
 
 
+def _reservar_evidencias_mb(
+    db: Session,
+    *,
+    negocio_id: int,
+    size_bytes: int,
+    negocio: Negocio | None = None,
+) -> None:
+    """
+    Consume evidencias_mb (Strategy C: BILLABLE + OPERATIONAL).
+    Con límite, el BILLABLE se incrementa con tope atómico (check + increment
+    en el mismo UPDATE): dos subidas concurrentes no pueden pasar ambas el límite.
+    """
+    mb = _bytes_to_mb(size_bytes)
+    if mb <= 0:
+        return
+
+    try:
+        n = negocio or db.query(Negocio).filter(Negocio.id == int(negocio_id)).first()
+    except Exception:
+        n = None
+
+    max_mb = _coerce_float(_get_inbound_limits(resolve_entitlements(n)).get("evidencias_mb")) if n else None
+
+    if max_mb is None:
+        try:
+            acumular_usage_dual(
+                db,
+                negocio_id=int(negocio_id),
+                module_key=ModuleKey.INBOUND,
+                metric_key=_METRIC_EVIDENCIAS_MB,
+                delta=float(mb),
+            )
+        except Exception:
+            # resiliente
+            pass
+        return
+
+    ok, usado = try_increment_usage_capped(
+        db,
+        int(negocio_id),
+        ModuleKey.INBOUND,
+        _METRIC_EVIDENCIAS_MB,
+        float(mb),
+        limit=float(max_mb),
+        counter_type=UsageCounterType.BILLABLE,
+    )
+    if not ok:
+        remaining = max(0.0, float(max_mb) - float(usado or 0.0))
+        raise InboundDomainError(
+            f"Límite de evidencias excedido. Disponible: {remaining:.2f} MB (de {float(max_mb):.0f} MB)."
+        )
+
+    try:
+        acumular_usage(
+            db,
+            int(negocio_id),
+            ModuleKey.INBOUND,
+            _METRIC_EVIDENCIAS_MB,
+            float(mb),
+            counter_type=UsageCounterType.OPERATIONAL,
+        )
+    except Exception:
+        pass
+
+
 # =========================================================
 # Queries
 # =========================================================
@@ -280,9 +350,9 @@ async def crear_documento(
 
     size_bytes, sha256_hex = await _save_upload_streaming(file, dest)
 
-    # ✅ enforce real con size final
+    # ✅ enforce real con size final: reserva atómica del usage
     try:
-        _enforce_evidencias_mb(db, negocio_id=negocio_id, size_bytes=size_bytes, negocio=negocio)
+        _reservar_evidencias_mb(db, negocio_id=negocio_id, size_bytes=size_bytes, negocio=negocio)
     except Exception:
         try:
             if dest.exists():
@@ -342,18 +412,6 @@ async def crear_documento(
         db.flush()
 
         mb = _bytes_to_mb(size_bytes)
-        if mb > 0:
-            try:
-                increment_usage_dual(
-                    db,
-                    negocio_id=int(negocio_id),
-                    module_key=ModuleKey.INBOUND,
-                    metric_key=_METRIC_EVIDENCIAS_MB,
-                    delta=float(mb),
-                )
-            except Exception:
-                # resiliente
-                pass
 
         logger.info(
             "[INBOUND][DOC] creado negocio_id=%s recepcion_id=%s doc_id=%s bytes=%s mb=%.3f tipo=%s",
@@ -16,7 +16,12 @@ from core.models.enums import InboundFotoTipo, ModuleKey, UsageCounterType
 from core.models import InboundFoto
 
 from core.services.services_entitlements import resolve_entitlements
-from core.services.services_usage import get_usage_value, increment_usage_dual
+from core.services.services_usage import (
+    acumular_usage,
+    acumular_usage_dual,
+    get_usage_value,
+    try_increment_usage_capped,
+)
 
 from modules.inbound_orbion.services.services_inbound_core import (
     InboundDomainError,
@@ -212,6 +217,62 @@ def _enforce_evidencias_limit_mb(
         )
 
 
+def _reservar_evidencias_mb(
+    db: Session,
+    *,
+    negocio,
+    negocio_id: int,
+    delta_bytes: int,
+) -> None:
+    """
+    Consume evidencias_mb (Strategy C: BILLABLE + OPERATIONAL).
+    Con límite, el BILLABLE se incrementa con tope atómico (check + increment
+    en el mismo UPDATE): dos subidas concurrentes no pueden pasar ambas el límite.
+    """
+    delta_mb = _to_mb(int(delta_bytes))
+    if delta_mb <= 0:
+        return
+
+    max_mb = None
+    if negocio is not None:
+        max_mb = _coerce_float(_get_inbound_limits(resolve_entitlements(negocio)).get("evidencias_mb"))
+
+    if max_mb is None:
+        try:
+            acumular_usage_dual(db, int(negocio_id), ModuleKey.INBOUND, _METRIC_EVIDENCIAS_MB, delta=float(delta_mb))
+        except Exception:
+            # resiliente: no romper por contadores
+            pass
+        return
+
+    ok, used_mb = try_increment_usage_capped(
+        db,
+        int(negocio_id),
+        ModuleKey.INBOUND,
+        _METRIC_EVIDENCIAS_MB,
+        float(delta_mb),
+        limit=float(max_mb),
+        counter_type=UsageCounterType.BILLABLE,
+    )
+    if not ok:
+        remaining = max(0.0, float(max_mb) - float(used_mb))
+        raise InboundDomainError(
+            f"Límite de evidencias excedido. Disponible: {remaining:.2f} MB (de {float(max_mb):.0f} MB)."
+        )
+
+    try:
+        acumular_usage(
+            db,
+            int(negocio_id),
+            ModuleKey.INBOUND,
+            _METRIC_EVIDENCIAS_MB,
+            float(delta_mb),
+            counter_type=UsageCounterType.OPERATIONAL,
+        )
+    except Exception:
+        pass
+
+
 async def _save_upload_streaming_image(
     file: UploadFile,
     dest: Path,
@@ -362,9 +423,16 @@ async def crear_foto_recepcion(
     # dims opcional
     width_px, height_px = _try_get_image_dims(raw)
 
-    # ✅ enforcement real con size final
-    if negocio is not None:
-        _enforce_evidencias_limit_mb(db, negocio=negocio, negocio_id=negocio_id, delta_bytes=size_bytes)
+    # ✅ enforcement real con size final: reserva atómica del usage
+    try:
+        _reservar_evidencias_mb(db, negocio=negocio, negocio_id=negocio_id, delta_bytes=size_bytes)
+    except Exception:
+        try:
+            if dest.exists():
+                dest.unlink()
+        except Exception:
+            pass
+        raise
 
     storage_relpath = _rel_uri(dest)
 
@@ -392,21 +460,6 @@ async def crear_foto_recepcion(
     db.add(foto)
     db.flush()
 
-    # ✅ usage dual: BILLABLE + OPERATIONAL (Strategy C)
-    delta_mb = _to_mb(int(size_bytes))
-    if delta_mb > 0:
-        try:
-            increment_usage_dual(
-                db,
-                int(negocio_id),
-                ModuleKey.INBOUND,
-                _METRIC_EVIDENCIAS_MB,
-                delta=float(delta_mb),
-            )
-        except Exception:
-            # resiliente: no romper por contadores
-            pass
-
     return foto
 
 
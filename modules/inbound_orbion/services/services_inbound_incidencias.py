@@ -11,7 +11,7 @@ from core.models.inbound.incidencias import InboundIncidencia
 from core.models.inbound.fotos import InboundFoto
 from core.models.enums import IncidenciaEstado, ModuleKey
 
-from core.services.services_usage import increment_usage_dual
+from core.services.services_usage import acumular_usage_dual
 
 from modules.inbound_orbion.services.services_inbound_core import (
     InboundDomainError,
@@ -134,7 +134,7 @@ def crear_incidencia(
     # - OPERATIONAL + BILLABLE por el mismo evento
     # - Queda en la misma tx del request (commit lo hace la ruta/bridge)
     # ---------------------------------------------------------
-    increment_usage_dual(
+    acumular_usage_dual(
         db,
         negocio_id=negocio_id,
         module_key=ModuleKey.INBOUND,
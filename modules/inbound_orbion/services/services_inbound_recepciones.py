@@ -5,13 +5,14 @@ from datetime import date, datetime
 from typing import Any
 
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func
 
 from core.models.time import utcnow
 from core.models.enums import RecepcionEstado, ModuleKey
 from core.models.inbound.recepciones import InboundRecepcion
 from core.models.inbound.proveedores import Proveedor
 
+from core.services.services_search import filtro_texto
 from core.services.services_usage import increment_usage_dual
 from modules.inbound_orbion.services.services_inbound_core import InboundDomainError
 
@@ -188,16 +189,10 @@ def listar_recepciones(
     if dt_to:
         stmt = stmt.where(InboundRecepcion.created_at <= dt_to)
 
-    if q:
-        qq = f"%{q.strip()}%"
-        stmt = stmt.where(
-            or_(
-                func.lower(InboundRecepcion.codigo_recepcion).like(func.lower(qq)),
-                func.lower(InboundRecepcion.documento_ref).like(func.lower(qq)),
-                func.lower(InboundRecepcion.contenedor).like(func.lower(qq)),
-                func.lower(InboundRecepcion.patente_camion).like(func.lower(qq)),
-            )
-        )
+    # código / documento / contenedor / patente (índice de búsqueda)
+    filtro_q = filtro_texto("inbound_recepciones", q)
+    if filtro_q is not None:
+        stmt = stmt.where(filtro_q)
 
     stmt = stmt.order_by(InboundRecepcion.created_at.desc()).limit(int(limit))
     return list(db.execute(stmt).scalars().all())
@@ -0,0 +1,480 @@
+﻿# modules/inbound_orbion/services/services_inbound_rollup.py
+"""
+Rollup diario inbound – ORBION
+
+✔ Tabla inbound_rollup_diario: un registro por (negocio, proveedor, día CL)
+  con recepciones, cerradas, kg, incidencias, checklist y SLA (suma + n)
+✔ Mantenimiento incremental: hooks de Session registran las recepciones
+  tocadas (recepción, líneas, incidencias, checklist) y antes del commit se
+  recalculan SOLO sus buckets, en la misma transacción (transiciones de
+  estado, reconciliar_y_cerrar_recepcion, edición de líneas, ...)
+✔ Falla del rollup no bloquea la operación (SAVEPOINT + log); rebuild lo repara
+✔ Rebuild / verify desde las tablas crudas (job operativo / bootstrap)
+
+Uso operativo:
+    python -m modules.inbound_orbion.services.services_inbound_rollup verify [negocio_id]
+    python -m modules.inbound_orbion.services.services_inbound_rollup rebuild [negocio_id]
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import and_, case, delete, event, exists, func, inspect, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from core.formatting import assume_cl_local_to_utc, to_cl_tz
+from core.logging_config import logger
+from core.models.inbound.checklist import InboundChecklistEjecucion, InboundChecklistRespuesta
+from core.models.inbound.incidencias import InboundIncidencia
+from core.models.inbound.lineas import InboundLinea
+from core.models.inbound.recepciones import InboundRecepcion
+from core.models.inbound.rollup import InboundRollupDiario
+from core.models.time import utcnow
+
+
+# proveedor_id del bucket para recepciones sin proveedor
+SIN_PROVEEDOR = 0
+
+# Buckets por statement al recalcular / borrar
+_CHUNK = 200
+
+# Filas por fetch en rebuild
+_YIELD_PER = 5000
+
+# Tolerancia para comparar floats en verify
+_EPS = 1e-6
+
+_INFO_KEY = "inbound_rollup_pendientes"
+
+
+# =========================================================
+# DÍA LOCAL (America/Santiago)
+# =========================================================
+
+def dia_local(dt: datetime) -> date:
+    """Día calendario en Chile de un timestamp (naive = UTC)."""
+    return to_cl_tz(dt).date()
+
+
+def inicio_dia_utc(d: date) -> datetime:
+    """Inicio del día CL `d` como UTC tz-aware."""
+    return assume_cl_local_to_utc(datetime.combine(d, time.min))
+
+
+# =========================================================
+# AGREGACIÓN DESDE TABLAS CRUDAS
+# =========================================================
+
+def _query_filas_recepcion(db: Session, *filtros):
+    """
+    Una fila por recepción con sus agregados (subqueries correlacionadas por
+    recepcion_id: índice, sin fan-out ni pre-agregar todo el tenant).
+    """
+    kg = (
+        select(func.coalesce(func.sum(InboundLinea.peso_recibido_kg), 0.0))
+        .where(InboundLinea.recepcion_id == InboundRecepcion.id)
+        .correlate(InboundRecepcion)
+        .scalar_subquery()
+    )
+    incidencias = (
+        select(func.count(InboundIncidencia.id))
+        .where(InboundIncidencia.recepcion_id == InboundRecepcion.id)
+        .correlate(InboundRecepcion)
+        .scalar_subquery()
+    )
+    con_chk = exists().where(InboundChecklistEjecucion.recepcion_id == InboundRecepcion.id)
+    chk_pendiente = exists().where(
+        InboundChecklistRespuesta.recepcion_id == InboundRecepcion.id,
+        InboundChecklistRespuesta.estado == "PENDIENTE",
+    )
+
+    return (
+        db.query(
+            InboundRecepcion.negocio_id,
+            InboundRecepcion.proveedor_id,
+            InboundRecepcion.created_at,
+            InboundRecepcion.fecha_estimada_llegada,
+            InboundRecepcion.fecha_arribo,
+            InboundRecepcion.fecha_fin_descarga,
+            InboundRecepcion.fecha_cierre,
+            kg.label("kg"),
+            incidencias.label("incidencias"),
+            case((con_chk, 1), else_=0).label("chk"),
+            case((and_(con_chk, ~chk_pendiente), 1), else_=0).label("chk_ok"),
+        )
+        .filter(*filtros)
+    )
+
+
+def _minutos(ini: datetime | None, fin: datetime | None) -> float | None:
+    if ini is None or fin is None:
+        return None
+    return (fin - ini).total_seconds() / 60.0
+
+
+@dataclass
+class _Acumulado:
+    recepciones: int = 0
+    recepciones_cerradas: int = 0
+    kg: float = 0.0
+    incidencias: int = 0
+    chk_total: int = 0
+    chk_ok: int = 0
+    eta_arribo_min_sum: float = 0.0
+    eta_arribo_n: int = 0
+    arribo_descarga_min_sum: float = 0.0
+    arribo_descarga_n: int = 0
+    arribo_cierre_min_sum: float = 0.0
+    arribo_cierre_n: int = 0
+
+    def agregar(self, r) -> None:
+        self.recepciones += 1
+        if r.fecha_cierre is not None:
+            self.recepciones_cerradas += 1
+        self.kg += float(r.kg or 0.0)
+        self.incidencias += int(r.incidencias or 0)
+        self.chk_total += int(r.chk or 0)
+        self.chk_ok += int(r.chk_ok or 0)
+
+        for campo, ini, fin in (
+            ("eta_arribo", r.fecha_estimada_llegada, r.fecha_arribo),
+            ("arribo_descarga", r.fecha_arribo, r.fecha_fin_descarga),
+            ("arribo_cierre", r.fecha_arribo, r.fecha_cierre),
+        ):
+            m = _minutos(ini, fin)
+            if m is not None:
+                setattr(self, f"{campo}_min_sum", getattr(self, f"{campo}_min_sum") + m)
+                setattr(self, f"{campo}_n", getattr(self, f"{campo}_n") + 1)
+
+
+def _bucket(negocio_id: int, proveedor_id: int | None, created_at: datetime) -> tuple[int, int, date]:
+    return (int(negocio_id), int(proveedor_id or SIN_PROVEEDOR), dia_local(created_at))
+
+
+def _acumular(filas: Iterable[Any]) -> dict[tuple[int, int, date], _Acumulado]:
+    out: dict[tuple[int, int, date], _Acumulado] = {}
+    for r in filas:
+        key = _bucket(r.negocio_id, r.proveedor_id, r.created_at)
+        acc = out.get(key)
+        if acc is None:
+            acc = out[key] = _Acumulado()
+        acc.agregar(r)
+    return out
+
+
+def _filtro_bucket(negocio_id: int, proveedor_id: int, dia: date):
+    prov = (
+        InboundRecepcion.proveedor_id.is_(None)
+        if proveedor_id == SIN_PROVEEDOR
+        else InboundRecepcion.proveedor_id == proveedor_id
+    )
+    return and_(
+        InboundRecepcion.negocio_id == negocio_id,
+        prov,
+        InboundRecepcion.created_at >= inicio_dia_utc(dia),
+        InboundRecepcion.created_at < inicio_dia_utc(dia + timedelta(days=1)),
+    )
+
+
+def _mappings(acumulados: dict[tuple[int, int, date], _Acumulado]) -> list[dict[str, Any]]:
+    ahora = utcnow()
+    return [
+        {
+            "negocio_id": key[0],
+            "proveedor_id": key[1],
+            "dia": key[2],
+            "actualizado_en": ahora,
+            **vars(acc),
+        }
+        for key, acc in acumulados.items()
+    ]
+
+
+# =========================================================
+# RECÁLCULO INCREMENTAL (por bucket)
+# =========================================================
+
+def recalcular_buckets(db: Session, buckets: Iterable[tuple[int, int, date]]) -> int:
+    """
+    Recalcula desde las tablas crudas los buckets (negocio_id, proveedor_id, día)
+    indicados: DELETE + INSERT. Idempotente, sin commit. Retorna filas escritas.
+    """
+    buckets = sorted(set(buckets))
+    escritas = 0
+
+    for i in range(0, len(buckets), _CHUNK):
+        lote = buckets[i:i + _CHUNK]
+        en_lote = set(lote)
+        acumulados = _acumular(
+            _query_filas_recepcion(db, or_(*(_filtro_bucket(*b) for b in lote)))
+        )
+
+        db.execute(
+            delete(InboundRollupDiario).where(
+                tuple_(
+                    InboundRollupDiario.negocio_id,
+                    InboundRollupDiario.proveedor_id,
+                    InboundRollupDiario.dia,
+                ).in_(lote)
+            )
+        )
+        filas = _mappings({k: v for k, v in acumulados.items() if k in en_lote})
+        if filas:
+            db.execute(InboundRollupDiario.__table__.insert(), filas)
+            escritas += len(filas)
+
+    return escritas
+
+
+def recalcular_recepciones(db: Session, recepcion_ids: Iterable[int]) -> int:
+    """Recalcula los buckets de las recepciones indicadas (sin commit)."""
+    ids = sorted({int(x) for x in recepcion_ids if x is not None})
+    buckets: set[tuple[int, int, date]] = set()
+    for i in range(0, len(ids), _CHUNK):
+        rows = (
+            db.query(InboundRecepcion.negocio_id, InboundRecepcion.proveedor_id, InboundRecepcion.created_at)
+            .filter(InboundRecepcion.id.in_(ids[i:i + _CHUNK]))
+            .all()
+        )
+        buckets.update(_bucket(*r) for r in rows if r.created_at is not None)
+    return recalcular_buckets(db, buckets)
+
+
+# =========================================================
+# HOOKS DE SESSION
+# =========================================================
+
+# Atributos que cambian el rollup (otros updates no recalculan)
+_ATTRS_RECEPCION = (
+    "negocio_id",
+    "proveedor_id",
+    "created_at",
+    "fecha_estimada_llegada",
+    "fecha_arribo",
+    "fecha_fin_descarga",
+    "fecha_cierre",
+)
+_ATTRS_HIJOS = {
+    InboundLinea: ("recepcion_id", "peso_recibido_kg"),
+    InboundIncidencia: ("recepcion_id",),
+    InboundChecklistEjecucion: ("recepcion_id",),
+    InboundChecklistRespuesta: ("recepcion_id", "estado"),
+}
+
+
+def _cambio(obj: Any, attrs: tuple[str, ...]) -> bool:
+    estado = inspect(obj)
+    return any(estado.attrs[a].history.has_changes() for a in attrs)
+
+
+def _valores_previos(obj: Any, attr: str) -> list:
+    return [v for v in inspect(obj).attrs[attr].history.deleted if v is not None]
+
+
+def _pendientes(session: Session) -> dict[str, set]:
+    pend = session.info.get(_INFO_KEY)
+    if pend is None:
+        pend = session.info[_INFO_KEY] = {"recepciones": set(), "buckets": set()}
+    return pend
+
+
+@event.listens_for(Session, "after_flush")
+def _track_rollup(session: Session, flush_context) -> None:
+    pend = None
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, InboundRecepcion):
+            nuevo_o_borrado = obj in session.new or obj in session.deleted
+            if not nuevo_o_borrado and not _cambio(obj, _ATTRS_RECEPCION):
+                continue
+            pend = pend or _pendientes(session)
+
+            if obj.created_at is not None and obj.negocio_id is not None:
+                pend["buckets"].add(_bucket(obj.negocio_id, obj.proveedor_id, obj.created_at))
+            if obj in session.dirty:
+                # bucket anterior si cambió negocio / proveedor / día
+                negocio_id = (_valores_previos(obj, "negocio_id") or [obj.negocio_id])[0]
+                proveedor_id = (inspect(obj).attrs.proveedor_id.history.deleted or [obj.proveedor_id])[0]
+                created_at = (_valores_previos(obj, "created_at") or [obj.created_at])[0]
+                if created_at is not None and negocio_id is not None:
+                    pend["buckets"].add(_bucket(negocio_id, proveedor_id, created_at))
+            continue
+
+        attrs = _ATTRS_HIJOS.get(type(obj))
+        if attrs is None:
+            continue
+        if obj in session.dirty and not _cambio(obj, attrs):
+            continue
+        pend = pend or _pendientes(session)
+        pend["recepciones"].add(obj.recepcion_id)
+        if obj in session.dirty:
+            pend["recepciones"].update(_valores_previos(obj, "recepcion_id"))
+
+
+@event.listens_for(Session, "before_commit")
+def _aplicar_rollup(session: Session) -> None:
+    # solo el commit de la transacción externa (no al liberar SAVEPOINTs)
+    if session.get_nested_transaction() is not None:
+        return
+
+    # before_commit corre antes del flush del commit: flush explícito para
+    # que los cambios aún pendientes registren sus buckets (no-op si no hay)
+    session.flush()
+    pend = session.info.pop(_INFO_KEY, None)
+    if not pend:
+        return
+
+    try:
+        with session.begin_nested():
+            recalcular_recepciones(session, pend["recepciones"])
+            recalcular_buckets(session, pend["buckets"])
+    except Exception:
+        # el rollup es derivado: la operación de negocio se commitea igual
+        logger.exception(
+            "[INBOUND_ROLLUP] recálculo incremental falló recepciones=%s buckets=%s",
+            len(pend["recepciones"]),
+            len(pend["buckets"]),
+        )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _descartar_rollup(session: Session, transaction) -> None:
+    # rollback de la transacción externa: los buckets registrados ya no aplican
+    if transaction.parent is None:
+        session.info.pop(_INFO_KEY, None)
+
+
+# =========================================================
+# REBUILD / VERIFY
+# =========================================================
+
+def _negocio_ids_con_recepciones(db: Session, negocio_id: Optional[int]) -> list[int]:
+    if negocio_id is not None:
+        return [int(negocio_id)]
+    return sorted(int(r[0]) for r in db.query(InboundRecepcion.negocio_id).distinct().all())
+
+
+def calcular_rollup_negocio(db: Session, negocio_id: int) -> dict[tuple[int, int, date], _Acumulado]:
+    """Rollup esperado del negocio desde las tablas crudas (streaming, no escribe)."""
+    return _acumular(
+        _query_filas_recepcion(db, InboundRecepcion.negocio_id == int(negocio_id)).yield_per(_YIELD_PER)
+    )
+
+
+def reconstruir_inbound_rollup(
+    db: Session,
+    negocio_id: Optional[int] = None,
+    *,
+    commit: bool = True,
+) -> dict:
+    """
+    Reconstruye inbound_rollup_diario desde recepciones / líneas / incidencias /
+    checklist (una transacción por negocio). Idempotente.
+    """
+    counters = {"negocios": 0, "filas": 0, "errors": 0}
+
+    for nid in _negocio_ids_con_recepciones(db, negocio_id):
+        try:
+            filas = _mappings(calcular_rollup_negocio(db, nid))
+            db.execute(delete(InboundRollupDiario).where(InboundRollupDiario.negocio_id == nid))
+            if filas:
+                db.execute(InboundRollupDiario.__table__.insert(), filas)
+            if commit:
+                db.commit()
+            else:
+                db.flush()
+
+            counters["negocios"] += 1
+            counters["filas"] += len(filas)
+        except Exception:
+            db.rollback()
+            counters["errors"] += 1
+            logger.exception("[INBOUND_ROLLUP] rebuild falló negocio_id=%s", nid)
+
+    logger.info(
+        "[INBOUND_ROLLUP] rebuild negocios=%s filas=%s errors=%s",
+        counters["negocios"],
+        counters["filas"],
+        counters["errors"],
+    )
+    return {"ok": counters["errors"] == 0, "now": utcnow().isoformat(), "counters": counters}
+
+
+def verificar_inbound_rollup(db: Session, negocio_id: Optional[int] = None) -> dict:
+    """
+    Compara inbound_rollup_diario contra el recálculo desde tablas crudas
+    (no escribe). Retorna resumen + hasta 50 diferencias.
+    """
+    counters = {"scanned": 0, "ok": 0, "mismatch": 0, "missing": 0, "orphan": 0}
+    diffs: list[dict] = []
+    campos = list(vars(_Acumulado()))
+
+    for nid in _negocio_ids_con_recepciones(db, negocio_id):
+        esperado = calcular_rollup_negocio(db, nid)
+        actuales = {
+            (r.negocio_id, r.proveedor_id, r.dia): r
+            for r in db.query(InboundRollupDiario).filter(InboundRollupDiario.negocio_id == nid).all()
+        }
+
+        for key in set(esperado) | set(actuales):
+            counters["scanned"] += 1
+            esp, act = esperado.get(key), actuales.get(key)
+            if act is None:
+                counters["missing"] += 1
+                tipo = "missing"
+            elif esp is None:
+                counters["orphan"] += 1
+                tipo = "orphan"
+            elif any(abs(float(getattr(esp, c)) - float(getattr(act, c) or 0)) > _EPS for c in campos):
+                counters["mismatch"] += 1
+                tipo = "mismatch"
+            else:
+                counters["ok"] += 1
+                continue
+            if len(diffs) < 50:
+                diffs.append({"negocio_id": key[0], "proveedor_id": key[1], "dia": key[2].isoformat(), "tipo": tipo})
+
+    ok = counters["mismatch"] == 0 and counters["missing"] == 0 and counters["orphan"] == 0
+    return {"ok": ok, "counters": counters, "diffs": diffs}
+
+
+def ensure_inbound_rollup(db: Session) -> int:
+    """
+    Bootstrap idempotente (startup): reconstruye los negocios con recepciones
+    pero sin filas de rollup (tabla recién creada). Retorna cuántos.
+    """
+    con_recepciones = {int(r[0]) for r in db.query(InboundRecepcion.negocio_id).distinct().all()}
+    con_rollup = {int(r[0]) for r in db.query(InboundRollupDiario.negocio_id).distinct().all()}
+
+    pendientes = sorted(con_recepciones - con_rollup)
+    for nid in pendientes:
+        reconstruir_inbound_rollup(db, nid, commit=True)
+
+    if pendientes:
+        logger.info("[INBOUND_ROLLUP] bootstrap reconstruyó negocios=%s", pendientes)
+    return len(pendientes)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    from core.database import SessionLocal
+
+    accion = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    nid_arg = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    _db = SessionLocal()
+    try:
+        if accion == "rebuild":
+            res = reconstruir_inbound_rollup(_db, nid_arg)
+        else:
+            res = verificar_inbound_rollup(_db, nid_arg)
+        print(json.dumps(res, ensure_ascii=False, indent=2, default=str))
+        sys.exit(0 if res.get("ok") else 1)
+    finally:
+        _db.close()
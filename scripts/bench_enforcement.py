@@ -0,0 +1,190 @@
+﻿# scripts/bench_enforcement.py
+"""
+Benchmark de enforcement – ORBION
+
+1) Costo por llamada: check_limit (fast-path, 1 query) vs el snapshot completo
+   de entitlements sin cache (lo que leía check_limit antes).
+2) Correctitud concurrente: N threads reservan 1 unidad contra un límite L
+   (reserve_usage, hard cap). Debe quedar exactamente L permitidas y el
+   contador BILLABLE en L.
+
+Uso (desde la raíz del repo; usa una BD SQLite temporal, no toca la real):
+
+    python -m scripts.bench_enforcement --calls 500 --threads 16 --reservas 200 --limite 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+_METRIC = "recepciones_mes"
+
+
+def _setup_env() -> str:
+    fd, path = tempfile.mkstemp(prefix="orbion_bench_enf_", suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("APP_SECRET_KEY", "bench-enforcement")
+    return path
+
+
+def _seed(limite: int) -> int:
+    from core.database import SessionLocal, init_db
+    from core.models import Negocio
+    from core.models.enums import ModuleKey
+    from core.services.services_subscriptions import activate_module
+
+    init_db()
+    db = SessionLocal()
+    try:
+        negocio = Negocio(
+            nombre_fantasia="Bench Enforcement",
+            entitlements={
+                "segment": "pyme",
+                "modules": {"inbound": {"enabled": True, "status": "active"}},
+                "limits": {"inbound": {_METRIC: limite}},
+            },
+        )
+        db.add(negocio)
+        db.flush()
+        activate_module(db, negocio.id, ModuleKey.INBOUND, start_trial=False)
+        db.commit()
+        return int(negocio.id)
+    finally:
+        db.close()
+
+
+class _QueryCounter:
+    def __init__(self, engine) -> None:
+        from sqlalchemy import event
+
+        self.n = 0
+        event.listen(engine, "before_cursor_execute", self._on_exec)
+
+    def _on_exec(self, *args, **kwargs) -> None:
+        self.n += 1
+
+
+def _bench(nombre: str, fn, calls: int, counter: _QueryCounter) -> None:
+    fn()  # warm-up
+    lat = []
+    q0 = counter.n
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t0)
+    queries = (counter.n - q0) / calls
+    print(
+        f"{nombre:<28} p50={statistics.median(lat) * 1000:7.3f}ms  "
+        f"mean={statistics.mean(lat) * 1000:7.3f}ms  queries/call={queries:.1f}"
+    )
+
+
+def bench_costo(negocio_id: int, calls: int) -> None:
+    from core.database import SessionLocal, engine
+    from core.models.enums import ModuleKey
+    from core.services.services_enforcement import check_limit
+    from core.services.services_entitlements import get_entitlements_snapshot
+
+    counter = _QueryCounter(engine)
+    db = SessionLocal()
+    try:
+        _bench(
+            "snapshot (sin cache)",
+            lambda: get_entitlements_snapshot(db, negocio_id, use_cache=False),
+            calls,
+            counter,
+        )
+        _bench(
+            "check_limit (fast-path)",
+            lambda: check_limit(db, negocio_id, ModuleKey.INBOUND, _METRIC, 1),
+            calls,
+            counter,
+        )
+    finally:
+        db.close()
+
+
+def bench_concurrencia(negocio_id: int, threads: int, reservas: int, limite: int) -> bool:
+    from core.database import SessionLocal
+    from core.models.enums import ModuleKey, UsageCounterType
+    from core.services.services_enforcement import EnforcementDecision, reserve_usage
+    from core.services.services_usage import get_usage_value
+
+    permitidas = 0
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def _worker(n: int) -> None:
+        nonlocal permitidas
+        barrier.wait()
+        for _ in range(n):
+            db = SessionLocal()
+            try:
+                res = reserve_usage(db, negocio_id, ModuleKey.INBOUND, _METRIC, 1)
+                db.commit()
+                if res.decision != EnforcementDecision.BLOCK:
+                    with lock:
+                        permitidas += 1
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+    por_thread = [reservas // threads + (1 if i < reservas % threads else 0) for i in range(threads)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(_worker, por_thread))
+    elapsed = time.perf_counter() - t0
+
+    db = SessionLocal()
+    try:
+        final = get_usage_value(
+            db, negocio_id, ModuleKey.INBOUND, _METRIC, counter_type=UsageCounterType.BILLABLE
+        )
+    finally:
+        db.close()
+
+    ok = permitidas == limite and abs(final - limite) < 1e-9
+    print(
+        f"reserve_usage concurrente   threads={threads} reservas={reservas} limite={limite} "
+        f"permitidas={permitidas} billable={final:g} ({reservas / elapsed:.0f} reservas/s) "
+        f"-> {'OK' if ok else 'FALLA'}"
+    )
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de enforcement ORBION")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--reservas", type=int, default=200)
+    parser.add_argument("--limite", type=int, default=50)
+    args = parser.parse_args()
+
+    path = _setup_env()
+    try:
+        negocio_id = _seed(args.limite)
+        bench_costo(negocio_id, args.calls)
+        ok = bench_concurrencia(negocio_id, args.threads, args.reservas, args.limite)
+    finally:
+        for suf in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suf)
+            except OSError:
+                pass
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
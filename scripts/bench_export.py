@@ -0,0 +1,249 @@
+﻿# scripts/bench_export.py
+"""
+Benchmark de exportación de movimientos – ORBION
+
+Compara, para tenants de 10k / 100k / 1M movimientos:
+
+  - legacy:    query.all() + Workbook normal (celda a celda) + BytesIO
+               (implementación anterior de routes_export.build_excel)
+  - streaming: services_export (yield_per -> XLSX streaming -> chunks)
+  - csv:       yield_per -> core.streaming.iter_csv (/exportar/movimientos.csv)
+  - csv-gzip:  ídem + iter_gzip (?gzip=true)
+
+Cada medición corre en un subproceso aparte para aislar el pico de RSS
+(ru_maxrss). Se reporta RSS base (tras imports), pico, tiempo al primer
+chunk (TTFB) y tiempo total.
+
+Uso (desde la raíz del repo; BD SQLite temporal):
+
+    python -m scripts.bench_export --tamanos 10000,100000,1000000
+    python -m scripts.bench_export --legacy-max 1000000   # incluye legacy con 1M
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+# =========================================================
+# SEED
+# =========================================================
+
+def _seed(tamanos: list[int]) -> dict[int, int]:
+    from core.database import SessionLocal, engine, init_db
+    from core.models import Movimiento, Negocio
+
+    init_db()
+    negocios: dict[int, int] = {}
+    ins = Movimiento.__table__.insert()
+    base = datetime(2024, 1, 1)
+
+    for filas in tamanos:
+        db = SessionLocal()
+        try:
+            negocio = Negocio(nombre_fantasia=f"Bench Export {filas}")
+            db.add(negocio)
+            db.commit()
+            nid = int(negocio.id)
+        finally:
+            db.close()
+
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            lote = []
+            for i in range(filas):
+                tipo = "entrada" if i % 3 else "salida"
+                lote.append(
+                    {
+                        "negocio_id": nid,
+                        "usuario": f"operador{i % 40:02d}@bench.cl",
+                        "tipo": tipo,
+                        "producto": f"Producto {i % 5000:05d}",
+                        "cantidad": 5 if tipo == "entrada" else 2,
+                        "zona": f"B-01-S{i % 50}",
+                        "fecha": base + timedelta(seconds=30 * i),
+                        "fecha_vencimiento": (base + timedelta(days=i % 365)).date() if tipo == "entrada" else None,
+                        "motivo_salida": "venta" if tipo == "salida" else None,
+                    }
+                )
+                if len(lote) >= 20000:
+                    conn.execute(ins, lote)
+                    lote.clear()
+            if lote:
+                conn.execute(ins, lote)
+        negocios[filas] = nid
+        print(f"seed        negocio_id={nid} movimientos={filas} ({time.perf_counter() - t0:.1f}s)")
+
+    return negocios
+
+
+# =========================================================
+# MEDICIÓN (subproceso)
+# =========================================================
+
+def _rss_mb() -> float:
+    # Linux: KB; macOS: bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _legacy(db, negocio_id: int):
+    from io import BytesIO
+
+    import openpyxl
+    from openpyxl.utils import get_column_letter
+
+    from modules.basic_wms.services.services_export import MOVIMIENTOS_HEADERS, query_movimientos_export
+
+    resultados = query_movimientos_export(db, negocio_id).all()
+    rows = []
+    for r in resultados:
+        cantidad_neta = -(r.cantidad or 0) if r.tipo == "salida" else (r.cantidad or 0)
+        rows.append(
+            (
+                r.fecha.isoformat() if r.fecha else None,
+                r.tipo,
+                int(r.cantidad) if r.cantidad is not None else 0,
+                int(cantidad_neta),
+                r.producto,
+                r.zona,
+                r.usuario,
+                r.fecha_vencimiento.isoformat() if r.fecha_vencimiento else None,
+                r.motivo_salida,
+            )
+        )
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Movimientos"
+    for col_idx, header in enumerate(MOVIMIENTOS_HEADERS, start=1):
+        cell = ws.cell(row=1, column=col_idx, value=header)
+        cell.font = openpyxl.styles.Font(bold=True)
+    for row_idx, row in enumerate(rows, start=2):
+        for col_idx, value in enumerate(row, start=1):
+            ws.cell(row=row_idx, column=col_idx, value=value)
+    for col_idx, _ in enumerate(MOVIMIENTOS_HEADERS, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = 18
+
+    stream = BytesIO()
+    wb.save(stream)
+    stream.seek(0)
+    # StreamingResponse sobre BytesIO: itera por líneas
+    return iter(stream)
+
+
+def _streaming(db, negocio_id: int):
+    from modules.basic_wms.services.services_export import MOVIMIENTOS_HEADERS, iter_movimientos_rows, iter_xlsx
+
+    return iter_xlsx(MOVIMIENTOS_HEADERS, iter_movimientos_rows(db, negocio_id), title="Movimientos")
+
+
+def _csv(db, negocio_id: int, gzip: bool = False):
+    from core.streaming import iter_csv, iter_gzip
+    from modules.basic_wms.services.services_export import MOVIMIENTOS_HEADERS, iter_movimientos_rows
+
+    chunks = iter_csv(MOVIMIENTOS_HEADERS, iter_movimientos_rows(db, negocio_id))
+    return iter_gzip(chunks) if gzip else chunks
+
+
+_MODOS = {
+    "legacy": _legacy,
+    "streaming": _streaming,
+    "csv": _csv,
+    "csv-gzip": lambda db, negocio_id: _csv(db, negocio_id, gzip=True),
+}
+
+
+def medir(modo: str, negocio_id: int) -> None:
+    from core.database import SessionLocal
+
+    base_rss = _rss_mb()
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        chunks = _MODOS[modo](db, negocio_id)
+        ttfb = None
+        total_bytes = 0
+        for chunk in chunks:
+            if ttfb is None:
+                ttfb = time.perf_counter() - t0
+            total_bytes += len(chunk)
+        total = time.perf_counter() - t0
+    finally:
+        db.close()
+
+    print(json.dumps({
+        "base_rss_mb": base_rss,
+        "peak_rss_mb": _rss_mb(),
+        "ttfb_s": ttfb or total,
+        "total_s": total,
+        "bytes": total_bytes,
+    }))
+
+
+# =========================================================
+# MAIN
+# =========================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de export de movimientos ORBION")
+    sub = parser.add_subparsers(dest="cmd")
+
+    p_medir = sub.add_parser("_medir")
+    p_medir.add_argument("--modo", choices=list(_MODOS), required=True)
+    p_medir.add_argument("--negocio", type=int, required=True)
+
+    parser.add_argument("--tamanos", default="10000,100000,1000000")
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="omite legacy sobre este tamaño (1M legacy: varios GB)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("APP_SECRET_KEY", "bench-export")
+
+    if args.cmd == "_medir":
+        medir(args.modo, args.negocio)
+        return
+
+    fd, path = tempfile.mkstemp(prefix="orbion_bench_export_", suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    try:
+        tamanos = [int(x) for x in args.tamanos.split(",") if x.strip()]
+        negocios = _seed(tamanos)
+
+        print(f"{'filas':>9} {'modo':<10} {'rss base':>9} {'rss pico':>9} {'ttfb':>8} {'total':>8} {'bytes':>9}")
+        for filas in tamanos:
+            for modo in _MODOS:
+                if modo == "legacy" and filas > args.legacy_max:
+                    print(f"{filas:>9} {modo:<10} {'(omitido, --legacy-max)':>40}")
+                    continue
+                out = subprocess.run(
+                    [sys.executable, "-m", "scripts.bench_export", "_medir", "--modo", modo, "--negocio", str(negocios[filas])],
+                    capture_output=True,
+                    text=True,
+                    env=os.environ.copy(),
+                    check=True,
+                )
+                m = json.loads(out.stdout.strip().splitlines()[-1])
+                print(
+                    f"{filas:>9} {modo:<10} {m['base_rss_mb']:>7.0f}MB {m['peak_rss_mb']:>7.0f}MB "
+                    f"{m['ttfb_s']:>7.2f}s {m['total_s']:>7.2f}s {m['bytes'] / 1e6:>7.1f}MB"
+                )
+    finally:
+        for suf in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suf)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
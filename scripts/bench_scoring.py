@@ -0,0 +1,350 @@
+﻿# scripts/bench_scoring.py
+"""
+Benchmark de scoring de proveedores (inbound analytics v3) – ORBION
+
+Fixture: un tenant con N proveedores (default 500) y M recepciones
+(default 50k) repartidas entre ellos, con incidencias (0..3 por recepción),
+checklist (1 ejecución por recepción, ~1/3 con respuestas PENDIENTE) y
+tiempos ETA / arribo / cierre.
+
+Compara:
+
+  - legacy:   loop por proveedor (db.get + ids de recepción + counts con
+              IN (...) + 2 _avg_minutes ≈ 7 queries por proveedor)
+  - agrupado: services_inbound_analytics.calcular_scoring_proveedores
+              (1 query agrupada por proveedor_id sobre inbound_rollup_diario)
+
+Reporta latencia (mediana), queries por llamada y verifica que ambos
+rankings sean idénticos.
+
+Uso (desde la raíz del repo; por defecto BD SQLite temporal):
+
+    python -m scripts.bench_scoring --proveedores 500 --recepciones 50000
+    python -m scripts.bench_scoring --database-url postgresql://...  # BD vacía de prueba
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def _setup_env(database_url: str | None) -> str | None:
+    os.environ.setdefault("APP_SECRET_KEY", "bench-scoring")
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+        return None
+    fd, path = tempfile.mkstemp(prefix="orbion_bench_scoring_", suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+
+# =========================================================
+# SEED
+# =========================================================
+
+def _insert_ids(conn, tabla, filas: list[dict]) -> list[int]:
+    res = conn.execute(tabla.insert().returning(tabla.c.id, sort_by_parameter_order=True), filas)
+    return [int(r[0]) for r in res]
+
+
+def _seed(proveedores: int, recepciones: int) -> int:
+    from core.database import SessionLocal, engine, init_db
+    from core.models import Negocio
+    from core.models.inbound.checklist import (
+        InboundChecklistEjecucion,
+        InboundChecklistItem,
+        InboundChecklistPlantilla,
+        InboundChecklistRespuesta,
+        InboundChecklistSeccion,
+    )
+    from core.models.inbound.incidencias import InboundIncidencia
+    from core.models.inbound.proveedores import Proveedor
+    from core.models.inbound.recepciones import InboundRecepcion
+
+    init_db()
+    db = SessionLocal()
+    try:
+        negocio = Negocio(nombre_fantasia="Bench Scoring")
+        db.add(negocio)
+        db.flush()
+        nid = int(negocio.id)
+
+        tpl = InboundChecklistPlantilla(negocio_id=nid, nombre="Bench")
+        db.add(tpl)
+        db.flush()
+        sec = InboundChecklistSeccion(negocio_id=nid, plantilla_id=tpl.id, codigo="GEN", titulo="General")
+        db.add(sec)
+        db.flush()
+        items = [
+            InboundChecklistItem(negocio_id=nid, plantilla_id=tpl.id, seccion_id=sec.id, codigo=f"I{i}", nombre=f"Ítem {i}")
+            for i in range(2)
+        ]
+        db.add_all(items)
+        db.commit()
+        tpl_id = int(tpl.id)
+        item_ids = [int(it.id) for it in items]
+    finally:
+        db.close()
+
+    rnd = random.Random(42)
+    base = datetime(2025, 1, 1, 8, tzinfo=timezone.utc)
+    t0 = time.perf_counter()
+
+    with engine.begin() as conn:
+        prov_ids = _insert_ids(
+            conn,
+            Proveedor.__table__,
+            [{"negocio_id": nid, "nombre": f"Proveedor {p:04d}", "activo": 1} for p in range(proveedores)],
+        )
+
+        lote = 10000
+        for ini in range(0, recepciones, lote):
+            filas = []
+            for k in range(ini, min(ini + lote, recepciones)):
+                eta = base + timedelta(minutes=47 * k)
+                arribo = eta + timedelta(minutes=rnd.randint(-20, 300)) if k % 7 else None
+                cierre = arribo + timedelta(minutes=rnd.randint(60, 900)) if arribo and k % 5 else None
+                filas.append(
+                    {
+                        "negocio_id": nid,
+                        # proveedores con volumen desigual (algunos concentran más recepciones)
+                        "proveedor_id": prov_ids[min(int(rnd.paretovariate(1.2)) - 1, proveedores - 1) if k % 4 == 0 else rnd.randrange(proveedores)],
+                        "origen": "MANUAL",
+                        "codigo_recepcion": f"R{k:07d}",
+                        "estado": "CERRADO" if cierre else "EN_DESCARGA",
+                        "created_at": eta,
+                        "updated_at": eta,
+                        "fecha_estimada_llegada": eta,
+                        "fecha_arribo": arribo,
+                        "fecha_cierre": cierre,
+                    }
+                )
+            rec_ids = _insert_ids(conn, InboundRecepcion.__table__, filas)
+
+            incidencias = [
+                {"negocio_id": nid, "recepcion_id": rid, "tipo": "DAÑO", "criticidad": "MEDIA", "estado": "CREADA", "activo": 1,
+                 "created_at": base, "updated_at": base}
+                for rid in rec_ids
+                for _ in range(rnd.choice((0, 0, 0, 1, 1, 2, 3)))
+            ]
+            if incidencias:
+                conn.execute(InboundIncidencia.__table__.insert(), incidencias)
+
+            ejec_ids = _insert_ids(
+                conn,
+                InboundChecklistEjecucion.__table__,
+                [{"negocio_id": nid, "recepcion_id": rid, "plantilla_id": tpl_id, "creado_en": base, "actualizado_en": base}
+                 for rid in rec_ids],
+            )
+            conn.execute(
+                InboundChecklistRespuesta.__table__.insert(),
+                [
+                    {"negocio_id": nid, "recepcion_id": rid, "ejecucion_id": eid, "plantilla_id": tpl_id, "item_id": item_id,
+                     "estado": "PENDIENTE" if (rid % 3 == 0 and j == 1) else "CUMPLE", "creado_en": base, "actualizado_en": base}
+                    for rid, eid in zip(rec_ids, ejec_ids)
+                    for j, item_id in enumerate(item_ids)
+                ],
+            )
+
+    print(f"seed        {proveedores} proveedores / {recepciones} recepciones en {time.perf_counter() - t0:.1f}s")
+
+    # el seed usa inserts Core (sin hooks de Session): rollup desde cero
+    from modules.inbound_orbion.services.services_inbound_rollup import reconstruir_inbound_rollup
+
+    t0 = time.perf_counter()
+    db = SessionLocal()
+    try:
+        res = reconstruir_inbound_rollup(db, nid)
+    finally:
+        db.close()
+    print(f"rollup      {res['counters']['filas']} filas en {time.perf_counter() - t0:.1f}s")
+    return nid
+
+
+# =========================================================
+# LEGACY (implementación anterior, loop por proveedor)
+# =========================================================
+
+def _legacy(db, *, negocio_id: int, desde, hasta) -> list[dict]:
+    from sqlalchemy import exists, func
+
+    from core.models.inbound.checklist import InboundChecklistEjecucion, InboundChecklistRespuesta
+    from core.models.inbound.incidencias import InboundIncidencia
+    from core.models.inbound.proveedores import Proveedor
+    from core.models.inbound.recepciones import InboundRecepcion
+    from modules.inbound_orbion.services.services_inbound_analytics import (
+        _clamp,
+        _filtros_analytics,
+        _safe_div,
+        _to_float,
+    )
+
+    _CHK_COMPLETO = ~exists().where(
+        InboundChecklistRespuesta.recepcion_id == InboundChecklistEjecucion.recepcion_id,
+        InboundChecklistRespuesta.estado == "PENDIENTE",
+    )
+
+    def _avg_minutes(db, filtros, col_ini, col_fin) -> float:
+        if db.bind.dialect.name == "sqlite":
+            expr = (func.julianday(col_fin) - func.julianday(col_ini)) * 24.0 * 60.0
+        else:
+            expr = func.extract("epoch", col_fin - col_ini) / 60.0
+        v = db.query(func.avg(expr)).filter(*filtros, col_ini.isnot(None), col_fin.isnot(None)).scalar()
+        return 0.0 if v is None else round(max(float(v), 0.0), 1)
+
+    # mismo rango (días CL) que la versión agrupada
+    filtros = _filtros_analytics(negocio_id=negocio_id, desde=desde, hasta=hasta, proveedor_id=None)
+
+    prov_ids = [pid[0] for pid in db.query(func.distinct(InboundRecepcion.proveedor_id)).filter(*filtros).all() if pid and pid[0] is not None]
+    out = []
+    for pid in prov_ids:
+        p = db.get(Proveedor, pid)
+        nombre = p.nombre if p else "—"
+        recep_ids = [x[0] for x in db.query(InboundRecepcion.id).filter(*filtros).filter(InboundRecepcion.proveedor_id == pid).all()]
+        n_recep = len(recep_ids)
+        if n_recep == 0:
+            continue
+        inc_total = db.query(func.count(InboundIncidencia.id)).filter(InboundIncidencia.recepcion_id.in_(recep_ids)).scalar() or 0
+        inc_rate = _safe_div(float(inc_total), float(n_recep))
+        chk_total = db.query(func.count(InboundChecklistEjecucion.id)).filter(InboundChecklistEjecucion.recepcion_id.in_(recep_ids)).scalar() or 0
+        chk_ok = (
+            db.query(func.count(InboundChecklistEjecucion.id))
+            .filter(InboundChecklistEjecucion.recepcion_id.in_(recep_ids))
+            .filter(_CHK_COMPLETO)
+            .scalar()
+            or 0
+        )
+        chk_pct = _safe_div(float(chk_ok), float(chk_total)) * 100.0 if chk_total else 0.0
+        f_prov = filtros + [InboundRecepcion.proveedor_id == pid]
+        eta_arribo = _avg_minutes(db, f_prov, InboundRecepcion.fecha_estimada_llegada, InboundRecepcion.fecha_arribo)
+        arribo_cierre = _avg_minutes(db, f_prov, InboundRecepcion.fecha_arribo, InboundRecepcion.fecha_cierre)
+
+        s_chk = _clamp(_to_float(chk_pct), 0.0, 100.0)
+        s_inc = _clamp(100.0 * (1.0 - _clamp(inc_rate / 2.0, 0.0, 1.0)), 0.0, 100.0)
+        s_eta = _clamp(100.0 * (1.0 - _clamp(eta_arribo / 240.0, 0.0, 1.0)), 0.0, 100.0)
+        s_ciclo = _clamp(100.0 * (1.0 - _clamp(arribo_cierre / 720.0, 0.0, 1.0)), 0.0, 100.0)
+        score = round(_clamp(0.40 * s_chk + 0.25 * s_inc + 0.20 * s_eta + 0.15 * s_ciclo, 0.0, 100.0), 1)
+        out.append(
+            {
+                "proveedor_id": pid,
+                "proveedor_nombre": nombre,
+                "recepciones": n_recep,
+                "checklist_pct": round(s_chk, 1),
+                "inc_rate": round(inc_rate, 2),
+                "eta_arribo_min": float(eta_arribo),
+                "arribo_cierre_min": float(arribo_cierre),
+                "score": score,
+            }
+        )
+    out.sort(key=lambda x: x.get("score", 0), reverse=True)
+    return out
+
+
+# =========================================================
+# MEDICIÓN
+# =========================================================
+
+class _QueryCounter:
+    def __init__(self, engine) -> None:
+        from sqlalchemy import event
+
+        self.n = 0
+        event.listen(engine, "before_cursor_execute", self._on_exec)
+
+    def _on_exec(self, *args, **kwargs) -> None:
+        self.n += 1
+
+
+def _medir(nombre: str, fn, repeticiones: int, counter: _QueryCounter) -> list[dict]:
+    res = fn()  # warm-up
+    lat = []
+    q0 = counter.n
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        res = fn()
+        lat.append(time.perf_counter() - t0)
+    queries = (counter.n - q0) / repeticiones
+    print(f"{nombre:<10} p50={statistics.median(lat) * 1000:9.1f}ms  queries/call={queries:.0f}  proveedores={len(res)}")
+    return res
+
+
+def _equivalentes(a: dict | None, b: dict) -> bool:
+    """
+    Mismos valores. Minutos / score admiten ±0.1: legacy promedia con
+    julianday() (float) y el rollup con timedelta exacto, así que un promedio
+    en x.x5 puede redondear distinto.
+    """
+    if a is None or set(a) != set(b):
+        return False
+    for k, v in b.items():
+        if isinstance(v, float):
+            if abs(a[k] - v) > 0.1 + 1e-9:
+                return False
+        elif a[k] != v:
+            return False
+    return True
+
+
+def bench(nid: int, repeticiones: int) -> None:
+    from core.database import SessionLocal, engine
+    from modules.inbound_orbion.services.services_inbound_analytics import calcular_scoring_proveedores
+
+    counter = _QueryCounter(engine)
+    rangos = {
+        "todo": (None, None),
+        "90 días": (datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 4, 1, tzinfo=timezone.utc)),
+    }
+
+    db = SessionLocal()
+    try:
+        for etiqueta, (desde, hasta) in rangos.items():
+            print(f"-- rango: {etiqueta}")
+            legacy = _medir("legacy", lambda: _legacy(db, negocio_id=nid, desde=desde, hasta=hasta), repeticiones, counter)
+            agrupado = _medir(
+                "agrupado",
+                lambda: calcular_scoring_proveedores(db, negocio_id=nid, desde=desde, hasta=hasta),
+                repeticiones,
+                counter,
+            )
+            por_id = {r["proveedor_id"]: r for r in legacy}
+            diffs = [r["proveedor_id"] for r in agrupado if not _equivalentes(por_id.get(r["proveedor_id"]), r)]
+            iguales = not diffs and len(legacy) == len(agrupado)
+            print(f"verificación: {'idénticos' if iguales else f'DIFERENCIAS en {len(diffs)} proveedores {diffs[:10]}'}")
+    finally:
+        db.close()
+
+
+# =========================================================
+# MAIN
+# =========================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de scoring de proveedores ORBION")
+    parser.add_argument("--proveedores", type=int, default=500)
+    parser.add_argument("--recepciones", type=int, default=50_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = _setup_env(args.database_url)
+    try:
+        nid = _seed(args.proveedores, args.recepciones)
+        bench(nid, args.repeticiones)
+    finally:
+        if path:
+            for suf in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suf)
+                except OSError:
+                    pass
+
+
+if __name__ == "__main__":
+    main()
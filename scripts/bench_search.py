@@ -0,0 +1,198 @@
+﻿# scripts/bench_search.py
+"""
+Benchmark de búsqueda por substring – ORBION
+
+Compara, sobre un tenant con N movimientos (default 1M), el filtro LIKE
+'%q%' sobre lower(col) (scan secuencial) contra services_search.filtro_texto
+(FTS5 trigram en SQLite / GIN pg_trgm en Postgres):
+
+  - COUNT(*) filtrado   (KPIs de /movimientos)
+  - primera página      (ORDER BY fecha DESC, id DESC LIMIT 100)
+
+para un término selectivo (1 producto) y uno frecuente (~10% de las filas).
+Además mide el costo de mantener el índice en escritura (inserts con triggers).
+
+Uso (desde la raíz del repo; por defecto BD SQLite temporal):
+
+    python -m scripts.bench_search --filas 1000000 --repeticiones 5
+    python -m scripts.bench_search --database-url postgresql://...  # BD vacía de prueba
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+_PALABRAS = ["arroz", "harina", "aceite", "azucar", "fideos", "sal", "leche", "cafe", "te", "porotos"]
+
+
+def _setup_env(database_url: str | None) -> str | None:
+    os.environ.setdefault("APP_SECRET_KEY", "bench-search")
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+        return None
+    fd, path = tempfile.mkstemp(prefix="orbion_bench_search_", suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+
+def _nombre_producto(i: int) -> str:
+    return f"{_PALABRAS[i % len(_PALABRAS)].capitalize()} Marca{i // len(_PALABRAS):04d} {i:05d}"
+
+
+def _seed(filas: int, productos: int) -> int:
+    from core.database import SessionLocal, engine, init_db
+    from core.models import Movimiento, Negocio
+
+    init_db()
+    db = SessionLocal()
+    try:
+        negocio = Negocio(nombre_fantasia="Bench Search")
+        db.add(negocio)
+        db.commit()
+        nid = int(negocio.id)
+    finally:
+        db.close()
+
+    rnd = random.Random(42)
+    base = datetime(2024, 1, 1)
+    ins = Movimiento.__table__.insert()
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        lote = []
+        for i in range(filas):
+            lote.append(
+                {
+                    "negocio_id": nid,
+                    "usuario": f"operador{i % 40:02d}@bench.cl",
+                    "tipo": "entrada" if i % 3 else "salida",
+                    "producto": _nombre_producto(rnd.randrange(productos)),
+                    "cantidad": 1,
+                    "zona": "B-01-S1",
+                    "fecha": base + timedelta(seconds=30 * i),
+                }
+            )
+            if len(lote) >= 20000:
+                conn.execute(ins, lote)
+                lote.clear()
+        if lote:
+            conn.execute(ins, lote)
+    print(f"seed        {filas} movimientos en {time.perf_counter() - t0:.1f}s")
+    return nid
+
+
+def _medir(fn, repeticiones: int) -> tuple[float, object]:
+    res = fn()  # warm-up
+    lat = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        res = fn()
+        lat.append(time.perf_counter() - t0)
+    return statistics.median(lat), res
+
+
+def bench(nid: int, productos: int, repeticiones: int) -> None:
+    from sqlalchemy import func, select
+
+    from core.database import SessionLocal
+    from core.models import Movimiento
+    from core.services.services_search import filtro_texto
+
+    def _like(q: str):
+        return func.lower(Movimiento.producto).like(f"%{q.lower()}%")
+
+    def _indexado(q: str):
+        return filtro_texto("movimientos", q, columnas=("producto",))
+
+    terminos = {
+        "selectivo": f"{productos // 2:05d}",  # sufijo único de 1 producto
+        "frecuente": "harina",
+    }
+
+    db = SessionLocal()
+    try:
+        for etiqueta, q in terminos.items():
+            for nombre, filtro in (("LIKE", _like), ("indexado", _indexado)):
+                cond = filtro(q)
+                base = select(Movimiento.id).where(Movimiento.negocio_id == nid, cond)
+
+                t_count, n = _medir(
+                    lambda: db.execute(select(func.count()).select_from(base.subquery())).scalar_one(),
+                    repeticiones,
+                )
+                t_page, page = _medir(
+                    lambda: db.execute(
+                        base.order_by(Movimiento.fecha.desc(), Movimiento.id.desc()).limit(100)
+                    ).all(),
+                    repeticiones,
+                )
+                print(
+                    f"{etiqueta:<10} {q!r:<20} {nombre:<9} count={t_count * 1000:9.2f}ms "
+                    f"página={t_page * 1000:9.2f}ms  filas={n} ({len(page)} en página)"
+                )
+    finally:
+        db.close()
+
+
+def bench_escritura(nid: int, filas: int) -> None:
+    from core.database import engine
+    from core.models import Movimiento
+
+    lote = [
+        {
+            "negocio_id": nid,
+            "usuario": "escritura@bench.cl",
+            "tipo": "entrada",
+            "producto": _nombre_producto(i),
+            "cantidad": 1,
+            "zona": "B-01-S1",
+            "fecha": datetime(2030, 1, 1) + timedelta(seconds=i),
+        }
+        for i in range(filas)
+    ]
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(Movimiento.__table__.insert(), lote)
+    dt = time.perf_counter() - t0
+    print(f"escritura   {filas} inserts con índice de búsqueda: {filas / dt:.0f} filas/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda ORBION")
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--productos", type=int, default=5000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--escrituras", type=int, default=20000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = _setup_env(args.database_url)
+    try:
+        nid = _seed(args.filas, args.productos)
+
+        from core.services.services_search import ensure_search_indexes
+
+        t0 = time.perf_counter()
+        ensure_search_indexes()
+        print(f"índices     creados/poblados en {time.perf_counter() - t0:.1f}s")
+
+        bench(nid, args.productos, args.repeticiones)
+        bench_escritura(nid, args.escrituras)
+    finally:
+        if path:
+            for suf in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suf)
+                except OSError:
+                    pass
+
+
+if __name__ == "__main__":
+    main()
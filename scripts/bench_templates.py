@@ -0,0 +1,283 @@
+﻿# scripts/bench_templates.py
+"""
+Benchmark de templates Jinja2 – ORBION
+
+Compara, con los templates reales del repo:
+
+  - legacy:       un Jinja2Templates(directory=...) por router de basic_wms,
+                  más core.web (raíz + inbound) y main.py (raíz); sin
+                  bytecode cache, auto_reload activo (layout anterior)
+  - shared-cold:  un solo Environment (core.templates.create_templates +
+                  core.web.add_template_dir), bytecode cache vacío
+                  (primer worker tras un deploy)
+  - shared-warm:  ídem con el bytecode cache ya escrito (workers siguientes /
+                  reinicios), auto_reload off como en producción
+
+Qué templates compila cada Environment se toma de los TemplateResponse(...)
+de cada router (regex sobre el código). Cada modo corre en un subproceso
+aparte: se reporta el costo de los primeros requests de un worker (carga +
+primer render de cada template), templates compilados en memoria, delta de
+RSS y render medio en caliente con un contexto permisivo (sin BD).
+
+Uso (desde la raíz del repo):
+
+    python -m scripts.bench_templates
+    python -m scripts.bench_templates --renders 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_TEMPLATE_RESPONSE = re.compile(r"""TemplateResponse\(\s*(?:request\s*,\s*)?["']([^"']+\.html)["']""")
+
+_ROUTERS_ROOT = [
+    *sorted((ROOT / "core" / "routes").glob("*.py")),
+    ROOT / "main.py",
+]
+_ROUTERS_INBOUND = sorted((ROOT / "modules" / "inbound_orbion" / "routes").glob("*.py"))
+_ROUTERS_WMS = sorted((ROOT / "modules" / "basic_wms" / "routes").glob("routes_*.py"))
+
+_DIR_ROOT = ROOT / "templates"
+_DIR_INBOUND = ROOT / "modules" / "inbound_orbion" / "templates"
+_DIR_WMS = ROOT / "modules" / "basic_wms" / "templates"
+
+
+def _nombres(paths: list[Path]) -> list[str]:
+    out: set[str] = set()
+    for p in paths:
+        out.update(_TEMPLATE_RESPONSE.findall(p.read_text(encoding="utf-8-sig")))
+    return sorted(out)
+
+
+# =========================================================
+# CONTEXTO PERMISIVO (render sin BD)
+# =========================================================
+
+class _Todo:
+    """Valor comodín: atributos, índices, llamadas y comparaciones no fallan."""
+
+    def __getattr__(self, _name):
+        return self
+
+    def __getitem__(self, _key):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __iter__(self):
+        return iter(())
+
+    def __len__(self):
+        return 0
+
+    def __bool__(self):
+        return False
+
+    def __str__(self):
+        return ""
+
+    def __html__(self):
+        return ""
+
+    def __int__(self):
+        return 0
+
+    def __float__(self):
+        return 0.0
+
+    def __format__(self, _spec):
+        return ""
+
+    def _cmp(self, _other):
+        return False
+
+    __lt__ = __le__ = __gt__ = __ge__ = _cmp
+
+    def _arit(self, _other):
+        return self
+
+    __add__ = __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = __truediv__ = __rtruediv__ = _arit
+
+
+class _Contexto(dict):
+    def __missing__(self, _key):
+        return _Todo()
+
+
+# =========================================================
+# ENVIRONMENTS
+# =========================================================
+
+def _envs_legacy() -> list[tuple[object, list[str]]]:
+    from fastapi.templating import Jinja2Templates
+    from jinja2 import ChoiceLoader, FileSystemLoader
+
+    envs: list[tuple[object, list[str]]] = []
+
+    from core.formatting import cl_date, cl_datetime, cl_num, clp
+
+    # core.web: raíz + inbound (ChoiceLoader) + filtros CL, usado por core/routes e inbound
+    web = Jinja2Templates(directory=str(_DIR_ROOT))
+    web.env.loader = ChoiceLoader([web.env.loader, FileSystemLoader(str(_DIR_INBOUND))])
+    for nombre, fn in {"clp": clp, "cl_num": cl_num, "cl_datetime": cl_datetime, "cl_date": cl_date}.items():
+        web.env.filters[nombre] = fn
+        web.env.globals[nombre] = fn
+    envs.append((web.env, _nombres([p for p in _ROUTERS_ROOT if p.name != "main.py"] + _ROUTERS_INBOUND)))
+
+    # main.py: create_templates(BASE_DIR) propio
+    main = Jinja2Templates(directory=str(_DIR_ROOT))
+    envs.append((main.env, _nombres([ROOT / "main.py"])))
+
+    # basic_wms: un Jinja2Templates por router
+    for p in _ROUTERS_WMS:
+        nombres = _nombres([p])
+        if nombres:
+            envs.append((Jinja2Templates(directory=str(_DIR_WMS)).env, nombres))
+    return envs
+
+
+def _envs_shared() -> list[tuple[object, list[str]]]:
+    from core.web import add_template_dir, templates
+
+    add_template_dir(_DIR_INBOUND)
+    add_template_dir(_DIR_WMS)
+    return [(templates.env, _nombres(_ROUTERS_ROOT + _ROUTERS_INBOUND + _ROUTERS_WMS))]
+
+
+# =========================================================
+# MEDICIÓN (subproceso)
+# =========================================================
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _render(tpl) -> bool:
+    try:
+        tpl.render(_Contexto(request=_Todo(), user=_Todo()))
+        return True
+    except Exception:
+        return False
+
+
+def medir(modo: str, renders: int) -> None:
+    from jinja2 import TemplateNotFound
+
+    if modo != "legacy":
+        import core.web  # noqa: F401  (import fuera de la medición)
+
+    envs = _envs_legacy() if modo == "legacy" else _envs_shared()
+
+    # primeros requests de un worker: carga + primer render de cada template
+    # (extends / include se cargan recién al renderizar, en cada Environment)
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    ok = []
+    for env, nombres in envs:
+        for nombre in nombres:
+            try:
+                tpl = env.get_template(nombre)
+            except TemplateNotFound:
+                # referenciado por un router pero no presente en el repo
+                continue
+            if _render(tpl):
+                ok.append(tpl)
+    t_primer = time.perf_counter() - t0
+    rss1 = _rss_mb()
+    compilados = sum(len(env.cache or {}) for env, _ in envs)
+
+    # render en caliente (incluye get_template del padre en cada extends)
+    t1 = time.perf_counter()
+    for _ in range(renders):
+        for tpl in ok:
+            tpl.render(_Contexto(request=_Todo(), user=_Todo()))
+    t_render = time.perf_counter() - t1
+
+    print(json.dumps({
+        "envs": len(envs),
+        "compilados": compilados,
+        "primer_render_ms": t_primer * 1000,
+        "rss_delta_mb": rss1 - rss0,
+        "renderizables": len(ok),
+        "render_us": (t_render / max(1, renders * len(ok))) * 1e6,
+    }))
+
+
+# =========================================================
+# MAIN
+# =========================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de templates Jinja2 ORBION")
+    sub = parser.add_subparsers(dest="cmd")
+
+    p_medir = sub.add_parser("_medir")
+    p_medir.add_argument("--modo", choices=["legacy", "shared-cold", "shared-warm"], required=True)
+    p_medir.add_argument("--renders", type=int, default=500)
+
+    parser.add_argument("--renders", type=int, default=500, help="renders por template en la medición en caliente")
+    args = parser.parse_args()
+
+    os.environ.setdefault("APP_SECRET_KEY", "bench-templates")
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+    if args.cmd == "_medir":
+        medir(args.modo, args.renders)
+        return
+
+    cache_dir = tempfile.mkdtemp(prefix="orbion_bench_jinja_")
+    env = os.environ.copy()
+    env.update(
+        {
+            "APP_ENV": "production",
+            "TEMPLATES_BYTECODE_CACHE_DIR": cache_dir,
+        }
+    )
+
+    try:
+        print(f"{'modo':<12} {'envs':>5} {'en memoria':>11} {'1er render':>11} {'rss Δ':>8} {'render':>10}")
+        for modo in ("legacy", "shared-cold", "shared-warm"):
+            out = subprocess.run(
+                [sys.executable, "-m", "scripts.bench_templates", "_medir", "--modo", modo, "--renders", str(args.renders)],
+                capture_output=True,
+                text=True,
+                env=env,
+                cwd=str(ROOT),
+                check=True,
+            )
+            m = json.loads(out.stdout.strip().splitlines()[-1])
+            print(
+                f"{modo:<12} {m['envs']:>5} {m['compilados']:>11} {m['primer_render_ms']:>9.0f}ms "
+                f"{m['rss_delta_mb']:>6.1f}MB {m['render_us']:>8.0f}us"
+            )
+        print(f"(render medio sobre {m['renderizables']} templates renderizables sin BD)")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+﻿# scripts/load_test_concurrency.py
+"""
+Load test de concurrencia – ORBION
+
+Mide throughput y latencia de requests concurrentes contra un servidor vivo,
+más la latencia de un "probe" liviano (sin BD) lanzado en paralelo: si las
+rutas pesadas bloquean el event loop, el probe se degrada junto con ellas.
+
+Uso (desde la raíz del repo, mismo .env / DATABASE_URL que el servidor):
+
+    # 1) Datos de prueba (tenant + admin + N movimientos)
+    python -m scripts.load_test_concurrency seed --movimientos 50000
+
+    # 2) Servidor
+    uvicorn main:app --port 8000
+
+    # 3) Carga
+    python -m scripts.load_test_concurrency run --base-url http://127.0.0.1:8000 \\
+        --path /dashboard --path /stock --concurrency 16 --requests 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.cookiejar
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+
+SEED_EMAIL = "loadtest@orbion.cl"
+SEED_PASSWORD = "loadtest"
+
+
+# =========================================================
+# SEED
+# =========================================================
+
+def seed(movimientos: int, productos: int, slots: int) -> None:
+    from core.database import SessionLocal, init_db
+    from core.models import Movimiento, Negocio, Producto, Slot, Ubicacion, Usuario, Zona
+    from core.security import hash_password
+    from modules.basic_wms.services.services_stock_saldos import reconstruir_stock_saldos
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if db.query(Usuario).filter(Usuario.email == SEED_EMAIL).first():
+            print(f"seed ya existe ({SEED_EMAIL})")
+            return
+
+        negocio = Negocio(nombre_fantasia="Load Test")
+        db.add(negocio)
+        db.flush()
+
+        db.add(
+            Usuario(
+                negocio_id=negocio.id,
+                email=SEED_EMAIL,
+                password_hash=hash_password(SEED_PASSWORD),
+                rol="admin",
+                activo=1,
+            )
+        )
+
+        zona = Zona(negocio_id=negocio.id, nombre="LT", sigla="LT")
+        db.add(zona)
+        db.flush()
+        ubic = Ubicacion(zona_id=zona.id, nombre="U1", sigla="U1")
+        db.add(ubic)
+        db.flush()
+
+        codigos = [f"LT-U1-S{i}" for i in range(1, slots + 1)]
+        slot_objs = [
+            Slot(ubicacion_id=ubic.id, codigo=f"S{i}", codigo_full=c, capacidad=100000)
+            for i, c in enumerate(codigos, start=1)
+        ]
+        db.add_all(slot_objs)
+
+        nombres = [f"Producto {i:04d}" for i in range(productos)]
+        producto_objs = [
+            Producto(
+                negocio_id=negocio.id,
+                nombre=n,
+                sku=f"LT{i:06d}",
+                stock_min=10,
+                stock_max=5000,
+                costo_unitario=100,
+            )
+            for i, n in enumerate(nombres)
+        ]
+        db.add_all(producto_objs)
+        db.commit()
+
+        base = datetime.utcnow() - timedelta(days=90)
+        rows = []
+        for i in range(movimientos):
+            tipo = "entrada" if i % 3 else "salida"
+            rows.append(
+                {
+                    "negocio_id": negocio.id,
+                    "usuario": SEED_EMAIL,
+                    "tipo": tipo,
+                    "producto": nombres[i % productos],
+                    "cantidad": 5 if tipo == "entrada" else 2,
+                    "zona": codigos[i % slots],
+                    "producto_id": producto_objs[i % productos].id,
+                    "slot_id": slot_objs[i % slots].id,
+                    "fecha": base + timedelta(minutes=i),
+                    "fecha_vencimiento": (date.today() + timedelta(days=i % 120)) if tipo == "entrada" else None,
+                }
+            )
+            if len(rows) >= 5000:
+                db.bulk_insert_mappings(Movimiento, rows)
+                rows.clear()
+        if rows:
+            db.bulk_insert_mappings(Movimiento, rows)
+        db.commit()
+
+        reconstruir_stock_saldos(db, negocio.id)
+        print(f"seed ok negocio_id={negocio.id} movimientos={movimientos} login={SEED_EMAIL}/{SEED_PASSWORD}")
+    finally:
+        db.close()
+
+
+# =========================================================
+# RUN
+# =========================================================
+
+def _opener(base_url: str, email: str, password: str) -> urllib.request.OpenerDirector:
+    jar = http.cookiejar.CookieJar()
+
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    login = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), _NoRedirect())
+    data = urllib.parse.urlencode({"email": email, "password": password}).encode()
+    try:
+        login.open(f"{base_url}/app/login", data=data, timeout=30)
+    except urllib.error.HTTPError as exc:
+        if exc.code not in (302, 303):
+            raise
+    if not any(c.name for c in jar):
+        raise SystemExit("login fallido (sin cookie de sesión)")
+
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+
+def _timed_get(opener, url: str) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    try:
+        with opener.open(url, timeout=120) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    return time.perf_counter() - t0, status
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+def run(base_url: str, paths: list[str], concurrency: int, total: int, probe_path: str, email: str, password: str) -> None:
+    opener = _opener(base_url, email, password)
+    urls = [f"{base_url}{paths[i % len(paths)]}" for i in range(total)]
+
+    # warm-up
+    for p in paths:
+        _timed_get(opener, f"{base_url}{p}")
+
+    probe_lat: list[float] = []
+    stop = threading.Event()
+
+    def _probe() -> None:
+        while not stop.is_set():
+            dt, _ = _timed_get(opener, f"{base_url}{probe_path}")
+            probe_lat.append(dt)
+            time.sleep(0.05)
+
+    probe = threading.Thread(target=_probe, daemon=True)
+    probe.start()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda u: _timed_get(opener, u), urls))
+    elapsed = time.perf_counter() - t0
+
+    stop.set()
+    probe.join()
+
+    lat = [r[0] for r in results]
+    errores = sum(1 for r in results if r[1] >= 400)
+
+    print(f"paths={paths} concurrency={concurrency} requests={total} errores={errores}")
+    print(f"throughput   {total / elapsed:8.1f} req/s  (total {elapsed:.2f}s)")
+    print(
+        f"latencia     p50={_pct(lat, 0.50) * 1000:7.1f}ms  p95={_pct(lat, 0.95) * 1000:7.1f}ms  "
+        f"max={max(lat) * 1000:7.1f}ms"
+    )
+    if probe_lat:
+        print(
+            f"probe {probe_path} p50={_pct(probe_lat, 0.50) * 1000:7.1f}ms  "
+            f"p95={_pct(probe_lat, 0.95) * 1000:7.1f}ms  n={len(probe_lat)} "
+            f"(mean {statistics.mean(probe_lat) * 1000:.1f}ms)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test de concurrencia ORBION")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_seed = sub.add_parser("seed")
+    p_seed.add_argument("--movimientos", type=int, default=50000)
+    p_seed.add_argument("--productos", type=int, default=500)
+    p_seed.add_argument("--slots", type=int, default=50)
+
+    p_run = sub.add_parser("run")
+    p_run.add_argument("--base-url", default="http://127.0.0.1:8000")
+    p_run.add_argument("--path", action="append", dest="paths")
+    p_run.add_argument("--concurrency", type=int, default=16)
+    p_run.add_argument("--requests", type=int, default=200)
+    p_run.add_argument("--probe-path", default="/favicon.ico")
+    p_run.add_argument("--email", default=SEED_EMAIL)
+    p_run.add_argument("--password", default=SEED_PASSWORD)
+
+    args = parser.parse_args()
+    if args.cmd == "seed":
+        seed(args.movimientos, args.productos, args.slots)
+    else:
+        run(
+            args.base_url.rstrip("/"),
+            args.paths or ["/dashboard"],
+            args.concurrency,
+            args.requests,
+            args.probe_path,
+            args.email,
+            args.password,
+        )
+
+
+if __name__ == "__main__":
+    main()